@@ -0,0 +1,319 @@
+# dashboard/artifact_index.py
+# 下载目录（DOWNLOAD_ROOT）文件索引
+#
+# 文件下载 / 历史文件页面以前每次打开都要 os.listdir + isdir/isfile 逐层扫描整棵目录树，
+# 积累几个月的文件后每次页面加载是上万次 stat。现在由写文件 / 移动文件的地方顺手登记到
+# DownloadArtifact 表，页面直接查表渲染：
+#   - export_files / 批量导出 / file_replace / Starlet_qyzl / export_wholeblood_files 写入时 record_artifact
+#   - PDF 由后台 worker 生成，任务完成时登记
+#   - 旧文件进历史目录时 move_artifact
+#   - 手工增删文件后可执行 `python manage.py reconcile_download_index` 按磁盘重建
+#   - payload.json 记录同时保存其中已取样的条码 / 实验号，供文件替换页的当日重复提示使用
+import json
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import DownloadArtifact
+
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIRNAME = "历史文件"
+STATION_DIRNAME = "岗位清单"
+
+# Starlet 在平台下多一层类别
+STARLET_CATEGORIES = ("工作清单和上机列表", "取样指令")
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def artifact_kind(file_name):
+    """文件类别：payload（*.payload.json）/ onboarding（上机列表）/ worksheet（工作清单 PDF）/ 空串"""
+    name = file_name or ""
+    if name.lower().endswith(".payload.json"):
+        return "payload"
+    if "OnboardingList" in name:
+        return "onboarding"
+    if "WorkSheet" in name and name.lower().endswith(".pdf"):
+        return "worksheet"
+    return ""
+
+
+def _classify(rel_parts):
+    """
+    按下载目录约定的层级解析相对路径，返回索引字段 dict；不属于下载页展示范围的返回 None。
+      通用：平台 / 日期 / 项目 / 文件
+      Starlet：Starlet / 类别 / 日期 / (项目) / 文件
+      历史文件：历史文件 / 以上任一结构
+    """
+    parts = list(rel_parts)
+    section = "main"
+    if parts and parts[0] == HISTORY_DIRNAME:
+        section = "history"
+        parts = parts[1:]
+    elif parts and parts[0] == STATION_DIRNAME:
+        return None
+
+    if not parts or parts[-1].lower().endswith(".tmp"):
+        return None
+
+    platform = parts[0]
+    category = project = ""
+    if platform == "Starlet":
+        if len(parts) == 4:
+            _, category, date_name, file_name = parts
+        elif len(parts) == 5:
+            _, category, date_name, project, file_name = parts
+        else:
+            return None
+        if category not in STARLET_CATEGORIES:
+            return None
+    elif len(parts) == 4:
+        platform, date_name, project, file_name = parts
+    else:
+        return None
+
+    if not _DATE_RE.match(date_name):
+        return None
+
+    return {
+        "section": section,
+        "platform": platform,
+        "category": category,
+        "date_name": date_name,
+        "project": project,
+        "file_name": file_name,
+        "kind": artifact_kind(file_name),
+    }
+
+
+def _rel_parts(path, root):
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    if rel.startswith(".."):
+        return None
+    return rel.split(os.sep)
+
+
+def record_artifact(path, sampled_codes=None):
+    """
+    登记（或刷新）一个已写入 DOWNLOAD_ROOT 的文件；索引失败只记日志，不影响导出本身。
+    payload.json 可顺带传入 sampled_codes（见 payload_sampled_codes），不传则首次查询时再从文件提取。
+    返回索引记录（不在下载页展示范围内 / 登记失败时返回 None）。
+    """
+    try:
+        parts = _rel_parts(path, settings.DOWNLOAD_ROOT)
+        fields = _classify(parts) if parts else None
+        if fields is None:
+            return None
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            forget_artifact(path)
+            return None
+        codes = None
+        if fields["kind"] == "payload" and sampled_codes is not None:
+            codes = "\n".join(sampled_codes)
+        artifact, _ = DownloadArtifact.objects.update_or_create(
+            rel_path="/".join(parts),
+            defaults=dict(fields, size=st.st_size, mtime=st.st_mtime, sampled_codes=codes, barcodes_indexed=False),
+        )
+        return artifact
+    except Exception as e:
+        logger.warning("登记下载文件索引失败：%s（%s）", path, e)
+        return None
+
+
+def forget_artifact(path):
+    """文件被删除 / 移走后，从索引中去掉"""
+    try:
+        parts = _rel_parts(path, settings.DOWNLOAD_ROOT)
+        if parts:
+            DownloadArtifact.objects.filter(rel_path="/".join(parts)).delete()
+    except Exception as e:
+        logger.warning("移除下载文件索引失败：%s（%s）", path, e)
+
+
+def move_artifact(src, dst):
+    forget_artifact(src)
+    record_artifact(dst)
+
+
+def _scan_disk(root):
+    """按磁盘实际内容生成 {rel_path: 字段}"""
+    found = {}
+    for dirpath, _, filenames in os.walk(root):
+        for fn in filenames:
+            path = os.path.join(dirpath, fn)
+            parts = _rel_parts(path, root)
+            fields = _classify(parts) if parts else None
+            if fields is None:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            found["/".join(parts)] = dict(fields, size=st.st_size, mtime=st.st_mtime)
+    return found
+
+
+def reconcile_artifacts():
+    """
+    按磁盘重建索引：补登记缺失的文件、删除已不存在的记录、刷新大小 / 修改时间有变化的记录。
+    返回 (新增, 删除, 更新) 条数
+    """
+    root = settings.DOWNLOAD_ROOT
+    found = _scan_disk(root) if os.path.isdir(root) else {}
+    existing = {a.rel_path: a for a in DownloadArtifact.objects.all()}
+
+    to_create = [DownloadArtifact(rel_path=rp, **f) for rp, f in found.items() if rp not in existing]
+    stale_ids = [a.pk for rp, a in existing.items() if rp not in found]
+    to_update = []
+    for rp, a in existing.items():
+        f = found.get(rp)
+        if f and (a.size != f["size"] or a.mtime != f["mtime"] or a.kind != f["kind"]):
+            a.size, a.mtime, a.kind = f["size"], f["mtime"], f["kind"]
+            a.sampled_codes = None    # 文件内容变了，已取样条码 / 主子条码待重新提取
+            a.barcodes_indexed = False
+            to_update.append(a)
+
+    with transaction.atomic():
+        DownloadArtifact.objects.bulk_create(to_create, batch_size=500)
+        for i in range(0, len(stale_ids), 500):
+            DownloadArtifact.objects.filter(pk__in=stale_ids[i:i + 500]).delete()
+        DownloadArtifact.objects.bulk_update(to_update, ["size", "mtime", "kind", "sampled_codes", "barcodes_indexed"], batch_size=500)
+
+    return len(to_create), len(stale_ids), len(to_update)
+
+
+def ensure_artifact_index():
+    """索引为空（首次上线）时按磁盘建一次"""
+    if not DownloadArtifact.objects.exists():
+        added, _, _ = reconcile_artifacts()
+        if added:
+            logger.info("下载文件索引初始化：登记 %s 个文件", added)
+
+
+_ARTIFACT_FIELDS = ("rel_path", "platform", "category", "date_name", "project", "file_name")
+
+
+def list_artifacts(section, date_from=None):
+    """取某个页面（main / history）的文件记录；date_from 给定时只取该日期（含）之后的"""
+    qs = DownloadArtifact.objects.filter(section=section)
+    if date_from:
+        qs = qs.filter(date_name__gte=date_from)
+    return list(qs.values(*_ARTIFACT_FIELDS))
+
+
+def artifact_platforms(section):
+    """页面顶层节点：[(平台, 类别), ...]（非 Starlet 平台类别为空串）"""
+    return sorted(set(
+        DownloadArtifact.objects.filter(section=section)
+        .values_list("platform", "category").distinct()
+    ))
+
+
+def artifact_dates(section, platform, category="", before="", limit=20):
+    """
+    某平台（类别）下的日期，新的在前，按 before（不含）向前翻页。
+    返回 (日期列表, 下一页游标)；没有更早的日期时游标为空串。
+    """
+    qs = DownloadArtifact.objects.filter(section=section, platform=platform, category=category)
+    if before:
+        qs = qs.filter(date_name__lt=before)
+    dates = list(qs.order_by("-date_name").values_list("date_name", flat=True).distinct()[:limit + 1])
+    if len(dates) > limit:
+        return dates[:limit], dates[limit - 1]
+    return dates, ""
+
+
+def artifact_day(section, platform, category, date_name):
+    """某个日期节点下的全部文件记录（展开时才查询）"""
+    return list(
+        DownloadArtifact.objects.filter(
+            section=section, platform=platform, category=category, date_name=date_name
+        ).values(*_ARTIFACT_FIELDS)
+    )
+
+
+# ============ 按文件名查找（文件替换用） ============
+def find_artifact_path(file_name, section="main"):
+    """
+    按文件名取绝对路径（走 file_name 索引）；没有登记或文件已不在磁盘上时返回 None。
+    同名文件出现在多个目录时取最新写入的一个。
+    """
+    root = settings.DOWNLOAD_ROOT
+    for rel_path in (
+        DownloadArtifact.objects.filter(file_name=file_name, section=section)
+        .order_by("-mtime").values_list("rel_path", flat=True)
+    ):
+        path = os.path.join(root, *rel_path.split("/"))
+        if os.path.isfile(path):
+            return path
+        forget_artifact(path)    # 文件已被手工删除，顺手清理
+    return None
+
+
+def artifact_paths_by_kind(kind, section="main"):
+    """某类文件的 {文件名: 绝对路径}（走 section + kind 索引）"""
+    root = settings.DOWNLOAD_ROOT
+    return {
+        name: os.path.join(root, *rel_path.split("/"))
+        for name, rel_path in (
+            DownloadArtifact.objects.filter(section=section, kind=kind)
+            .order_by("mtime").values_list("file_name", "rel_path")
+        )
+    }
+
+
+# ============ 当日已取样条码 / 实验号（文件替换页重复提示用） ============
+def payload_sampled_codes(payload):
+    """提取 payload 的 worksheet_table 中的 match_sample / origin_barcode（统一大写、去空、排序）"""
+    codes = set()
+    for row in payload.get("worksheet_table") or []:
+        # worksheet_table: list[list[cell]]
+        if not isinstance(row, list):
+            continue
+        for cell in row:
+            if not isinstance(cell, dict):
+                continue
+            for key in ("match_sample", "origin_barcode"):
+                v = str(cell.get(key) or "").strip()
+                if v:
+                    codes.add(v.upper())
+    return sorted(codes)
+
+
+def _day_payload_artifacts(date_name):
+    # 只算“文件下载”中的 payload：进了历史目录（被替换掉）的不再计入
+    return DownloadArtifact.objects.filter(section="main", kind="payload", date_name=date_name)
+
+
+def sampled_codes_version(date_name):
+    """当日已取样集合的版本号（payload 增删改都会变化），用作 ETag"""
+    agg = _day_payload_artifacts(date_name).aggregate(n=Count("id"), top=Max("id"), last=Max("indexed_at"))
+    last = agg["last"].timestamp() if agg["last"] else 0
+    return f"{date_name}-{agg['n']}-{agg['top'] or 0}-{last:.6f}"
+
+
+def daily_sampled_codes(date_name):
+    """当日所有 payload 中已取样的条码 / 实验号集合；尚未提取的 payload 现场读取一次并回写"""
+    codes = set()
+    for a in _day_payload_artifacts(date_name).only("id", "rel_path", "sampled_codes"):
+        if a.sampled_codes is None:
+            path = os.path.join(settings.DOWNLOAD_ROOT, *a.rel_path.split("/"))
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    a.sampled_codes = "\n".join(payload_sampled_codes(json.load(f)))
+            except Exception:
+                # 单个文件坏了不影响整体
+                a.sampled_codes = ""
+            # update() 不触发 auto_now，版本号不变
+            DownloadArtifact.objects.filter(pk=a.pk).update(sampled_codes=a.sampled_codes)
+        if a.sampled_codes:
+            codes.update(a.sampled_codes.split("\n"))
+    return codes
@@ -0,0 +1,137 @@
+# dashboard/barcode_history.py
+# ICP-MS“同主条码、不同子条码”冲突检测用的当日条码历史
+#
+# 以前每次 ICP-MS 生成都要遍历 DOWNLOAD_ROOT/平台/日期/项目，重新解析当天该项目的全部 payload.json。
+# 现在 payload 落盘（_dump_payload_json）时即把其中的“主条码 + 子条码”样本条码写入 PayloadBarcode：
+#   - 与下载文件索引同生命周期：payload 被替换进历史目录时随索引记录一并删除
+#   - 未在写入时登记的 payload（旧文件 / reconcile 补登记）在首次查询时解析一次
+#   - 查询只按本次出现的主条码走索引，代价与本次条码数成正比
+import json
+import logging
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import DownloadArtifact, PayloadBarcode
+
+
+logger = logging.getLogger(__name__)
+
+# 曲线 / 质控 / Blank 不参与
+_SPECIAL_PREFIXES = ("STD", "QC", "Blank")
+
+
+def split_main_sub_barcode(barcode: str) -> tuple[str, str]:
+    """
+    仅把含 '-' 的条码拆成 (主条码, 子条码)
+    例如：
+      6859899683-01 -> ("6859899683", "-01")
+      6859899683    -> ("6859899683", "")
+    """
+    s = (barcode or "").strip()
+    if not s:
+        return "", ""
+    parts = s.split("-", 1)
+    if len(parts) == 2 and parts[0].strip() and parts[1].strip():
+        return parts[0].strip(), "-" + parts[1].strip()
+    return s, ""
+
+
+def payload_subbarcode_origins(payload: dict) -> set[tuple[str, str]]:
+    """
+    payload 中参与冲突检测的 (主条码, 完整条码)：
+      - worksheet_table 中真正的样本孔位（排除定位孔、NOTUBE）
+      - origin_barcode 同时含主条码和子条码（必须带 '-'）
+      - 排除曲线/质控/Blank
+    """
+    result = set()
+    for row in payload.get("worksheet_table") or []:
+        if not isinstance(row, list):
+            continue
+        for cell in row:
+            if not isinstance(cell, dict) or cell.get("locator"):
+                continue
+
+            origin = str(cell.get("origin_barcode") or "").strip()
+            match_sample = str(cell.get("match_sample") or "").strip()
+            if not origin or origin.upper() == "NOTUBE":
+                continue
+
+            main_bc, sub_bc = split_main_sub_barcode(origin)
+            if not main_bc or not sub_bc:
+                continue
+            if match_sample.startswith(_SPECIAL_PREFIXES):
+                continue
+
+            result.add((main_bc, origin))
+    return result
+
+
+def index_payload_barcodes(artifact, payload: dict):
+    """写入（覆盖）某个 payload 的主 / 子条码；失败只记日志，不影响导出"""
+    try:
+        with transaction.atomic():
+            PayloadBarcode.objects.filter(artifact=artifact).delete()
+            PayloadBarcode.objects.bulk_create([
+                PayloadBarcode(
+                    artifact=artifact,
+                    platform=artifact.platform,
+                    date_name=artifact.date_name,
+                    project=artifact.project,
+                    main_barcode=main_bc,
+                    origin_barcode=origin,
+                )
+                for main_bc, origin in sorted(payload_subbarcode_origins(payload))
+            ], batch_size=500)
+            DownloadArtifact.objects.filter(pk=artifact.pk).update(barcodes_indexed=True)
+    except Exception as e:
+        logger.warning("登记 payload 条码失败：%s（%s）", artifact.rel_path, e)
+
+
+def _project_payloads(platform, date_name, project):
+    # 与原先扫描 DOWNLOAD_ROOT/平台/日期/项目 的范围一致（不含历史目录）
+    return DownloadArtifact.objects.filter(
+        section="main", kind="payload", platform=platform, category="", date_name=date_name, project=project,
+    )
+
+
+def _index_pending_payloads(platform, date_name, project):
+    for a in _project_payloads(platform, date_name, project).filter(barcodes_indexed=False):
+        path = os.path.join(settings.DOWNLOAD_ROOT, *a.rel_path.split("/"))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except Exception:
+            payload = {}   # 单个文件坏了不影响整体
+        index_payload_barcodes(a, payload)
+
+
+def main_barcode_history(platform: str, date_name: str, project: str, main_barcodes=None) -> dict[str, set[str]]:
+    """
+    当天该平台 / 项目已生成的 payload 中“主条码 -> 已出现过的完整条码集合”。
+    main_barcodes 给定时只查这些主条码（冲突检测只关心本次出现的主条码）。
+    """
+    result = defaultdict(set)
+    if not platform or not project or not date_name:
+        return result
+
+    _index_pending_payloads(platform, date_name, project)
+
+    qs = PayloadBarcode.objects.filter(
+        platform=platform, date_name=date_name, project=project, artifact__section="main",
+    )
+    if main_barcodes is not None:
+        mains = list({m for m in main_barcodes if m})
+        if not mains:
+            return result
+        rows = []
+        for i in range(0, len(mains), 500):
+            rows.extend(qs.filter(main_barcode__in=mains[i:i + 500]).values_list("main_barcode", "origin_barcode"))
+    else:
+        rows = qs.values_list("main_barcode", "origin_barcode")
+
+    for main_bc, origin in rows:
+        result[main_bc].add(origin)
+    return result
@@ -0,0 +1,272 @@
+# dashboard/benchmarks.py
+# 性能基准：python manage.py run_benchmarks [名称 ...] [--quick]
+#
+# 每个基准对比“原先的写法”与现在的实现，返回若干 (说明, 毫秒) 结果行。
+# 写数据库的基准只使用 project_name = BENCH_PROJECT 的临时记录，结束后删除（连同写入时登记的统计版本号）。
+import time
+from datetime import date
+
+
+BENCH_PROJECT = "__benchmark__"
+
+# 名称 -> (说明, 函数)；函数签名 fn(quick: bool) -> list[(label, ms)]
+BENCHMARKS = {}
+
+
+def benchmark(name, title):
+    def register(fn):
+        BENCHMARKS[name] = (title, fn)
+        return fn
+    return register
+
+
+def _elapsed_ms(fn, repeat=1):
+    """执行 repeat 次，返回单次平均毫秒"""
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1000 / repeat
+
+
+def run_benchmark(name, quick=False):
+    title, fn = BENCHMARKS[name]
+    return title, fn(quick)
+
+
+# ============ SampleRecord 整板写入 ============
+def _plate_rows(plate_idx, wells=96):
+    from .sample_records import make_sample_row
+    rows = []
+    for i in range(wells):
+        well = f"{'ABCDEFGH'[i // 12 % 8]}{i % 12 + 1}"
+        rows.append(make_sample_row(well, f"VD{plate_idx:02d}{i:03d}", f"14262{plate_idx:02d}{i:04d}"))
+    return rows
+
+
+@benchmark("sample_records", "SampleRecord 每板写入耗时（逐孔 update_or_create vs save_plate_records）")
+def bench_sample_records(quick=False):
+    from .models import SampleRecord, SampleStatsVersion
+    from .sample_records import save_plate_records
+
+    plates = 2 if quick else 10
+    record_date = date(2000, 1, 1)
+    try:
+        def legacy():
+            for p in range(plates):
+                for row in _plate_rows(p):
+                    SampleRecord.objects.update_or_create(
+                        project_name=BENCH_PROJECT, record_date=record_date, batch_id="legacy",
+                        plate_no=f"X{p}", well_str=row["well_str"],
+                        defaults={"sample_name": row["sample_name"], "barcode": row["barcode"], "error_info": ""},
+                    )
+
+        def bulk():
+            for p in range(plates):
+                save_plate_records(_plate_rows(p), project_name=BENCH_PROJECT, record_date=record_date,
+                                   plate_no=f"X{p}", batch_id="bulk")
+
+        # 首次为插入，第二次为覆盖更新（同一批次重新生成）
+        return [
+            ("逐孔 update_or_create（插入）", _elapsed_ms(legacy) / plates),
+            ("逐孔 update_or_create（更新）", _elapsed_ms(legacy) / plates),
+            ("save_plate_records（插入）", _elapsed_ms(bulk) / plates),
+            ("save_plate_records（更新）", _elapsed_ms(bulk) / plates),
+        ]
+    finally:
+        SampleRecord.objects.filter(project_name=BENCH_PROJECT).delete()
+        # save_plate_records 提交后会为该日期登记统计缓存版本号
+        SampleStatsVersion.objects.filter(record_date=record_date).delete()
+
+
+# ============ PDF 冷 / 热渲染 ============
+def _worksheet_context():
+    """一块 96 孔工作清单（export_files 使用的 export_pdf.html 上下文）"""
+    worksheet_table = []
+    for r, letter in enumerate("ABCDEFGH"):
+        worksheet_table.append([
+            {
+                "letter": letter, "num": c, "index": r * 12 + c,
+                "match_sample": f"VD{r * 12 + c:05d}", "origin_barcode": f"142620{r * 12 + c:04d}",
+                "cut_barcode": f"142620{r * 12 + c:04d}", "warm": "", "highlight": False,
+            }
+            for c in range(1, 13)
+        ])
+    return {
+        "worksheet_table": worksheet_table,
+        "error_rows": [],
+        "project_name_full": "维生素D检测",
+        "nums": [str(i) for i in range(1, 13)],
+        "preview": False,
+        "header": {"today_str": "2026-01-05", "plate_no": "X1", "instrument_num": "I1",
+                   "systerm_num": "1", "injection_plate": "P1"},
+        "platform": "NIMBUS",
+    }
+
+
+@benchmark("pdf_render", "96 孔工作清单 PDF（每次新建 FontConfiguration/CSS vs 常驻 WarmPdfRenderer）")
+def bench_pdf_render(quick=False):
+    import os
+    import tempfile
+    from .pdf_jobs import WarmPdfRenderer
+
+    repeat = 1 if quick else 3
+    html = WarmPdfRenderer().render_html("dashboard/export_pdf.html", _worksheet_context())
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = os.path.join(tmp, "bench.pdf")
+        warm = WarmPdfRenderer()
+        warm.warm_up()
+        return [
+            # 原先每次导出都重新加载 CJK 字体、解析 @font-face CSS
+            ("冷渲染（新建渲染器）", _elapsed_ms(lambda: WarmPdfRenderer().write_pdf(html, out_path, "worksheet"), repeat)),
+            ("热渲染（常驻渲染器）", _elapsed_ms(lambda: warm.write_pdf(html, out_path, "worksheet"), repeat)),
+        ]
+
+
+# ============ 岗位清单 xlsx 解析 ============
+def _station_list_xlsx(rows):
+    """与 Excel 另存一样使用共享字符串的 xlsx 岗位清单"""
+    import io
+    import xlsxwriter
+
+    buf = io.BytesIO()
+    book = xlsxwriter.Workbook(buf, {"in_memory": True})
+    sheet = book.add_worksheet()
+    sheet.write_row(0, 0, ("序号", "主条码", "子条码", "实验号", "姓名", "备注"))
+    for i in range(1, rows + 1):
+        sheet.write_row(i, 0, (i, 1426200000 + i, f"{1426200000 + i}-01", f"VD{i:06d}", "张三", ""))
+    book.close()
+    return buf.getvalue()
+
+
+@benchmark("station_parser", "xlsx 岗位清单解析（xlrd 整表读取 vs openpyxl 只读 vs 流式 XML 扫描）")
+def bench_station_parser(quick=False):
+    import xlrd
+    from .station_parser import _iter_xlsx_openpyxl, _iter_xlsx
+
+    rows = 2000 if quick else 50000
+    data = _station_list_xlsx(rows)
+
+    def legacy():
+        # 原先各平台的写法：xlrd 打开整个工作簿，逐行 str(单元格)
+        sheet = xlrd.open_workbook(file_contents=data).sheet_by_index(0)
+        for r in range(sheet.nrows):
+            [str(v) for v in sheet.row_values(r)]
+
+    return [
+        (f"xlrd 整表读取（{rows} 行）", _elapsed_ms(legacy)),
+        (f"openpyxl read_only（{rows} 行）", _elapsed_ms(lambda: list(_iter_xlsx_openpyxl(data)))),
+        (f"流式 XML 扫描（{rows} 行）", _elapsed_ms(lambda: list(_iter_xlsx(data)))),
+    ]
+
+
+# ============ Tecan 扫码结果冲突检测 ============
+def _tecan_run(rows, seed=22):
+    """
+    合成一次 5 个载架（GridPos 20~24）的 Tecan 扫码结果，以及对应的岗位清单映射和当天历史主码前缀。
+    约三分之一的主码重复出现，部分条码带 '$'，部分条码在岗位清单中缺失。
+    """
+    import random
+    import pandas as pd
+
+    rnd = random.Random(seed)
+    data, station_map, history_prefix_map = [], {}, {}
+    for i in range(rows):
+        main = f"{1426200000 + rnd.randint(1, max(1, rows // 3))}"
+        sid = f"{main}-{rnd.choice(('01', '02', '03'))}"
+        if rnd.random() < 0.02:
+            main, sid = "$" + main, "$" + sid
+        data.append((str(i + 1), sid, main, str(20 + i % 5), str(i % 16 + 1)))
+        if rnd.random() < 0.8 and sid not in station_map:
+            station_map[sid] = [f"{rnd.choice(('CA', 'ZMNs', 'PCA', 'ZMN', 'VD'))}{rnd.randint(1, 99)}"
+                                for _ in range(rnd.randint(1, 3))]
+        if rnd.random() < 0.1:
+            history_prefix_map[main] = rnd.choice(("", "CA", "ZMNs", "PCA"))
+    df = pd.DataFrame(data, columns=["RowID", "SRCTubeID", "MainBarcode", "GridPos", "TipNumber"])
+    return df, station_map, history_prefix_map
+
+
+def _legacy_tecan_conflicts(df, station_map, history_prefix_map, project_name):
+    """原先 tecaningest 中的逐行写法（groupby.apply / apply(axis=1) / iterrows），返回值与 _detect_tecan_conflicts 相同"""
+    import pandas as pd
+    from .views_TecanIngest import _get_main_exp_prefix
+
+    df["__exp_prefix"] = df["SRCTubeID"].apply(lambda sid: _get_main_exp_prefix(sid, station_map))
+
+    def _mark_diff_sub_same_prefix(group):
+        result = pd.Series(False, index=group.index)
+        if group["SRCTubeID"].nunique() <= 1:
+            return result
+        first_idx = group.index[0]
+        base_prefix = group.loc[first_idx, "__exp_prefix"]
+        for idx in group.index[1:]:
+            row_prefix = group.loc[idx, "__exp_prefix"]
+            if group.loc[idx, "SRCTubeID"] != group.loc[first_idx, "SRCTubeID"]:
+                if base_prefix and row_prefix and base_prefix == row_prefix:
+                    result[idx] = True
+                elif not base_prefix and not row_prefix:
+                    result[idx] = True
+        return result
+
+    # 只选出用到的两列（原先对整表 apply，新版 pandas 会对分组列给出 FutureWarning，逐组开销相同）
+    diff_sub_later_mask = df.groupby("MainBarcode", group_keys=False)[["SRCTubeID", "__exp_prefix"]].apply(
+        _mark_diff_sub_same_prefix
+    ).reindex(df.index, fill_value=False)
+    mask_infile = diff_sub_later_mask | df["SRCTubeID"].duplicated(keep=False)
+    df.drop(columns=["__exp_prefix"], inplace=True)
+
+    def _is_cross_dup(row):
+        main = str(row["MainBarcode"])
+        if main not in history_prefix_map:
+            return False
+        hist_prefix = history_prefix_map[main]
+        cur_prefix = _get_main_exp_prefix(str(row["SRCTubeID"]), station_map)
+        if not hist_prefix or not cur_prefix:
+            return False
+        return hist_prefix == cur_prefix
+
+    mask_cross = df.apply(_is_cross_dup, axis=1)
+
+    conflict_barcodes = set()
+    for _, row in df.iterrows():
+        src_tube_id = str(row.get("SRCTubeID", "")).strip()
+        if not src_tube_id or "$" in src_tube_id:
+            continue
+        exp_list = station_map.get(src_tube_id, [])
+        has_pca = any(exp.startswith("PCA") for exp in exp_list)
+        has_ca = any(exp.startswith("CA") for exp in exp_list)
+        has_zmn = any(exp.startswith("ZMN") for exp in exp_list)
+        if project_name == "CA" and (has_pca or has_zmn):
+            conflict_barcodes.add(src_tube_id)
+        elif project_name == "ZMNs" and (has_pca or has_ca):
+            conflict_barcodes.add(src_tube_id)
+    mask_project = df["SRCTubeID"].isin(conflict_barcodes)
+
+    mask_dollar = df["MainBarcode"].astype(str).str.contains(r"\$")
+
+    df["conflict_type"] = ""
+    df.loc[mask_infile, "conflict_type"] = "文件内重复"
+    df.loc[mask_cross, "conflict_type"] = "跨文件重复"
+    df.loc[mask_project, "conflict_type"] = "项目实验号冲突"
+    return {
+        "infile": mask_infile,
+        "cross": mask_cross,
+        "project": mask_project,
+        "dollar": mask_dollar,
+        "need_fix": (mask_infile | mask_cross | mask_project) & (~mask_dollar),
+    }
+
+
+@benchmark("tecan_conflicts", "Tecan 5 载架扫码结果冲突检测（逐行 apply / iterrows vs 按列计算）")
+def bench_tecan_conflicts(quick=False):
+    from .views_TecanIngest import _detect_tecan_conflicts
+
+    rows = 800 if quick else 8000
+    df, station_map, history_prefix_map = _tecan_run(rows)
+    repeat = 1 if quick else 3
+    out = []
+    for project_name in ("CA", "ZMNs"):
+        out.append((f"{project_name} 逐行写法（{rows} 行）", _elapsed_ms(
+            lambda: _legacy_tecan_conflicts(df.copy(), station_map, history_prefix_map, project_name), repeat)))
+        out.append((f"{project_name} _detect_tecan_conflicts（{rows} 行）", _elapsed_ms(
+            lambda: _detect_tecan_conflicts(df.copy(), station_map, history_prefix_map, project_name), repeat)))
+    return out
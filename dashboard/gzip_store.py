@@ -0,0 +1,118 @@
+# dashboard/gzip_store.py
+# 内容寻址的 gzip JSON 文件存储（payload_store / station_map_store 共用）
+#
+#   - 文件按 key（内容摘要，十六进制）命名：<root>[/<subdir>]/<key>.json.gz
+#   - 写入先落临时文件再 os.replace，多进程 / 多线程同时写同一 key 也只会看到完整文件；
+#     已存在即内容相同，只刷新 mtime
+#   - mtime 即“最近访问时间”：读取时可顺带刷新，cleanup 删除超过 TTL 未访问的文件
+#   - maybe_cleanup 在保存时按间隔顺带清理，出错只记日志
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+_HEX = frozenset("0123456789abcdef")
+_SUFFIX = ".json.gz"
+
+
+def valid_key(key):
+    """key 只能是非空的小写十六进制串（防止拼出存储目录以外的路径）"""
+    return bool(key) and isinstance(key, str) and all(c in _HEX for c in key)
+
+
+class GzipStore:
+    """
+    一个存储目录。
+      root：返回根目录的可调用对象（模块级设置，测试可替换）
+      ttl：返回默认 TTL（秒）的可调用对象
+      label：日志里的名称
+    """
+
+    def __init__(self, root, ttl, label, cleanup_interval=3600):
+        self._root = root
+        self._ttl = ttl
+        self.label = label
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+
+    def directory(self, subdir=None):
+        root = self._root()
+        return os.path.join(root, subdir) if subdir else root
+
+    def path(self, key, subdir=None):
+        return os.path.join(self.directory(subdir), f"{key}{_SUFFIX}")
+
+    def write(self, key, raw, subdir=None):
+        """原子写入压缩文件；同名文件已存在时（内容寻址，内容必然相同）只刷新访问时间"""
+        path = self.path(key, subdir)
+        try:
+            os.utime(path)
+            return
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(raw, compresslevel=6))
+        os.replace(tmp_path, path)
+
+    def read(self, key, subdir=None, touch=False):
+        """读取并解析；不存在时抛 FileNotFoundError。touch=True 时刷新访问时间（供 TTL 判断）"""
+        path = self.path(key, subdir)
+        with open(path, "rb") as f:
+            data = json.loads(gzip.decompress(f.read()).decode("utf-8"))
+        if touch:
+            os.utime(path)
+        return data
+
+    def touch(self, key, subdir=None):
+        """刷新访问时间；不存在时抛 FileNotFoundError"""
+        os.utime(self.path(key, subdir))
+
+    def keys(self, subdir=None):
+        """目录下全部 key（目录不存在时为空）"""
+        directory = self.directory(subdir)
+        if not os.path.isdir(directory):
+            return []
+        return [entry.name[:-len(_SUFFIX)] for entry in os.scandir(directory) if entry.name.endswith(_SUFFIX)]
+
+    def cleanup(self, ttl=None, subdir=None, keep=()):
+        """删除超过 ttl 秒未访问、且不在 keep 中的文件（含残留的临时文件），返回删除的个数"""
+        ttl = self._ttl() if ttl is None else ttl
+        cutoff = time.time() - ttl
+        directory = self.directory(subdir)
+        removed = 0
+        if not os.path.isdir(directory):
+            return removed
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.name.split(".", 1)[0] in keep:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    if entry.name.endswith(_SUFFIX):
+                        removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def maybe_cleanup(self, cleanup):
+        """距上次清理超过 cleanup_interval 时执行 cleanup()（返回删除个数或其元组）"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = now
+        try:
+            removed = cleanup()
+        except OSError as e:
+            logger.warning("清理%s失败：%s", self.label, e)
+            return
+        if any(removed) if isinstance(removed, tuple) else removed:
+            logger.info("清理过期%s：%s", self.label, removed)
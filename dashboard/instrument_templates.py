@@ -0,0 +1,123 @@
+# dashboard/instrument_templates.py
+# 仪器上机模板（InstrumentConfiguration.upload_file）的预解析描述
+#
+# 生成工作清单时只需要模板的列头；以前每次请求都要尝试多种编码解码，
+# 再用 pd.read_csv(sep=None, engine="python") 嗅探分隔符，开销不小。
+# 现在在保存厂家配置时解析一次，把结果存入 InstrumentConfiguration.template_meta：
+#   {headers, delimiter, encoding, lossy, vialpos_col, injection_volume_col, source_name, source_size}
+import csv
+import logging
+import os
+from io import StringIO
+
+import pandas as pd
+
+
+# 模板允许的扩展名
+TEMPLATE_EXTS = (".txt", ".csv")
+
+# 解码顺序（与 ProcessResult 既有口径一致）
+_TEMPLATE_ENCODINGS = ("utf-8", "utf-8-sig", "gb18030")
+
+# 列角色识别（与上机列表填充逻辑使用的列名一致）
+_VIALPOS_COLS = ("VialPos", "Vial position", "样品瓶", "Well_Number")
+_INJECTION_VOLUME_COLS = ("SmplInjVol", "Injection volume")
+
+
+class TemplateParseError(ValueError):
+    """上机模板无法解析（扩展名不支持 / 内容为空 / pandas 读取失败）"""
+
+
+def _decode_template(raw):
+    """
+    依次尝试 _TEMPLATE_ENCODINGS；都失败时按 utf-8 替换非法字节（达安 / ICP-MS 原先的兜底），
+    并返回 lossy=True，由 ProcessResult 按原口径拒绝。
+    """
+    for enc in _TEMPLATE_ENCODINGS:
+        try:
+            return raw.decode(enc), enc, False
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("utf-8", errors="replace"), "utf-8", True
+
+
+def _sniff_delimiter(text):
+    # pandas 的 sep=None 同样是对首行做 csv.Sniffer 嗅探
+    first_line = text.splitlines()[0] if text else ""
+    try:
+        return csv.Sniffer().sniff(first_line).delimiter
+    except csv.Error:
+        return ","
+
+
+def build_template_descriptor(raw, filename):
+    """
+    解析模板字节内容，返回描述 dict（可直接存入 JSONField）。
+    解析失败抛 TemplateParseError。
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext not in TEMPLATE_EXTS:
+        raise TemplateParseError(f"仅支持 .txt 或 .csv 模板，当前为：{ext}")
+
+    text, encoding, lossy = _decode_template(raw)
+    try:
+        # 列头仍用与原先完全相同的 pandas 调用得到，保证口径不变
+        headers = pd.read_csv(StringIO(text), sep=None, engine="python", dtype=str).columns.tolist()
+    except Exception as e:
+        raise TemplateParseError(f"读取上机模板失败：{e}")
+    if not headers:
+        raise TemplateParseError("上机模板为空，无法确定列头")
+
+    return {
+        "headers": [str(h) for h in headers],
+        "delimiter": _sniff_delimiter(text),
+        "encoding": encoding,
+        "lossy": lossy,                 # 编码无法识别、按替换字符兜底解码
+        "vialpos_col": next((h for h in headers if h in _VIALPOS_COLS), ""),
+        "injection_volume_col": next((h for h in headers if h in _INJECTION_VOLUME_COLS), ""),
+        "source_name": os.path.basename(filename or ""),
+        "source_size": len(raw),
+    }
+
+
+def _descriptor_is_current(meta, upload_file):
+    if not meta or not meta.get("headers"):
+        return False
+    try:
+        size = upload_file.size
+    except (OSError, ValueError):
+        return False
+    return (meta.get("source_name") == os.path.basename(upload_file.name)
+            and meta.get("source_size") == size)
+
+
+def refresh_template_descriptor(instrument_config):
+    """重新解析 upload_file 并写回 template_meta；返回新的描述"""
+    upload_file = instrument_config.upload_file
+    with upload_file.open("rb") as f:
+        raw = f.read()
+    meta = build_template_descriptor(raw, upload_file.name)
+    instrument_config.template_meta = meta
+    type(instrument_config).objects.filter(pk=instrument_config.pk).update(template_meta=meta)
+    return meta
+
+
+def get_template_descriptor(instrument_config):
+    """
+    取仪器上机模板描述；已保存且与当前文件一致时直接返回，
+    否则（历史配置 / 文件被替换）现场解析一次并回写。
+    """
+    meta = instrument_config.template_meta or {}
+    if _descriptor_is_current(meta, instrument_config.upload_file):
+        return meta
+    logging.getLogger(__name__).info(
+        "上机模板描述缺失或已过期，重新解析：%s", instrument_config.upload_file.name
+    )
+    return refresh_template_descriptor(instrument_config)
+
+
+def require_strict_encoding(meta):
+    """ProcessResult 原先在编码无法识别时直接报错，不接受替换字符兜底"""
+    if meta.get("lossy"):
+        raise TemplateParseError(f"上机模板编码无法识别（已尝试 {' / '.join(_TEMPLATE_ENCODINGS)}）")
+    return meta
@@ -0,0 +1,16 @@
+# python manage.py cleanup_payload_store [--ttl 秒]
+# 清理服务端导出数据存储中过期（长时间未访问）的结果页数据，可配合计划任务定时执行
+from django.core.management.base import BaseCommand
+
+from dashboard.payload_store import cleanup_payload_store, PAYLOAD_STORE_TTL
+
+
+class Command(BaseCommand):
+    help = "清理过期的导出数据（payload_store）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ttl", type=int, default=PAYLOAD_STORE_TTL, help="超过多少秒未访问即删除")
+
+    def handle(self, *args, **options):
+        removed_meta, removed_blobs = cleanup_payload_store(ttl=options["ttl"])
+        self.stdout.write(f"已清理：meta {removed_meta} 个，板数据 {removed_blobs} 个")
@@ -0,0 +1,19 @@
+# python manage.py export_station_list [--date YYYY-MM-DD] [--out 路径]
+# 把岗位清单映射库（StationMapping）按原 station_list.json 格式导出，供仍读取该文件的外部工具使用
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dashboard.station_store import export_station_json
+
+
+class Command(BaseCommand):
+    help = "导出某天的岗位清单映射（station_list.json）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", default="", help="日期 YYYY-MM-DD，默认当天")
+        parser.add_argument("--out", default="", help="输出路径，默认 DOWNLOAD_ROOT/岗位清单/<日期>/station_list.json")
+
+    def handle(self, *args, **options):
+        date_name = options["date"] or timezone.localdate().strftime("%Y-%m-%d")
+        path = export_station_json(date_name, options["out"] or None)
+        self.stdout.write(f"已导出：{path}")
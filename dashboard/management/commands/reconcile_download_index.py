@@ -0,0 +1,13 @@
+# python manage.py reconcile_download_index
+# 按 DOWNLOAD_ROOT 磁盘内容重建下载文件索引（手工拷入 / 删除文件后执行）
+from django.core.management.base import BaseCommand
+
+from dashboard.artifact_index import reconcile_artifacts
+
+
+class Command(BaseCommand):
+    help = "按磁盘重建文件下载页使用的下载文件索引（DownloadArtifact）"
+
+    def handle(self, *args, **options):
+        added, removed, updated = reconcile_artifacts()
+        self.stdout.write(f"下载文件索引已同步：新增 {added}，删除 {removed}，更新 {updated}")
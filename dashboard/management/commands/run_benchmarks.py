@@ -0,0 +1,31 @@
+# python manage.py run_benchmarks [名称 ...] [--quick] [--list]
+# 运行 dashboard/benchmarks.py 中的性能基准（不指定名称时全部运行）
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.benchmarks import BENCHMARKS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = "运行性能基准，对比原先的写法与现在的实现"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="要运行的基准名称（默认全部）")
+        parser.add_argument("--quick", action="store_true", help="缩小数据量，只做冒烟检查")
+        parser.add_argument("--list", action="store_true", help="列出全部基准")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for name, (title, _) in BENCHMARKS.items():
+                self.stdout.write(f"{name}: {title}")
+            return
+
+        names = options["names"] or list(BENCHMARKS)
+        unknown = [n for n in names if n not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"未知的基准：{', '.join(unknown)}（可用：{', '.join(BENCHMARKS)}）")
+
+        for name in names:
+            title, rows = run_benchmark(name, quick=options["quick"])
+            self.stdout.write(f"== {name}: {title}")
+            for label, ms in rows:
+                self.stdout.write(f"   {label:<48} {ms:10.2f} ms")
@@ -0,0 +1,104 @@
+# python manage.py run_pdf_worker [--workers 2] [--poll 2] [--once]
+# 后台 PDF 渲染 worker：从 PdfRenderJob 表领取任务，交给进程池用 WeasyPrint 生成 PDF
+# PDF_RENDER_ASYNC 默认打开：导出只登记任务，必须常驻运行本 worker（与 web 服务一起启动），否则 PDF 一直排队
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from dashboard.pdf_process import init_render_process, render_in_process
+
+
+# 两次接管超时任务之间的间隔（秒）
+RECOVER_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = "后台 PDF 渲染 worker（处理导出工作清单时排队的 PDF 任务）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="渲染进程数")
+        parser.add_argument("--poll", type=float, default=2.0, help="空闲时轮询间隔（秒）")
+        parser.add_argument("--once", action="store_true", help="处理完当前队列后退出")
+
+    def _new_pool(self, workers):
+        # fork 之前关闭数据库连接，避免子进程继承同一个连接
+        connections.close_all()
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_render_process)
+
+    def _fail_jobs(self, jobs, err):
+        """进程池崩溃：这些任务按失败处理（未超过重试次数的会退避后重新排队）"""
+        from dashboard.pdf_jobs import mark_job_failed
+
+        for job in jobs:
+            mark_job_failed(job, f"渲染进程异常退出：{err!r}")
+            self.stderr.write(f"[{job.job_id}] 渲染进程异常退出（第 {job.attempts} 次）")
+
+    def handle(self, *args, **options):
+        from dashboard.pdf_jobs import (
+            recover_stale_jobs, claim_next_job, mark_job_done, mark_job_failed,
+        )
+
+        workers = max(1, options["workers"])
+        poll = max(0.1, options["poll"])
+
+        recover_stale_jobs()
+        last_recover = time.monotonic()
+        pool = self._new_pool(workers)
+
+        self.stdout.write(f"PDF worker 已启动：{workers} 个渲染进程")
+        inflight = {}   # future -> job
+        try:
+            while True:
+                # 0) 定期接管超时的 running 任务（其他 worker / 请求内渲染崩溃留下的）
+                if time.monotonic() - last_recover >= RECOVER_INTERVAL:
+                    recover_stale_jobs(exclude_ids=[job.pk for job in inflight.values()])
+                    last_recover = time.monotonic()
+
+                # 1) 补满进程池
+                broken = None
+                while len(inflight) < workers:
+                    job = claim_next_job()
+                    if job is None:
+                        break
+                    try:
+                        inflight[pool.submit(render_in_process, job.html, job.out_path, job.style)] = job
+                    except BrokenProcessPool as e:
+                        self._fail_jobs([job], e)
+                        broken = e
+                        break
+
+                if broken is None and not inflight:
+                    if options["once"]:
+                        break
+                    time.sleep(poll)
+                    continue
+
+                # 2) 回收已完成的任务
+                if broken is None:
+                    done, _ = wait(list(inflight), timeout=poll, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        job = inflight[fut]
+                        try:
+                            fut.result()
+                        except BrokenProcessPool as e:
+                            broken = e      # 留在 inflight 里，下面统一处理
+                            continue
+                        except Exception as e:
+                            mark_job_failed(job, e)
+                            self.stderr.write(f"[{job.job_id}] 失败（第 {job.attempts} 次）：{e}")
+                        else:
+                            mark_job_done(job)
+                            self.stdout.write(f"[{job.job_id}] 完成：{job.out_path}")
+                        del inflight[fut]
+
+                # 3) 某个子进程被杀 / 崩溃后整个进程池不可用：在途任务全部按失败处理，重建进程池
+                if broken is not None:
+                    self._fail_jobs(inflight.values(), broken)
+                    inflight.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._new_pool(workers)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,25 @@
+# python manage.py watch_station_list [--interval 60] [--once]
+# 轮询共享盘上的共同岗位清单目录，把当天 / 明天最新的岗位清单镜像到本地（见 dashboard/station_mirror.py）
+# web 进程只读本地镜像、不会自行轮询，部署时需常驻运行本命令（每台服务器一个）
+from django.core.management.base import BaseCommand
+
+from dashboard.station_mirror import (
+    STATION_NETWORK_DIR, STATION_WATCH_INTERVAL, run_station_watcher, sync_station_mirror,
+)
+
+
+class Command(BaseCommand):
+    help = "镜像共享盘上的共同岗位清单到本地"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=STATION_WATCH_INTERVAL, help="轮询间隔（秒）")
+        parser.add_argument("--once", action="store_true", help="只同步一次后退出")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            updated = sync_station_mirror()
+            self.stdout.write(f"已同步：{', '.join(updated) or '无更新'}")
+            return
+
+        self.stdout.write(f"岗位清单 watcher 已启动：{STATION_NETWORK_DIR}，每 {options['interval']} 秒轮询")
+        run_station_watcher(interval=options["interval"])
@@ -0,0 +1,203 @@
+# dashboard/mapping_cache.py
+# 对应关系表（SamplingConfiguration.mapping_file）解析缓存
+#
+# NIMBUS / Starlet / Tecan / 达安 / ICP-MS / 全血工作站每次生成都要 pd.read_excel 两个 sheet，
+# openpyxl 解析是整条链路里最慢的一步。这里按 (文件路径, mtime, size) 做进程内 LRU 缓存：
+#   - 文件未变：直接命中，返回 DataFrame 副本（调用方可随意修改）
+#   - 文件被替换（后台重新上传）：签名变化自动重新解析；project_config_edit 也会主动失效
+# 各平台都要的派生结构（条码 -> 名称、曲线 / 质控名称、编译后的上机列表规则）也随文件缓存，
+# 同一份文件只构建 / 编译一次，调用方只读使用，不必再复制 sheet 重建。
+import os
+import threading
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import pandas as pd
+from django.conf import settings
+
+from .worklist_engine import WorklistMap
+
+
+# 最多缓存多少份对应关系表（按最近使用淘汰）
+_MAPPING_CACHE_SIZE = getattr(settings, "MAPPING_CACHE_SIZE", 32)
+
+_cache = OrderedDict()   # path -> MappingBundle
+_lock = threading.Lock()
+
+
+def _empty_mapping():
+    return MappingProxyType({})
+
+
+@dataclass(frozen=True)
+class MappingBundle:
+    """
+    一份对应关系表的解析结果（只读，勿直接修改其中的 DataFrame / 元组）。
+    “工作清单”派生字段（缺列时为空）：
+      barcode_to_name            Barcode(str) -> Name（原值）
+      barcode_to_code            Barcode(str) -> Code(str)
+      stripped_barcode_to_name   Barcode / Name 均 str 后去空格（达安）
+      name_to_barcodes           Name（原值）-> 条码元组，由 barcode_to_name 反查（NIMBUS / Starlet）
+      stripped_name_to_barcodes  Name 去空格 -> 条码元组，按表中逐行、跳过空条码（ICP-MS）
+      std_names                  Code 为 STD<数字> 的 Name，按数字排序（曲线顺序）
+      std_pool / qc_names        Code 以 STD / QC 开头的 Name（原值），表中顺序
+      code_names                 (Code(str), Name 原值)，表中顺序
+    """
+    path: str
+    signature: tuple                 # (mtime_ns, size)
+    sheets: MappingProxyType         # sheet 名 -> DataFrame
+    barcode_to_name: MappingProxyType = field(default_factory=_empty_mapping)
+    barcode_to_code: MappingProxyType = field(default_factory=_empty_mapping)
+    stripped_barcode_to_name: MappingProxyType = field(default_factory=_empty_mapping)
+    name_to_barcodes: MappingProxyType = field(default_factory=_empty_mapping)
+    stripped_name_to_barcodes: MappingProxyType = field(default_factory=_empty_mapping)
+    std_names: tuple = ()
+    std_pool: tuple = ()
+    qc_names: tuple = ()
+    code_names: tuple = ()
+    # 编译后的“上机列表”：(classify, key, fillna) -> WorklistMap
+    _worklist_maps: dict = field(default_factory=dict, repr=False, compare=False)
+    _worklist_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def sheet(self, sheet_name):
+        """返回指定 sheet 的副本；不存在时与 pd.read_excel 一致抛 ValueError"""
+        return self.sheet_view(sheet_name).copy()
+
+    def sheet_view(self, sheet_name):
+        """返回缓存中的 sheet 本身（不复制，只读遍历用）；不存在时同样抛 ValueError"""
+        if sheet_name not in self.sheets:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        return self.sheets[sheet_name]
+
+    def columns(self, sheet_name):
+        """指定 sheet 的列名（不复制数据）"""
+        return list(self.sheet_view(sheet_name).columns)
+
+    def names_with_code_prefix(self, prefix):
+        """Code 以 prefix 开头的 Name（原值），表中顺序"""
+        return [name for code, name in self.code_names if code.startswith(prefix)]
+
+    def barcode_queues(self, stripped=False):
+        """Name -> 条码队列（每块板各取一份，按 popleft 消费）"""
+        source = self.stripped_name_to_barcodes if stripped else self.name_to_barcodes
+        return defaultdict(deque, {name: deque(barcodes) for name, barcodes in source.items()})
+
+    def worklist_map(self, classify, key=str, fillna=None):
+        """
+        “上机列表”编译后的 WorklistMap，同一 (classify, key, fillna) 每份文件只编译一次。
+        classify / key 须为同一对象才能命中（用 worklist_engine 中的模块级函数）。
+        """
+        cache_key = (classify, key, fillna)
+        worklist_map = self._worklist_maps.get(cache_key)
+        if worklist_map is None:
+            df = self.sheet_view("上机列表")
+            if fillna is not None:
+                df = df.fillna(fillna)
+            with self._worklist_lock:
+                worklist_map = self._worklist_maps.setdefault(cache_key, WorklistMap(df, classify, key))
+        return worklist_map
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _parse_mapping_file(path, signature):
+    # 一次打开工作簿读出全部 sheet，避免同一文件被 openpyxl 解析两遍
+    sheets = pd.read_excel(path, sheet_name=None)
+
+    derived = {}
+    df_wc = sheets.get("工作清单")
+    if df_wc is not None:
+        derived = _worksheet_lookups(df_wc)
+
+    return MappingBundle(
+        path=path,
+        signature=signature,
+        sheets=MappingProxyType(sheets),
+        **derived,
+    )
+
+
+def _worksheet_lookups(df_wc):
+    # 口径与各视图原先现算的一致（astype(str) / strip / 跳过 "nan" 条码）
+    cols = set(df_wc.columns)
+    out = {}
+    if {"Barcode", "Name"} <= cols:
+        barcode_to_name = dict(zip(df_wc["Barcode"].astype(str), df_wc["Name"]))
+        name_to_barcodes = defaultdict(list)
+        for barcode, name in barcode_to_name.items():
+            name_to_barcodes[name].append(barcode)
+
+        stripped_name_to_barcodes = defaultdict(list)
+        for b, n in zip(df_wc["Barcode"].astype(str).str.strip(), df_wc["Name"].astype(str).str.strip()):
+            if n and b and b != "nan":
+                stripped_name_to_barcodes[n].append(b)
+
+        out.update(
+            barcode_to_name=MappingProxyType(barcode_to_name),
+            stripped_barcode_to_name=MappingProxyType(dict(zip(
+                df_wc["Barcode"].astype(str).str.strip(), df_wc["Name"].astype(str).str.strip()
+            ))),
+            name_to_barcodes=MappingProxyType({n: tuple(bs) for n, bs in name_to_barcodes.items()}),
+            stripped_name_to_barcodes=MappingProxyType(
+                {n: tuple(bs) for n, bs in stripped_name_to_barcodes.items()}
+            ),
+        )
+        if "Code" in cols:
+            out["barcode_to_code"] = MappingProxyType(
+                dict(zip(df_wc["Barcode"].astype(str), df_wc["Code"].astype(str)))
+            )
+
+    if {"Code", "Name"} <= cols:
+        codes = df_wc["Code"].astype(str)
+        df_std = df_wc[codes.str.match(r"^STD\d+$", na=False)].copy()
+        df_std["__std_idx"] = df_std["Code"].astype(str).str.replace("STD", "", regex=False).astype(int)
+        out.update(
+            std_names=tuple(df_std.sort_values("__std_idx")["Name"].tolist()),
+            std_pool=tuple(df_wc.loc[codes.str.startswith("STD"), "Name"].tolist()),
+            qc_names=tuple(df_wc.loc[codes.str.startswith("QC"), "Name"].tolist()),
+            code_names=tuple(zip(codes.tolist(), df_wc["Name"].tolist())),
+        )
+    return out
+
+
+def get_mapping_bundle(path):
+    """
+    取对应关系表的解析结果（带缓存）。
+    文件不存在时抛 FileNotFoundError，与直接 pd.read_excel 的行为一致。
+    """
+    path = os.path.abspath(path)
+    signature = _file_signature(path)
+
+    with _lock:
+        bundle = _cache.get(path)
+        if bundle is not None and bundle.signature == signature:
+            _cache.move_to_end(path)
+            return bundle
+
+    # 解析放在锁外，避免大文件阻塞其他项目的命中
+    bundle = _parse_mapping_file(path, signature)
+
+    with _lock:
+        _cache[path] = bundle
+        _cache.move_to_end(path)
+        while len(_cache) > _MAPPING_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return bundle
+
+
+def read_mapping_sheet(path, sheet_name):
+    """pd.read_excel(path, sheet_name=...) 的缓存版，返回可修改的 DataFrame 副本"""
+    return get_mapping_bundle(path).sheet(sheet_name)
+
+
+def invalidate_mapping_cache(path=None):
+    """清除指定文件（或全部）的缓存；后台重新上传对应关系表时调用"""
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(os.path.abspath(path), None)
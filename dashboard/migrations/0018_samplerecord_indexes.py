@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:45
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def dedupe_sample_records(apps, schema_editor):
+    # 历史数据中同一 upsert 键可能已有多条记录：保留 id 最大（最后写入）的一条
+    SampleRecord = apps.get_model('dashboard', 'SampleRecord')
+    key = ('project_name', 'record_date', 'batch_id', 'plate_no', 'well_str')
+    dups = (
+        SampleRecord.objects.values(*key)
+        .annotate(n=Count('id'), keep_id=Max('id'))
+        .filter(n__gt=1)
+    )
+    for d in dups.iterator():
+        SampleRecord.objects.filter(**{k: d[k] for k in key}).exclude(id=d['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0017_samplerecord_batch_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='samplerecord',
+            index=models.Index(fields=['record_date', 'project_name'], name='samplerec_date_proj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='samplerecord',
+            index=models.Index(fields=['project_name', 'record_date', 'plate_no'], name='samplerec_proj_date_plate_idx'),
+        ),
+        migrations.RunPython(dedupe_sample_records, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='samplerecord',
+            constraint=models.UniqueConstraint(fields=('project_name', 'record_date', 'batch_id', 'plate_no', 'well_str'), name='samplerec_upsert_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+def fill_search_keys(apps, schema_editor):
+    # 历史记录回填规范化查找列（口径与 models.normalize_search_key 一致）
+    SampleRecord = apps.get_model('dashboard', 'SampleRecord')
+    batch = []
+    for rec in SampleRecord.objects.only('id', 'sample_name', 'barcode').iterator(chunk_size=2000):
+        rec.sample_name_norm = str(rec.sample_name or '').strip().upper()
+        rec.barcode_norm = str(rec.barcode or '').strip().upper()
+        batch.append(rec)
+        if len(batch) >= 2000:
+            SampleRecord.objects.bulk_update(batch, ['sample_name_norm', 'barcode_norm'])
+            batch = []
+    if batch:
+        SampleRecord.objects.bulk_update(batch, ['sample_name_norm', 'barcode_norm'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0018_samplerecord_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='samplerecord',
+            name='barcode_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='samplerecord',
+            name='sample_name_norm',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='samplerecord',
+            index=models.Index(fields=['sample_name_norm', 'record_date'], name='samplerec_name_norm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='samplerecord',
+            index=models.Index(fields=['barcode_norm', 'record_date'], name='samplerec_barcode_norm_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0019_samplerecord_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instrumentconfiguration',
+            name='template_meta',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0021_pdfrenderjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rel_path', models.CharField(max_length=500, unique=True)),
+                ('section', models.CharField(choices=[('main', '文件下载'), ('history', '历史文件')], default='main', max_length=10)),
+                ('platform', models.CharField(max_length=50)),
+                ('category', models.CharField(blank=True, default='', max_length=50)),
+                ('date_name', models.CharField(max_length=10)),
+                ('project', models.CharField(blank=True, default='', max_length=100)),
+                ('file_name', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField(default=0)),
+                ('mtime', models.FloatField(default=0)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['section', 'platform', 'date_name'], name='artifact_sect_plat_date_idx')],
+            },
+        ),
+    ]
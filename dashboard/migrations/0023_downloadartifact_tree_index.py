@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0022_downloadartifact'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='downloadartifact',
+            name='artifact_sect_plat_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='downloadartifact',
+            index=models.Index(fields=['section', 'platform', 'category', 'date_name'], name='artifact_tree_idx'),
+        ),
+    ]
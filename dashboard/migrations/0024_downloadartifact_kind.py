@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+def fill_kind(apps, schema_editor):
+    # 已有索引记录回填文件类别（口径与 artifact_index.artifact_kind 一致）
+    DownloadArtifact = apps.get_model('dashboard', 'DownloadArtifact')
+    batch = []
+    for a in DownloadArtifact.objects.only('id', 'file_name').iterator(chunk_size=2000):
+        name = a.file_name or ''
+        if name.lower().endswith('.payload.json'):
+            a.kind = 'payload'
+        elif 'OnboardingList' in name:
+            a.kind = 'onboarding'
+        elif 'WorkSheet' in name and name.lower().endswith('.pdf'):
+            a.kind = 'worksheet'
+        else:
+            continue
+        batch.append(a)
+    DownloadArtifact.objects.bulk_update(batch, ['kind'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0023_downloadartifact_tree_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadartifact',
+            name='kind',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.RunPython(fill_kind, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='downloadartifact',
+            index=models.Index(fields=['file_name', 'section'], name='artifact_file_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='downloadartifact',
+            index=models.Index(fields=['section', 'kind'], name='artifact_sect_kind_idx'),
+        ),
+    ]
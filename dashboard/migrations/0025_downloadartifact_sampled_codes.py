@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0024_downloadartifact_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadartifact',
+            name='sampled_codes',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
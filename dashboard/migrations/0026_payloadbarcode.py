@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0025_downloadartifact_sampled_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadartifact',
+            name='barcodes_indexed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PayloadBarcode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(max_length=50)),
+                ('date_name', models.CharField(max_length=10)),
+                ('project', models.CharField(max_length=100)),
+                ('main_barcode', models.CharField(max_length=100)),
+                ('origin_barcode', models.CharField(max_length=100)),
+                ('artifact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcodes', to='dashboard.downloadartifact')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['platform', 'date_name', 'project', 'main_barcode'], name='payloadbc_key_main_idx')],
+            },
+        ),
+    ]
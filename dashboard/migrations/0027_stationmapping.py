@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0026_payloadbarcode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_name', models.CharField(max_length=10)),
+                ('barcode', models.CharField(max_length=100)),
+                ('experiment_no', models.CharField(max_length=100)),
+                ('barcode_kind', models.CharField(choices=[('main', '主条码'), ('sub', '子条码')], default='main', max_length=10)),
+                ('seq', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date_name', 'barcode', 'seq'], name='station_day_barcode_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date_name', 'experiment_no'), name='station_day_exp_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StationMappingWarning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_name', models.CharField(max_length=10)),
+                ('type', models.CharField(default='conflict', max_length=20)),
+                ('experiment_no', models.CharField(blank=True, default='', max_length=100)),
+                ('old_barcode', models.CharField(blank=True, default='', max_length=100)),
+                ('new_barcode', models.CharField(blank=True, default='', max_length=100)),
+                ('msg', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date_name', 'type', 'experiment_no', 'old_barcode', 'new_barcode', 'msg'), name='station_warning_uniq')],
+            },
+        ),
+    ]
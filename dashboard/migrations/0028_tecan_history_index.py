@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0027_stationmapping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TecanProcessedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(max_length=8)),
+                ('project_dir', models.CharField(max_length=100)),
+                ('file_name', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField(default=0)),
+                ('mtime', models.FloatField(default=0)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'project_dir', 'file_name'), name='tecan_file_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TecanHistoryBarcode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(max_length=8)),
+                ('project_dir', models.CharField(max_length=100)),
+                ('row_id', models.IntegerField()),
+                ('main_barcode', models.CharField(max_length=100)),
+                ('src_tube_id', models.CharField(max_length=100)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcodes', to='dashboard.tecanprocessedfile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'project_dir', 'main_barcode'], name='tecanhist_key_main_idx')],
+            },
+        ),
+    ]
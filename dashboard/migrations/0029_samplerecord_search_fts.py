@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:10
+
+from django.db import migrations
+
+
+# “包含”查找的三元组全文索引（SQLite FTS5 trigram，外部内容表 = dashboard_samplerecord）
+# 由触发器与主表同步，bulk_create / ON CONFLICT DO UPDATE / delete 均会触发
+FTS_TABLE = 'dashboard_samplerecord_fts'
+
+CREATE_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        sample_name_norm, barcode_norm,
+        content='dashboard_samplerecord', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS samplerec_fts_ai AFTER INSERT ON dashboard_samplerecord BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, sample_name_norm, barcode_norm)
+        VALUES (new.id, new.sample_name_norm, new.barcode_norm);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS samplerec_fts_ad AFTER DELETE ON dashboard_samplerecord BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, sample_name_norm, barcode_norm)
+        VALUES ('delete', old.id, old.sample_name_norm, old.barcode_norm);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS samplerec_fts_au AFTER UPDATE ON dashboard_samplerecord BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, sample_name_norm, barcode_norm)
+        VALUES ('delete', old.id, old.sample_name_norm, old.barcode_norm);
+        INSERT INTO {FTS_TABLE}(rowid, sample_name_norm, barcode_norm)
+        VALUES (new.id, new.sample_name_norm, new.barcode_norm);
+    END""",
+    # 回填历史记录
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS samplerec_fts_ai',
+    'DROP TRIGGER IF EXISTS samplerec_fts_ad',
+    'DROP TRIGGER IF EXISTS samplerec_fts_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def create_search_fts(apps, schema_editor):
+    # 只有 SQLite 有 FTS5；其他数据库上 search_sample_records 会回退到 LIKE
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0028_tecan_history_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_fts, drop_search_fts),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import os
 from django.utils.text import slugify
 from datetime import date
@@ -72,6 +73,8 @@ class InstrumentConfiguration(models.Model):
     instrument_num = models.CharField(max_length=200)
     systerm_num = models.CharField(max_length=10, choices=SYSTERM_NUM_CHOICES, default='', blank=True)  # ★ 新增字段:系统号
     upload_file = models.FileField(upload_to=upload_to_instrument_folder, blank=True, null=True)
+    # ★ 新增字段:上机模板预解析结果（列头/分隔符/编码/列角色），见 instrument_templates.py
+    template_meta = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
 class InjectionVolumeConfiguration(models.Model):
@@ -102,6 +105,11 @@ class InjectionPlateConfiguration(models.Model):
     injection_plate = models.JSONField(default=list, help_text="保存为字符串列表，例如 ['Plate1','Plate2','Plate3'] ")
     created_at = models.DateTimeField(auto_now_add=True)
 
+# 标本查找用的规范化键：去首尾空白 + 大写（写入与查询两端统一口径）
+def normalize_search_key(value):
+    return str(value or "").strip().upper()
+
+
 # 记录每一板样本信息，用于标本查找
 class SampleRecord(models.Model):
     project_name = models.CharField(max_length=100)   # 项目名称
@@ -114,7 +122,215 @@ class SampleRecord(models.Model):
 
     # 新增：用于区分同一天同项目同板号的不同生成批次
     batch_id = models.CharField(max_length=50, default='', blank=True)
-    
+
+    # 新增：规范化查找列（由 sample_name / barcode 派生，供精确/前缀查找走索引）
+    sample_name_norm = models.CharField(max_length=100, default='', blank=True, editable=False)
+    barcode_norm = models.CharField(max_length=100, default='', blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # 每日标本统计：按日期取当天全部记录，再按项目分组
+            models.Index(fields=['record_date', 'project_name'], name='samplerec_date_proj_idx'),
+            # Tecan / ICP-MS 重新生成时按“同日-同项目-同板号”清理旧记录
+            models.Index(fields=['project_name', 'record_date', 'plate_no'], name='samplerec_proj_date_plate_idx'),
+            # 历史标本查找：按实验号 / 条码的规范化列做精确或前缀查找
+            models.Index(fields=['sample_name_norm', 'record_date'], name='samplerec_name_norm_idx'),
+            models.Index(fields=['barcode_norm', 'record_date'], name='samplerec_barcode_norm_idx'),
+        ]
+        constraints = [
+            # 批量 upsert 的冲突键（同日-同项目-同批次-同板号-孔位），唯一约束自带索引
+            models.UniqueConstraint(
+                fields=['project_name', 'record_date', 'batch_id', 'plate_no', 'well_str'],
+                name='samplerec_upsert_key_uniq',
+            ),
+        ]
+
+    def fill_search_keys(self):
+        self.sample_name_norm = normalize_search_key(self.sample_name)
+        self.barcode_norm = normalize_search_key(self.barcode)
+
+    def save(self, *args, **kwargs):
+        self.fill_search_keys()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = set(update_fields) | {"sample_name_norm", "barcode_norm"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.project_name} | {self.sample_name or self.barcode} | {self.plate_no}-{self.well_str}"
+
+
+# 每日标本统计的缓存版本号：写入某日 SampleRecord 时 +1，缓存键带上版本号
+# 存在数据库里，多个 web 进程（各自的 LocMemCache）看到的是同一个版本
+class SampleStatsVersion(models.Model):
+    record_date = models.DateField(unique=True)
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.record_date} | v{self.version}"
+
+
+# PDF 渲染任务队列：导出时登记任务；PDF_RENDER_ASYNC 打开时由 run_pdf_worker 进程池在后台生成 PDF
+class PdfRenderJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', '排队中'),
+        ('running', '生成中'),
+        ('done', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    job_id = models.CharField(max_length=32, unique=True)          # 对外暴露的任务号（uuid hex）
+    style = models.CharField(max_length=30)                        # 样式预设，见 pdf_jobs.PDF_STYLES
+    html = models.TextField(blank=True, default='')                # 已渲染好的 HTML（完成后清空）
+    out_path = models.CharField(max_length=500)                    # PDF 输出绝对路径
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True, default='')
+    run_after = models.DateTimeField(default=timezone.now)         # 失败重试的最早执行时间
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='pdfjob_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} | {self.status} | {os.path.basename(self.out_path)}"
+
+
+# 下载目录（DOWNLOAD_ROOT）文件索引：文件下载 / 历史文件页面直接从这里渲染，不再逐层扫描目录
+class DownloadArtifact(models.Model):
+    SECTION_CHOICES = [
+        ('main', '文件下载'),
+        ('history', '历史文件'),
+    ]
+
+    rel_path = models.CharField(max_length=500, unique=True)                   # 相对 DOWNLOAD_ROOT 的路径（/ 分隔）
+    section = models.CharField(max_length=10, choices=SECTION_CHOICES, default='main')
+    platform = models.CharField(max_length=50)
+    category = models.CharField(max_length=50, blank=True, default='')         # Starlet 类别：工作清单和上机列表 / 取样指令
+    date_name = models.CharField(max_length=10)                                # YYYY-MM-DD
+    project = models.CharField(max_length=100, blank=True, default='')         # Starlet 取样指令没有项目层
+    file_name = models.CharField(max_length=255)
+    kind = models.CharField(max_length=20, blank=True, default='')             # onboarding / worksheet / payload，见 artifact_index.artifact_kind
+    sampled_codes = models.TextField(null=True, blank=True)                     # payload 中已取样的实验号/条码（大写、排序、换行分隔）；NULL 表示尚未提取
+    barcodes_indexed = models.BooleanField(default=False)                       # payload 的主/子条码是否已写入 PayloadBarcode
+    size = models.BigIntegerField(default=0)
+    mtime = models.FloatField(default=0)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['section', 'platform', 'category', 'date_name'], name='artifact_tree_idx'),
+            models.Index(fields=['file_name', 'section'], name='artifact_file_name_idx'),
+            models.Index(fields=['section', 'kind'], name='artifact_sect_kind_idx'),
+        ]
+
+    def __str__(self):
+        return self.rel_path
+
+
+# payload.json 中“主条码 + 子条码”样本条码（ICP-MS 同主条码不同子条码冲突检测用），随下载文件索引同步增删
+class PayloadBarcode(models.Model):
+    artifact = models.ForeignKey(DownloadArtifact, on_delete=models.CASCADE, related_name='barcodes')
+    platform = models.CharField(max_length=50)
+    date_name = models.CharField(max_length=10)                    # YYYY-MM-DD
+    project = models.CharField(max_length=100)
+    main_barcode = models.CharField(max_length=100)
+    origin_barcode = models.CharField(max_length=100)              # 完整条码（含子条码）
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['platform', 'date_name', 'project', 'main_barcode'], name='payloadbc_key_main_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.platform} | {self.date_name} | {self.project} | {self.origin_barcode}"
+
+
+# 岗位清单“条码 <-> 实验号”每日映射库（原 DOWNLOAD_ROOT/岗位清单/<日期>/station_list.json），见 station_store
+class StationMapping(models.Model):
+    KIND_CHOICES = [
+        ('main', '主条码'),
+        ('sub', '子条码'),
+    ]
+
+    date_name = models.CharField(max_length=10)                                # YYYY-MM-DD
+    barcode = models.CharField(max_length=100)
+    experiment_no = models.CharField(max_length=100)
+    barcode_kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='main')  # 岗位清单按主条码 / 子条码匹配
+    seq = models.PositiveIntegerField(default=0)                               # 当日写入顺序（同一条码下实验号的先后）
+
+    class Meta:
+        indexes = [
+            # 条码 -> 实验号列表
+            models.Index(fields=['date_name', 'barcode', 'seq'], name='station_day_barcode_idx'),
+        ]
+        constraints = [
+            # 同一天一个实验号只对应一个条码；批量 upsert 的冲突键，唯一约束自带索引（实验号 -> 条码）
+            models.UniqueConstraint(fields=['date_name', 'experiment_no'], name='station_day_exp_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date_name} | {self.barcode} -> {self.experiment_no}"
+
+
+# 岗位清单合并时的冲突提示（同一实验号当天先后映射到不同条码）
+class StationMappingWarning(models.Model):
+    date_name = models.CharField(max_length=10)
+    type = models.CharField(max_length=20, default='conflict')
+    experiment_no = models.CharField(max_length=100, blank=True, default='')
+    old_barcode = models.CharField(max_length=100, blank=True, default='')
+    new_barcode = models.CharField(max_length=100, blank=True, default='')
+    msg = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # 与原 station_list.json 的 warning 去重口径一致
+            models.UniqueConstraint(
+                fields=['date_name', 'type', 'experiment_no', 'old_barcode', 'new_barcode', 'msg'],
+                name='station_warning_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date_name} | {self.msg}"
+
+
+# Tecan 当天 processed 扫码文件（media/tecan/<YYYYMMDD>/<项目>/processed/*.csv）索引，见 tecan_history
+class TecanProcessedFile(models.Model):
+    day = models.CharField(max_length=8)                                       # YYYYMMDD
+    project_dir = models.CharField(max_length=100)
+    file_name = models.CharField(max_length=255)
+    size = models.BigIntegerField(default=0)
+    mtime = models.FloatField(default=0)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'project_dir', 'file_name'], name='tecan_file_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} | {self.project_dir} | {self.file_name}"
+
+
+# processed 文件中的逐行条码（跨文件重复检查按 主条码 查询）
+class TecanHistoryBarcode(models.Model):
+    file = models.ForeignKey(TecanProcessedFile, on_delete=models.CASCADE, related_name='barcodes')
+    day = models.CharField(max_length=8)
+    project_dir = models.CharField(max_length=100)
+    row_id = models.IntegerField()                                              # 文件内 RowID（从 1 开始）
+    main_barcode = models.CharField(max_length=100)
+    src_tube_id = models.CharField(max_length=100)                             # 完整条码（SRCTubeID）
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'project_dir', 'main_barcode'], name='tecanhist_key_main_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} | {self.project_dir} | {self.src_tube_id}"
@@ -0,0 +1,168 @@
+# dashboard/payload_store.py
+# 导出数据（export_payload / wholeblood_payload）的服务端存储
+#
+# 结果页生成的多板数据（每块板的 96 孔 worksheet_table、worklist_records、error_rows）体积较大，
+# 以前整块塞进 session，每个请求都要从库里读出并重新签名。现在改为落盘：
+#   - 每块板单独序列化、gzip 压缩，按内容 sha256 命名（内容相同的板只存一份）
+#   - 顶层字段 + 各板摘要组成 meta，同样压缩落盘，meta 的摘要即 token
+#   - session 里只保存 {"payload_token": token}
+#   - 预览 / 导出只加载需要的那一块板
+#   - 超过 PAYLOAD_STORE_TTL 未访问的数据由 cleanup_payload_store 清理
+# 原子写入 / 访问时间 / TTL 清理见 gzip_store。
+import hashlib
+import json
+import logging
+import os
+
+from django.conf import settings
+
+from .gzip_store import GzipStore, valid_key
+
+
+logger = logging.getLogger(__name__)
+
+# 存储目录（不对外提供静态访问）
+PAYLOAD_STORE_ROOT = getattr(settings, "PAYLOAD_STORE_ROOT", os.path.join(settings.BASE_DIR, "payload_store"))
+
+# 多久未访问即可清理（秒），默认 3 天
+PAYLOAD_STORE_TTL = getattr(settings, "PAYLOAD_STORE_TTL", 3 * 24 * 3600)
+
+_SESSION_TOKEN_KEY = "payload_token"
+
+# meta/<token>.json.gz 与 blobs/<板摘要>.json.gz
+_META, _BLOBS = "meta", "blobs"
+_store = GzipStore(lambda: PAYLOAD_STORE_ROOT, lambda: PAYLOAD_STORE_TTL, "导出数据")
+
+
+def _dumps(obj, sort_keys=False):
+    # 与 session 的 JSON 序列化口径一致（键转字符串、允许 NaN），不可序列化对象兜底为字符串
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def _digest(obj):
+    # 摘要按排序后的键计算（键顺序不同但内容相同的数据共用一份）；落盘内容仍保持原有键顺序
+    return hashlib.sha256(_dumps(obj, sort_keys=True)).hexdigest()
+
+
+class StoredPayload:
+    """
+    一份已落盘的导出数据。
+    meta 为顶层字段（不含 plates）；plate(i) 按需加载单块板，每次返回新的 dict，调用方可随意修改。
+    旧结构（单板，没有 plates）整份数据都在 meta 里。
+    """
+
+    def __init__(self, token, meta, plate_digests=None, plates=None):
+        self.token = token
+        self.meta = meta
+        self._plate_digests = plate_digests
+        self._plates = plates        # 仅旧 session 兼容时使用（数据已在内存中）
+
+    @classmethod
+    def from_dict(cls, payload):
+        """包装仍保存在 session 里的旧数据（升级前生成的结果页）"""
+        payload = dict(payload)
+        plates = payload.pop("plates", None)
+        if isinstance(plates, list):
+            return cls("", payload, plates=plates)
+        if plates is not None:
+            payload["plates"] = plates
+        return cls("", payload)
+
+    @property
+    def has_plates(self):
+        return self._plate_digests is not None or self._plates is not None
+
+    @property
+    def plate_count(self):
+        if self._plates is not None:
+            return len(self._plates)
+        return len(self._plate_digests or ())
+
+    def get(self, key, default=None):
+        return self.meta.get(key, default)
+
+    def __getitem__(self, key):
+        return self.meta[key]
+
+    def plate(self, idx):
+        """加载第 idx 块板；索引无效时抛 IndexError"""
+        if not self.has_plates or idx < 0 or idx >= self.plate_count:
+            raise IndexError(idx)
+        if self._plates is not None:
+            return json.loads(_dumps(self._plates[idx]))
+        return _store.read(self._plate_digests[idx], _BLOBS)
+
+    def plates(self):
+        return [self.plate(i) for i in range(self.plate_count)]
+
+
+def save_payload(payload):
+    """把导出数据落盘，返回 token（内容不变时 token 也不变）"""
+    payload = dict(payload)
+    plates = payload.pop("plates", None)
+
+    plate_digests = None
+    if isinstance(plates, list):
+        plate_digests = []
+        for plate in plates:
+            digest = _digest(plate)
+            _store.write(digest, _dumps(plate), _BLOBS)
+            plate_digests.append(digest)
+    elif plates is not None:
+        payload["plates"] = plates
+
+    meta = {"meta": payload, "plates": plate_digests}
+    token = _digest(meta)[:32]
+    _store.write(token, _dumps(meta), _META)
+
+    _store.maybe_cleanup(cleanup_payload_store)
+    return token
+
+
+def load_payload(token):
+    """按 token 加载；不存在（已过期被清理）时返回 None"""
+    if not valid_key(token):
+        return None
+    try:
+        data = _store.read(token, _META, touch=True)    # 记录访问时间，供 TTL 清理判断
+    except FileNotFoundError:
+        return None
+    return StoredPayload(token, data["meta"], plate_digests=data["plates"])
+
+
+# ============ session 读写 ============
+def stash_session_payload(request, key, payload):
+    """保存导出数据，session[key] 只记录 token"""
+    request.session[key] = {_SESSION_TOKEN_KEY: save_payload(payload)}
+    request.session.modified = True
+
+
+def get_session_payload(request, key):
+    """取 session[key] 对应的导出数据（StoredPayload）；没有或已过期时返回 None"""
+    value = request.session.get(key)
+    if not value or not isinstance(value, dict):
+        return None
+    if _SESSION_TOKEN_KEY in value:
+        return load_payload(value[_SESSION_TOKEN_KEY])
+    return StoredPayload.from_dict(value)
+
+
+# ============ TTL 清理 ============
+def cleanup_payload_store(ttl=None):
+    """
+    删除超过 ttl 秒未访问的 meta，再删除不再被任何 meta 引用、且同样过期的板数据。
+    返回 (删除的 meta 数, 删除的板数据数)
+    """
+    removed_meta = _store.cleanup(ttl, _META)
+
+    referenced = set()
+    for token in _store.keys(_META):
+        try:
+            referenced.update(_store.read(token, _META).get("plates") or ())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            logger.warning("payload meta 无法读取，跳过：%s", _store.path(token, _META))
+
+    removed_blobs = _store.cleanup(ttl, _BLOBS, keep=referenced)
+    return removed_meta, removed_blobs
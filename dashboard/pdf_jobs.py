@@ -0,0 +1,369 @@
+# dashboard/pdf_jobs.py
+# PDF 渲染任务队列（基于现有 SQLite 库，无外部 broker）
+#
+# 导出工作清单时，请求内只做 render_to_string（很快），把 HTML + 输出路径写入 PdfRenderJob 表，
+# 耗时的 WeasyPrint 排版由 worker 的进程池在后台完成，请求立即返回 job_id。
+#   - 任务落库 → 服务重启不丢；worker 启动时接管超时未完成的 running 任务
+#   - 失败自动重试（指数退避），超过 max_attempts 标记 failed
+#   - 结果页导出按钮轮询 pdf_job_status，PDF 全部生成后才提示导出成功
+#
+# 部署：web 服务之外需常驻一个 worker 进程（systemd / supervisor / 计划任务开机启动均可）：
+#     python manage.py run_pdf_worker --workers 2
+# 没有 worker 的环境（本地开发、单机临时部署）在 settings 中设 PDF_RENDER_ASYNC = False，
+# 入队即在请求内同步渲染；否则任务排队超过 PDF_JOB_STALE_SECONDS 会在轮询结果里报“排队超时”。
+import atexit
+import logging
+import os
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
+
+from .artifact_index import record_artifact
+from .models import PdfRenderJob
+
+
+logger = logging.getLogger(__name__)
+
+# 是否异步生成（默认打开，需运行 run_pdf_worker，见文件头）；关闭时入队即同步渲染
+PDF_RENDER_ASYNC = getattr(settings, "PDF_RENDER_ASYNC", True)
+
+# 默认重试次数 / running 超时接管时间
+PDF_JOB_MAX_ATTEMPTS = getattr(settings, "PDF_JOB_MAX_ATTEMPTS", 3)
+PDF_JOB_STALE_SECONDS = getattr(settings, "PDF_JOB_STALE_SECONDS", 600)
+
+# 批量导出（打包 ZIP）共用进程池的进程数（每个 web 进程一个池，首次批量导出时创建）
+PDF_BATCH_WORKERS = getattr(settings, "PDF_BATCH_WORKERS", 4)
+
+# 工作清单字体（大体积 CJK 字体）
+PDF_FONT_PATH = os.path.join(settings.BASE_DIR, 'dashboard', 'static', 'css', 'fonts', 'NotoSansSC-Regular.ttf')
+
+
+# ============ 样式预设（与原先各导出入口的 CSS 一一对应） ============
+def _worksheet_css():
+    # export_files：A4 横向 + 内置 NotoSans 字体
+    return f"""
+        @font-face {{
+            font-family: "NotoSans";
+            src: url("{PDF_FONT_PATH}") format("truetype");
+            font-weight: normal;
+            font-style: normal;
+        }}
+
+        @page {{
+            size: A4 landscape;
+            margin: 6mm 6mm 8mm 6mm;
+        }}
+
+        body, table, td, th, div, span {{
+            font-family: "NotoSans", "DejaVu Sans", sans-serif;
+            font-size: 9pt;
+            line-height: 1.25;
+        }}
+    """
+
+
+def _replace_css():
+    # 上机列表替换后重新生成的 Replace_ 工作清单
+    return """
+        @page { size: A4; margin: 10mm; }
+        body { font-family: "Noto Sans CJK SC", "SimSun", sans-serif; font-size: 10px; }
+    """
+
+
+def _wholeblood_css():
+    # 全血工作站：样品放置图 / 前处理样品工作单
+    return """
+        @page { size: A4; margin: 10mm; }
+        body { font-family: "Noto Sans CJK SC", "SimSun", sans-serif; font-size: 10px; }
+        .highlight { background-color: #ffcccc; }
+    """
+
+
+PDF_STYLES = {
+    "worksheet": _worksheet_css,
+    "replace": _replace_css,
+    "wholeblood": _wholeblood_css,
+}
+
+
+class WarmPdfRenderer:
+    """
+    进程内常驻的 PDF 渲染器（每个 worker 进程一个）：
+      - 每种样式的 FontConfiguration + CSS 只解析一次（@font-face 的 CJK 大字体只加载一次）
+      - 导出用到的模板只编译一次（DEBUG 时不缓存，便于改模板即时生效）
+    """
+
+    def __init__(self):
+        self._styles = {}      # style -> (font_config, css)
+        self._templates = {}   # 模板名 -> 已编译模板
+        self._lock = threading.Lock()
+
+    def _style(self, style):
+        cached = self._styles.get(style)
+        if cached is None:
+            if style not in PDF_STYLES:
+                raise ValueError(f"未知的 PDF 样式：{style}")
+            font_config = FontConfiguration()
+            cached = (font_config, CSS(string=PDF_STYLES[style](), font_config=font_config))
+            self._styles[style] = cached
+        return cached
+
+    def warm_up(self):
+        """worker 启动时预热全部样式"""
+        with self._lock:
+            for style in PDF_STYLES:
+                self._style(style)
+
+    def render_html(self, template_name, context):
+        if settings.DEBUG:
+            return get_template(template_name).render(context)
+        tpl = self._templates.get(template_name)
+        if tpl is None:
+            tpl = self._templates[template_name] = get_template(template_name)
+        return tpl.render(context)
+
+    def write_pdf(self, html, out_path, style):
+        """
+        渲染一份 PDF。
+        先写 .tmp 再原子替换，下载页不会看到写了一半的文件。
+        """
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        tmp_path = out_path + ".tmp"
+        # 字体配置在多次渲染间共享，同一进程内串行使用
+        with self._lock:
+            font_config, pdf_css = self._style(style)
+            HTML(string=html).write_pdf(tmp_path, stylesheets=[pdf_css], font_config=font_config)
+        os.replace(tmp_path, out_path)
+        return out_path
+
+
+_renderer = None
+
+
+def get_pdf_renderer():
+    """取当前进程的常驻渲染器（首次调用时创建）"""
+    global _renderer
+    if _renderer is None:
+        _renderer = WarmPdfRenderer()
+    return _renderer
+
+
+def render_pdf_html(template_name, context):
+    """用常驻渲染器渲染导出用 HTML（等价于 render_to_string）"""
+    return get_pdf_renderer().render_html(template_name, context)
+
+
+def render_pdf(html, out_path, style):
+    """同步渲染一份 PDF（worker 子进程 / 同步模式内调用）"""
+    return get_pdf_renderer().write_pdf(html, out_path, style)
+
+
+# ============ 入队 / 查询 ============
+def enqueue_pdf_job(html, out_path, style, max_attempts=None):
+    """
+    登记一个 PDF 渲染任务，返回 job_id。
+    PDF_RENDER_ASYNC=False 时当场渲染（任务记录仍会保留，便于统一查询），失败直接抛异常。
+    """
+    if style not in PDF_STYLES:
+        raise ValueError(f"未知的 PDF 样式：{style}")
+
+    job = PdfRenderJob.objects.create(
+        job_id=uuid.uuid4().hex,
+        style=style,
+        html=html,
+        out_path=out_path,
+        max_attempts=max_attempts or PDF_JOB_MAX_ATTEMPTS,
+    )
+    if not PDF_RENDER_ASYNC:
+        run_job_inline(job)
+    return job.job_id
+
+
+def all_jobs_done(job_ids):
+    """这些任务是否都已生成完毕（同步模式下入队即完成）"""
+    return not PdfRenderJob.objects.filter(job_id__in=list(job_ids)).exclude(status="done").exists()
+
+
+def create_claimed_job(html, out_path, style):
+    """
+    登记一个由调用方当场渲染的任务（直接置为 running，后台 worker 不会领取），返回 job_id。
+    调用方崩溃时，该任务会在超时后被 recover_stale_jobs 放回队列，由 worker 补做。
+    """
+    if style not in PDF_STYLES:
+        raise ValueError(f"未知的 PDF 样式：{style}")
+
+    job = PdfRenderJob.objects.create(
+        job_id=uuid.uuid4().hex,
+        style=style,
+        html=html,
+        out_path=out_path,
+        status="running",
+        attempts=1,
+        max_attempts=PDF_JOB_MAX_ATTEMPTS,
+    )
+    return job.job_id
+
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def _get_batch_pool():
+    """批量导出共用的进程池：首次使用时创建，之后各请求复用（子进程里的字体/CSS 保持预热）"""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            from .pdf_process import init_render_process
+            _batch_pool = ProcessPoolExecutor(max_workers=PDF_BATCH_WORKERS, initializer=init_render_process)
+            atexit.register(_batch_pool.shutdown, wait=False, cancel_futures=True)
+        return _batch_pool
+
+
+def _discard_batch_pool(pool):
+    """子进程崩溃后进程池不可再用，丢弃后下次重新创建"""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is pool:
+            _batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_jobs_in_pool(job_ids):
+    """
+    在共用进程池内并行渲染一批 create_claimed_job 登记的任务（请求内等待全部完成）。
+    返回 {job_id: 错误信息}，成功的任务错误信息为空串。
+    """
+    from concurrent.futures.process import BrokenProcessPool
+    from .pdf_process import render_in_process
+
+    jobs = list(PdfRenderJob.objects.filter(job_id__in=job_ids))
+    results = {}
+    if not jobs:
+        return results
+
+    pool = _get_batch_pool()
+    broken = False
+
+    def fail(job, err):
+        mark_job_failed(job, err, retry=False)
+        results[job.job_id] = str(err) or type(err).__name__
+
+    futures = []
+    for job in jobs:
+        try:
+            futures.append((pool.submit(render_in_process, job.html, job.out_path, job.style), job))
+        except BrokenProcessPool as e:
+            broken = True
+            fail(job, e)
+    for fut, job in futures:
+        try:
+            fut.result()
+        except Exception as e:
+            broken = broken or isinstance(e, BrokenProcessPool)
+            fail(job, e)
+        else:
+            mark_job_done(job)
+            results[job.job_id] = ""
+    if broken:
+        _discard_batch_pool(pool)
+    return results
+
+
+def job_is_stalled(job):
+    """到期后仍排队超过 PDF_JOB_STALE_SECONDS：多半是 run_pdf_worker 没有运行"""
+    return (job.status == "pending"
+            and job.run_after < timezone.now() - timedelta(seconds=PDF_JOB_STALE_SECONDS))
+
+
+def job_status_dict(job):
+    stalled = job_is_stalled(job)
+    if stalled:
+        logger.warning("PDF 任务 %s 排队超时，请确认 run_pdf_worker 已启动", job.job_id)
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_display": "排队超时" if stalled else job.get_status_display(),
+        "stalled": stalled,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "file_name": os.path.basename(job.out_path),
+        "error": (job.last_error if job.status == "failed"
+                  else "排队超时：后台 PDF 服务（run_pdf_worker）可能未启动" if stalled else ""),
+    }
+
+
+# ============ worker 侧 ============
+def recover_stale_jobs(exclude_ids=()):
+    """
+    把超时仍处于 running 的任务放回队列（worker 崩溃 / 服务重启后接管）。
+    exclude_ids：调用方自己正在渲染的任务主键，不接管。
+    """
+    cutoff = timezone.now() - timedelta(seconds=PDF_JOB_STALE_SECONDS)
+    stale = PdfRenderJob.objects.filter(status="running", updated_at__lt=cutoff).exclude(pk__in=list(exclude_ids))
+    n = stale.update(
+        status="pending", run_after=timezone.now(), updated_at=timezone.now()
+    )
+    if n:
+        logger.warning("接管 %s 个超时未完成的 PDF 任务", n)
+    return n
+
+
+def claim_next_job():
+    """原子地领取一个到期的 pending 任务并标记为 running；没有任务时返回 None"""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            PdfRenderJob.objects.filter(status="pending", run_after__lte=now)
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = PdfRenderJob.objects.filter(pk=job.pk, status="pending").update(
+            status="running", attempts=F("attempts") + 1, updated_at=now
+        )
+    if not claimed:
+        return None   # 被其他 worker 抢先领取
+    job.refresh_from_db()
+    return job
+
+
+def mark_job_done(job):
+    job.status = "done"
+    job.html = ""          # PDF 已落盘，HTML 不再需要，避免任务表膨胀
+    job.last_error = ""
+    job.save(update_fields=["status", "html", "last_error", "updated_at"])
+    record_artifact(job.out_path)     # PDF 落盘后才出现在文件下载页
+
+
+def mark_job_failed(job, err, retry=True):
+    job.last_error = str(err)
+    if retry and job.attempts < job.max_attempts:
+        # 指数退避：10s / 20s / 40s ...
+        job.status = "pending"
+        job.run_after = timezone.now() + timedelta(seconds=10 * (2 ** (job.attempts - 1)))
+    else:
+        job.status = "failed"
+        logger.warning("PDF 任务 %s 生成失败：%s", job.job_id, err)
+    job.save(update_fields=["status", "run_after", "last_error", "updated_at"])
+
+
+def run_job_inline(job):
+    """在当前进程内执行一个任务（同步模式 / 调试用）；失败时不重试，异常原样抛给调用方"""
+    PdfRenderJob.objects.filter(pk=job.pk).update(status="running", attempts=F("attempts") + 1)
+    job.refresh_from_db()
+    try:
+        render_pdf(job.html, job.out_path, job.style)
+    except Exception as e:
+        mark_job_failed(job, e, retry=False)
+        raise
+    mark_job_done(job)
@@ -0,0 +1,18 @@
+# dashboard/pdf_process.py
+# PDF 渲染进程池的子进程入口（run_pdf_worker 与批量导出共用）
+#
+# 本模块顶层不导入任何 Django 模型：spawn 方式启动的子进程在反序列化入口函数时会先导入本模块，
+# 此时 Django 尚未 setup，模型要到 initializer 执行之后才能导入。
+
+
+def init_render_process():
+    # 子进程（Windows 下为 spawn）需要自行初始化 Django，并预热常驻渲染器（字体/CSS 只加载一次）
+    import django
+    django.setup()
+    from dashboard.pdf_jobs import get_pdf_renderer
+    get_pdf_renderer().warm_up()
+
+
+def render_in_process(html, out_path, style):
+    from dashboard.pdf_jobs import render_pdf
+    return render_pdf(html, out_path, style)
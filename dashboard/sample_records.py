@@ -0,0 +1,371 @@
+# dashboard/sample_records.py
+# SampleRecord 批量落库：NIMBUS / Starlet / Tecan / 达安 / ICP-MS 手工取样共用
+#
+# 原先各平台逐孔调用 update_or_create，一块板 96 孔 = 96 次 SELECT + INSERT/UPDATE；
+# 这里改为“先攒一整板，再在一个事务里 bulk_create（冲突时更新）”。
+import re
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+from .models import SampleRecord, SampleStatsVersion, normalize_search_key
+
+
+# upsert 冲突键（与 SampleRecord.Meta 中的唯一约束一致）
+_UPSERT_KEY = ["project_name", "record_date", "batch_id", "plate_no", "well_str"]
+
+# 批量写入时需要覆盖的字段（upsert 键之外的部分）
+_UPDATE_FIELDS = ["sample_name", "barcode", "error_info", "sample_name_norm", "barcode_norm"]
+
+# 单条 SQL 的批大小（SQLite 变量数上限保护）
+_BATCH_SIZE = 500
+
+
+def make_sample_row(well_str, sample_name="", barcode="", error_info=""):
+    """
+    构造一条待写入的孔位记录（普通 dict），供 save_plate_records 使用。
+    """
+    return {
+        "well_str": str(well_str or "").strip(),
+        "sample_name": sample_name,
+        "barcode": barcode,
+        "error_info": error_info or "",
+    }
+
+
+def save_plate_records(rows, *, project_name, record_date, plate_no, batch_id="", replace_plate=False):
+    """
+    以“同日-同项目-同批次-同板号-孔位”为粒度，批量写入一整板 SampleRecord。
+
+    rows          : 可迭代的 dict（见 make_sample_row），同一孔位出现多次时以最后一次为准
+    replace_plate : True 时先删除“同日-同项目-同板号”的旧记录（Tecan / ICP-MS 的既有口径）
+
+    返回实际写入的孔位数。
+    """
+    # 同一孔位去重（与逐孔 update_or_create 的“后写覆盖”语义一致）
+    by_well = {}
+    for row in rows:
+        well_str = row.get("well_str") or ""
+        if not well_str:
+            continue
+        by_well[well_str] = row
+
+    objs = [
+        SampleRecord(
+            project_name=project_name,
+            record_date=record_date,
+            batch_id=batch_id,
+            plate_no=plate_no,
+            well_str=well_str,
+            sample_name=row.get("sample_name"),
+            barcode=row.get("barcode"),
+            error_info=row.get("error_info") or "",
+        )
+        for well_str, row in by_well.items()
+    ]
+    for obj in objs:
+        obj.fill_search_keys()   # bulk_create 不走 save()，这里手动同步规范化查找列
+
+    with transaction.atomic():
+        if replace_plate:
+            SampleRecord.objects.filter(
+                project_name=project_name,
+                record_date=record_date,
+                plate_no=plate_no,
+            ).delete()
+        if objs:
+            # 依赖 samplerec_upsert_key_uniq 唯一约束：冲突时就地更新（INSERT ... ON CONFLICT DO UPDATE）
+            SampleRecord.objects.bulk_create(
+                objs,
+                batch_size=_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=_UPSERT_KEY,
+                update_fields=_UPDATE_FIELDS,
+            )
+
+        # 当日统计缓存随写入失效（事务提交后再清）
+        transaction.on_commit(lambda: invalidate_daily_sample_stats(record_date))
+
+    return len(objs)
+
+
+# ============ 历史标本查找 ============
+SEARCH_MODES = ("exact", "prefix", "contains")
+
+# 单页条数默认值 / 硬上限
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
+
+# 前缀查找的上界哨兵：norm >= q AND norm < q + _PREFIX_SENTINEL，可直接走 B-tree 索引
+_PREFIX_SENTINEL = chr(0x10FFFF)
+
+# 包含查找的三元组全文索引（见迁移 0029，仅 SQLite）；trigram 至少需要 3 个字符
+_SEARCH_FTS_TABLE = "dashboard_samplerecord_fts"
+_SEARCH_FTS_MIN_LEN = 3
+_search_fts_ready = {}   # 数据库名 -> 全文索引表是否存在
+
+
+def _search_fts_available():
+    db_name = str(connection.settings_dict.get("NAME"))
+    if db_name not in _search_fts_ready:
+        _search_fts_ready[db_name] = (
+            connection.vendor == "sqlite"
+            and _SEARCH_FTS_TABLE in connection.introspection.table_names()
+        )
+    return _search_fts_ready[db_name]
+
+
+def _contains_condition(key):
+    """
+    包含查找条件：能用全文索引时先用 FTS5 MATCH 取候选 id，再用 LIKE 复核；
+    查询串短于 3 个字符或没有全文索引时，退回到逐行 LIKE。
+    """
+    cond = Q(sample_name_norm__contains=key) | Q(barcode_norm__contains=key)
+    if len(key) < _SEARCH_FTS_MIN_LEN or not _search_fts_available():
+        return cond
+    phrase = '"' + key.replace('"', '""') + '"'
+    fts_ids = RawSQL(f"SELECT rowid FROM {_SEARCH_FTS_TABLE} WHERE {_SEARCH_FTS_TABLE} MATCH %s", (phrase,))
+    return Q(pk__in=fts_ids) & cond
+
+
+def encode_search_cursor(rec):
+    """游标 = 最后一条记录的 (record_date, id)，与排序键一致"""
+    return f"{rec.record_date.isoformat()}_{rec.pk}"
+
+
+def decode_search_cursor(cursor):
+    """解析游标；格式不对时抛 ValueError"""
+    d, pk = str(cursor).rsplit("_", 1)
+    return date.fromisoformat(d), int(pk)
+
+
+def search_sample_records(query, *, mode="contains", date_from=None, date_to=None,
+                          project_name="", cursor="", limit=SEARCH_DEFAULT_LIMIT):
+    """
+    按实验号 / 条码查找 SampleRecord。
+
+    mode      : exact（精确）/ prefix（前缀）/ contains（包含，默认）
+                exact、prefix 走规范化列索引；contains 走三元组全文索引（查询串至少 3 个字符）
+    date_from / date_to / project_name : 可选过滤
+    cursor    : 上一页返回的 next_cursor（按 record_date 倒序、id 倒序翻页）
+    limit     : 单页条数，最多 SEARCH_MAX_LIMIT
+
+    返回 (records, next_cursor)；没有下一页时 next_cursor 为 ""。
+    参数非法时抛 ValueError。
+    """
+    key = normalize_search_key(query)
+    if not key:
+        return [], ""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"不支持的查找模式：{mode}")
+
+    if mode == "exact":
+        cond = Q(sample_name_norm=key) | Q(barcode_norm=key)
+    elif mode == "prefix":
+        upper = key + _PREFIX_SENTINEL
+        cond = (Q(sample_name_norm__gte=key, sample_name_norm__lt=upper)
+                | Q(barcode_norm__gte=key, barcode_norm__lt=upper))
+    else:
+        cond = _contains_condition(key)
+
+    qs = SampleRecord.objects.filter(cond)
+    if date_from:
+        qs = qs.filter(record_date__gte=date_from)
+    if date_to:
+        qs = qs.filter(record_date__lte=date_to)
+    if project_name:
+        qs = qs.filter(project_name=project_name)
+    if cursor:
+        c_date, c_pk = decode_search_cursor(cursor)
+        qs = qs.filter(Q(record_date__lt=c_date) | Q(record_date=c_date, pk__lt=c_pk))
+
+    limit = max(1, min(int(limit or SEARCH_DEFAULT_LIMIT), SEARCH_MAX_LIMIT))
+    records = list(qs.order_by("-record_date", "-pk")[:limit + 1])
+
+    next_cursor = ""
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_search_cursor(records[-1])
+    return records, next_cursor
+
+
+# ============ 每日标本统计 ============
+# 可选：按项目设定“允许前缀”集合；项目未配置时自动从数据中抽取
+STATS_ALLOWED_PREFIX_MAP = {
+    "VAE": {"AE", "VF", "V", "ST"},
+    "VD":  {"VD", "VF", "V", "YVD", "ST"},
+    # 其他项目留空 → 自动提取
+}
+
+# 统计时剔除的前缀
+_STATS_EXCLUDED_PREFIXES = {"QC", "STD"}
+
+# 预编译：'前缀+数字' 的纯实验号（如 VD123 → ('VD', '123')），以及“字母后紧跟数字”的前缀探测
+_STATS_NAME_RE = re.compile(r"([A-Za-z]+)(\d+)")
+_STATS_PREFIX_RE = re.compile(r"^[A-Za-z]+(?=\d)")
+
+# 按日缓存（秒）；设为 0 / None 关闭缓存
+_STATS_CACHE_TIMEOUT = getattr(settings, "SAMPLE_STATS_CACHE_TIMEOUT", 300)
+
+
+def _daily_stats_version(record_date):
+    return (SampleStatsVersion.objects.filter(record_date=record_date)
+            .values_list("version", flat=True).first() or 0)
+
+
+def _daily_stats_cache_key(record_date, version):
+    return f"dashboard:sample_stats:{record_date.isoformat()}:v{version}"
+
+
+def invalidate_daily_sample_stats(record_date):
+    """
+    写入 SampleRecord 后调用：该日期的统计缓存版本号 +1。
+
+    版本号存在数据库里，所有进程下次读取时都会换用新的缓存键；
+    默认的 LocMemCache 是进程内的，只 cache.delete 清不掉其他 worker 里的旧结果。
+    """
+    bumped = SampleStatsVersion.objects.filter(record_date=record_date).update(version=F("version") + 1)
+    if bumped:
+        return
+    try:
+        with transaction.atomic():
+            SampleStatsVersion.objects.create(record_date=record_date, version=1)
+    except IntegrityError:
+        # 并发写入时另一个进程刚建好这一行
+        SampleStatsVersion.objects.filter(record_date=record_date).update(version=F("version") + 1)
+
+
+def _split_prefix_number(name):
+    """'VD123' → ('VD', 123)；不是纯 '前缀+数字' 时返回 None"""
+    m = _STATS_NAME_RE.fullmatch(name)
+    if not m:
+        return None
+    return m.group(1), int(m.group(2))
+
+
+def _join_sorted(names):
+    return ", ".join(sorted(names))
+
+
+class _ProjectStatsAcc:
+    """单个项目的累加器：一次遍历记录，按前缀分桶"""
+
+    def __init__(self):
+        self.nums_by_prefix = defaultdict(list)   # 前缀 -> 数字部分列表（含重复）
+        self.detected_prefixes = set()
+        self.barcode_to_samples = defaultdict(set)
+        self.sample_count = defaultdict(int)
+
+    def add(self, sample_name, barcode):
+        # 收集候选 sample_name（兼容 'AE1234-VD5678' 这种 "-" 连接的情况，取前两段）
+        name_head = ""
+        if sample_name:
+            parts = str(sample_name).split('-')
+            name_head = parts[0]
+            for name in parts[:2]:
+                m = _STATS_PREFIX_RE.match(name)
+                if m:
+                    self.detected_prefixes.add(m.group())
+                pn = _split_prefix_number(name)
+                if pn:
+                    self.nums_by_prefix[pn[0]].append(pn[1])
+
+        # “条码→样本名集合”、“样本名→出现次数”，用于“共血/多血”
+        self.barcode_to_samples[barcode].add(name_head)
+        self.sample_count[name_head] += 1
+
+    def rows(self, allowed_prefixes=None):
+        # 选择要使用的前缀集合，并剔除 QC / STD
+        prefixes = allowed_prefixes if allowed_prefixes else self.detected_prefixes
+        prefixes = {p for p in prefixes if p not in _STATS_EXCLUDED_PREFIXES}
+
+        # 共血：同一个条码对应多个样本名；多血：同一个样本名在当天出现多次
+        # 两者都只统计纯 '前缀+数字' 的名称，这里一次性按前缀分桶
+        shared_by_prefix = defaultdict(set)
+        for key, names in self.barcode_to_samples.items():
+            if len(names) > 1:
+                pn = _split_prefix_number(str(key))
+                if pn:
+                    shared_by_prefix[pn[0]].add(str(key))
+        multi_by_prefix = defaultdict(set)
+        for name, cnt in self.sample_count.items():
+            if cnt > 1:
+                pn = _split_prefix_number(name)
+                if pn:
+                    multi_by_prefix[pn[0]].add(name)
+
+        result_rows = []
+        for prefix in sorted(prefixes):
+            raw_nums = self.nums_by_prefix.get(prefix, [])
+            nums = sorted(raw_nums)
+            total = len(raw_nums)
+
+            # 空号（找缺口）
+            missing_ranges = []
+            empty_count = 0
+            for a, b in zip(nums, nums[1:]):
+                gap = b - a - 1
+                if gap > 0:
+                    empty_count += gap
+                    if gap == 1:
+                        missing_ranges.append(f"{prefix}{a + 1}")
+                    else:
+                        missing_ranges.append(f"{prefix}{a + 1}-{prefix}{b - 1}")
+
+            shared = shared_by_prefix.get(prefix, set())
+            multi = multi_by_prefix.get(prefix, set())
+
+            result_rows.append({
+                "prefix":      prefix,
+                "total":       total,
+                "start":       f"{prefix}{nums[0]}" if nums else None,
+                "end":         f"{prefix}{nums[-1]}" if nums else None,
+                "empty":       f"{empty_count}（{', '.join(missing_ranges)}）" if empty_count else "0",
+                "sharedBlood": f"{len(shared)}（{_join_sorted(shared)}）" if shared else "0",
+                "multiBlood":  f"{len(multi)}（{_join_sorted(multi)}）" if multi else "0",
+            })
+        return result_rows
+
+
+def daily_sample_stats(record_date):
+    """
+    统计某一天全部项目的标本情况（每日标本统计弹窗的数据源）。
+
+    单次流式读取 (project_name, sample_name, barcode)，内存中按项目、前缀分组；
+    结果按日期缓存，save_plate_records 写入该日期时递增数据库中的版本号，所有进程的旧缓存随之失效。
+    返回 [{"project_name": ..., "statistics": [...]}, ...]
+    """
+    if _STATS_CACHE_TIMEOUT:
+        cache_key = _daily_stats_cache_key(record_date, _daily_stats_version(record_date))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    accs = {}
+    rows = (
+        SampleRecord.objects.filter(record_date=record_date)
+        .values_list("project_name", "sample_name", "barcode")
+        .iterator(chunk_size=2000)
+    )
+    for project_name, sample_name, barcode in rows:
+        acc = accs.get(project_name)
+        if acc is None:
+            acc = accs[project_name] = _ProjectStatsAcc()
+        acc.add(sample_name, barcode)
+
+    projects_payload = [
+        {
+            "project_name": proj,
+            "statistics": accs[proj].rows(STATS_ALLOWED_PREFIX_MAP.get(proj)),
+        }
+        for proj in sorted(accs)
+    ]
+
+    if _STATS_CACHE_TIMEOUT:
+        cache.set(cache_key, projects_payload, _STATS_CACHE_TIMEOUT)
+    return projects_payload
@@ -0,0 +1,99 @@
+# dashboard/station_map_store.py
+# Tecan 岗位清单映射（子条码 -> 实验号列表）的服务端存储
+#
+# tecaningest 以前把整份映射塞进 session（request.session["tecan_station_map"]），之后该会话的每个请求
+# （修正重复、processed 文件列表、导出……）都要把这份大 dict 反序列化一遍。现在改为：
+#   - 映射按内容 sha256 命名，gzip 压缩落盘（gzip_store，与 payload_store 共用），多进程共享
+#   - 同一天同一份岗位清单，不同操作员 / 不同会话得到同一个 key，只存一份
+#   - 进程内再按 key 做 LRU 缓存（内容寻址，key 不变内容就不变，无需校验）
+#   - session 里只保存 key（request.session["tecan_station_map_key"]）
+#   - 超过 STATION_MAP_STORE_TTL 未访问的映射在保存时顺带清理
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .gzip_store import GzipStore, valid_key
+
+# 存储目录（不对外提供静态访问）
+STATION_MAP_STORE_ROOT = getattr(settings, "STATION_MAP_STORE_ROOT", os.path.join(settings.BASE_DIR, "station_map_store"))
+
+# 多久未访问即可清理（秒），默认 3 天
+STATION_MAP_STORE_TTL = getattr(settings, "STATION_MAP_STORE_TTL", 3 * 24 * 3600)
+
+# 进程内最多缓存多少份映射（按最近使用淘汰）
+_STATION_MAP_CACHE_SIZE = getattr(settings, "STATION_MAP_CACHE_SIZE", 8)
+
+_SESSION_KEY = "tecan_station_map_key"
+_LEGACY_SESSION_KEY = "tecan_station_map"      # 升级前整份映射直接放在 session 里
+
+_cache = OrderedDict()   # key -> dict
+_lock = threading.Lock()
+_store = GzipStore(lambda: STATION_MAP_STORE_ROOT, lambda: STATION_MAP_STORE_TTL, "岗位清单映射")
+
+
+def _remember(key, station_map):
+    with _lock:
+        _cache[key] = station_map
+        _cache.move_to_end(key)
+        while len(_cache) > _STATION_MAP_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def save_station_map(station_map):
+    """保存映射，返回 key（内容相同的映射 key 也相同）；空映射返回空串"""
+    if not station_map:
+        return ""
+    raw = json.dumps(station_map, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    key = hashlib.sha256(raw).hexdigest()[:32]
+    # 多个操作员同时上传同一份清单时各写各的临时文件，最后原子替换；已存在只刷新访问时间
+    _store.write(key, raw)
+
+    _remember(key, station_map)
+    _store.maybe_cleanup(cleanup_station_map_store)
+    return key
+
+
+def load_station_map(key):
+    """按 key 取映射（只读，勿直接修改）；key 为空 / 已过期被清理时返回 None"""
+    if not valid_key(key):
+        return None
+    with _lock:
+        station_map = _cache.get(key)
+        if station_map is not None:
+            _cache.move_to_end(key)
+    try:
+        if station_map is None:
+            station_map = _store.read(key)
+            _remember(key, station_map)
+        _store.touch(key)    # 记录访问时间，供 TTL 清理判断
+    except FileNotFoundError:
+        return station_map
+    return station_map
+
+
+# ============ session 读写 ============
+def stash_session_station_map(request, station_map):
+    """保存映射，session 只记录 key（同时去掉升级前的整份映射）"""
+    request.session[_SESSION_KEY] = save_station_map(station_map)
+    request.session.pop(_LEGACY_SESSION_KEY, None)
+    request.session.modified = True
+
+
+def get_session_station_map(request):
+    """取当前会话的映射；保存的是空映射时返回空 dict，会话里没有 / 已过期时返回 None"""
+    key = request.session.get(_SESSION_KEY)
+    if key is None:
+        return request.session.get(_LEGACY_SESSION_KEY)
+    if key == "":
+        return {}
+    return load_station_map(key)
+
+
+# ============ TTL 清理 ============
+def cleanup_station_map_store(ttl=None):
+    """删除超过 ttl 秒未访问的映射，返回删除的个数"""
+    return _store.cleanup(ttl)
@@ -0,0 +1,185 @@
+# dashboard/station_mirror.py
+# 共享盘“共同岗位清单”的本地镜像
+#
+# 以前 ProcessResult / Daan_process_result / ICP-MS 每个请求、check_station_auto 每次前端轮询，
+# 都要同步 os.listdir 局域网共享目录并读取最新文件；共享盘一慢，所有请求一起卡住。
+# 现在由后台 watcher 定时轮询共享目录（STATION_NETWORK_DIR），把当天 / 明天时间戳最新的文件
+# 镜像到本地（STATION_MIRROR_ROOT/<YYYYMMDD>/）：
+#   - 请求内只读本地镜像，不再访问共享盘；镜像内容仍交给 station_parser 按 sha256 缓存解析
+#   - 文件名 / 大小 / 修改时间都没变时不重新拷贝
+#   - 共享盘访问失败时保留上一次的镜像
+#   - watcher 只由 `python manage.py watch_station_list` 单独运行（web 进程不启动轮询线程，
+#     多个 worker 不会各自轮询共享盘）
+#   - 测试时把 STATION_NETWORK_DIR 指向本地目录即可
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 共享盘上的共同岗位清单目录
+STATION_NETWORK_DIR = getattr(settings, "STATION_NETWORK_DIR", r"\\10.10.18.70\00-标本签收与领取\2026\共同岗位清单")
+
+# 本地镜像目录
+STATION_MIRROR_ROOT = getattr(settings, "STATION_MIRROR_ROOT", os.path.join(settings.BASE_DIR, "station_mirror"))
+
+# 轮询间隔（秒）
+STATION_WATCH_INTERVAL = getattr(settings, "STATION_WATCH_INTERVAL", 60)
+
+_MANIFEST_NAME = "manifest.json"
+
+
+def _station_name_re(day_str):
+    # 文件名格式：共同岗位清单{YYYYMMDD}_{HHMM}.xlsx
+    return re.compile(r"^共同岗位清单" + re.escape(day_str) + r"_(\d{4})\.(xlsx|xls)$", re.IGNORECASE)
+
+
+def _watched_days():
+    # 前端可选“今天 / 明天”检测
+    now = timezone.localtime()
+    return [now.strftime("%Y%m%d"), (now + timedelta(days=1)).strftime("%Y%m%d")]
+
+
+def _day_dir(day_str):
+    return os.path.join(STATION_MIRROR_ROOT, day_str)
+
+
+def _read_manifest(day_str):
+    try:
+        with open(os.path.join(_day_dir(day_str), _MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# ============ 同步（watcher 侧） ============
+def _sync_day(day_str, entries):
+    """把共享目录中 day_str 最新的岗位清单镜像到本地；返回是否有更新"""
+    # 筛选该天文件，按时间戳(HHMM)取最新
+    pattern = _station_name_re(day_str)
+    candidates = []
+    for name in entries:
+        m = pattern.match(name)
+        if m:
+            candidates.append((m.group(1), name))
+    if not candidates:
+        return False
+
+    candidates.sort(key=lambda x: x[0])
+    latest_name = candidates[-1][1]
+    src = os.path.join(STATION_NETWORK_DIR, latest_name)
+    st = os.stat(src)
+    manifest = _read_manifest(day_str)
+    if (manifest and manifest.get("filename") == latest_name
+            and manifest.get("size") == st.st_size and manifest.get("mtime") == st.st_mtime):
+        return False
+
+    with open(src, "rb") as f:
+        file_bytes = f.read()
+
+    day_dir = _day_dir(day_str)
+    os.makedirs(day_dir, exist_ok=True)
+    dst = os.path.join(day_dir, latest_name)
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(file_bytes)
+    os.replace(tmp_path, dst)
+
+    _write_json_atomic(os.path.join(day_dir, _MANIFEST_NAME), {
+        "filename": latest_name,
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "sha256": hashlib.sha256(file_bytes).hexdigest(),
+        "synced_at": timezone.localtime().strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+    # 同一天被新版本取代的旧镜像
+    for name in os.listdir(day_dir):
+        if name not in (latest_name, _MANIFEST_NAME) and not name.endswith(".tmp"):
+            try:
+                os.remove(os.path.join(day_dir, name))
+            except OSError:
+                pass
+
+    logger.info("[auto_station] 已镜像岗位清单: %s", src)
+    return True
+
+
+def sync_station_mirror(day_strs=None):
+    """
+    轮询一次共享目录（只 listdir 一次），更新各日期的本地镜像。
+    返回有更新的日期列表；共享目录无法访问时返回空列表并保留原镜像。
+    """
+    try:
+        entries = os.listdir(STATION_NETWORK_DIR)
+    except Exception as e:
+        logger.warning("[auto_station] 无法访问网络路径: %s, 原因: %s", STATION_NETWORK_DIR, e)
+        return []
+
+    updated = []
+    for day_str in day_strs or _watched_days():
+        try:
+            if _sync_day(day_str, entries):
+                updated.append(day_str)
+        except Exception as e:
+            logger.warning("[auto_station] 镜像 %s 的岗位清单失败: %s", day_str, e)
+    return updated
+
+
+def cleanup_station_mirror(keep_days=7):
+    """删除 keep_days 天之前的镜像目录"""
+    cutoff = (timezone.localtime() - timedelta(days=keep_days)).strftime("%Y%m%d")
+    if not os.path.isdir(STATION_MIRROR_ROOT):
+        return
+    for name in os.listdir(STATION_MIRROR_ROOT):
+        if name.isdigit() and len(name) == 8 and name < cutoff:
+            shutil.rmtree(os.path.join(STATION_MIRROR_ROOT, name), ignore_errors=True)
+
+
+def run_station_watcher(interval=None, stop_event=None):
+    """按 interval 秒轮询，直到 stop_event 被置位（watch_station_list 命令使用）"""
+    interval = max(1.0, interval or STATION_WATCH_INTERVAL)
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        sync_station_mirror()
+        cleanup_station_mirror()
+        stop_event.wait(interval)
+
+
+# ============ 读取（请求侧，只读本地镜像） ============
+def mirrored_station_name(day_str):
+    """day_str（YYYYMMDD）已镜像的岗位清单文件名；没有时返回 None"""
+    manifest = _read_manifest(day_str)
+    return manifest.get("filename") if manifest else None
+
+
+def mirrored_station_file(day_str):
+    """
+    读取 day_str 已镜像的岗位清单。
+    返回：(file_bytes, filename) 成功；(None, None) 尚未镜像到
+    """
+    manifest = _read_manifest(day_str)
+    if not manifest:
+        return None, None
+    try:
+        with open(os.path.join(_day_dir(day_str), manifest["filename"]), "rb") as f:
+            return f.read(), manifest["filename"]
+    except OSError as e:
+        logger.warning("[auto_station] 读取本地镜像失败: %s, 原因: %s", day_str, e)
+        return None, None
+
@@ -0,0 +1,411 @@
+# dashboard/station_parser.py
+# 岗位清单（Excel）解析缓存
+#
+# 同一份岗位清单一天内会被上传 / 自动读取很多次，NIMBUS / Starlet（ProcessResult）、达安、ICP-MS、
+# Tecan、全血工作站各自 xlrd.open_workbook 一遍（Tecan 还对同一个上传文件解析两遍）。
+# 这里统一解析一次，按文件内容的 sha256 做进程内 LRU 缓存：
+#   - 内容相同（重复上传 / 共享盘镜像未变）直接命中，完全跳过解析
+#   - 单元格统一取 str(值)（与各平台原先的 xlrd 口径一致），取条码 / 实验号时默认再 strip 并跳过空行；
+#     ProcessResult 原先不 strip、不跳空行，用 raw=True 保持原口径
+#   - 条码 -> 实验号列表 / 实验号 -> 条码 按 (条码列, 实验号列, 选项) 首次使用时构建一次，
+#     每次返回新的容器，调用方可随意修改
+#   - 只保留用到的列（主条码 / 子条码 / 实验号，以及缺列时兜底的第一列），逐行流式读取：
+#     xls 用 xlrd on_demand；xlsx 直接扫描工作表 XML，只解码用到的列的单元格
+#     （openpyxl read_only 逐个构造单元格，比原先的 xlrd 还慢；结构不常见时仍退回 openpyxl）
+import hashlib
+import html
+import io
+import itertools
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, time
+
+import xlrd
+from django.conf import settings
+from openpyxl import load_workbook
+from openpyxl.utils.datetime import from_ISO8601, to_excel
+
+
+# 最多缓存多少份岗位清单（按最近使用淘汰）
+_STATION_PARSE_CACHE_SIZE = getattr(settings, "STATION_PARSE_CACHE_SIZE", 8)
+
+_cache = OrderedDict()   # sha256 -> ParsedStationList
+_lock = threading.Lock()
+
+# xlrd 会把纯数字读成 1426218671.0
+_INT_LIKE_RE = re.compile(r"\d+\.0")
+
+# 匹配用到的列
+STATION_COLUMNS = ("主条码", "子条码", "实验号")
+
+_XLSX_MAGIC = b"PK\x03\x04"
+
+# xlsx 工作表 XML 的单元格：<c r="B12" t="s" s="3"><v>7</v></c> / <c r="B12" s="3"/>
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_XLSX_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_XLSX_CELL_RE = re.compile(rb'<c r="([A-Z]+)(\d+)"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+_XLSX_TYPE_RE = re.compile(rb'\bt="([^"]*)"')
+_XLSX_V_RE = re.compile(rb"<v>([^<]*)</v>")
+_XLSX_T_RE = re.compile(rb"<t(?:\s[^>]*)?>([^<]*)</t>")
+
+
+def _int_like(s):
+    return s[:-2] if _INT_LIKE_RE.fullmatch(s) else s
+
+
+class ParsedStationList:
+    """
+    一份岗位清单的解析结果（只读）：完整表头 + 逐行“用到的列”的单元格字符串。
+    key_column：含“子条码”列时为子条码，否则为主条码（与 NIMBUS 的匹配口径一致）。
+    """
+
+    def __init__(self, sha256, header, rows, projection):
+        self.sha256 = sha256
+        self.header = header                 # tuple[str]，完整表头
+        self.rows = rows                     # tuple[tuple[str]]，不含表头，只含 projection 中的列
+        self.index = {col: idx for idx, col in enumerate(header)}
+        self._pos = {col_idx: pos for pos, col_idx in enumerate(projection)}   # 表头列号 -> 行内位置
+        self._maps = {}
+        self._maps_lock = threading.Lock()
+
+    @property
+    def use_sub_barcode(self):
+        return "子条码" in self.index
+
+    @property
+    def key_column(self):
+        if self.use_sub_barcode:
+            return "子条码"
+        return "主条码" if "主条码" in self.index else None
+
+    def has_columns(self, *cols):
+        return all(c in self.index for c in cols)
+
+    def _col_idx(self, col):
+        # 与各平台原先的 st_index.get(列名, 0) 一致：缺列时退回第一列
+        return self.index.get(col, 0)
+
+    def _pairs(self, key_col, sn_col, int_like, require_name, raw=False):
+        cache_key = (key_col, sn_col, int_like, require_name, raw)
+        pairs = self._maps.get(cache_key)
+        if pairs is not None:
+            return pairs
+
+        key_idx = self._pos[self._col_idx(key_col)]
+        sn_idx = self._pos[self._col_idx(sn_col)]
+        out = []
+        for row in self.rows:
+            bc = row[key_idx] if key_idx < len(row) else ""
+            sn = row[sn_idx] if sn_idx < len(row) else ""
+            if raw:
+                out.append((bc, sn))
+                continue
+            bc, sn = bc.strip(), sn.strip()
+            if int_like:
+                bc, sn = _int_like(bc), _int_like(sn)
+            if not bc or (require_name and not sn):
+                continue
+            out.append((bc, sn))
+        pairs = tuple(out)
+        with self._maps_lock:
+            self._maps[cache_key] = pairs
+        return pairs
+
+    def pairs(self, key_col=None, sn_col="实验号", int_like=False, require_name=True):
+        """[(条码, 实验号), ...]，按表中顺序；key_col 默认取 key_column"""
+        return list(self._pairs(key_col or self.key_column or "主条码", sn_col, int_like, require_name))
+
+    def barcode_to_names(self, key_col=None, sn_col="实验号", int_like=False, require_name=True, raw=False):
+        """
+        条码 -> 实验号列表（defaultdict(list)，按表中顺序）。
+          int_like：把 1426218671.0 这类数字还原为 1426218671
+          require_name：实验号为空的行是否跳过
+          raw：单元格原样使用（不 strip，空条码 / 空实验号的行也保留），忽略 int_like / require_name
+        """
+        result = defaultdict(list)
+        for bc, sn in self._pairs(key_col or self.key_column or "主条码", sn_col, int_like, require_name, raw):
+            result[bc].append(sn)
+        return result
+
+    def name_to_barcode(self, key_col=None, sn_col="实验号", int_like=False):
+        """实验号 -> 条码（同一实验号出现多次时取最后一次）"""
+        return {sn: bc for bc, sn in self._pairs(key_col or self.key_column or "主条码", sn_col, int_like, True)}
+
+
+def _projection(header):
+    """需要保留的表头列号（第一列始终保留，供缺列时兜底）"""
+    cols = {0}
+    cols.update(idx for idx, col in enumerate(header) if col in STATION_COLUMNS)
+    return tuple(sorted(cols))
+
+
+def _xlrd_text(value):
+    # 与 str(xlrd 单元格值) 一致：数字 / 日期为 float，布尔为 0 / 1，空单元格为 ''
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return str(float(value))
+    if isinstance(value, (datetime, date, time)):
+        return str(float(to_excel(value)))
+    return str(value)
+
+
+class _UnsupportedXlsx(Exception):
+    """工作表 XML 不是常见的写法（带命名空间前缀 / 单元格缺少 r 属性），交给 openpyxl"""
+
+
+def _xlsx_first_sheet_path(zf):
+    # 与 openpyxl 的 wb.worksheets[0] 一致：workbook.xml 中第一个 sheet
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    sheet = wb.find(f"{_XLSX_NS}sheets/{_XLSX_NS}sheet")
+    if sheet is None:
+        raise _UnsupportedXlsx("workbook.xml 中没有 sheet")
+    rid = sheet.get(_XLSX_REL_NS + "id")
+    for rel in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels")):
+        if rel.get("Id") == rid:
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else "xl/" + target
+    raise _UnsupportedXlsx(f"找不到 sheet 关系：{rid}")
+
+
+def _xlsx_shared_strings(zf):
+    try:
+        f = zf.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    si_tag, t_tag, r_tag = _XLSX_NS + "si", _XLSX_NS + "t", _XLSX_NS + "r"
+    out = []
+    with f:
+        for _, el in ET.iterparse(f):
+            if el.tag != si_tag:
+                continue
+            # 纯文本 <si><t>；富文本 <si><r><t>...；忽略拼音注音 <rPh>
+            t = el.find(t_tag)
+            if t is not None:
+                out.append(t.text or "")
+            else:
+                out.append("".join(r.findtext(t_tag) or "" for r in el.iter(r_tag)))
+            el.clear()
+    return out
+
+
+def _xlsx_col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ch - 64
+    return n - 1
+
+
+def _xlsx_cell_text(attrs, inner, shared):
+    """单元格 XML → 与 _xlrd_text(openpyxl 值) 相同的字符串"""
+    if not inner:
+        return ""
+    m = _XLSX_TYPE_RE.search(attrs)
+    t = m.group(1) if m else b"n"
+    if t == b"inlineStr":
+        text = b"".join(_XLSX_T_RE.findall(inner)).decode("utf-8")
+    else:
+        v = _XLSX_V_RE.search(inner)
+        if v is None:
+            return ""
+        text = v.group(1).decode("utf-8")
+        if t == b"s":
+            return shared[int(text)]
+        if t == b"n":
+            return str(float(text)) if text else ""
+        if t == b"b":
+            return "1" if text == "1" else "0"
+        if t == b"d":
+            return str(float(to_excel(from_ISO8601(text))))
+    return html.unescape(text) if "&" in text else text
+
+
+def _xlsx_row_chunks(f, size=1 << 20):
+    """按 </row> 切分工作表 XML 流，每块只含完整的行（不必把整张表解压到内存）"""
+    tail = b""
+    while True:
+        data = f.read(size)
+        if not data:
+            if tail:
+                yield tail
+            return
+        buf = tail + data
+        cut = buf.rfind(b"</row>")
+        if cut < 0:
+            tail = buf
+            continue
+        cut += len(b"</row>")
+        yield buf[:cut]
+        tail = buf[cut:]
+
+
+def _xlsx_rows(f):
+    """逐行产出 (行号, [(列号, 属性, 内容), ...])；单元格此时尚未解码"""
+    cur_no, cur = None, []
+    for chunk_no, chunk in enumerate(_xlsx_row_chunks(f)):
+        if chunk_no == 0 and b"<sheetData" not in chunk:
+            raise _UnsupportedXlsx("工作表 XML 带命名空间前缀")
+        if chunk.count(b'<c r="') != chunk.count(b"<c ") + chunk.count(b"<c>"):
+            raise _UnsupportedXlsx("单元格缺少 r 属性")
+        for m in _XLSX_CELL_RE.finditer(chunk):
+            row_no = int(m.group(2))
+            if row_no != cur_no:
+                if cur_no is not None:
+                    yield cur_no, cur
+                cur_no, cur = row_no, []
+            cur.append((_xlsx_col_index(m.group(1)), m.group(3), m.group(4)))
+    if cur_no is not None:
+        yield cur_no, cur
+
+
+def _iter_xlsx_fast(file_bytes):
+    """
+    xlsx：流式扫描第一个工作表的 XML，首个产出为完整表头，其后为投影后的行（中间缺失的行补空）。
+    表头之后只解码 projection 中的列。
+    """
+    zf = zipfile.ZipFile(io.BytesIO(file_bytes))
+    sheet_path = _xlsx_first_sheet_path(zf)
+    shared = _xlsx_shared_strings(zf)
+
+    with zf.open(sheet_path) as f:
+        rows = _xlsx_rows(f)
+        first = next(rows, None)
+        if first is None:
+            return
+        if first[0] == 1:
+            values = {col: _xlsx_cell_text(attrs, inner, shared) for col, attrs, inner in first[1]}
+            header = tuple(values.get(i, "").strip() for i in range(max(values, default=-1) + 1))
+        else:
+            header = ()                    # 第一行为空
+            rows = itertools.chain([first], rows)
+        yield header
+
+        pos = {col: p for p, col in enumerate(_projection(header))}
+        empty_row = ("",) * len(pos)
+        last_no = 1
+        for row_no, cells in rows:
+            for _ in range(last_no + 1, row_no):
+                yield empty_row
+            out = list(empty_row)
+            for col, attrs, inner in cells:
+                p = pos.get(col)
+                if p is not None:
+                    out[p] = _xlsx_cell_text(attrs, inner, shared)
+            yield tuple(out)
+            last_no = row_no
+
+
+def _iter_xlsx_openpyxl(file_bytes):
+    """xlsx 兜底：openpyxl 只读模式逐行读取"""
+    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        first = next(rows, None)
+        if first is None:
+            return
+        header = tuple(_xlrd_text(v).strip() for v in first)
+        yield header
+        projection = _projection(header)
+        for row in rows:
+            n = len(row)
+            yield tuple(_xlrd_text(row[i]) if i < n else "" for i in projection)
+    finally:
+        wb.close()
+
+
+def _iter_xlsx(file_bytes):
+    """
+    优先用流式 XML 扫描；工作表结构不是常见写法（命名空间前缀、单元格缺少 r 属性等）时
+    在产出第一行之前回退到 openpyxl
+    """
+    try:
+        rows = _iter_xlsx_fast(file_bytes)
+        first = next(rows, None)
+    except (_UnsupportedXlsx, KeyError, ET.ParseError, zipfile.BadZipFile):
+        yield from _iter_xlsx_openpyxl(file_bytes)
+        return
+    if first is not None:
+        yield first
+        yield from rows
+
+
+def _iter_xls(file_bytes):
+    """xls（及其他 xlrd 能打开的格式）：on_demand 只加载第一个 sheet，逐行只取用到的列"""
+    book = xlrd.open_workbook(filename=None, file_contents=file_bytes, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        if sheet.nrows == 0:
+            return
+        header = tuple(str(v).strip() for v in sheet.row_values(0))
+        yield header
+        projection = _projection(header)
+        ncols = sheet.ncols
+        for r in range(1, sheet.nrows):
+            yield tuple(str(sheet.cell_value(r, c)) if c < ncols else "" for c in projection)
+    finally:
+        book.release_resources()
+
+
+def iter_station_rows(file_bytes):
+    """
+    流式读取岗位清单：首个产出为完整表头（tuple[str]），其后逐行产出投影后的单元格字符串。
+    单元格口径与 str(xlrd 单元格值) 一致（不 strip；表头除外）。
+    """
+    if file_bytes[:4] == _XLSX_MAGIC:
+        return _iter_xlsx(file_bytes)
+    return _iter_xls(file_bytes)
+
+
+def _parse_workbook(file_bytes, sha256):
+    rows = iter_station_rows(file_bytes)
+    header = next(rows, None)
+    if header is None:
+        return ParsedStationList(sha256, (), (), (0,))
+    return ParsedStationList(sha256, header, tuple(rows), _projection(header))
+
+
+def parse_station_list(file_bytes):
+    """
+    解析岗位清单字节内容（带缓存）。
+    无法解析时与 xlrd.open_workbook 一样抛异常。
+    """
+    sha256 = hashlib.sha256(file_bytes).hexdigest()
+    with _lock:
+        parsed = _cache.get(sha256)
+        if parsed is not None:
+            _cache.move_to_end(sha256)
+            return parsed
+
+    # 解析放在锁外，避免大文件阻塞其他请求的命中
+    parsed = _parse_workbook(file_bytes, sha256)
+
+    with _lock:
+        _cache[sha256] = parsed
+        _cache.move_to_end(sha256)
+        while len(_cache) > _STATION_PARSE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return parsed
+
+
+def read_upload_bytes(f):
+    """读出上传文件的全部字节，并把读指针复位（同一文件对象后续还可再读）"""
+    try:
+        f.seek(0)
+    except Exception:
+        pass
+    data = f.read()
+    try:
+        f.seek(0)
+    except Exception:
+        pass
+    return data
+
+
+def parse_station_upload(f):
+    """parse_station_list 的上传文件版本"""
+    return parse_station_list(read_upload_bytes(f))
@@ -0,0 +1,349 @@
+# dashboard/station_store.py
+# 岗位清单“条码 <-> 实验号”每日映射库
+#
+# 以前每次 NIMBUS / Starlet / Tecan 生成都要读出 DOWNLOAD_ROOT/岗位清单/<日期>/station_list.json，
+# 在 Python 里合并后再 indent=2 整份写回；文件替换时每个被替换的孔位又要把整份文件重新读一遍。
+# 现在映射存入 StationMapping 表（同日同实验号唯一），冲突提示存入 StationMappingWarning：
+#   - 合并 = 一次查询本次涉及的实验号 + 一次批量 upsert
+#   - 条码查实验号 / 实验号查条码 = 按索引点查
+#   - 读取方全部走表；station_list.json 只在需要时导出（供仍读取该文件的外部工具）：
+#     `python manage.py export_station_list --date YYYY-MM-DD`；
+#     STATION_JSON_EXPORT=True 时恢复为每次合并有变化后自动导出（每次都要重查当天全部映射并整份重写）
+#   - 升级前已有的 station_list.json 在首次访问该日时导入一次
+#   - 前几天映射的叠加结果（station_history_overlay）按日期缓存，参与叠加的某天有新写入时才重建
+import json
+import logging
+import os
+import threading
+from collections import ChainMap, OrderedDict, defaultdict
+from datetime import timedelta
+from types import MappingProxyType
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .artifact_index import STATION_DIRNAME
+from .models import StationMapping, StationMappingWarning
+
+
+logger = logging.getLogger(__name__)
+
+# 合并有变化时是否同步导出 station_list.json（默认不导出，需要时用 export_station_list 命令）
+STATION_JSON_EXPORT = getattr(settings, "STATION_JSON_EXPORT", False)
+
+STATION_JSON_NAME = "station_list.json"
+
+# 导出 / 兼容旧文件用的字段名：(条码->实验号列表, 实验号->条码)
+_JSON_KEYS = {
+    "main": ("主条码->实验号列表", "实验号->主条码"),
+    "sub": ("子条码->实验号列表", "实验号->子条码"),
+}
+_GENERIC_KEYS = ("barcode->实验号列表", "实验号->barcode")
+
+_KIND_LABELS = {"main": "主条码", "sub": "子条码"}
+
+# 条码匹配时叠加前几天的映射（不含当天）
+STATION_HISTORY_DAYS = getattr(settings, "STATION_HISTORY_DAYS", 3)
+
+# 最多缓存多少个日期的叠加结果（按最近使用淘汰）
+_OVERLAY_CACHE_SIZE = 16
+
+# 单条 SQL 的批大小（SQLite 变量数上限保护）
+_BATCH_SIZE = 500
+
+# 本进程内已确认过旧文件导入的日期
+_checked_days = set()
+
+_overlays = OrderedDict()   # (记录日期, 天数) -> (签名, 叠加结果)
+_overlay_lock = threading.Lock()
+
+
+def station_json_path(date_name):
+    return os.path.join(settings.DOWNLOAD_ROOT, STATION_DIRNAME, date_name, STATION_JSON_NAME)
+
+
+# ============ 旧文件导入 ============
+def _legacy_maps(data):
+    """从旧 station_list.json 取 (条码->实验号列表, 实验号->条码, 条码类型)，兼容三种字段名"""
+    for kind, (k1, k2) in (("main", _JSON_KEYS["main"]), ("sub", _JSON_KEYS["sub"]), ("main", _GENERIC_KEYS)):
+        if k1 in data or k2 in data:
+            return data.get(k1) or {}, data.get(k2) or {}, kind
+    return {}, {}, "main"
+
+
+def _import_legacy_json(date_name):
+    """该日在库中还没有任何数据、但磁盘上有旧 station_list.json 时，导入一次"""
+    if date_name in _checked_days:
+        return
+    _checked_days.add(date_name)
+
+    if (StationMapping.objects.filter(date_name=date_name).exists()
+            or StationMappingWarning.objects.filter(date_name=date_name).exists()):
+        return
+    path = station_json_path(date_name)
+    if not os.path.isfile(path):
+        return
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.warning("旧岗位清单映射读取失败，跳过导入：%s（%s）", path, e)
+        return
+
+    mb2sn, sn2mb, kind = _legacy_maps(data)
+    pending = {}   # 实验号 -> 条码，按原列表顺序
+    for mb, sns in mb2sn.items():
+        if not isinstance(sns, list):
+            sns = [sns]
+        for sn in sns:
+            sn = str(sn).strip()
+            if sn and sn not in pending:
+                pending[sn] = str(sn2mb.get(sn) or mb).strip()
+    for sn, mb in sn2mb.items():
+        sn = str(sn).strip()
+        if sn and sn not in pending and str(mb or "").strip():
+            pending[sn] = str(mb).strip()
+
+    warnings = [
+        StationMappingWarning(
+            date_name=date_name,
+            type=str(w.get("type") or ""),
+            experiment_no=str(w.get("experiment_no") or ""),
+            old_barcode=str(w.get("old_main_barcode") or ""),
+            new_barcode=str(w.get("new_main_barcode") or ""),
+            msg=str(w.get("msg") or "")[:255],
+        )
+        for w in (data.get("warning") or []) if isinstance(w, dict)
+    ]
+
+    with transaction.atomic():
+        StationMapping.objects.bulk_create([
+            StationMapping(date_name=date_name, barcode=mb, experiment_no=sn, barcode_kind=kind, seq=i + 1)
+            for i, (sn, mb) in enumerate(pending.items()) if mb
+        ], batch_size=_BATCH_SIZE, ignore_conflicts=True)
+        StationMappingWarning.objects.bulk_create(warnings, batch_size=_BATCH_SIZE, ignore_conflicts=True)
+    logger.info("导入旧岗位清单映射：%s（%s 条）", path, len(pending))
+
+
+# ============ 合并 ============
+def merge_station_pairs(date_name, pairs, override=False, barcode_kind="main"):
+    """
+    把本次岗位清单的 (条码, 实验号) 合并进当天映射库（按 pairs 顺序处理）。
+    同一实验号当天已映射到其他条码时记一条冲突提示：
+      - override=True：改映射到本次条码（子条码岗位清单）
+      - override=False：忽略本次冲突行
+    返回 summary：{saved, added_pairs, conflicts, path}；saved 表示是否导出了 station_list.json（见 STATION_JSON_EXPORT）
+    """
+    _import_legacy_json(date_name)
+
+    norm = []
+    seen = set()
+    for mb, sn in pairs or ():
+        mb = str(mb or "").strip()
+        sn = str(sn or "").strip()
+        if not mb or not sn or (mb, sn) in seen:
+            continue
+        seen.add((mb, sn))
+        norm.append((mb, sn))
+
+    sns = list({sn for _, sn in norm})
+    sn2mb = {}
+    for i in range(0, len(sns), _BATCH_SIZE):
+        sn2mb.update(
+            StationMapping.objects.filter(date_name=date_name, experiment_no__in=sns[i:i + _BATCH_SIZE])
+            .values_list("experiment_no", "barcode")
+        )
+
+    label = _KIND_LABELS.get(barcode_kind, "条码")
+    pending = {}    # 实验号 -> 条码；插入顺序即追加顺序
+    warnings = []
+    added_pairs = conflict_cnt = 0
+    for mb, sn in norm:
+        old_mb = sn2mb.get(sn)
+        if old_mb == mb:
+            continue
+        if old_mb:
+            conflict_cnt += 1
+            action = "已强制覆盖" if override else "已忽略本次冲突行"
+            warnings.append(StationMappingWarning(
+                date_name=date_name,
+                type="conflict",
+                experiment_no=sn,
+                old_barcode=old_mb,
+                new_barcode=mb,
+                msg=f"实验号 {sn} 当天已映射{label} {old_mb}，本次上传为 {mb}，{action}"[:255],
+            ))
+            if not override:
+                continue
+        sn2mb[sn] = mb
+        pending.pop(sn, None)
+        pending[sn] = mb
+        added_pairs += 1
+
+    if pending or warnings:
+        with transaction.atomic():
+            start = StationMapping.objects.filter(date_name=date_name).aggregate(m=Max("seq"))["m"] or 0
+            # 改映射的实验号 seq 同时刷新，排到新条码列表末尾（与原先 append 的顺序一致）
+            StationMapping.objects.bulk_create(
+                [
+                    StationMapping(date_name=date_name, barcode=mb, experiment_no=sn,
+                                   barcode_kind=barcode_kind, seq=start + i + 1)
+                    for i, (sn, mb) in enumerate(pending.items())
+                ],
+                batch_size=_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=["date_name", "experiment_no"],
+                update_fields=["barcode", "barcode_kind", "seq"],
+            )
+            StationMappingWarning.objects.bulk_create(warnings, batch_size=_BATCH_SIZE, ignore_conflicts=True)
+
+    path = station_json_path(date_name)
+    saved = False
+    if STATION_JSON_EXPORT and (pending or warnings or not os.path.isfile(path)):
+        export_station_json(date_name, path)
+        saved = True
+
+    return {"saved": saved, "added_pairs": added_pairs, "conflicts": conflict_cnt, "path": path}
+
+
+# ============ 查询 ============
+def experiments_for_barcode(date_name, barcode):
+    """当天某条码对应的实验号列表（按写入顺序）"""
+    _import_legacy_json(date_name)
+    return list(
+        StationMapping.objects.filter(date_name=date_name, barcode=barcode)
+        .order_by("seq").values_list("experiment_no", flat=True)
+    )
+
+
+def barcode_for_experiment(date_name, experiment_no):
+    """当天某实验号对应的条码；没有时返回空串"""
+    _import_legacy_json(date_name)
+    return (
+        StationMapping.objects.filter(date_name=date_name, experiment_no=experiment_no)
+        .values_list("barcode", flat=True).first()
+    ) or ""
+
+
+def station_barcode_map(date_name, barcodes=None):
+    """
+    当天完整的 条码 -> 实验号列表（条码按首次出现顺序，实验号按写入顺序）。
+    barcodes 给定时只查这些条码。
+    """
+    _import_legacy_json(date_name)
+    qs = StationMapping.objects.filter(date_name=date_name)
+    if barcodes is not None:
+        wanted = list({bc for bc in barcodes if bc})
+        rows = []
+        for i in range(0, len(wanted), _BATCH_SIZE):
+            rows.extend(qs.filter(barcode__in=wanted[i:i + _BATCH_SIZE]).values_list("seq", "barcode", "experiment_no"))
+        rows.sort()
+        rows = [(bc, sn) for _, bc, sn in rows]
+    else:
+        rows = qs.order_by("seq").values_list("barcode", "experiment_no")
+
+    result = defaultdict(list)
+    for bc, sn in rows:
+        result[bc].append(sn)
+    return dict(result)
+
+
+# ============ 前几天的映射叠加（条码匹配用） ============
+def _days_signature(date_names):
+    """各天映射的版本：(条数, 最大写入序号)；新增 / 改映射都会让它变化"""
+    for date_name in date_names:
+        _import_legacy_json(date_name)
+    agg = {
+        date_name: (n, top)
+        for date_name, n, top in (
+            StationMapping.objects.filter(date_name__in=date_names)
+            .values("date_name").annotate(n=Count("id"), top=Max("seq"))
+            .values_list("date_name", "n", "top")
+        )
+    }
+    return tuple(agg.get(date_name, (0, 0)) for date_name in date_names)
+
+
+def station_history_overlay(record_date, days=None):
+    """
+    record_date 之前 days 天（不含当天）的 条码 -> 实验号元组，近的日期优先（先找到的不被更早的覆盖）。
+    结果只读、按日期缓存；参与叠加的某天有新写入时签名变化，自动重建。
+    """
+    days = STATION_HISTORY_DAYS if days is None else days
+    date_names = [(record_date - timedelta(days=d)).strftime("%Y-%m-%d") for d in range(1, days + 1)]
+    key = (record_date.strftime("%Y-%m-%d"), days)
+    signature = _days_signature(date_names)
+
+    with _overlay_lock:
+        cached = _overlays.get(key)
+        if cached is not None and cached[0] == signature:
+            _overlays.move_to_end(key)
+            return cached[1]
+
+    overlay = {}
+    for date_name in date_names:
+        for bc, sns in station_barcode_map(date_name).items():
+            if bc not in overlay and sns:
+                overlay[bc] = tuple(sns)
+    overlay = MappingProxyType(overlay)
+
+    with _overlay_lock:
+        _overlays[key] = (signature, overlay)
+        _overlays.move_to_end(key)
+        while len(_overlays) > _OVERLAY_CACHE_SIZE:
+            _overlays.popitem(last=False)
+    return overlay
+
+
+def station_map_with_history(record_date, today_map, days=None):
+    """
+    本次岗位清单的 条码 -> 实验号列表 叠加前几天的历史映射（当天优先），只读，仅用于条码匹配。
+    NIMBUS / Starlet / 达安 / ICP-MS 均可直接复用，不复制历史数据。
+    """
+    return ChainMap(dict(today_map), station_history_overlay(record_date, days))
+
+
+# ============ 导出 ============
+def export_station_json(date_name, path=None):
+    """按原 station_list.json 的格式导出当天映射（warning 在最前面），返回写入路径"""
+    _import_legacy_json(date_name)
+    path = path or station_json_path(date_name)
+
+    rows = list(
+        StationMapping.objects.filter(date_name=date_name)
+        .order_by("seq").values_list("barcode", "experiment_no", "barcode_kind")
+    )
+    mb2sn = defaultdict(list)
+    sn2mb = {}
+    for bc, sn, _ in rows:
+        mb2sn[bc].append(sn)
+        sn2mb[sn] = bc
+    # 字段名跟随最近一次写入的岗位清单类型
+    key1, key2 = _JSON_KEYS.get(rows[-1][2] if rows else "main", _JSON_KEYS["main"])
+
+    warnings = [
+        {
+            "type": w.type,
+            "experiment_no": w.experiment_no,
+            "old_main_barcode": w.old_barcode,
+            "new_main_barcode": w.new_barcode,
+            "msg": w.msg,
+        }
+        for w in StationMappingWarning.objects.filter(date_name=date_name).order_by("id")
+    ]
+
+    ordered_out = {
+        "生成时间": timezone.localtime().strftime("%Y-%m-%d %H:%M:%S"),
+        "warning": warnings,
+        key1: dict(mb2sn),
+        key2: sn2mb,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(ordered_out, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,132 @@
+# dashboard/tecan_history.py
+# Tecan 跨文件重复检查用的当日 processed 条码索引
+#
+# 以前每次上传扫码结果，都要把 media/tecan/<日期>/<项目>/processed 下的全部 CSV 重新读取、拆分一遍
+# （一天下来是 O(文件数²) 的工作量）。现在写 processed 文件时即把其中的条码写入 TecanHistoryBarcode：
+#   - _write_processed_copy_from_original / _write_processed_with_row_replacements 写出后 index_processed_file
+#   - 删除 / 移走 processed 文件时 forget_processed_file
+#   - 查询前只对目录做一次 listdir + stat：未登记 / 大小或修改时间有变化的文件补解析，已不在磁盘上的删除
+#     （旧文件、手工放入的文件也能自愈）
+#   - 查询按本次出现的主条码走索引
+import logging
+import os
+
+from django.db import transaction
+
+from .models import TecanHistoryBarcode, TecanProcessedFile
+from .tecan_scan import load_tecan_scan
+
+
+logger = logging.getLogger(__name__)
+
+_BATCH_SIZE = 500
+
+
+def _history_key(processed_dir):
+    # processed_dir = MEDIA_ROOT/tecan/<YYYYMMDD>/<项目>/processed
+    project_path = os.path.dirname(os.path.abspath(processed_dir))
+    return os.path.basename(os.path.dirname(project_path)), os.path.basename(project_path)
+
+
+def _is_scan_file(name):
+    return name.lower().endswith(".csv")
+
+
+def _index_file(day, project_dir, file_name, st, scan):
+    with transaction.atomic():
+        record, _ = TecanProcessedFile.objects.update_or_create(
+            day=day, project_dir=project_dir, file_name=file_name,
+            defaults={"size": st.st_size, "mtime": st.st_mtime},
+        )
+        TecanHistoryBarcode.objects.filter(file=record).delete()
+        if scan is None:
+            return
+        TecanHistoryBarcode.objects.bulk_create([
+            TecanHistoryBarcode(
+                file=record, day=day, project_dir=project_dir,
+                row_id=row_id, main_barcode=main, src_tube_id=src,
+            )
+            for row_id, src, main in zip(scan.row_ids, scan.src_tube_ids, scan.main_barcodes)
+            if main
+        ], batch_size=_BATCH_SIZE)
+
+
+def index_processed_file(path, scan=None):
+    """登记（覆盖）一个 processed 文件的条码；scan 为已有的解析结果。失败只记日志，不影响主流程"""
+    try:
+        day, project_dir = _history_key(os.path.dirname(path))
+        st = os.stat(path)
+        if scan is None:
+            try:
+                scan = load_tecan_scan(path)
+            except ValueError:
+                scan = None   # 空文件：登记文件本身，避免每次查询重复解析
+        _index_file(day, project_dir, os.path.basename(path), st, scan)
+    except Exception as e:
+        logger.warning("登记 Tecan processed 条码失败：%s（%s）", path, e)
+
+
+def forget_processed_file(processed_dir, file_name):
+    """processed 文件被删除 / 移走后，从索引中去掉"""
+    day, project_dir = _history_key(processed_dir)
+    TecanProcessedFile.objects.filter(day=day, project_dir=project_dir, file_name=file_name).delete()
+
+
+def _sync_processed_dir(processed_dir):
+    """按磁盘校正索引：只 listdir + stat，不读取未变化的文件"""
+    day, project_dir = _history_key(processed_dir)
+    indexed = {
+        f.file_name: f for f in TecanProcessedFile.objects.filter(day=day, project_dir=project_dir)
+    }
+    on_disk = set()
+    if os.path.isdir(processed_dir):
+        for name in os.listdir(processed_dir):
+            if not _is_scan_file(name):
+                continue
+            path = os.path.join(processed_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            on_disk.add(name)
+            f = indexed.get(name)
+            if f is None or f.size != st.st_size or f.mtime != st.st_mtime:
+                index_processed_file(path)
+
+    stale = [f.pk for name, f in indexed.items() if name not in on_disk]
+    if stale:
+        TecanProcessedFile.objects.filter(pk__in=stale).delete()
+    return day, project_dir
+
+
+def _history_chunks(processed_dir, main_barcodes):
+    """当天该项目的索引查询；main_barcodes 给定时按主条码分批点查"""
+    day, project_dir = _sync_processed_dir(processed_dir)
+    qs = TecanHistoryBarcode.objects.filter(day=day, project_dir=project_dir)
+    if main_barcodes is None:
+        return [qs]
+    mains = list({m for m in main_barcodes if m})
+    return [qs.filter(main_barcode__in=mains[i:i + _BATCH_SIZE]) for i in range(0, len(mains), _BATCH_SIZE)]
+
+
+def history_main_barcodes(processed_dir, main_barcodes=None):
+    """
+    当天该项目 processed 文件中出现过的 MainBarcode。
+    main_barcodes 给定时只查这些主条码（返回其中出现过的），不加载全天的条码。
+    """
+    result = set()
+    for chunk in _history_chunks(processed_dir, main_barcodes):
+        result.update(chunk.values_list("main_barcode", flat=True).distinct())
+    return result
+
+
+def history_first_tubes(processed_dir, main_barcodes=None):
+    """
+    当天该项目 processed 文件中“主条码 -> 首次出现的完整条码（SRCTubeID）”。
+    按文件名、RowID 的顺序取首次出现；main_barcodes 给定时只查这些主条码。
+    """
+    result = {}
+    for chunk in _history_chunks(processed_dir, main_barcodes):
+        for main, src in chunk.order_by("file__file_name", "row_id").values_list("main_barcode", "src_tube_id"):
+            result.setdefault(main, src)
+    return result
@@ -0,0 +1,160 @@
+# dashboard/tecan_scan.py
+# Tecan 扫码结果 CSV 解析（唯一入口）
+#
+# 以前同一个扫码 CSV 在一次提交里要被读好几遍：tecaningest 用 _parse_tecan_csv_abs 解析一遍，
+# 修正重复时 _read_raw_csv_lines 再按行拆一遍，_render_tecan_process_result 里
+# _build_clinical_cells_from_csv 又从磁盘逐行读一遍，每个单元格都现场 re.search。
+# 这里统一解析成一份按列存放的 TecanScan，并按 (文件路径, mtime, size) 做进程内 LRU 缓存：
+#   - 重复检查 / 修正 / 渲染共用同一份解析结果
+#   - 写 processed 文件时把对应的解析结果直接登记进缓存，渲染时不再回读磁盘
+#
+# 文件格式（与 R 版一致）：
+#   - 首行为批次 / 板号信息，原样保留
+#   - 其余每行以 ';' 分隔：第1列 -> 区域（GridPos），第3列 -> 位置（TipNumber），最后一列 -> SRCTubeID
+#   - MainBarcode = SRCTubeID.split('-')[0]
+#   - RowID 从 1 开始，对应去掉空行后的数据行序号
+import copy
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from django.conf import settings
+
+
+# 最多缓存多少份扫码文件（按最近使用淘汰）
+_TECAN_SCAN_CACHE_SIZE = getattr(settings, "TECAN_SCAN_CACHE_SIZE", 16)
+
+_cache = OrderedDict()   # path -> TecanScan
+_lock = threading.Lock()
+
+_INT_RE = re.compile(r"\d+")
+
+FRAME_COLUMNS = ("RowID", "SRCTubeID", "MainBarcode", "GridPos", "TipNumber")
+
+
+def _extract_int(s):
+    # 从文本中提取第一段数字
+    m = _INT_RE.search(s)
+    return int(m.group(0)) if m else None
+
+
+class TecanScan:
+    """
+    一份扫码 CSV 的解析结果（只读）：首行原文 + 逐行字段 + 按列存放的常用字段。
+      areas：第1列原文（区域，如 "20"）
+      grid_pos / tip_numbers：第1 / 3 列中提取的整数（没有时为 None）
+    """
+
+    def __init__(self, header_line, fields, path=None, signature=None):
+        self.path = path
+        self.signature = signature
+        self.header_line = header_line
+        self.fields = fields                                   # tuple[tuple[str]]
+        self.row_ids = tuple(range(1, len(fields) + 1))
+        self.areas = tuple(parts[0] for parts in fields)
+        self.src_tube_ids = tuple(parts[-1] for parts in fields)
+        self.main_barcodes = tuple(s.split("-", 1)[0] for s in self.src_tube_ids)
+        self.grid_pos = tuple(_extract_int(a) for a in self.areas)
+        self.tip_numbers = tuple(_extract_int(parts[2]) if len(parts) >= 3 else None for parts in fields)
+        self._frame = None
+
+    def __len__(self):
+        return len(self.fields)
+
+    def frame(self):
+        """
+        DataFrame（列：RowID / SRCTubeID / MainBarcode / GridPos / TipNumber）的副本，调用方可随意修改。
+        GridPos / TipNumber 有缺失时与原先一样为 float + NaN。
+        """
+        if self._frame is None:
+            self._frame = pd.DataFrame({
+                "RowID": self.row_ids,
+                "SRCTubeID": self.src_tube_ids,
+                "MainBarcode": self.main_barcodes,
+                "GridPos": list(self.grid_pos),
+                "TipNumber": list(self.tip_numbers),
+            }, columns=list(FRAME_COLUMNS))
+        return self._frame.copy()
+
+    def with_replacements(self, fix_map_by_rowid):
+        """
+        返回替换后的新解析结果：{RowID -> (old_srctubeid, new_srctubeid)}，
+        仅当该行最后一列等于 old_srctubeid 时替换为 new_srctubeid，其他行不变。
+        """
+        fields = list(self.fields)
+        for rowid, (old_v, new_v) in fix_map_by_rowid.items():
+            idx = rowid - 1
+            if 0 <= idx < len(fields) and fields[idx][-1] == old_v:
+                fields[idx] = fields[idx][:-1] + (new_v,)
+        return TecanScan(self.header_line, tuple(fields))
+
+    def to_csv_text(self):
+        """按原格式输出（首行 + ';' 拼接的数据行）"""
+        lines = [self.header_line.strip()]
+        lines.extend(";".join(parts) for parts in self.fields)
+        return "\n".join(lines) + "\n"
+
+
+def parse_tecan_text(text, path=None, signature=None):
+    """解析扫码 CSV 文本；空文件 / 只有首行时抛 ValueError"""
+    lines = [ln.strip() for ln in text.splitlines()]
+    lines = [ln for ln in lines if ln]
+    if not lines:
+        raise ValueError("CSV为空")
+    if len(lines) == 1:
+        raise ValueError("CSV无数据行")
+    fields = tuple(tuple(p.strip() for p in ln.split(";")) for ln in lines[1:])
+    return TecanScan(lines[0], fields, path=path, signature=signature)
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _store(path, scan):
+    with _lock:
+        _cache[path] = scan
+        _cache.move_to_end(path)
+        while len(_cache) > _TECAN_SCAN_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def load_tecan_scan(path):
+    """
+    取扫码文件的解析结果（带缓存，文件被改写后自动重新解析）。
+    文件不存在时抛 FileNotFoundError，内容无效时抛 ValueError。
+    """
+    path = os.path.abspath(path)
+    signature = _file_signature(path)
+    with _lock:
+        scan = _cache.get(path)
+        if scan is not None and scan.signature == signature:
+            _cache.move_to_end(path)
+            return scan
+
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        scan = parse_tecan_text(f.read(), path=path, signature=signature)
+    _store(path, scan)
+    return scan
+
+
+def remember_tecan_scan(path, scan):
+    """
+    登记“刚写入 path 的内容就是 scan”（写 processed 文件后调用），之后 load_tecan_scan 直接命中。
+    返回绑定到 path 的解析结果。
+    """
+    path = os.path.abspath(path)
+    bound = copy.copy(scan)      # 各列均为 tuple，浅拷贝即可
+    bound.path, bound.signature = path, _file_signature(path)
+    _store(path, bound)
+    return bound
+
+
+def write_tecan_scan(path, scan):
+    """按原格式写出 scan 并登记缓存"""
+    with open(path, "w", encoding="utf-8", errors="ignore") as f:
+        f.write(scan.to_csv_text())
+    return remember_tecan_scan(path, scan)
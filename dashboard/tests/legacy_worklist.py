@@ -0,0 +1,576 @@
+# dashboard/tests/legacy_worklist.py
+# 上机列表映射的旧写法（worklist_engine 之前各平台 df_worklistmap.iterrows() 逐条套规则），原样保留，
+# 只包成函数、参数改为显式传入，作为 test_worklist_engine 的对照基准。不要在业务代码中使用。
+import re
+from collections import deque
+
+import pandas as pd
+
+from dashboard.views_TecanIngest import format_vialpos_column
+
+
+def _well_number_rowwise(row_idx, col):
+    return row_idx * 12 + col
+
+
+def legacy_nimbus_fill(worklist_table, df_worklistmap, *, platform, instrument_name, injection_plate,
+                       name_to_barcodes, barcode_to_well):
+    """ProcessResult（NIMBUS / Starlet）build_one_plate_payload 中的映射循环；返回镜像列集合"""
+    first_col = worklist_table.columns[0]
+
+    # 记录哪些列需要镜像第一列（由映射表的 * 标注）
+    mirror_cols = set()
+
+    for _, row in df_worklistmap.iterrows():
+        sample_key = row.iloc[0]
+        fill_vals  = row.iloc[1:]
+
+        # ===== 新增：标记本行是否为“默认 * 行” =====
+        is_default_star_row = (str(sample_key).strip() == "*")
+
+        def fill_cols(mask):
+            for col, val in zip(worklist_table.columns[1:], fill_vals.values):
+                # ------- 新增：当“当前行是 * 行 且 该列映射值也为 *” → 镜像第一列 -------
+                # ★ 标注“需要镜像”的列（映射表该列写了 "*"）
+                if str(val).strip() == "*":
+                    mirror_cols.add(col)
+                    continue
+                # -------------------------------------------------------------------
+
+                if col in ("SmplInjVol", "Injection volume"):
+                    continue
+                if col in ("VialPos", "Vial position", "样品瓶"):
+                    ROWS = list("ABCDEFGH")
+                    def _resolve_vialpos(sample_name_value):
+                        s = str(sample_name_value).strip().upper()
+                        m = re.fullmatch(r"X(\d+)", s)
+                        if m:
+                            k0 = int(m.group(1)) - 1
+                            if platform == "NIMBUS":
+                                coln     = 3 + (k0 // 8)
+                                row_idx  = k0 % 8
+                            else:  # Starlet
+                                row_idx  = 1 + (k0 // 12)
+                                coln     = 1 + (k0 % 12)
+                            if not (0 <= row_idx < 8 and 1 <= coln <= 12):
+                                return None
+                            well_pos = f"{ROWS[row_idx]}{coln}"
+                            well_no  = _well_number_rowwise(row_idx, coln)
+                            if instrument_name == "Thermo" or instrument_name == "Agilent":
+                                if val == "{{Well_Number}}":
+                                    return f"{injection_plate}:{well_no}" if injection_plate else well_no
+                                else:
+                                    return f"{injection_plate}-{well_pos}" if injection_plate else well_pos
+                            else:
+                                if val == "{{Well_Number}}":
+                                    return well_no
+                                else:
+                                    return well_pos
+
+                        if val in ["{{Well_Number}}", "{{Well_Position}}"]:
+                            # 1) QC/STD：通过 name->barcode 队列取条码，再查位置信息
+                            if sample_name_value in name_to_barcodes and name_to_barcodes[sample_name_value]:
+                                barcode = name_to_barcodes[sample_name_value].popleft()
+                                wells_q = barcode_to_well.get(barcode)
+                                if wells_q:
+                                    # 依次使用该条码对应的各个孔位
+                                    pos, no = wells_q.popleft()
+                                    # 下面保持你原来的仪器判断逻辑不变
+                                    if instrument_name == "Thermo" or instrument_name == "Agilent":
+                                        if val == "{{Well_Number}}":
+                                            return f"{injection_plate}:{no}" if injection_plate else no
+                                        else:
+                                            return f"{injection_plate}-{pos}" if injection_plate else pos
+                                    else:
+                                        if val == "{{Well_Number}}":
+                                            return no
+                                        else:
+                                            return pos
+
+                            # 2) 临床样本：第一列就是条码
+                            elif sample_name_value in barcode_to_well:
+                                wells_q = barcode_to_well.get(str(sample_name_value))
+                                if wells_q:
+                                    pos, no = wells_q.popleft()
+                                    if instrument_name == "Thermo" or instrument_name == "Agilent":
+                                        if val == "{{Well_Number}}":
+                                            return f"{injection_plate}:{no}" if injection_plate else no
+                                        else:
+                                            return f"{injection_plate}-{pos}" if injection_plate else pos
+                                    else:
+                                        if val == "{{Well_Number}}":
+                                            return no
+                                        else:
+                                            return pos
+
+                            else:
+                                if instrument_name == "Thermo" or instrument_name == "Agilent":
+                                    if val == "{{Well_Number}}":
+                                        return f"{injection_plate}:{'1'}" if injection_plate else "1"
+                                    else:
+                                        return f"{injection_plate}-{'A1'}" if injection_plate else "A1"
+                                else:
+                                    if val == "{{Well_Number}}":
+                                        return "1"
+                                    else:
+                                        return "A1"
+
+                        return val
+
+                    worklist_table.loc[mask, col] = worklist_table.loc[mask, first_col].apply(_resolve_vialpos)
+
+                else:
+                    worklist_table.loc[mask, col] = val
+
+        if str(sample_key) == "DB*":
+            mask = worklist_table.iloc[:, 0].str.startswith("DB")
+            fill_cols(mask)
+        elif str(sample_key).startswith("DB"):
+            mask = worklist_table.iloc[:, 0] == str(sample_key)
+            fill_cols(mask)
+
+        elif str(sample_key) == "Test*":
+            mask = worklist_table.iloc[:, 0].str.startswith("Test")
+            fill_cols(mask)
+        elif str(sample_key).startswith("Test"):
+            mask = worklist_table.iloc[:, 0] == str(sample_key)
+            fill_cols(mask)
+
+
+        elif str(sample_key) == "STD*":
+            mask = worklist_table.iloc[:, 0].str.startswith("STD")
+            fill_cols(mask)
+        elif str(sample_key).startswith("STD"):
+            mask = worklist_table.iloc[:, 0] == str(sample_key)
+            fill_cols(mask)
+
+        elif str(sample_key) == "*":
+            mask = worklist_table.iloc[:, 1].isna()
+            fill_cols(mask)
+
+    return mirror_cols
+
+
+def legacy_icpms_fill(df_worklist, df_worklistmap, *, std_names_use, qc_names, injection_vol, injection_plate,
+                      name_to_barcodes, barcode_to_well):
+    """手工 ICP-MS 的映射循环；返回镜像列集合"""
+    letters = list("ABCDEFGH")
+    txt_headers = list(df_worklist.columns)
+    first_col_header = txt_headers[0]
+
+    mirror_cols = set()
+
+    # 4) 应用 df_worklistmap 映射规则
+    col0 = df_worklist[first_col_header]
+
+    def resolve_vialpos_for_value(sample_name_value, placeholder):
+        """
+        根据第一列的值 sample_name_value 决定孔位。
+        - 当 placeholder 为 {{Well_Number}} / {{Well_Position}} 时，按条码动态计算；
+        - 否则视为固定字符串（例如 D3B-F8 / D3B-F9），直接返回 placeholder。
+        """
+
+        s = str(sample_name_value).strip()
+        if not s:
+            return ""
+
+        # 1) 非占位符：直接返回配置值（用于 DB* / Test* 的 D3B-F8 / D3B-F9）
+        if placeholder not in ("{{Well_Number}}", "{{Well_Position}}"):
+            return placeholder
+
+        # 2) 定位孔：X1 / X2 / X3 ...
+        # 手工 ICP-MS 的定位孔规则与 worksheet 保持一致：
+        # 板1=A3, 板2=B3, 板3=C3 ... 超过8块后循环
+        m = re.fullmatch(r"X(\d+)", s.upper())
+        if m:
+            k0 = int(m.group(1)) - 1
+            row_idx = k0 % 8
+            coln = 3   # 固定第3列 -> “3”
+            row_letter = letters[row_idx]
+            well_pos = f"{row_letter}{coln}"
+            well_no = row_idx * 12 + coln
+
+            if placeholder == "{{Well_Number}}":
+                return f"{well_no}"
+            else:
+                return f"{well_pos}"
+
+        # 1) QC/STD：通过 name_to_barcodes 队列取条码，再查位置信息
+        if s in name_to_barcodes and name_to_barcodes[s]:
+            barcode = name_to_barcodes[s].popleft()
+            wells_q = barcode_to_well.get(barcode)
+            if wells_q:
+                pos, no = wells_q.popleft()
+                # ICP-MS 这里不区分 Thermo/Agilent，格式保持与 NIMBUS 一致
+                if placeholder == "{{Well_Number}}":
+                    return f"{no}"
+                else:
+                    return f"{pos}"
+
+        # 2) 临床样本：第一列即为条码
+        if s in barcode_to_well:
+            wells_q = barcode_to_well.get(s)
+            if wells_q:
+                pos, no = wells_q.popleft()
+                if placeholder == "{{Well_Number}}":
+                    return f"{no}"
+                else:
+                    return f"{pos}"
+
+        # 3) 找不到就返回空
+        return f"{injection_plate}-{'H1'}"
+
+    def apply_to(mask, fill_values):
+        for col, val in zip(txt_headers[1:], fill_values.values):
+            v = str(val).strip()
+
+            # "*"：该列镜像第一列
+            if v == "*":
+                mirror_cols.add(col)
+                continue
+
+            # 2) 进样体积列：直接用配置的 injection_volume（如果有），否则写回映射表里的值
+            if col in ("SmplInjVol", "Injection volume"):
+                df_worklist.loc[mask, col] = injection_vol or v
+                continue
+
+            # 3) ★ 动态计算孔位列：列名为 VialPos / Vial position / 样品瓶
+            #    触发方式与 NIMBUS 完全一致，不再通过占位符 "{{Well_Number}}" 判断
+            if col in ("VialPos", "Vial position", "样品瓶", "样品瓶号"):
+                df_worklist.loc[mask, col] = df_worklist.loc[mask, first_col_header].apply(
+                    lambda x: resolve_vialpos_for_value(x, v)
+                )
+                continue
+
+            # 4) 其它列：直接按映射表填固定值
+            df_worklist.loc[mask, col] = val
+
+    # 遍历 mapping 表中的每一条规则（完全照 NIMBUS 的 key 语义）
+    for _, rule in df_worklistmap.iterrows():
+        sample_key  = rule.iloc[0]
+        fill_values = rule.iloc[1:]
+
+        if str(sample_key) == "DB*":
+            mask = df_worklist.iloc[:, 0].str.startswith("DB")
+            apply_to(mask, fill_values)
+        elif str(sample_key).startswith("DB"):
+            mask = col0 == str(sample_key)
+            apply_to(mask, fill_values)
+        elif str(sample_key) == "Test*":
+            mask = col0.str.startswith("Test")
+            apply_to(mask, fill_values)
+        elif str(sample_key).startswith("Test"):
+            mask = col0 == str(sample_key)
+            apply_to(mask, fill_values)
+
+        elif str(sample_key) == "STD*":
+            mask = col0.isin(std_names_use)
+            apply_to(mask, fill_values)
+        elif str(sample_key).startswith("STD"):
+            mask = col0 == str(sample_key)
+            apply_to(mask, fill_values)
+
+        elif str(sample_key) == "QC*":
+            mask = col0.isin(qc_names)
+            apply_to(mask, fill_values)
+        elif str(sample_key).startswith("QC"):
+            mask = col0 == str(sample_key)
+            apply_to(mask, fill_values)
+
+        elif str(sample_key) == "*":
+            # 通配：填充剩余所有空行
+            mask = df_worklist.iloc[:, 1].isna()
+            apply_to(mask, fill_values)
+
+    return mirror_cols
+
+
+def legacy_daan_fill(worklist_table, df_worklistmap, *, name_to_wells, _format_vialpos):
+    """达安的映射循环；返回镜像列集合"""
+    first_col = worklist_table.columns[0]
+
+    mirror_cols = set()
+
+    # ========== 5. 按 mapping_file 的“上机列表”sheet 填充 ==========
+    for _, map_row in df_worklistmap.iterrows():
+        sample_key = str(map_row.iloc[0]).strip()
+        fill_vals = map_row.iloc[1:]
+
+        def fill_cols(mask):
+            for col, val in zip(worklist_table.columns[1:], fill_vals.values):
+                val = "" if pd.isna(val) else str(val).strip()
+
+                if val == "*":
+                    mirror_cols.add(col)
+                    continue
+
+                if col in ("SmplInjVol", "Injection volume"):
+                    continue
+
+                if col in ("VialPos", "Vial position", "样品瓶"):
+                    def _resolve_vialpos(sample_name_value):
+                        sample_name_value = str(sample_name_value).strip()
+
+                        # 如果该样本在达安 txt 中有孔位，使用 txt Well
+                        wells_q = name_to_wells.get(sample_name_value)
+                        if wells_q:
+                            well = wells_q.popleft()
+                            if val in ("{{Well_Number}}", "{{Well_Position}}"):
+                                return _format_vialpos(well, val)
+                            return val
+
+                        # DB/Test 等没有实际孔位的项：沿用 NIMBUS 兜底 A1/1
+                        if val in ("{{Well_Number}}", "{{Well_Position}}"):
+                            if val == "{{Well_Number}}":
+                                return "1"
+                            return "A1"
+
+                        return val
+
+                    worklist_table.loc[mask, col] = worklist_table.loc[mask, first_col].apply(_resolve_vialpos)
+
+                else:
+                    worklist_table.loc[mask, col] = val
+
+        if sample_key == "DB*":
+            mask = worklist_table[first_col].astype(str).str.startswith("DB", na=False)
+            fill_cols(mask)
+
+        elif sample_key.startswith("DB"):
+            mask = worklist_table[first_col].astype(str) == sample_key
+            fill_cols(mask)
+
+        elif sample_key == "Test*":
+            mask = worklist_table[first_col].astype(str).str.startswith("Test", na=False)
+            fill_cols(mask)
+
+        elif sample_key.startswith("Test"):
+            mask = worklist_table[first_col].astype(str) == sample_key
+            fill_cols(mask)
+
+        elif sample_key == "STD*":
+            mask = worklist_table[first_col].astype(str).str.startswith("STD", na=False)
+            fill_cols(mask)
+
+        elif sample_key.startswith("STD"):
+            mask = worklist_table[first_col].astype(str) == sample_key
+            fill_cols(mask)
+
+        elif sample_key == "QC*":
+            # 兼容 mapping_file 中存在 QC* 行的情况
+            mask = worklist_table[first_col].astype(str).str.startswith("QC", na=False)
+            fill_cols(mask)
+
+        elif sample_key.startswith("QC"):
+            # 兼容具体 QC 名称或 QC 前缀
+            mask = worklist_table[first_col].astype(str) == sample_key
+            fill_cols(mask)
+
+        elif sample_key == "*":
+            # 默认行：填充还未被填过的行
+            # 使用第二列是否为空作为判断，与 NIMBUS 逻辑一致
+            if len(worklist_table.columns) > 1:
+                mask = worklist_table.iloc[:, 1].isna()
+            else:
+                mask = pd.Series([False] * len(worklist_table), index=worklist_table.index)
+            fill_cols(mask)
+
+    return mirror_cols
+
+
+# Tecan：views_TecanIngest._apply_mapping_to_table 的旧实现
+def legacy_tecan_apply_mapping(
+    mapping_df: pd.DataFrame,
+    worklist_table: pd.DataFrame,
+    *,
+    name_to_barcodes: dict[str, deque],
+    barcode_to_well: dict[str, tuple[str, int]],
+    locator_info: dict | None = None,
+    project_name: str | None = None,
+    injection_plate: str | None = None,
+    instrument_name: str | None = None,
+    set_name: str | None = None,
+    output_file: str | None = None
+):
+    """
+    按 '上机列表' 映射模板，把占位符填入 worklist_table（第一列已是完整 SampleName_list）。
+    兼容规则：
+      - sample_key = 'DB*'/'Test*'/'STD3'/'*' 等
+      - 列值 = 常量 / '*'(镜像第一列) / {{Well_Number}} / {{Well_Position}}
+      - Tecan 特有：'----------' 代表定位孔（仅第1个生效，其他同名删掉）
+    """
+    df = worklist_table
+    headers = list(df.columns)
+    first_col = headers[0]
+
+    loc_display = (locator_info or {}).get("display_name")  # e.g. "X3"
+
+    # 识别孔号/孔位列（尽量兼容多命名）
+    WELLNUM_COLS = {"Well_Number", "Vial position", "VialPos", "样品瓶"}
+    WELLPOS_COLS = {"Well_Position", "SourcePositionID", "TargetPositionID", "Vial position"}
+    col_wellnum = next((c for c in headers if c in WELLNUM_COLS), None)
+    col_wellpos = next((c for c in headers if c in WELLPOS_COLS), None)
+
+    # 记录需要镜像第一列的列（模板值 = '*'）
+    mirror_cols = set()
+
+    # 第一次使用定位孔的标记 & 待删除行
+    locator_first_used = False
+    rows_to_drop = []
+
+    # 按模板逐行套规则（与 NIMBUS 同构）
+    for _, map_row in mapping_df.iterrows():
+        sample_key = str(map_row.iloc[0]).strip()
+        fill_vals  = list(map_row.iloc[1:].values)
+
+        # 针对 sample_key 生成 mask
+        col0 = df[first_col].astype(str)
+
+        if sample_key.upper().startswith("DB"):
+            mask = col0.str.upper().str.startswith("DB")
+        elif sample_key.lower().startswith("test"):
+            mask = col0.str.lower().str.startswith("test")
+        elif sample_key.upper().startswith("STD"):
+            mask = col0 == sample_key  # STD3 等精确匹配
+        elif loc_display and sample_key.strip() == loc_display:
+            mask = (col0 == loc_display)
+        elif sample_key.strip() == "*":
+            # 兜底规则：留到最后填尚未填充的行
+            mask = df.iloc[:, 1].isna() if df.shape[1] > 1 else pd.Series([True] * len(df), index=df.index)
+        else:
+            # 临床样本（一般不在模板中定义具体 key），跳过；让 '*' 兜底去管
+            continue
+
+        idxs = df.index[mask].tolist()
+        if not idxs:
+            continue
+
+        # 处理每个目标列
+        for col, val in zip(headers[1:], fill_vals):
+            sval = str(val).strip()
+
+            # '*'：整列镜像第一列
+            if sval == "*":
+                mirror_cols.add(col)
+                continue
+
+            # 定位孔行：只替第一个命中的行
+            if loc_display and sample_key.strip() == loc_display:
+                if not locator_info:
+                    # 没有定位孔信息 → 保留原样
+                    continue
+                # 第一个
+                first_idx = None
+                for i in idxs:
+                    if not locator_first_used:
+                        first_idx = i
+                        locator_first_used = True
+                        break
+                # 其他同名行删除
+                for j in idxs:
+                    if j != first_idx:
+                        rows_to_drop.append(j)
+                if first_idx is None:
+                    continue
+                # 写显示名 + 坐标（仅当占位符时）
+                if col == first_col:
+                    df.at[first_idx, col] = loc_display
+                if col_wellnum and col == col_wellnum:
+                    df.at[first_idx, col_wellnum] = locator_info.get("well_num")
+                if col_wellpos and col == col_wellpos:
+                    df.at[first_idx, col_wellpos] = locator_info.get("well_pos")
+                continue
+
+            # 孔号/孔位占位符：根据“样本名 → 条码 → 孔位”求值  f"{injection_plate}:{well_no}"
+            if sval in ("{{Well_Number}}", "{{Well_Position}}"):
+                def _resolve(sample_name_value: str):
+                    name = str(sample_name_value).strip()
+
+                    # 1) DB*: 固定 A1/1（与 Tecan 现有规则一致）
+                    if name.upper().startswith("DB"):
+                        return 1 if sval == "{{Well_Number}}" else "A1"
+
+                    # 2) 定位孔：name 等于 X{plate} 时，直接用 locator_info
+                    if loc_display and locator_info and name == loc_display:
+                        well_pos = locator_info.get("well_pos")
+                        well_num = locator_info.get("well_num")
+                        if instrument_name == "Thermo" or instrument_name == "Agilent":
+                            if sval == "{{Well_Number}}":
+                                return f"{injection_plate}:{well_num}" if injection_plate else well_num
+                            else:
+                                if project_name == "PCA":
+                                    return f"{injection_plate}:{well_pos}" if injection_plate else well_pos
+                                else:
+                                    return f"{injection_plate}-{well_pos}" if injection_plate else well_pos
+                        else:
+                            if sval == "{{Well_Number}}":
+                                return well_num
+                            else:
+                                return well_pos
+
+                    # 3) QC/STD：Name→Barcode（队列），条码→(well_pos, well_num)
+                    if name in name_to_barcodes and name_to_barcodes[name]:
+                        barcode = name_to_barcodes[name].popleft()
+                        wells = barcode_to_well.get(barcode)
+                        if wells:
+                            well_pos, well_num = wells.popleft()   # ← 关键：消费本条码的下一个孔位
+                            if instrument_name == "Thermo" or instrument_name == "Agilent":
+                                if sval == "{{Well_Number}}":
+                                    return f"{injection_plate}:{well_num}" if injection_plate else well_num
+                                else:
+                                    if project_name == "PCA":
+                                        return f"{injection_plate}:{well_pos}" if injection_plate else well_pos
+                                    else:
+                                        return f"{injection_plate}-{well_pos}" if injection_plate else well_pos
+                            else:
+                                if sval == "{{Well_Number}}":
+                                    return well_num
+                                else:
+                                    return well_pos
+                        return None
+
+                    # 3) 临床：第一列值即条码
+                    wells = barcode_to_well.get(name)
+
+                    if wells:
+                        well_pos, well_num = wells.popleft()       # ← 关键：消费一次
+                        if instrument_name == "Thermo" or instrument_name == "Agilent":
+                            if sval == "{{Well_Number}}":
+                                return f"{injection_plate}:{well_num}" if injection_plate else well_num
+                            else:
+                                if project_name == "PCA":
+                                    return f"{injection_plate}:{well_pos}" if injection_plate else well_pos
+                                else:
+                                    return f"{injection_plate}-{well_pos}" if injection_plate else well_pos
+                        else:
+                            if sval == "{{Well_Number}}":
+                                return well_num
+                            else:
+                                return well_pos
+
+                df.loc[mask, col] = df.loc[mask, first_col].apply(_resolve)
+            else:
+                # 其他列：写常量
+                df.loc[mask, col] = val
+
+    # 统一执行“镜像列”
+    for col in mirror_cols:
+        df[col] = df[first_col]
+
+    # 删除多余的定位孔行
+    if rows_to_drop:
+        df.drop(rows_to_drop, inplace=True)
+        df.reset_index(drop=True, inplace=True)
+
+    if set_name and ("SetName" in df.columns):
+        df["SetName"] = set_name
+
+    if output_file and ("OutputFile" in df.columns):
+        df["OutputFile"] = output_file
+
+    if 'VialPos' in df.columns:
+        df = format_vialpos_column(df, "VialPos")
+
+    df = df.fillna("")
+
+    return df
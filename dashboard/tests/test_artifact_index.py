@@ -0,0 +1,301 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from dashboard import views
+from dashboard.artifact_index import (
+    HISTORY_DIRNAME, artifact_dates, artifact_day, artifact_paths_by_kind, daily_sampled_codes,
+    ensure_artifact_index, find_artifact_path, move_artifact, payload_sampled_codes, reconcile_artifacts,
+    record_artifact, sampled_codes_version,
+)
+from dashboard.models import DownloadArtifact
+
+
+class ArtifactIndexTestCase(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.enterContext(override_settings(DOWNLOAD_ROOT=tmp.name))
+
+    def _write(self, *parts, content="x"):
+        path = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def _rel_paths(self, **filters):
+        return sorted(DownloadArtifact.objects.filter(**filters).values_list("rel_path", flat=True))
+
+
+class RecordArtifactTests(ArtifactIndexTestCase):
+    def test_record_classifies_layouts(self):
+        onboarding = record_artifact(self._write("NIMBUS", "2026-10-01", "VD", "X1_OnboardingList_1.txt"))
+        self.assertEqual(
+            (onboarding.section, onboarding.platform, onboarding.category, onboarding.date_name,
+             onboarding.project, onboarding.kind),
+            ("main", "NIMBUS", "", "2026-10-01", "VD", "onboarding"),
+        )
+        self.assertEqual(onboarding.rel_path, "NIMBUS/2026-10-01/VD/X1_OnboardingList_1.txt")
+
+        sampling = record_artifact(self._write("Starlet", "取样指令", "2026-10-01", "cmd.csv"))
+        self.assertEqual((sampling.platform, sampling.category, sampling.project), ("Starlet", "取样指令", ""))
+
+        history = record_artifact(self._write(HISTORY_DIRNAME, "NIMBUS", "2026-10-01", "VD", "X1_WorkSheet_1.pdf"))
+        self.assertEqual((history.section, history.kind), ("history", "worksheet"))
+
+    def test_record_skips_files_outside_the_tree(self):
+        self.assertIsNone(record_artifact(self._write("岗位清单", "2026-10-01", "VD", "a.txt")))
+        self.assertIsNone(record_artifact(self._write("NIMBUS", "not-a-date", "VD", "a.txt")))
+        self.assertIsNone(record_artifact(self._write("NIMBUS", "2026-10-01", "VD", "a.txt.tmp")))
+        self.assertIsNone(record_artifact(self._write("Starlet", "其他", "2026-10-01", "a.txt")))
+        self.assertFalse(DownloadArtifact.objects.exists())
+
+    def test_record_refreshes_and_forgets_missing_file(self):
+        path = self._write("NIMBUS", "2026-10-01", "VD", "a.txt")
+        record_artifact(path)
+        self._write("NIMBUS", "2026-10-01", "VD", "a.txt", content="longer")
+        self.assertEqual(record_artifact(path).size, 6)
+        self.assertEqual(DownloadArtifact.objects.count(), 1)
+
+        os.remove(path)
+        self.assertIsNone(record_artifact(path))
+        self.assertFalse(DownloadArtifact.objects.exists())
+
+    def test_move_to_history(self):
+        src = self._write("NIMBUS", "2026-10-01", "VD", "X1_OnboardingList_1.txt")
+        record_artifact(src)
+        dst = os.path.join(self.root, HISTORY_DIRNAME, "NIMBUS", "2026-10-01", "VD", "X1_OnboardingList_1.txt")
+        os.makedirs(os.path.dirname(dst))
+        os.replace(src, dst)
+        move_artifact(src, dst)
+
+        self.assertEqual(self._rel_paths(section="main"), [])
+        self.assertEqual(
+            self._rel_paths(section="history"),
+            [f"{HISTORY_DIRNAME}/NIMBUS/2026-10-01/VD/X1_OnboardingList_1.txt"],
+        )
+
+
+class ReconcileArtifactsTests(ArtifactIndexTestCase):
+    def test_reconcile_adds_removes_and_refreshes(self):
+        kept = self._write("NIMBUS", "2026-10-01", "VD", "kept.txt")
+        changed = self._write("NIMBUS", "2026-10-01", "VD", "X1_WorkSheet_1.payload.json", content="{}")
+        gone = self._write("NIMBUS", "2026-10-01", "VD", "gone.txt")
+        for path in (kept, changed, gone):
+            record_artifact(path)
+        DownloadArtifact.objects.filter(file_name="X1_WorkSheet_1.payload.json").update(
+            sampled_codes="A", barcodes_indexed=True,
+        )
+        os.remove(gone)
+        self._write("NIMBUS", "2026-10-01", "VD", "X1_WorkSheet_1.payload.json", content='{"a": 1}')
+        self._write("NIMBUS", "2026-10-02", "VD", "new.txt")
+
+        self.assertEqual(reconcile_artifacts(), (1, 1, 1))
+        self.assertEqual(self._rel_paths(), [
+            "NIMBUS/2026-10-01/VD/X1_WorkSheet_1.payload.json",
+            "NIMBUS/2026-10-01/VD/kept.txt",
+            "NIMBUS/2026-10-02/VD/new.txt",
+        ])
+        payload = DownloadArtifact.objects.get(file_name="X1_WorkSheet_1.payload.json")
+        self.assertEqual(payload.size, 8)
+        # 内容变了：已提取的条码作废，待下次查询重新提取
+        self.assertIsNone(payload.sampled_codes)
+        self.assertFalse(payload.barcodes_indexed)
+
+        self.assertEqual(reconcile_artifacts(), (0, 0, 0))
+
+    def test_ensure_builds_only_an_empty_index(self):
+        self._write("NIMBUS", "2026-10-01", "VD", "a.txt")
+        ensure_artifact_index()
+        self.assertEqual(DownloadArtifact.objects.count(), 1)
+
+        self._write("NIMBUS", "2026-10-01", "VD", "b.txt")
+        ensure_artifact_index()
+        self.assertEqual(DownloadArtifact.objects.count(), 1)
+
+    def test_management_command(self):
+        self._write("NIMBUS", "2026-10-01", "VD", "a.txt")
+        out = StringIO()
+        call_command("reconcile_download_index", stdout=out)
+        self.assertEqual(DownloadArtifact.objects.count(), 1)
+        self.assertIn("新增 1，删除 0，更新 0", out.getvalue())
+
+
+class ArtifactDatesTests(ArtifactIndexTestCase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 6):
+            record_artifact(self._write("NIMBUS", f"2026-10-0{day}", "VD", "a.txt"))
+            record_artifact(self._write("NIMBUS", f"2026-10-0{day}", "FA", "b.txt"))
+        record_artifact(self._write("Starlet", "取样指令", "2026-10-09", "cmd.csv"))
+        record_artifact(self._write(HISTORY_DIRNAME, "NIMBUS", "2026-09-30", "VD", "old.txt"))
+
+    def test_pages_newest_first(self):
+        self.assertEqual(artifact_dates("main", "NIMBUS", limit=2), (["2026-10-05", "2026-10-04"], "2026-10-04"))
+        self.assertEqual(
+            artifact_dates("main", "NIMBUS", before="2026-10-04", limit=2),
+            (["2026-10-03", "2026-10-02"], "2026-10-02"),
+        )
+        self.assertEqual(artifact_dates("main", "NIMBUS", before="2026-10-02", limit=2), (["2026-10-01"], ""))
+        # 恰好取完时没有下一页
+        self.assertEqual(artifact_dates("main", "NIMBUS", limit=5)[1], "")
+
+    def test_scoped_by_section_and_category(self):
+        self.assertEqual(artifact_dates("history", "NIMBUS"), (["2026-09-30"], ""))
+        self.assertEqual(artifact_dates("main", "Starlet", "取样指令"), (["2026-10-09"], ""))
+        self.assertEqual(artifact_dates("main", "Starlet", "工作清单和上机列表"), ([], ""))
+
+    def test_day_lists_only_that_date(self):
+        rows = artifact_day("main", "NIMBUS", "", "2026-10-03")
+        self.assertEqual(sorted((r["project"], r["file_name"]) for r in rows), [("FA", "b.txt"), ("VD", "a.txt")])
+
+    def _tree(self, **params):
+        request = RequestFactory().get("/dashboard/file_download_tree/", params)
+        response = views.file_download_tree_api(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_tree_api_dates_level(self):
+        status, data = self._tree(level="dates", platform="NIMBUS", limit="3")
+        self.assertEqual(status, 200)
+        self.assertEqual(data["dates"], ["2026-10-05", "2026-10-04", "2026-10-03"])
+        self.assertTrue(data["has_more"])
+
+        status, data = self._tree(level="dates", platform="NIMBUS", limit="3", before=data["next_before"])
+        self.assertEqual((data["dates"], data["has_more"]), (["2026-10-02", "2026-10-01"], False))
+
+        self.assertEqual(self._tree(level="dates", platform="NIMBUS", before="bad")[0], 400)
+        self.assertEqual(self._tree(level="dates", platform="NIMBUS", limit="x")[0], 400)
+
+    def test_tree_api_platforms_level(self):
+        _, data = self._tree(level="platforms")
+        self.assertEqual(data["platforms"], [
+            {"platform": "NIMBUS", "categories": []},
+            {"platform": "Starlet", "categories": ["取样指令"]},
+        ])
+
+
+class FindArtifactPathTests(ArtifactIndexTestCase):
+    NAME = "X1_WorkSheet_1.payload.json"
+
+    def test_newest_main_copy_wins(self):
+        older = self._write("NIMBUS", "2026-10-01", "VD", self.NAME)
+        newer = self._write("NIMBUS", "2026-10-02", "VD", self.NAME)
+        history = self._write(HISTORY_DIRNAME, "NIMBUS", "2026-10-03", "VD", self.NAME)
+        os.utime(older, (1000, 1000))
+        for path in (older, newer, history):
+            record_artifact(path)
+
+        self.assertEqual(find_artifact_path(self.NAME), newer)
+        self.assertEqual(find_artifact_path(self.NAME, section="history"), history)
+        self.assertIsNone(find_artifact_path("missing.payload.json"))
+        self.assertEqual(artifact_paths_by_kind("payload"), {self.NAME: newer})
+
+    def test_deleted_file_is_skipped_and_forgotten(self):
+        older = self._write("NIMBUS", "2026-10-01", "VD", self.NAME)
+        newer = self._write("NIMBUS", "2026-10-02", "VD", self.NAME)
+        os.utime(older, (1000, 1000))
+        record_artifact(older)
+        record_artifact(newer)
+        os.remove(newer)
+
+        self.assertEqual(find_artifact_path(self.NAME), older)
+        self.assertEqual(self._rel_paths(), [f"NIMBUS/2026-10-01/VD/{self.NAME}"])
+
+    def _get_payload(self, filename):
+        request = RequestFactory().get("/dashboard/file_replace_get_payload/", {"filename": filename})
+        response = views.file_replace_get_payload(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_get_payload_view(self):
+        record_artifact(self._write("NIMBUS", "2026-10-01", "VD", self.NAME, content='{"plate_no": 1}'))
+
+        status, data = self._get_payload("X1_OnboardingList_1.txt")
+        self.assertEqual(status, 200)
+        self.assertEqual((data["payload"], data["filename"]), ({"plate_no": 1}, self.NAME))
+        self.assertEqual(self._get_payload("X2_OnboardingList_1.txt")[0], 404)
+        self.assertEqual(self._get_payload("X1_WorkSheet_1.pdf")[0], 400)
+
+
+def _payload(*cells):
+    return {"worksheet_table": [list(cells), "not-a-row"]}
+
+
+class SampledCodesTests(ArtifactIndexTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate().strftime("%Y-%m-%d")
+
+    def _record_payload(self, name, payload, date_name=None, history=False, with_codes=True):
+        parts = (HISTORY_DIRNAME,) if history else ()
+        path = self._write(*parts, "NIMBUS", date_name or self.today, "VD", name, content=json.dumps(payload))
+        return record_artifact(path, sampled_codes=payload_sampled_codes(payload) if with_codes else None)
+
+    def test_payload_sampled_codes(self):
+        payload = _payload(
+            {"match_sample": " vd001 ", "origin_barcode": "111-01"},
+            {"match_sample": "", "origin_barcode": None},
+            "not-a-cell",
+            {"match_sample": "VD001", "origin_barcode": "222"},
+        )
+        self.assertEqual(payload_sampled_codes(payload), ["111-01", "222", "VD001"])
+        self.assertEqual(payload_sampled_codes({}), [])
+
+    def test_daily_codes_merge_today_main_payloads(self):
+        self._record_payload("A_WorkSheet_1.payload.json", _payload({"match_sample": "S1"}))
+        lazy = self._record_payload("A_WorkSheet_2.payload.json", _payload({"origin_barcode": "b2"}), with_codes=False)
+        self._record_payload("A_WorkSheet_3.payload.json", _payload({"match_sample": "OLD"}), date_name="2000-01-01")
+        self._record_payload("A_WorkSheet_4.payload.json", _payload({"match_sample": "GONE"}), history=True)
+        record_artifact(self._write("NIMBUS", self.today, "VD", "A_WorkSheet_5.payload.json", content="{broken"))
+
+        self.assertEqual(daily_sampled_codes(self.today), {"S1", "B2"})
+        # 未提取的 payload 首次查询时回写，之后不再读文件
+        lazy.refresh_from_db()
+        self.assertEqual(lazy.sampled_codes, "B2")
+        self.assertEqual(DownloadArtifact.objects.get(file_name="A_WorkSheet_5.payload.json").sampled_codes, "")
+
+    def test_version_tracks_add_and_remove(self):
+        empty = sampled_codes_version(self.today)
+        first = self._record_payload("A_WorkSheet_1.payload.json", _payload({"match_sample": "S1"}))
+        one = sampled_codes_version(self.today)
+        self.assertNotEqual(one, empty)
+        self.assertEqual(sampled_codes_version(self.today), one)
+
+        self._record_payload("A_WorkSheet_2.payload.json", _payload({"match_sample": "S2"}))
+        two = sampled_codes_version(self.today)
+        self.assertNotEqual(two, one)
+
+        # 被替换进历史目录：不再计入
+        src = os.path.join(self.root, first.rel_path)
+        dst = os.path.join(self.root, HISTORY_DIRNAME, first.rel_path)
+        os.makedirs(os.path.dirname(dst))
+        os.replace(src, dst)
+        move_artifact(src, dst)
+        self.assertNotIn(sampled_codes_version(self.today), (one, two))
+        self.assertEqual(daily_sampled_codes(self.today), {"S2"})
+
+    def _get_codes(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        request = RequestFactory().get("/dashboard/file_replace_sampled_codes/", **headers)
+        return views.file_replace_sampled_codes(request)
+
+    def test_view_answers_304_until_codes_change(self):
+        self._record_payload("A_WorkSheet_1.payload.json", _payload({"match_sample": "S1"}))
+        response = self._get_codes()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {"date": self.today, "codes": ["S1"]})
+        etag = response["ETag"]
+
+        self.assertEqual(self._get_codes(etag).status_code, 304)
+
+        self._record_payload("A_WorkSheet_2.payload.json", _payload({"origin_barcode": "b2"}))
+        response = self._get_codes(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["codes"], ["B2", "S1"])
+        self.assertNotEqual(response["ETag"], etag)
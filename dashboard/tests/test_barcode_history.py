@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from dashboard.artifact_index import HISTORY_DIRNAME, move_artifact, reconcile_artifacts, record_artifact
+from dashboard.barcode_history import (
+    index_payload_barcodes, main_barcode_history, payload_subbarcode_origins, split_main_sub_barcode,
+)
+from dashboard.models import DownloadArtifact, PayloadBarcode
+
+DAY = "2026-10-01"
+
+
+def _payload(*cells):
+    return {"worksheet_table": [list(cells)]}
+
+
+def _cell(origin, match_sample="VD001", locator=False):
+    return {"origin_barcode": origin, "match_sample": match_sample, "locator": locator}
+
+
+class PayloadOriginsTests(TestCase):
+    def test_split_main_sub_barcode(self):
+        self.assertEqual(split_main_sub_barcode(" 6859899683-01 "), ("6859899683", "-01"))
+        self.assertEqual(split_main_sub_barcode("6859899683"), ("6859899683", ""))
+        self.assertEqual(split_main_sub_barcode("6859899683-"), ("6859899683-", ""))
+        self.assertEqual(split_main_sub_barcode(None), ("", ""))
+
+    def test_only_clinical_sub_barcodes(self):
+        payload = _payload(
+            _cell("111-01"),
+            _cell("111-02"),
+            _cell("222"),                           # 无子条码
+            _cell("333-01", locator=True),          # 定位孔
+            _cell("NOTUBE"),
+            _cell("444-01", match_sample="STD1"),   # 曲线 / 质控 / Blank
+            _cell("555-01", match_sample="QC-L"),
+            _cell("666-01", match_sample="Blank"),
+            "not-a-cell",
+        )
+        self.assertEqual(payload_subbarcode_origins(payload), {("111", "111-01"), ("111", "111-02")})
+        self.assertEqual(payload_subbarcode_origins({}), set())
+
+
+class MainBarcodeHistoryTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.enterContext(override_settings(DOWNLOAD_ROOT=tmp.name))
+
+    def _save(self, payload, name, project="VD", date_name=DAY, index=True):
+        path = os.path.join(self.root, "ICP-MS", date_name, project, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        artifact = record_artifact(path)
+        if index:
+            index_payload_barcodes(artifact, payload)
+        return path
+
+    def test_history_is_scoped_to_platform_day_and_project(self):
+        self._save(_payload(_cell("111-01"), _cell("222-01")), "A.payload.json")
+        self._save(_payload(_cell("111-02")), "B.payload.json")
+        self._save(_payload(_cell("111-09")), "C.payload.json", project="FA")
+        self._save(_payload(_cell("111-08")), "D.payload.json", date_name="2026-10-02")
+
+        history = main_barcode_history("ICP-MS", DAY, "VD")
+        self.assertEqual(dict(history), {"111": {"111-01", "111-02"}, "222": {"222-01"}})
+        self.assertEqual(dict(main_barcode_history("ICP-MS", DAY, "VD", main_barcodes=["222", "999"])),
+                         {"222": {"222-01"}})
+        self.assertEqual(dict(main_barcode_history("ICP-MS", DAY, "VD", main_barcodes=[""])), {})
+        self.assertEqual(dict(main_barcode_history("NIMBUS", DAY, "VD")), {})
+        self.assertEqual(dict(main_barcode_history("ICP-MS", DAY, "")), {})
+
+    def test_reindex_replaces_rows(self):
+        self._save(_payload(_cell("111-01")), "A.payload.json")
+        artifact = DownloadArtifact.objects.get(file_name="A.payload.json")
+        index_payload_barcodes(artifact, _payload(_cell("111-03")))
+        self.assertEqual(dict(main_barcode_history("ICP-MS", DAY, "VD")), {"111": {"111-03"}})
+
+    def test_unindexed_payloads_are_parsed_on_first_query(self):
+        self._save(_payload(_cell("111-01")), "A.payload.json", index=False)
+        bad = os.path.join(self.root, "ICP-MS", DAY, "VD", "B.payload.json")
+        with open(bad, "w", encoding="utf-8") as f:
+            f.write("{broken")
+        reconcile_artifacts()
+        self.assertFalse(DownloadArtifact.objects.filter(barcodes_indexed=True).exists())
+
+        self.assertEqual(dict(main_barcode_history("ICP-MS", DAY, "VD")), {"111": {"111-01"}})
+        self.assertEqual(DownloadArtifact.objects.filter(barcodes_indexed=True).count(), 2)
+        self.assertEqual(PayloadBarcode.objects.count(), 1)
+
+    def test_replaced_payload_leaves_history(self):
+        src = self._save(_payload(_cell("111-01")), "A.payload.json")
+        dst = os.path.join(self.root, HISTORY_DIRNAME, "ICP-MS", DAY, "VD", "A.payload.json")
+        os.makedirs(os.path.dirname(dst))
+        os.replace(src, dst)
+        move_artifact(src, dst)
+
+        self.assertEqual(dict(main_barcode_history("ICP-MS", DAY, "VD")), {})
+        self.assertFalse(PayloadBarcode.objects.exists())
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from dashboard import views
+from dashboard.models import PdfRenderJob
+from dashboard.payload_store import StoredPayload
+
+
+def _plate(no):
+    return {
+        "worksheet_table": [], "error_rows": [], "header": {"plate_no": no},
+        "txt_headers": ["SampleName", "VialPos"],
+        "worklist_records": [{"SampleName": f"S{no}", "VialPos": "A1"}],
+    }
+
+
+class ExportAllPlatesTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.enterContext(override_settings(DOWNLOAD_ROOT=tmp.name))
+        self.all_payload = StoredPayload.from_dict({
+            "project_name": "VD", "platform": "NIMBUS", "testing_day": "today",
+            "instrument_num": "I1", "systerm_num": "S1", "plates": [_plate(1), _plate(2), _plate(3)],
+        })
+        self.write_threads = set()
+        write = views._write_plate_files
+
+        def record_thread(plan):
+            self.write_threads.add(threading.get_ident())
+            write(plan)
+
+        self.enterContext(mock.patch.object(views, "_write_plate_files", record_thread))
+
+    def _export(self, query="plate=all"):
+        request = RequestFactory().post(f"/dashboard/export_files/?{query}")
+        return views._export_all_plates(request, self.all_payload, "Sciex")
+
+    def test_async_batch_is_queued_for_the_worker(self):
+        with mock.patch.object(views, "render_jobs_in_pool") as pool:
+            data = json.loads(self._export().content)
+        pool.assert_not_called()
+        self.assertEqual(PdfRenderJob.objects.filter(status="pending").count(), 3)
+        self.assertEqual([p["pdf_ready"] for p in data["plates"]], [False] * 3)
+        self.assertIn("PDF 生成中", data["message"])
+        # 上机列表 / payload.json 在线程池里写出
+        self.assertNotIn(threading.get_ident(), self.write_threads)
+        written = [name for _, _, names in os.walk(self.root) for name in names]
+        self.assertEqual(sum(name.endswith(".txt") for name in written), 3)
+        self.assertEqual(sum(name.endswith(".payload.json") for name in written), 3)
+
+    def test_sync_batch_renders_in_pool(self):
+        def render(job_ids):
+            PdfRenderJob.objects.filter(job_id__in=job_ids).update(status="done")
+            return {job_id: ("boom" if i == 1 else "") for i, job_id in enumerate(job_ids)}
+
+        with mock.patch.object(views, "PDF_RENDER_ASYNC", False), \
+                mock.patch.object(views, "render_jobs_in_pool", side_effect=render) as pool, \
+                mock.patch.object(views, "enqueue_pdf_job") as enqueue:
+            data = json.loads(self._export().content)
+        enqueue.assert_not_called()
+        self.assertEqual(len(pool.call_args.args[0]), 3)
+        self.assertEqual([p["ok"] for p in data["plates"]], [True, False, True])
+        self.assertEqual(data["plates"][1]["message"], "PDF生成失败: boom")
+        self.assertEqual(data["message"], "导出完成：成功 2 / 3 块板")
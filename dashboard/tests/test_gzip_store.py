@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from dashboard import payload_store, station_map_store
+from dashboard.gzip_store import GzipStore, valid_key
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+class GzipStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.store = GzipStore(lambda: self.root, lambda: 100, "测试")
+
+    def test_key_validation(self):
+        self.assertTrue(valid_key("0123abcdef"))
+        for key in ("", None, 123, "ABC", "../etc", "a/b", "a.json"):
+            self.assertFalse(valid_key(key), key)
+
+    def test_concurrent_put_and_get(self):
+        keys = [f"{i:02x}" for i in range(8)]
+
+        def work(i):
+            key = keys[i % len(keys)]
+            self.store.write(key, f'{{"n": "{key}"}}'.encode("utf-8"), "sub")
+            return key, self.store.read(key, "sub")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(work, range(64)))
+        for key, data in results:
+            self.assertEqual(data, {"n": key})
+        self.assertEqual(sorted(self.store.keys("sub")), keys)
+        self.assertEqual([n for n in os.listdir(os.path.join(self.root, "sub")) if n.endswith(".tmp")], [])
+
+    def test_ttl_expiry_keeps_recently_read_and_kept_keys(self):
+        for key in ("aa", "bb", "cc", "dd"):
+            self.store.write(key, b"{}")
+            _age(self.store.path(key), 1000)
+        self.store.read("bb", touch=True)
+        self.store.write("cc", b"{}")          # 已存在：只刷新访问时间
+
+        self.assertEqual(self.store.cleanup(keep={"dd"}), 1)
+        self.assertEqual(sorted(self.store.keys()), ["bb", "cc", "dd"])
+        with self.assertRaises(FileNotFoundError):
+            self.store.read("aa")
+
+    def test_maybe_cleanup_is_throttled(self):
+        cleanup = mock.Mock(return_value=0)
+        self.store.maybe_cleanup(cleanup)
+        self.store.maybe_cleanup(cleanup)
+        self.assertEqual(cleanup.call_count, 1)
+
+
+class StoresOnGzipStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(mock.patch.object(payload_store, "PAYLOAD_STORE_ROOT", tmp.name))
+        self.enterContext(mock.patch.object(station_map_store, "STATION_MAP_STORE_ROOT", tmp.name))
+
+    def test_payload_cleanup_keeps_blobs_of_live_meta(self):
+        old = payload_store.save_payload({"p": 1, "plates": [{"a": 1}]})
+        live = payload_store.save_payload({"p": 2, "plates": [{"a": 1}, {"b": 2}]})
+        for key in payload_store._store.keys("blobs"):
+            _age(payload_store._store.path(key, "blobs"), 10)
+        _age(payload_store._store.path(old, "meta"), 10)
+
+        self.assertEqual(payload_store.cleanup_payload_store(ttl=5), (1, 0))
+        self.assertIsNone(payload_store.load_payload(old))
+        self.assertEqual(payload_store.load_payload(live).plate(1), {"b": 2})
+        self.assertIsNone(payload_store.load_payload("../meta"))
+
+    def test_station_map_round_trip_and_expiry(self):
+        key = station_map_store.save_station_map({"111-01": ["VD1"]})
+        self.assertEqual(station_map_store.load_station_map(key), {"111-01": ["VD1"]})
+        self.assertIsNone(station_map_store.load_station_map("not-a-key"))
+
+        station_map_store._cache.clear()
+        _age(station_map_store._store.path(key), 10)
+        self.assertEqual(station_map_store.cleanup_station_map_store(ttl=5), 1)
+        self.assertIsNone(station_map_store.load_station_map(key))
@@ -0,0 +1,24 @@
+from django.test import SimpleTestCase
+
+from dashboard.instrument_templates import TemplateParseError, build_template_descriptor, require_strict_encoding
+
+
+class TemplateDescriptorTests(SimpleTestCase):
+    def test_gb18030_template(self):
+        meta = build_template_descriptor("SampleName,样品瓶,SmplInjVol\n".encode("gb18030"), "t.csv")
+        self.assertEqual(meta["headers"], ["SampleName", "样品瓶", "SmplInjVol"])
+        self.assertEqual((meta["encoding"], meta["lossy"]), ("gb18030", False))
+        self.assertEqual(meta["vialpos_col"], "样品瓶")
+        self.assertIs(require_strict_encoding(meta), meta)
+
+    def test_undecodable_template_falls_back_like_daan_and_icpms(self):
+        # 0xFF 在 utf-8 / gb18030 中都非法：达安 / ICP-MS 原先替换非法字节后照常读取，ProcessResult 原先报错
+        meta = build_template_descriptor(b"SampleName\tVialPos\xff\n", "t.txt")
+        self.assertTrue(meta["lossy"])
+        self.assertEqual(meta["headers"], ["SampleName", "VialPos�"])
+        with self.assertRaises(TemplateParseError):
+            require_strict_encoding(meta)
+
+    def test_unsupported_extension(self):
+        with self.assertRaises(TemplateParseError):
+            build_template_descriptor(b"SampleName\n", "t.xlsx")
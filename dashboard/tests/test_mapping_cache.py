@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dashboard.mapping_cache import get_mapping_bundle, invalidate_mapping_cache
+from dashboard.worklist_engine import icpms_classifier, nimbus_classify, strip_key, tecan_classify
+
+WORKSHEET = pd.DataFrame({
+    "Barcode": ["B10", " B2 ", "B1", "Q1", "Q2", "Q1b", "K1"],
+    "Name": ["S10", " S2 ", "S1", "QC-L", "QC-H", "QC-L", "Blank"],
+    "Code": ["STD10", "STD2", "STD1", "QC1", "QC2", "QC1", "Blank"],
+})
+WORKLIST = pd.DataFrame([
+    ["DB*", "{{Well_Number}}", "*", None],
+    ["STD*", "{{Well_Position}}", "*", 5],
+], columns=["SampleName", "VialPos", "Name", "SmplInjVol"])
+
+
+class MappingBundleTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(invalidate_mapping_cache)
+        self.path = os.path.join(tmp.name, "mapping.xlsx")
+        self._write(WORKSHEET)
+
+    def _write(self, worksheet):
+        with pd.ExcelWriter(self.path) as writer:
+            worksheet.to_excel(writer, sheet_name="工作清单", index=False)
+            WORKLIST.to_excel(writer, sheet_name="上机列表", index=False)
+
+    def test_worksheet_lookups(self):
+        bundle = get_mapping_bundle(self.path)
+        self.assertEqual(bundle.std_names, ("S1", " S2 ", "S10"))          # 按 STD 序号
+        self.assertEqual(bundle.std_pool, ("S10", " S2 ", "S1"))           # 表中顺序
+        self.assertEqual(bundle.qc_names, ("QC-L", "QC-H", "QC-L"))
+        self.assertEqual(bundle.names_with_code_prefix("QC1"), ["QC-L", "QC-L"])
+        self.assertEqual(bundle.barcode_to_code[" B2 "], "STD2")
+        self.assertEqual(bundle.stripped_barcode_to_name["B2"], "S2")
+        self.assertEqual(bundle.name_to_barcodes["QC-L"], ("Q1", "Q1b"))
+        self.assertEqual(bundle.stripped_name_to_barcodes["S2"], ("B2",))
+        with self.assertRaises(TypeError):
+            bundle.barcode_to_name["X"] = "Y"
+
+    def test_barcode_queues_are_per_call(self):
+        bundle = get_mapping_bundle(self.path)
+        queues = bundle.barcode_queues()
+        self.assertEqual(queues["QC-L"].popleft(), "Q1")
+        self.assertEqual(list(bundle.barcode_queues()["QC-L"]), ["Q1", "Q1b"])
+        self.assertEqual(len(bundle.barcode_queues(stripped=True)["missing"]), 0)
+
+    def test_worklist_map_is_compiled_once_per_file(self):
+        bundle = get_mapping_bundle(self.path)
+        nimbus = bundle.worklist_map(nimbus_classify)
+        self.assertIs(get_mapping_bundle(self.path).worklist_map(nimbus_classify), nimbus)
+        self.assertIsNot(bundle.worklist_map(tecan_classify, key=strip_key), nimbus)
+
+        # ICP-MS：同一进样体积命中同一编译结果
+        self.assertIs(icpms_classifier("10"), icpms_classifier("10"))
+        icpms = bundle.worklist_map(icpms_classifier("10"), fillna="")
+        self.assertIs(bundle.worklist_map(icpms_classifier("10"), fillna=""), icpms)
+        self.assertIsNot(bundle.worklist_map(icpms_classifier("20"), fillna=""), icpms)
+        self.assertEqual(icpms.rules(WORKLIST.columns)[0].steps[-1], ("const", "SmplInjVol", "10"))
+
+    def test_replaced_file_is_reparsed(self):
+        bundle = get_mapping_bundle(self.path)
+        nimbus = bundle.worklist_map(nimbus_classify)
+        self._write(WORKSHEET.iloc[:3])
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        fresh = get_mapping_bundle(self.path)
+        self.assertIsNot(fresh, bundle)
+        self.assertEqual(fresh.qc_names, ())
+        self.assertIsNot(fresh.worklist_map(nimbus_classify), nimbus)
+
+    def test_missing_sheet_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            get_mapping_bundle(self.path).columns("不存在")
@@ -0,0 +1,27 @@
+import json
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from dashboard import payload_store
+
+
+class PayloadStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(mock.patch.object(payload_store, "PAYLOAD_STORE_ROOT", tmp.name))
+
+    def test_round_trip_keeps_key_order(self):
+        plate = {"worksheet_table": [[{"num": 1, "letter": "A"}]], "error_rows": [], "header": {"z": 1, "a": 2}}
+        token = payload_store.save_payload({"project_name": "VD", "platform": "NIMBUS", "plates": [plate]})
+        stored = payload_store.load_payload(token)
+        self.assertEqual(list(stored.meta), ["project_name", "platform"])
+        loaded = stored.plate(0)
+        self.assertEqual(json.dumps(loaded, ensure_ascii=False), json.dumps(plate, ensure_ascii=False))
+
+    def test_token_ignores_key_order(self):
+        a = payload_store.save_payload({"x": 1, "y": 2, "plates": [{"b": 1, "a": 2}]})
+        b = payload_store.save_payload({"y": 2, "x": 1, "plates": [{"a": 2, "b": 1}]})
+        self.assertEqual(a, b)
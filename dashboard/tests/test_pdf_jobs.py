@@ -0,0 +1,130 @@
+import os
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from dashboard import pdf_jobs
+from dashboard.models import PdfRenderJob
+
+
+def _noop_init():
+    pass
+
+
+def _crash_render(html, out_path, style):
+    # 模拟渲染子进程被杀（OOM 等），进程池随之变为 BrokenProcessPool
+    os._exit(1)
+
+
+class PdfJobQueueTests(TestCase):
+    def _job(self, **kwargs):
+        params = dict(job_id=kwargs.pop("job_id", "j1"), style="worksheet", html="<p/>", out_path="/tmp/x.pdf")
+        params.update(kwargs)
+        return PdfRenderJob.objects.create(**params)
+
+    def test_queued_by_default(self):
+        self.assertTrue(pdf_jobs.PDF_RENDER_ASYNC)
+        with mock.patch.object(pdf_jobs, "render_pdf") as render:
+            job_id = pdf_jobs.enqueue_pdf_job("<p/>", "/tmp/x.pdf", "worksheet")
+        render.assert_not_called()
+        self.assertEqual(PdfRenderJob.objects.get(job_id=job_id).status, "pending")
+        self.assertFalse(pdf_jobs.all_jobs_done([job_id]))
+
+    def test_sync_when_async_disabled(self):
+        with mock.patch.object(pdf_jobs, "PDF_RENDER_ASYNC", False), \
+                mock.patch.object(pdf_jobs, "render_pdf") as render, \
+                mock.patch.object(pdf_jobs, "record_artifact"):
+            job_id = pdf_jobs.enqueue_pdf_job("<p/>", "/tmp/x.pdf", "worksheet")
+        render.assert_called_once_with("<p/>", "/tmp/x.pdf", "worksheet")
+        self.assertEqual(PdfRenderJob.objects.get(job_id=job_id).status, "done")
+        self.assertTrue(pdf_jobs.all_jobs_done([job_id]))
+
+    def test_long_pending_job_reported_as_stalled(self):
+        job = self._job(run_after=timezone.now() - timedelta(seconds=pdf_jobs.PDF_JOB_STALE_SECONDS + 5))
+        with self.assertLogs("dashboard.pdf_jobs", "WARNING"):
+            status = pdf_jobs.job_status_dict(job)
+        self.assertTrue(status["stalled"])
+        self.assertIn("run_pdf_worker", status["error"])
+        self.assertFalse(pdf_jobs.job_status_dict(self._job(job_id="j2"))["stalled"])
+
+    def test_recover_skips_own_inflight_jobs(self):
+        mine = self._job(status="running")
+        other = self._job(job_id="j2", status="running")
+        old = timezone.now() - timedelta(seconds=pdf_jobs.PDF_JOB_STALE_SECONDS + 5)
+        PdfRenderJob.objects.update(updated_at=old)
+        with self.assertLogs("dashboard.pdf_jobs", "WARNING"):
+            self.assertEqual(pdf_jobs.recover_stale_jobs(exclude_ids=[mine.pk]), 1)
+        mine.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((mine.status, other.status), ("running", "pending"))
+
+    def test_worker_requeues_jobs_when_pool_breaks(self):
+        self._job()
+        target = "dashboard.management.commands.run_pdf_worker"
+        with mock.patch(f"{target}.render_in_process", _crash_render), \
+                mock.patch(f"{target}.init_render_process", _noop_init):
+            call_command("run_pdf_worker", "--once", "--workers", "1", "--poll", "0.2",
+                         stdout=StringIO(), stderr=StringIO())
+        job = PdfRenderJob.objects.get()
+        # 第 1 次失败：退避后重新排队，而不是卡在 running
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertIn("渲染进程异常退出", job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+
+
+class PdfRenderBenchmarkTests(TestCase):
+    def test_benchmark_runs(self):
+        try:
+            from weasyprint import HTML
+            HTML(string="<p/>").write_pdf()
+        except Exception:
+            self.skipTest("WeasyPrint 不可用（缺少 pango 等系统库）")
+        out = StringIO()
+        call_command("run_benchmarks", "pdf_render", "--quick", stdout=out)
+        self.assertIn("热渲染", out.getvalue())
+
+
+def _ok_render(html, out_path, style):
+    return out_path
+
+
+class BatchPoolTests(TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch("dashboard.pdf_process.init_render_process", _noop_init),
+            mock.patch.object(pdf_jobs, "record_artifact"),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.addCleanup(self._shutdown_pool)
+
+    def _shutdown_pool(self):
+        if pdf_jobs._batch_pool is not None:
+            pdf_jobs._discard_batch_pool(pdf_jobs._batch_pool)
+
+    def _claimed(self, n):
+        return [pdf_jobs.create_claimed_job("<p/>", f"/tmp/b{i}.pdf", "worksheet") for i in range(n)]
+
+    def test_pool_is_shared_across_batches(self):
+        with mock.patch("dashboard.pdf_process.render_in_process", _ok_render):
+            first = self._claimed(2)
+            self.assertEqual(pdf_jobs.render_jobs_in_pool(first), {j: "" for j in first})
+            pool = pdf_jobs._batch_pool
+            pdf_jobs.render_jobs_in_pool(self._claimed(2))
+            self.assertIs(pdf_jobs._batch_pool, pool)
+        self.assertEqual(PdfRenderJob.objects.filter(status="done").count(), 4)
+
+    def test_broken_pool_fails_jobs_and_is_rebuilt(self):
+        with mock.patch("dashboard.pdf_process.render_in_process", _crash_render), \
+                self.assertLogs("dashboard.pdf_jobs", "WARNING"):
+            errors = pdf_jobs.render_jobs_in_pool(self._claimed(2))
+        self.assertTrue(all(errors.values()))
+        self.assertEqual(PdfRenderJob.objects.filter(status="failed").count(), 2)
+        self.assertIsNone(pdf_jobs._batch_pool)
+        with mock.patch("dashboard.pdf_process.render_in_process", _ok_render):
+            self.assertEqual(set(pdf_jobs.render_jobs_in_pool(self._claimed(1)).values()), {""})
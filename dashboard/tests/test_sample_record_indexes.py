@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+
+from dashboard.models import SampleRecord
+from dashboard.sample_records import make_sample_row, save_plate_records
+
+
+def query_plan(qs):
+    """SQLite 的 EXPLAIN QUERY PLAN 结果（各步骤的 detail 用 ' | ' 拼接）"""
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return " | ".join(row[-1] for row in cursor.fetchall())
+
+
+class SampleRecordQueryPlanTests(TestCase):
+    """热点查询必须走 0018 / 0019 中新增的索引，而不是全表扫描"""
+
+    day = date(2026, 1, 5)
+
+    @classmethod
+    def setUpTestData(cls):
+        # 几天、几个项目、几块板的数据，再 ANALYZE，让查询计划基于真实的统计信息
+        for d in range(5):
+            for project in ("VD", "VAE", "IGF1"):
+                for plate in range(3):
+                    rows = [make_sample_row(f"{'ABCDEFGH'[i // 12]}{i % 12 + 1}", f"{project}{d}{plate}{i:03d}",
+                                            f"14{d}{plate}{i:05d}") for i in range(96)]
+                    save_plate_records(rows, project_name=project, record_date=cls.day - timedelta(days=d),
+                                       plate_no=f"X{plate + 1}", batch_id=f"b{d}")
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, qs, index_name):
+        plan = query_plan(qs)
+        self.assertIn(f"USING INDEX {index_name}", plan)
+        self.assertNotIn("SCAN dashboard_samplerecord", plan)
+
+    def test_daily_stats_uses_date_project_index(self):
+        qs = SampleRecord.objects.filter(record_date=self.day).values_list("project_name", "sample_name", "barcode")
+        self.assertUsesIndex(qs, "samplerec_date_proj_idx")
+
+    def test_plate_replace_uses_project_date_plate_index(self):
+        qs = SampleRecord.objects.filter(project_name="VD", record_date=self.day, plate_no="X1")
+        self.assertUsesIndex(qs, "samplerec_proj_date_plate_idx")
+
+    def test_upsert_key_uses_unique_constraint(self):
+        qs = SampleRecord.objects.filter(project_name="VD", record_date=self.day, batch_id="b0",
+                                         plate_no="X1", well_str="A1")
+        plan = query_plan(qs)
+        # SQLite 把 samplerec_upsert_key_uniq 建为表内 UNIQUE 约束，对应的是自动索引
+        self.assertIn("USING INDEX sqlite_autoindex_dashboard_samplerecord", plan)
+        self.assertIn("well_str=?", plan)
+
+    def test_exact_search_uses_norm_indexes(self):
+        qs = SampleRecord.objects.filter(Q(sample_name_norm="VD00001") | Q(barcode_norm="VD00001"))
+        plan = query_plan(qs)
+        self.assertIn("USING INDEX samplerec_name_norm_idx", plan)
+        self.assertIn("USING INDEX samplerec_barcode_norm_idx", plan)
+        self.assertNotIn("SCAN dashboard_samplerecord", plan)
@@ -0,0 +1,110 @@
+from datetime import date
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from dashboard.models import SampleRecord, SampleStatsVersion
+from dashboard.sample_records import (
+    _contains_condition, _daily_stats_cache_key, daily_sample_stats, make_sample_row, save_plate_records,
+    search_sample_records,
+)
+from dashboard.tests.test_sample_record_indexes import query_plan
+
+
+class SavePlateRecordsTests(TestCase):
+    def _save(self, rows, **kwargs):
+        params = dict(project_name="VD", record_date=date(2026, 1, 5), plate_no="X1", batch_id="b1")
+        params.update(kwargs)
+        return save_plate_records(rows, **params)
+
+    def test_bulk_insert_and_upsert(self):
+        self.assertEqual(self._save([make_sample_row("A1", "VD1", "111"), make_sample_row("A2", "VD2", "222")]), 2)
+        # 同一批次重新生成：冲突时就地更新，不新增行
+        self._save([make_sample_row("A1", "VD9", "999", "4")])
+        self.assertEqual(SampleRecord.objects.count(), 2)
+        rec = SampleRecord.objects.get(well_str="A1")
+        self.assertEqual((rec.sample_name, rec.barcode, rec.error_info), ("VD9", "999", "4"))
+        self.assertEqual((rec.sample_name_norm, rec.barcode_norm), ("VD9", "999"))
+
+    def test_last_row_wins_and_blank_wells_skipped(self):
+        n = self._save([make_sample_row("A1", "VD1"), make_sample_row("A1", "VD2"), make_sample_row("", "VD3")])
+        self.assertEqual(n, 1)
+        self.assertEqual(SampleRecord.objects.get().sample_name, "VD2")
+
+    def test_replace_plate_clears_other_batches(self):
+        self._save([make_sample_row("A1", "VD1"), make_sample_row("B1", "VD2")], batch_id="old")
+        self._save([make_sample_row("A1", "VD3")], batch_id="new", replace_plate=True)
+        self.assertEqual(list(SampleRecord.objects.values_list("batch_id", "sample_name")), [("new", "VD3")])
+
+
+class ContainsSearchTests(TestCase):
+    def _save(self, rows, **kwargs):
+        params = dict(project_name="VD", record_date=date(2026, 1, 5), plate_no="X1", batch_id="b1")
+        params.update(kwargs)
+        return save_plate_records(rows, **params)
+
+    def _contains(self, q):
+        records, _ = search_sample_records(q)
+        return sorted(r.well_str for r in records)
+
+    def test_contains_is_default_and_uses_fts(self):
+        self._save([make_sample_row("A1", "VD12345", "1426200001"), make_sample_row("A2", "AE777", "99123450")])
+        self.assertEqual(self._contains("d1234"), ["A1"])
+        self.assertEqual(self._contains("2345"), ["A1", "A2"])
+        self.assertEqual(self._contains("62000"), ["A1"])
+        # 主表按 rowid 回查，候选 id 来自全文索引，而不是整表 LIKE 扫描
+        plan = query_plan(SampleRecord.objects.filter(_contains_condition("2345")))
+        self.assertIn("SEARCH dashboard_samplerecord USING INTEGER PRIMARY KEY", plan)
+        self.assertIn("dashboard_samplerecord_fts VIRTUAL TABLE INDEX", plan)
+
+    def test_fts_follows_upsert_and_delete(self):
+        self._save([make_sample_row("A1", "VD11111", "B1")])
+        self._save([make_sample_row("A1", "VD22222", "B1")])   # ON CONFLICT DO UPDATE
+        self.assertEqual(self._contains("11111"), [])
+        self.assertEqual(self._contains("22222"), ["A1"])
+        self._save([make_sample_row("B2", "VD33333")], batch_id="b2", replace_plate=True)
+        self.assertEqual(self._contains("22222"), [])
+        self.assertEqual(self._contains("33333"), ["B2"])
+
+    def test_short_query_falls_back_to_like(self):
+        self._save([make_sample_row("A1", "VD1", "X9"), make_sample_row("A2", "AE2", "")])
+        self.assertEqual(self._contains("d1"), ["A1"])
+        self.assertEqual(self._contains("9"), ["A1"])
+
+
+class DailyStatsCacheTests(TestCase):
+    day = date(2026, 1, 5)
+
+    def setUp(self):
+        cache.clear()
+
+    def _totals(self):
+        return {p["project_name"]: [r["total"] for r in p["statistics"]] for p in daily_sample_stats(self.day)}
+
+    def test_write_bumps_shared_version(self):
+        save_plate_records([make_sample_row("A1", "VD1")], project_name="ZZ", record_date=self.day, plate_no="X1")
+        self.assertEqual(self._totals(), {"ZZ": [1]})
+
+        # 旁路写入（不触发失效）：仍命中缓存
+        SampleRecord.objects.create(project_name="ZZ", record_date=self.day, plate_no="X1", well_str="A2",
+                                    sample_name="VD2")
+        self.assertEqual(self._totals(), {"ZZ": [1]})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            save_plate_records([make_sample_row("A3", "VD3")], project_name="ZZ", record_date=self.day,
+                               plate_no="X1")
+        self.assertEqual(self._totals(), {"ZZ": [3]})
+        # 失效靠数据库里的版本号，而不是删除本进程的缓存项
+        self.assertIsNotNone(cache.get(_daily_stats_cache_key(self.day, 0)))
+
+
+class SampleRecordBenchmarkTests(TransactionTestCase):
+    # 与实际运行一样在自动提交模式下执行，on_commit 回调（登记统计版本号）会立即执行
+    def test_benchmark_runs_and_cleans_up(self):
+        out = StringIO()
+        call_command("run_benchmarks", "sample_records", "--quick", stdout=out)
+        self.assertIn("save_plate_records", out.getvalue())
+        self.assertFalse(SampleRecord.objects.filter(project_name="__benchmark__").exists())
+        self.assertFalse(SampleStatsVersion.objects.filter(record_date=date(2000, 1, 1)).exists())
@@ -0,0 +1,39 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from dashboard import station_mirror
+
+
+class StationMirrorTests(SimpleTestCase):
+    def setUp(self):
+        net = tempfile.TemporaryDirectory()
+        mirror = tempfile.TemporaryDirectory()
+        self.addCleanup(net.cleanup)
+        self.addCleanup(mirror.cleanup)
+        self.net_dir = net.name
+        self.enterContext(mock.patch.object(station_mirror, "STATION_NETWORK_DIR", net.name))
+        self.enterContext(mock.patch.object(station_mirror, "STATION_MIRROR_ROOT", mirror.name))
+
+    def _put(self, name, data):
+        with open(os.path.join(self.net_dir, name), "wb") as f:
+            f.write(data)
+
+    def test_sync_mirrors_latest_file(self):
+        self._put("共同岗位清单20260105_0800.xlsx", b"old")
+        self._put("共同岗位清单20260105_0930.xlsx", b"new")
+        self._put("共同岗位清单20260106_0700.xlsx", b"other day")
+        self.assertEqual(station_mirror.sync_station_mirror(["20260105"]), ["20260105"])
+        self.assertEqual(station_mirror.mirrored_station_file("20260105"), (b"new", "共同岗位清单20260105_0930.xlsx"))
+        # 未变化时不重新拷贝
+        self.assertEqual(station_mirror.sync_station_mirror(["20260105"]), [])
+        self.assertEqual(station_mirror.mirrored_station_file("20260106"), (None, None))
+
+    def test_reading_mirror_does_not_start_watcher(self):
+        before = {t.name for t in threading.enumerate()}
+        self.assertIsNone(station_mirror.mirrored_station_name("20260105"))
+        station_mirror.mirrored_station_file("20260105")
+        self.assertEqual({t.name for t in threading.enumerate()}, before)
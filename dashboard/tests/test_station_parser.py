@@ -0,0 +1,127 @@
+import io
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+import xlrd
+import xlsxwriter
+import xlwt
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from openpyxl import Workbook
+
+from dashboard import station_parser
+from dashboard.station_parser import _UnsupportedXlsx, iter_station_rows, parse_station_list
+
+ROWS = [
+    ("主条码", "实验号", "备注"),
+    (" 1426218671 ", "VD1 ", "x"),
+    ("", "VD2", ""),          # 空条码
+    ("1426218672", "", ""),   # 空实验号
+    (1426218673, "VD4", ""),  # 数字单元格
+]
+
+
+def _xls(rows):
+    book = xlwt.Workbook()
+    sheet = book.add_sheet("Sheet1")
+    for r, row in enumerate(rows):
+        for c, v in enumerate(row):
+            sheet.write(r, c, v)
+    buf = io.BytesIO()
+    book.save(buf)
+    return buf.getvalue()
+
+
+def _xlsx(rows):
+    wb = Workbook()
+    for row in rows:
+        wb.active.append([v if v != "" else None for v in row])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+class StationParserTests(SimpleTestCase):
+    def test_default_strips_and_skips_blank_rows(self):
+        for data in (_xls(ROWS), _xlsx(ROWS)):
+            parsed = parse_station_list(data)
+            self.assertEqual(parsed.key_column, "主条码")
+            self.assertEqual(dict(parsed.barcode_to_names()),
+                             {"1426218671": ["VD1"], "1426218673.0": ["VD4"]})
+            self.assertEqual(dict(parsed.barcode_to_names(int_like=True, require_name=False)),
+                             {"1426218671": ["VD1"], "1426218672": [""], "1426218673": ["VD4"]})
+
+    def test_raw_keeps_processresult_semantics(self):
+        # ProcessResult 原先逐行 str(单元格)：不 strip，空条码 / 空实验号的行也保留
+        for data in (_xls(ROWS), _xlsx(ROWS)):
+            self.assertEqual(dict(parse_station_list(data).barcode_to_names(raw=True)), {
+                " 1426218671 ": ["VD1 "],
+                "": ["VD2"],
+                "1426218672": [""],
+                "1426218673.0": ["VD4"],
+            })
+
+    def test_sub_barcode_column_takes_precedence(self):
+        rows = [("主条码", "子条码", "实验号"), ("111", "111-01", "VD1"), ("111", "111-02", "VD2")]
+        parsed = parse_station_list(_xls(rows))
+        self.assertTrue(parsed.use_sub_barcode)
+        self.assertEqual(dict(parsed.barcode_to_names()), {"111-01": ["VD1"], "111-02": ["VD2"]})
+        self.assertEqual(dict(parsed.barcode_to_names("主条码")), {"111": ["VD1", "VD2"]})
+
+
+def _excel_xlsx(first_row, rows):
+    """xlsxwriter 写出的 xlsx（共享字符串，与 Excel 另存一致）；rows 为 {行号: 行}，可跳行"""
+    buf = io.BytesIO()
+    book = xlsxwriter.Workbook(buf, {"in_memory": True})
+    sheet = book.add_worksheet()
+    date_fmt = book.add_format({"num_format": "yyyy-mm-dd"})
+    for r, row in rows.items():
+        for c, v in enumerate(row):
+            if isinstance(v, datetime):
+                sheet.write_datetime(first_row + r, c, v, date_fmt)
+            elif v is not None:
+                sheet.write(first_row + r, c, v)
+    book.close()
+    return buf.getvalue()
+
+
+class StationXlsxReaderTests(SimpleTestCase):
+    ROWS = {
+        0: ("序号", " 主条码 ", "实验号", "A&B", "子条码"),
+        1: (1, 1426218671, " VD1 ", "<x>&amp;", "1426218671-01"),
+        2: (2, "", "VD2", True, None),
+        4: (4, 1.5, datetime(2026, 1, 5, 12, 0), False, "张三"),   # 第 4 行（下标 3）为空行
+        5: (None, None, None, None, "末行"),
+    }
+
+    def _xlrd_rows(self, data):
+        sheet = xlrd.open_workbook(file_contents=data).sheet_by_index(0)
+        return [tuple(str(v) for v in sheet.row_values(r)) for r in range(sheet.nrows)]
+
+    def test_matches_xlrd(self):
+        data = _excel_xlsx(0, self.ROWS)
+        rows = list(iter_station_rows(data))
+        expected = self._xlrd_rows(data)
+        self.assertEqual(rows[0], tuple(v.strip() for v in expected[0]))
+        projection = station_parser._projection(rows[0])
+        self.assertEqual(rows[1:], [tuple(r[i] for i in projection) for r in expected[1:]])
+
+    def test_matches_openpyxl_reader(self):
+        # openpyxl 写出的是 inlineStr；第一行为空时表头为空
+        for data in (_xlsx(ROWS), _excel_xlsx(1, self.ROWS)):
+            fast = list(station_parser._iter_xlsx_fast(data))
+            slow = list(station_parser._iter_xlsx_openpyxl(data))
+            self.assertEqual(fast[1:], slow[1:])
+            self.assertEqual(fast[0], slow[0][:len(fast[0])])
+
+    def test_falls_back_to_openpyxl(self):
+        data = _xlsx(ROWS)
+        with mock.patch.object(station_parser, "_iter_xlsx_fast", side_effect=_UnsupportedXlsx("x")):
+            rows = list(iter_station_rows(data))
+        self.assertEqual(rows, list(station_parser._iter_xlsx_openpyxl(data)))
+
+    def test_benchmark_runs(self):
+        out = StringIO()
+        call_command("run_benchmarks", "station_parser", "--quick", stdout=out)
+        self.assertIn("流式 XML 扫描", out.getvalue())
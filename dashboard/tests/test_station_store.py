@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+from datetime import date
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from dashboard import station_store
+from dashboard.station_store import (
+    barcode_for_experiment, experiments_for_barcode, merge_station_pairs, station_barcode_map,
+    station_history_overlay, station_json_path, station_map_with_history,
+)
+
+DAY = "2026-01-05"
+
+
+class StationStoreTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(DOWNLOAD_ROOT=tmp.name))
+        self.enterContext(mock.patch.object(station_store, "_checked_days", set()))
+
+    def test_merge_keeps_order_and_records_conflicts(self):
+        summary = merge_station_pairs(DAY, [("111", "VD1"), ("111", "VD2"), ("222", "VD3"), ("111", "VD1")])
+        self.assertEqual((summary["added_pairs"], summary["conflicts"]), (3, 0))
+
+        # VD1 已映射到 111：不覆盖时忽略，覆盖时改映射并排到新条码末尾
+        summary = merge_station_pairs(DAY, [("333", "VD1")])
+        self.assertEqual((summary["added_pairs"], summary["conflicts"]), (0, 1))
+        self.assertEqual(barcode_for_experiment(DAY, "VD1"), "111")
+
+        merge_station_pairs(DAY, [("222", "VD1")], override=True, barcode_kind="sub")
+        self.assertEqual(experiments_for_barcode(DAY, "222"), ["VD3", "VD1"])
+        self.assertEqual(station_barcode_map(DAY), {"111": ["VD2"], "222": ["VD3", "VD1"]})
+        self.assertEqual(station_barcode_map(DAY, barcodes=["222", "999"]), {"222": ["VD3", "VD1"]})
+
+    def test_merge_does_not_export_json_by_default(self):
+        with mock.patch.object(station_store, "export_station_json") as export:
+            summary = merge_station_pairs(DAY, [("111", "VD1")])
+        export.assert_not_called()
+        self.assertFalse(summary["saved"])
+        self.assertFalse(os.path.exists(station_json_path(DAY)))
+
+    def test_export_is_opt_in(self):
+        with mock.patch.object(station_store, "STATION_JSON_EXPORT", True):
+            summary = merge_station_pairs(DAY, [("111", "VD1")])
+        self.assertTrue(summary["saved"])
+        self.assertTrue(os.path.isfile(station_json_path(DAY)))
+
+    def test_export_command_writes_legacy_format(self):
+        merge_station_pairs(DAY, [("111", "VD1"), ("111", "VD2")])
+        merge_station_pairs(DAY, [("222", "VD1")])
+        out = StringIO()
+        call_command("export_station_list", "--date", DAY, stdout=out)
+        with open(station_json_path(DAY), encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(list(data)[1:], ["warning", "主条码->实验号列表", "实验号->主条码"])
+        self.assertEqual(data["主条码->实验号列表"], {"111": ["VD1", "VD2"]})
+        self.assertEqual(data["实验号->主条码"], {"VD1": "111", "VD2": "111"})
+        self.assertEqual([w["new_main_barcode"] for w in data["warning"]], ["222"])
+
+    def test_legacy_json_is_imported_once(self):
+        path = station_json_path("2026-01-04")
+        os.makedirs(os.path.dirname(path))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"子条码->实验号列表": {"111-01": ["VD1"]}, "实验号->子条码": {"VD1": "111-01"}}, f)
+        self.assertEqual(station_barcode_map("2026-01-04"), {"111-01": ["VD1"]})
+        self.assertEqual(experiments_for_barcode("2026-01-04", "111-01"), ["VD1"])
+
+
+class StationHistoryOverlayTests(TestCase):
+    RECORD_DATE = date(2026, 1, 5)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(DOWNLOAD_ROOT=tmp.name))
+        self.enterContext(mock.patch.object(station_store, "_checked_days", set()))
+        station_store._overlays.clear()
+        self.addCleanup(station_store._overlays.clear)
+        merge_station_pairs("2026-01-04", [("111", "VD4")])
+        merge_station_pairs("2026-01-03", [("111", "VD3"), ("222", "VD3b")])
+
+    def test_nearer_days_win_and_record_date_is_excluded(self):
+        merge_station_pairs(DAY, [("333", "VD5")])
+        merge_station_pairs("2026-01-01", [("444", "VD1")])
+        overlay = station_history_overlay(self.RECORD_DATE, days=3)
+        self.assertEqual(dict(overlay), {"111": ("VD4",), "222": ("VD3b",)})
+        with self.assertRaises(TypeError):
+            overlay["999"] = ("X",)
+
+        merged = station_map_with_history(self.RECORD_DATE, {"111": ["VD5"]}, days=3)
+        self.assertEqual((merged["111"], merged["222"]), (["VD5"], ("VD3b",)))
+
+    def test_cached_until_a_covered_day_changes(self):
+        overlay = station_history_overlay(self.RECORD_DATE, days=3)
+        self.assertIs(station_history_overlay(self.RECORD_DATE, days=3), overlay)
+
+        # 窗口外的日期（当天 / 更早）有写入：沿用缓存
+        merge_station_pairs(DAY, [("333", "VD5")])
+        merge_station_pairs("2026-01-01", [("444", "VD1")])
+        self.assertIs(station_history_overlay(self.RECORD_DATE, days=3), overlay)
+
+        merge_station_pairs("2026-01-02", [("555", "VD2")])
+        added = station_history_overlay(self.RECORD_DATE, days=3)
+        self.assertIsNot(added, overlay)
+        self.assertEqual(added["555"], ("VD2",))
+
+        # 改映射（条数不变）也会重建
+        merge_station_pairs("2026-01-04", [("666", "VD4")], override=True)
+        remapped = station_history_overlay(self.RECORD_DATE, days=3)
+        self.assertIsNot(remapped, added)
+        self.assertEqual((remapped["666"], remapped["111"]), (("VD4",), ("VD3",)))
+
+    def test_cache_is_keyed_by_window(self):
+        three = station_history_overlay(self.RECORD_DATE, days=3)
+        one = station_history_overlay(self.RECORD_DATE, days=1)
+        self.assertEqual(dict(one), {"111": ("VD4",)})
+        self.assertIs(station_history_overlay(self.RECORD_DATE, days=3), three)
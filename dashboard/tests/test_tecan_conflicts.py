@@ -0,0 +1,34 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from dashboard.benchmarks import _legacy_tecan_conflicts, _tecan_run
+from dashboard.views_TecanIngest import _detect_tecan_conflicts
+
+
+class TecanConflictTests(SimpleTestCase):
+    def test_matches_legacy_rowwise_detection(self):
+        for seed in range(4):
+            for project_name in ("CA", "ZMNs", "VD"):
+                df, station_map, history_prefix_map = _tecan_run(600, seed=seed)
+                old_df, new_df = df.copy(), df.copy()
+                old = _legacy_tecan_conflicts(old_df, station_map, history_prefix_map, project_name)
+                new = _detect_tecan_conflicts(new_df, station_map, history_prefix_map, project_name)
+                with self.subTest(seed=seed, project_name=project_name):
+                    self.assertEqual(old_df["conflict_type"].tolist(), new_df["conflict_type"].tolist())
+                    for key in ("infile", "cross", "project", "dollar", "need_fix"):
+                        self.assertEqual(old[key].tolist(), new[key].tolist(), key)
+
+    def test_synthetic_run_has_every_conflict_type(self):
+        df, station_map, history_prefix_map = _tecan_run(2000)
+        masks = _detect_tecan_conflicts(df, station_map, history_prefix_map, "CA")
+        self.assertEqual(set(df["GridPos"]), {"20", "21", "22", "23", "24"})
+        self.assertEqual(set(df["conflict_type"]), {"", "文件内重复", "跨文件重复", "项目实验号冲突"})
+        self.assertTrue(masks["dollar"].any())
+        self.assertFalse((masks["need_fix"] & masks["dollar"]).any())
+
+    def test_benchmark_runs(self):
+        out = StringIO()
+        call_command("run_benchmarks", "tecan_conflicts", "--quick", stdout=out)
+        self.assertIn("_detect_tecan_conflicts", out.getvalue())
@@ -0,0 +1,116 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from dashboard.models import TecanHistoryBarcode, TecanProcessedFile
+from dashboard.tecan_history import (
+    forget_processed_file, history_first_tubes, history_main_barcodes, index_processed_file,
+)
+from dashboard.tecan_scan import parse_tecan_text, write_tecan_scan
+
+
+def _scan_text(*src_tube_ids):
+    return "Batch;1\n" + "".join(f"20;1;{i + 1};{sid}\n" for i, sid in enumerate(src_tube_ids))
+
+
+class TecanHistoryTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # MEDIA_ROOT/tecan/<YYYYMMDD>/<项目>/processed
+        self.processed_dir = os.path.join(tmp.name, "tecan", "20260105", "PCA", "processed")
+        os.makedirs(self.processed_dir)
+
+    def _write(self, name, *src_tube_ids, index=True):
+        path = os.path.join(self.processed_dir, name)
+        if index:
+            write_tecan_scan(path, parse_tecan_text(_scan_text(*src_tube_ids)))
+            index_processed_file(path)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(_scan_text(*src_tube_ids))
+        return path
+
+    def test_main_barcodes_and_first_tubes(self):
+        self._write("a.csv", "111-01", "222-01")
+        self._write("b.csv", "111-02", "333-01")
+        self.assertEqual(history_main_barcodes(self.processed_dir), {"111", "222", "333"})
+        self.assertEqual(history_first_tubes(self.processed_dir),
+                         {"111": "111-01", "222": "222-01", "333": "333-01"})
+        self.assertEqual(history_first_tubes(self.processed_dir, ["111", "999"]), {"111": "111-01"})
+
+    def test_candidate_lookup_only_queries_given_mains(self):
+        self._write("a.csv", *[f"{n}-01" for n in range(100, 160)])
+        with CaptureQueriesContext(connection) as ctx:
+            found = history_main_barcodes(self.processed_dir, ["105", "999", ""])
+        self.assertEqual(found, {"105"})
+        lookups = [q["sql"] for q in ctx.captured_queries if "dashboard_tecanhistorybarcode" in q["sql"]]
+        self.assertEqual(len(lookups), 1)
+        self.assertIn('"main_barcode" IN', lookups[0])
+        # 没有候选主码时不查条码表
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(history_main_barcodes(self.processed_dir, []), set())
+        self.assertFalse([q for q in ctx.captured_queries if "dashboard_tecanhistorybarcode" in q["sql"]])
+
+    def test_sync_picks_up_changed_new_and_removed_files(self):
+        path = self._write("a.csv", "111-01")
+        self._write("manual.csv", "444-01", index=False)        # 手工放入、未登记
+        self.assertEqual(history_main_barcodes(self.processed_dir), {"111", "444"})
+
+        with open(path, "w", encoding="utf-8") as f:              # 改写（大小变化）
+            f.write(_scan_text("555-01", "555-02"))
+        os.remove(os.path.join(self.processed_dir, "manual.csv"))
+        self.assertEqual(history_main_barcodes(self.processed_dir), {"555"})
+        self.assertEqual(TecanProcessedFile.objects.count(), 1)
+
+    def test_forget_and_empty_files(self):
+        self._write("a.csv", "111-01")
+        with open(os.path.join(self.processed_dir, "empty.csv"), "w", encoding="utf-8") as f:
+            f.write("Batch;1\n")
+        self.assertEqual(history_main_barcodes(self.processed_dir), {"111"})
+        # 空文件也登记，之后不再重复解析
+        self.assertTrue(TecanProcessedFile.objects.filter(file_name="empty.csv").exists())
+
+        forget_processed_file(self.processed_dir, "a.csv")
+        self.assertFalse(TecanHistoryBarcode.objects.filter(main_barcode="111").exists())
+
+
+class TecanResolveDuplicatesTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=tmp.name))
+        base = os.path.join(tmp.name, "tecan", "20260105", "PCA")
+        self.processed_dir = os.path.join(base, "processed")
+        os.makedirs(self.processed_dir)
+        path = os.path.join(self.processed_dir, "earlier.csv")
+        write_tecan_scan(path, parse_tecan_text(_scan_text("777-01", "888-01")))
+        index_processed_file(path)
+        with open(os.path.join(base, "scan.csv"), "w", encoding="utf-8") as f:
+            f.write(_scan_text("111-01", "111-02"))
+
+        session = self.client.session
+        session.update({"tecan_pending_file": "tecan/20260105/PCA/scan.csv", "tecan_pending_date": "20260105",
+                        "tecan_project_dir": "PCA"})
+        session.save()
+
+    def _post(self, new_value):
+        return self.client.post(reverse("TecanIngestResolve"), {
+            "rowid_0": "2", "old_0": "111-02", "confirm_old_0": "111-02", "new_0": new_value,
+        })
+
+    def test_new_main_existing_in_history_is_rejected(self):
+        with mock.patch("dashboard.views_TecanIngest.history_main_barcodes",
+                        wraps=history_main_barcodes) as lookup:
+            response = self._post("777-02")
+        # 只按本次文件的主码 + 提交的新主码点查
+        self.assertEqual(set(lookup.call_args.args[1]), {"111", "777"})
+        self.assertContains(response, "新的主码 777 已存在")
+
+    def test_new_main_in_current_file_is_rejected(self):
+        self.assertContains(self._post("111-03"), "新的主码 111 已存在")
@@ -0,0 +1,112 @@
+import math
+import os
+import tempfile
+from collections import OrderedDict
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from dashboard import tecan_scan
+from dashboard.tecan_scan import load_tecan_scan, parse_tecan_text, remember_tecan_scan, write_tecan_scan
+
+TEXT = (
+    "Batch 1;Plate 2\n"
+    "20;x;1;111-01\n"
+    "\n"
+    " 21 ; x ; 2 ; 222-02 \n"
+    "Grid;x;T;333\n"
+)
+
+
+class ParseTecanTextTests(SimpleTestCase):
+    def test_columns(self):
+        scan = parse_tecan_text(TEXT)
+        self.assertEqual(len(scan), 3)
+        self.assertEqual(scan.header_line, "Batch 1;Plate 2")
+        self.assertEqual(scan.row_ids, (1, 2, 3))
+        self.assertEqual(scan.areas, ("20", "21", "Grid"))
+        self.assertEqual(scan.src_tube_ids, ("111-01", "222-02", "333"))
+        self.assertEqual(scan.main_barcodes, ("111", "222", "333"))
+        self.assertEqual(scan.grid_pos, (20, 21, None))
+        self.assertEqual(scan.tip_numbers, (1, 2, None))
+
+    def test_frame_is_a_copy(self):
+        scan = parse_tecan_text(TEXT)
+        frame = scan.frame()
+        self.assertEqual(list(frame.columns), list(tecan_scan.FRAME_COLUMNS))
+        self.assertTrue(math.isnan(frame["GridPos"].iloc[2]))
+        frame.loc[0, "SRCTubeID"] = "changed"
+        self.assertEqual(scan.frame()["SRCTubeID"].iloc[0], "111-01")
+
+    def test_invalid_text(self):
+        for text in ("", "\n \n", "header only\n"):
+            with self.assertRaises(ValueError):
+                parse_tecan_text(text)
+
+    def test_replacements_round_trip(self):
+        scan = parse_tecan_text(TEXT)
+        fixed = scan.with_replacements({
+            2: ("222-02", "222-03"),
+            3: ("not-the-value", "999"),     # 原值不符：不替换
+            9: ("x", "y"),                   # 行号越界：忽略
+        })
+        self.assertEqual(fixed.src_tube_ids, ("111-01", "222-03", "333"))
+        self.assertEqual(fixed.main_barcodes, ("111", "222", "333"))
+        self.assertEqual(scan.src_tube_ids, ("111-01", "222-02", "333"))
+
+        text = fixed.to_csv_text()
+        self.assertEqual(text, "Batch 1;Plate 2\n20;x;1;111-01\n21;x;2;222-03\nGrid;x;T;333\n")
+        self.assertEqual(parse_tecan_text(text).fields, fixed.fields)
+
+
+class TecanScanCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "scan.csv")
+        self.enterContext(mock.patch.object(tecan_scan, "_cache", OrderedDict()))
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(TEXT)
+
+    def test_cached_until_file_changes(self):
+        scan = load_tecan_scan(self.path)
+        self.assertEqual(scan.path, self.path)
+        self.assertIs(load_tecan_scan(self.path), scan)
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("22;x;3;444-01\n")
+        reloaded = load_tecan_scan(self.path)
+        self.assertIsNot(reloaded, scan)
+        self.assertEqual(reloaded.src_tube_ids[-1], "444-01")
+
+    def test_same_size_rewrite_is_reparsed(self):
+        scan = load_tecan_scan(self.path)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(TEXT.replace("111-01", "111-09"))
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(load_tecan_scan(self.path).src_tube_ids[0], "111-09")
+        self.assertEqual(scan.src_tube_ids[0], "111-01")
+
+    def test_written_scan_is_served_without_reparsing(self):
+        fixed = load_tecan_scan(self.path).with_replacements({1: ("111-01", "111-02")})
+        out = os.path.join(os.path.dirname(self.path), "processed.csv")
+        bound = write_tecan_scan(out, fixed)
+        self.assertIsNone(fixed.path)
+        with mock.patch.object(tecan_scan, "parse_tecan_text") as parse:
+            self.assertIs(load_tecan_scan(out), bound)
+        parse.assert_not_called()
+        with open(out, encoding="utf-8") as f:
+            self.assertEqual(parse_tecan_text(f.read()).fields, fixed.fields)
+
+    def test_lru_eviction(self):
+        paths = []
+        for i in range(3):
+            path = os.path.join(os.path.dirname(self.path), f"{i}.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(TEXT)
+            paths.append(path)
+        with mock.patch.object(tecan_scan, "_TECAN_SCAN_CACHE_SIZE", 2):
+            for path in paths:
+                remember_tecan_scan(path, parse_tecan_text(TEXT))
+        self.assertEqual(list(tecan_scan._cache), paths[1:])
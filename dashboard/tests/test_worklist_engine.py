@@ -0,0 +1,292 @@
+import copy
+import json
+import os
+import re
+from collections import defaultdict, deque
+from pathlib import Path
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from dashboard import views_TecanIngest
+from dashboard.tests import legacy_worklist
+from dashboard.worklist_engine import (
+    WorklistMap, apply_worklist_map, daan_classify, daan_vial_resolver, icpms_classifier, icpms_vial_resolver,
+    nimbus_classify, nimbus_vial_resolver, standard_rule_mask, strip_key, tecan_classify,
+)
+
+# 固定的映射表 + 板，旧写法（legacy_worklist）与 worklist_engine 的结果都要与 golden 文件一致。
+# 修改用例后用 UPDATE_GOLDEN=1 重新生成（由旧写法的结果写出）。
+GOLDEN_DIR = Path(__file__).parent / "golden"
+UPDATE_GOLDEN = bool(os.environ.get("UPDATE_GOLDEN"))
+
+NAN = float("nan")
+
+# 一块板的第一列：DB / Test / STD / QC / 定位孔（X3 在板面内，X99 超出板面）/ 临床条码
+PLATE = ["DB1", "Test0", "Test1", "DB2", "STD0", "STD1", "STD2", "DB3", "QC1", "QCH", "DB4",
+         "1426200001", "X3", "X99", "1426200002", "1426200003", "QC1", "QCH", "DB5"]
+# “*”行只有可求出孔号的条码 / 定位孔和超出板面的 X99：孔号为 int / None
+CLINICAL_PLATE = ["DB1", "STD0", "1426200001", "X3", "X99", "1426200002", "DB5"]
+
+
+def _queues():
+    """Name -> 条码队列，条码 -> (孔位, 孔号) 队列；STD2 的条码没有孔位，QC1 有两支条码"""
+    name_to_barcodes = defaultdict(deque, {
+        "STD0": deque(["S0"]), "STD1": deque(["S1"]), "STD2": deque(["S2"]), "QC1": deque(["Q1", "Q1b"]),
+    })
+    barcode_to_well = defaultdict(deque, {
+        "S0": deque([("A1", 1)]), "S1": deque([("B1", 13)]), "Q1": deque([("E1", 49)]), "Q1b": deque([("F1", 61)]),
+        "1426200001": deque([("C1", 25)]), "1426200002": deque([("D1", 37), ("D2", 38)]),
+    })
+    return name_to_barcodes, barcode_to_well
+
+
+def _table(headers, names=PLATE):
+    table = pd.DataFrame(columns=headers)
+    table[headers[0]] = names
+    return table
+
+
+def _cell(v):
+    return [type(v).__name__, str(v)]
+
+
+def snapshot(table, mirror_cols=None, **queues):
+    """表的列名、dtype、逐格 (类型, 值)，以及镜像列与剩余的孔位队列"""
+    snap = {
+        "columns": [str(c) for c in table.columns],
+        "dtypes": [str(t) for t in table.dtypes],
+        "values": {str(c): [_cell(v) for v in table.iloc[:, i]] for i, c in enumerate(table.columns)},
+    }
+    if mirror_cols is not None:
+        snap["mirror_cols"] = sorted(mirror_cols)
+    for name, q in queues.items():
+        snap[name] = {k: [list(x) if isinstance(x, tuple) else x for x in v] for k, v in sorted(q.items())}
+    return snap
+
+
+class GoldenWorklistMixin:
+    platform = None
+
+    def assertMatchesGolden(self, case, legacy, engine):
+        """legacy / engine 为 snapshot；两者都要与 golden 文件中的 case 一致"""
+        path = GOLDEN_DIR / f"worklist_{self.platform.lower()}.json"
+        golden = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        if UPDATE_GOLDEN:
+            golden[case] = legacy
+            GOLDEN_DIR.mkdir(exist_ok=True)
+            path.write_text(json.dumps(golden, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+        self.assertIn(case, golden, f"{path.name} 中没有 {case}，用 UPDATE_GOLDEN=1 生成")
+        self.assertEqual(legacy, golden[case], "旧写法与 golden 不一致")
+        self.assertEqual(engine, golden[case], "worklist_engine 与 golden 不一致")
+
+
+# ============ NIMBUS / Starlet ============
+NIMBUS_HEADERS = ["SampleName", "AcqMethod", "VialPos", "SmplInjVol", "SetName", "Other"]
+NIMBUS_MAPPING = pd.DataFrame([
+    ["DB*", "M_DB", "{{Well_Number}}", 5, "*", "x"],
+    ["Test*", "M_T", "{{Well_Position}}", 5, " * ", 1],
+    ["STD*", "M_S", "{{Well_Number}}", 5, "*", 2.5],
+    ["STD2", "M_S2", "{{Well_Position}}", 5, "*", None],
+    ["QC*", "M_Q", "D3B-F8", 5, "*", "q"],
+    ["*", "M_C", "{{Well_Number}}", 5, "*", ""],
+], columns=["Key", "C1", "C2", "C3", "C4", "C5"])
+
+
+def _run_nimbus(mode, platform, instrument_name, injection_plate, names=PLATE):
+    table = _table(NIMBUS_HEADERS, names)
+    name_to_barcodes, barcode_to_well = _queues()
+    if mode == "legacy":
+        mirror_cols = legacy_worklist.legacy_nimbus_fill(
+            table, NIMBUS_MAPPING, platform=platform, instrument_name=instrument_name,
+            injection_plate=injection_plate, name_to_barcodes=name_to_barcodes, barcode_to_well=barcode_to_well,
+        )
+    else:
+        mirror_cols = apply_worklist_map(
+            WorklistMap(NIMBUS_MAPPING, nimbus_classify), table,
+            lambda key, fill: standard_rule_mask(key, fill, with_qc=False),
+            nimbus_vial_resolver(platform=platform, instrument_name=instrument_name, injection_plate=injection_plate,
+                                 name_to_barcodes=name_to_barcodes, barcode_to_well=barcode_to_well),
+        )
+    return table, snapshot(table, mirror_cols, name_to_barcodes=name_to_barcodes, barcode_to_well=barcode_to_well)
+
+
+class NimbusWorklistTests(GoldenWorklistMixin, SimpleTestCase):
+    platform = "NIMBUS"
+    CASES = {
+        "agilent_no_plate": ("Agilent", None, PLATE),
+        "thermo_p1": ("Thermo", "P1", PLATE),
+        "other_p2": ("Other", "P2", PLATE),
+        "agilent_clinical_only": ("Agilent", None, CLINICAL_PLATE),
+    }
+    LOCATOR_WELL = 27.0     # NIMBUS 定位孔从第3列纵向排：X3 -> C3
+
+    def test_golden(self):
+        for case, args in self.CASES.items():
+            with self.subTest(case):
+                self.assertMatchesGolden(case, _run_nimbus("legacy", self.platform, *args)[1],
+                                         _run_nimbus("engine", self.platform, *args)[1])
+
+    def test_integer_wells_with_none_become_float_and_nan(self):
+        # “*”行的孔号为 int，X99 超出板面为 None：Series.apply 推断为 float64，写回后为 25.0 … NaN；
+        # STD* 行只有 int，保持 int
+        table, _ = _run_nimbus("engine", self.platform, "Agilent", None, CLINICAL_PLATE)
+        vial = dict(zip(table["SampleName"], table["VialPos"]))
+        self.assertEqual(table["VialPos"].dtype, object)
+        self.assertEqual((type(vial["STD0"]), vial["STD0"]), (int, 1))
+        self.assertEqual((type(vial["1426200001"]), vial["1426200001"]), (float, 25.0))
+        self.assertEqual(vial["X3"], self.LOCATOR_WELL)
+        self.assertTrue(pd.isna(vial["X99"]))
+
+
+class StarletWorklistTests(NimbusWorklistTests):
+    platform = "Starlet"
+    LOCATOR_WELL = 15.0     # Starlet 定位孔从 B 行横向排：X3 -> B3
+
+
+# ============ 手工 ICP-MS ============
+ICPMS_HEADERS = ["样品名", "样品瓶号", "Injection volume", "Other", "SetName"]
+ICPMS_MAPPING = pd.DataFrame([
+    ["DB*", "D3B-F8", "", "x", "*"],
+    ["Test*", "D3B-F9", "", 1, "*"],
+    ["STD*", "{{Well_Number}}", "", 2.5, "*"],
+    ["QC*", "{{Well_Position}}", "", None, "*"],
+    ["QCH", "{{Well_Number}}", "", "h", "*"],
+    ["*", " {{Well_Position}} ", "", "", "*"],
+], columns=["Key", "C1", "C2", "C3", "C4"]).fillna("")
+
+
+def _run_icpms(mode, injection_vol):
+    table = _table(ICPMS_HEADERS)
+    name_to_barcodes, barcode_to_well = _queues()
+    std_names, qc_names = ["STD0", "STD1", "STD2"], ["QC1"]
+    if mode == "legacy":
+        mirror_cols = legacy_worklist.legacy_icpms_fill(
+            table, ICPMS_MAPPING, std_names_use=std_names, qc_names=qc_names, injection_vol=injection_vol,
+            injection_plate="P9", name_to_barcodes=name_to_barcodes, barcode_to_well=barcode_to_well,
+        )
+    else:
+        mirror_cols = apply_worklist_map(
+            WorklistMap(ICPMS_MAPPING, icpms_classifier(injection_vol)), table,
+            lambda key, fill: standard_rule_mask(key, fill, std_names=std_names, qc_names=qc_names),
+            icpms_vial_resolver(injection_plate="P9", name_to_barcodes=name_to_barcodes,
+                                barcode_to_well=barcode_to_well),
+        )
+    return table, snapshot(table, mirror_cols, name_to_barcodes=name_to_barcodes, barcode_to_well=barcode_to_well)
+
+
+class IcpmsWorklistTests(GoldenWorklistMixin, SimpleTestCase):
+    platform = "ICPMS"
+
+    def test_golden(self):
+        for case, injection_vol in {"mapping_volume": "", "configured_volume": "10"}.items():
+            with self.subTest(case):
+                self.assertMatchesGolden(case, _run_icpms("legacy", injection_vol)[1],
+                                         _run_icpms("engine", injection_vol)[1])
+
+
+# ============ 达安 ============
+DAAN_HEADERS = ["SampleName", "Vial position", "SmplInjVol", "Other", "SetName"]
+DAAN_MAPPING = pd.DataFrame([
+    [" DB* ", "{{Well_Number}}", 5, "x", "*"],
+    ["Test*", "{{Well_Position}}", 5, 1, "*"],
+    ["STD*", " {{Well_Number}} ", 5, None, "*"],
+    ["QC1", "{{Well_Position}}", 5, 2.5, "*"],
+    ["*", "{{Well_Number}}", 5, NAN, "*"],
+], columns=["Key", "C1", "C2", "C3", "C4"])
+
+
+def _daan_format(instrument_name, injection_plate):
+    def format_well(well, mode):
+        well = str(well or "").strip().upper()
+        m = re.fullmatch(r"([A-H])([1-9]|1[0-2])", well)
+        well_no = (ord(m.group(1)) - 65) * 12 + int(m.group(2)) if m else 1
+        if instrument_name in ("Thermo", "Agilent"):
+            if mode == "{{Well_Number}}":
+                return f"{injection_plate}:{well_no}" if injection_plate else well_no
+            return f"{injection_plate}-{well}" if injection_plate else well
+        return well_no if mode == "{{Well_Number}}" else well
+    return format_well
+
+
+def _name_to_wells():
+    return defaultdict(deque, {
+        "STD0": deque(["A1"]), "STD1": deque(["b5"]), "QC1": deque(["H12", ""]),
+        "1426200001": deque(["C1"]), "1426200002": deque(["Z9"]), "X3": deque(["C3"]),
+    })
+
+
+def _run_daan(mode, instrument_name, injection_plate):
+    table = _table(DAAN_HEADERS)
+    name_to_wells = _name_to_wells()
+    format_well = _daan_format(instrument_name, injection_plate)
+    if mode == "legacy":
+        mirror_cols = legacy_worklist.legacy_daan_fill(table, DAAN_MAPPING, name_to_wells=name_to_wells,
+                                                       _format_vialpos=format_well)
+    else:
+        mirror_cols = apply_worklist_map(
+            WorklistMap(DAAN_MAPPING, daan_classify, key=strip_key), table,
+            lambda key, fill: standard_rule_mask(key, fill, single_column=False),
+            daan_vial_resolver(name_to_wells=name_to_wells, format_well=format_well),
+        )
+    return table, snapshot(table, mirror_cols, name_to_wells=name_to_wells)
+
+
+class DaanWorklistTests(GoldenWorklistMixin, SimpleTestCase):
+    platform = "Daan"
+
+    def test_golden(self):
+        for case, (instrument_name, injection_plate) in {"thermo_p1": ("Thermo", "P1"), "other": ("Other", "")}.items():
+            with self.subTest(case):
+                self.assertMatchesGolden(case, _run_daan("legacy", instrument_name, injection_plate)[1],
+                                         _run_daan("engine", instrument_name, injection_plate)[1])
+
+
+# ============ Tecan ============
+TECAN_HEADERS = ["SampleName", "Well_Number", "Well_Position", "SetName", "OutputFile", "Other"]
+TECAN_MAPPING = pd.DataFrame([
+    ["DB*", "{{Well_Number}}", "{{Well_Position}}", "*", "o", "x"],
+    ["test*", "{{Well_Number}}", "{{Well_Position}}", "*", "o", 1],
+    ["STD1", "{{Well_Number}}", "{{Well_Position}}", "*", "o", 2.5],
+    ["X3", "{{Well_Number}}", "{{Well_Position}}", "*", "o", "loc"],
+    ["*", "{{Well_Number}}", "{{Well_Position}}", "*", "o", None],
+], columns=TECAN_HEADERS)
+TECAN_PLATE = PLATE[:12] + ["X3"] + PLATE[12:]      # 同名定位孔行（与原实现一致：多列时全部删除）
+TECAN_LOCATOR = {"display_name": "X3", "well_pos": "C3", "well_num": 27}
+
+
+def _run_tecan(mode, instrument_name, injection_plate, project_name):
+    table = _table(TECAN_HEADERS, TECAN_PLATE)
+    name_to_barcodes, barcode_to_well = _queues()
+    if mode == "legacy":
+        fn, mapping = legacy_worklist.legacy_tecan_apply_mapping, TECAN_MAPPING
+    else:
+        fn, mapping = views_TecanIngest._apply_mapping_to_table, WorklistMap(TECAN_MAPPING, tecan_classify, key=strip_key)
+    out = fn(mapping, table, name_to_barcodes=name_to_barcodes, barcode_to_well=barcode_to_well,
+             locator_info=copy.deepcopy(TECAN_LOCATOR), project_name=project_name,
+             injection_plate=injection_plate, instrument_name=instrument_name, set_name="S1", output_file="O1")
+    return out, snapshot(out, name_to_barcodes=name_to_barcodes, barcode_to_well=barcode_to_well)
+
+
+class TecanWorklistTests(GoldenWorklistMixin, SimpleTestCase):
+    platform = "Tecan"
+    CASES = {
+        "other_ca": ("Other", None, "CA"),
+        "thermo_pca": ("Thermo", "P1", "PCA"),
+        "agilent_no_plate_zmn": ("Agilent", None, "ZMN"),
+    }
+
+    def test_golden(self):
+        for case, args in self.CASES.items():
+            with self.subTest(case):
+                self.assertMatchesGolden(case, _run_tecan("legacy", *args)[1], _run_tecan("engine", *args)[1])
+
+    def test_integer_wells_with_none_become_float_and_nan(self):
+        # “*”行：STD0 孔号 1，QCH / 1426200003 取不到孔位为 None：Series.apply 得 1.0 / NaN，最后 fillna("")；
+        # DB 行只有 int 1，保持 int
+        out, _ = _run_tecan("engine", "Other", None, "CA")
+        wells = dict(zip(out["SampleName"], out["Well_Number"]))
+        self.assertEqual((type(wells["DB1"]), wells["DB1"]), (int, 1))
+        self.assertEqual((type(wells["STD0"]), wells["STD0"]), (float, 1.0))
+        self.assertEqual(wells["QCH"], "")
+        self.assertEqual(wells["1426200003"], "")
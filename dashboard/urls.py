@@ -40,6 +40,7 @@ urlpatterns = [
 
     path('dashboard/file_download/', views.file_download, name='file_download'),  # 文件下载
     path('dashboard/file_download_history/', views.file_download_history, name='file_download_history'),  # 历史文件下载
+    path('dashboard/file_download_tree/', views.file_download_tree_api, name='file_download_tree_api'),  # 文件下载树按需加载
     path('dashboard/file_replace/', login_required(views.file_replace), name='file_replace'), # 文件替换
     path("dashboard/file_replace_sampled_codes/", views.file_replace_sampled_codes, name="file_replace_sampled_codes"),
     
@@ -49,6 +50,7 @@ urlpatterns = [
         name="download_export",
     ),
     path("dashboard/export_files/", views.export_files, name="export_files"),
+    path("dashboard/pdf_job_status/", views.pdf_job_status, name="pdf_job_status"),  # PDF 后台任务进度
 
     path("preview_export/", views.preview_export, name="preview_export"),
 
@@ -4,11 +4,11 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 
-from django.views.decorators.http import require_POST,require_GET
+from django.views.decorators.http import require_POST,require_GET,etag
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import *
-from django.http import JsonResponse,HttpResponseRedirect,HttpResponse, HttpResponseBadRequest,FileResponse, Http404
+from django.http import JsonResponse,HttpResponseRedirect,HttpResponse, HttpResponseBadRequest,FileResponse, Http404, StreamingHttpResponse
 from django.conf import settings
 from django.template.loader import render_to_string,get_template
 from django.core.files.storage import default_storage
@@ -18,6 +18,36 @@ from django.utils.encoding import escape_uri_path
 from django.urls import reverse
 from django.db.models import Q
 from .forms import *
+from .instrument_templates import (
+    get_template_descriptor, build_template_descriptor, require_strict_encoding, TemplateParseError,
+)
+from .pdf_jobs import (
+    enqueue_pdf_job, job_status_dict, render_pdf_html, create_claimed_job, render_jobs_in_pool, all_jobs_done,
+    PDF_RENDER_ASYNC,
+)
+from .mapping_cache import MappingBundle, get_mapping_bundle, invalidate_mapping_cache
+from .payload_store import stash_session_payload, get_session_payload
+from .artifact_index import (
+    HISTORY_DIRNAME, STATION_DIRNAME, STARLET_CATEGORIES,
+    record_artifact, move_artifact, ensure_artifact_index, list_artifacts,
+    artifact_platforms, artifact_dates, artifact_day, find_artifact_path, artifact_paths_by_kind,
+    payload_sampled_codes, daily_sampled_codes, sampled_codes_version,
+)
+from .barcode_history import (
+    split_main_sub_barcode as _split_main_sub_barcode, main_barcode_history, index_payload_barcodes,
+)
+from .station_store import (
+    merge_station_pairs, experiments_for_barcode, barcode_for_experiment, station_map_with_history,
+)
+from .station_mirror import mirrored_station_file, mirrored_station_name
+from .station_parser import parse_station_list, parse_station_upload
+from .sample_records import (
+    make_sample_row, save_plate_records, search_sample_records, daily_sample_stats, SEARCH_DEFAULT_LIMIT,
+)
+from .worklist_engine import (
+    WorklistMap, apply_worklist_map, standard_rule_mask, nimbus_classify, icpms_classifier, daan_classify,
+    strip_key, nimbus_vial_resolver, icpms_vial_resolver, daan_vial_resolver,
+)
 
 import xlrd
 import math
@@ -28,7 +58,9 @@ import pandas as pd
 pd.set_option('display.max_rows', None)
 pd.set_option('future.no_silent_downcasting', True)
 
-import os, io, logging
+import os, io, logging, threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import re
 import json
 from io import StringIO,BytesIO
@@ -345,6 +377,7 @@ def Starlet_qyzl(request):
         save_path = os.path.join(save_dir, file_name)
         with open(save_path, "wb") as f:
             f.write(output_stream.getvalue())
+        record_artifact(save_path)
 
         # 生成“文件下载”页 URL（若你的 urls.py 没给这个路由起名，可直接用硬编码 '/dashboard/file_download/'）
         try:
@@ -393,128 +426,12 @@ def sample_search_stats_today(request):
     统计口径和你给的 statistics(process_data) 基本一致：
       - 每个项目：根据 sample_name 自动提取字母前缀，或使用项目定制前缀集
       - 统计：实验号总数、起始/末尾实验号、空号（含区间描述）、共血、多血
+    具体计算见 sample_records.daily_sample_stats（单次遍历 + 按日缓存）。
     """
     today = datetime.now().date()
-    qs = SampleRecord.objects.filter(record_date=today)
-
-    # 若当天无数据，直接返回空结果
-    if not qs.exists():
-        return JsonResponse({"today_date": today.strftime("%Y-%m-%d"), "projects": []})
-
-    # 可选：按项目设定“允许前缀”集合；项目未配置时自动从数据中抽取
-    allowed_prefix_map = {
-        "VAE": {"AE", "VF", "V", "ST"},
-        "VD":  {"VD", "VF", "V", "YVD", "ST"},
-        # 其他项目留空 → 自动提取
-    }
-
-    def process_project(records, allowed_prefixes=None):
-        """
-        records: 当个项目的 Queryset
-        allowed_prefixes: set[str] | None
-        返回：与示例一致的列表
-        """
-        # 收集候选 sample_name（兼容 'AE1234-VD5678' 这种 "-" 连接的情况）
-        sample_names = []
-        for r in records:
-            if r.sample_name:
-                parts = str(r.sample_name).split('-')
-                if parts:
-                    sample_names.append(parts[0])
-                    if len(parts) > 1:
-                        sample_names.append(parts[1])
-
-        # 自动提取所有(字母+数字)的字母前缀，如 "VD123" → "VD"
-        detected_prefixes = set()
-        for name in sample_names:
-            m = re.match(r"^[A-Za-z]+(?=\d)", str(name))
-            if m:
-                detected_prefixes.add(m.group())
-
-        # 选择要使用的前缀集合
-        prefixes = allowed_prefixes if allowed_prefixes else detected_prefixes
-
-        # ★ 新增：统计时剔除 QC / STD 前缀
-        prefixes = {p for p in prefixes if p not in {"QC", "STD"}}
-
-        # 构造“条码→样本名集合”、“样本名→出现次数”，用于“共血/多血”
-        barcode_to_samples = defaultdict(set)
-        sample_count = defaultdict(int)
-        for r in records:
-            name_head = str(r.sample_name).split('-')[0] if r.sample_name else ""
-            barcode_to_samples[r.barcode].add(name_head)
-            sample_count[name_head] += 1
-
-        # 生成统计行
-        result_rows = []
-        for prefix in sorted(prefixes):
-            # 仅统计纯 '前缀+数字' 的样本名
-            matching = [n for n in sample_names if re.fullmatch(fr"{prefix}\d+", str(n))]
-
-            nums = sorted(
-                int(re.sub(r"^[A-Za-z]+", "", n))
-                for n in matching
-                if re.sub(r"^[A-Za-z]+", "", n).isdigit()
-            )
-
-            total = len(matching)
-            start_number = f"{prefix}{nums[0]}" if nums else None
-            end_number   = f"{prefix}{nums[-1]}" if nums else None
-
-            # 空号（找缺口）
-            missing_ranges = []
-            empty_count = 0
-            for i in range(len(nums) - 1):
-                gap = nums[i+1] - nums[i] - 1
-                if gap > 0:
-                    empty_count += gap
-                    if gap == 1:
-                        missing_ranges.append(f"{prefix}{nums[i] + 1}")
-                    else:
-                        missing_ranges.append(f"{prefix}{nums[i]+1}-{prefix}{nums[i+1]-1}")
-            empty_info = ", ".join(missing_ranges)
-
-            # 共血：同一个样本名映射多个条码（以样本名匹配、条码计数>1）
-            shared_blood_samples = [
-                name for name, barcodes in barcode_to_samples.items()
-                if len(barcodes) > 1 and re.fullmatch(fr"{prefix}\d+", str(name))
-            ]
-            shared_blood_info  = ", ".join(sorted(set(shared_blood_samples)))
-            shared_blood_count = len(set(shared_blood_samples))
-
-            # 多血：同一个样本名在当天记录出现多次（>1）
-            multi_blood_samples = [
-                name for name, cnt in sample_count.items()
-                if cnt > 1 and re.fullmatch(fr"{prefix}\d+", str(name))
-            ]
-            multi_blood_info  = ", ".join(sorted(set(multi_blood_samples)))
-            multi_blood_count = len(set(multi_blood_samples))
-
-            result_rows.append({
-                "prefix":      prefix,
-                "total":       total,
-                "start":       start_number,
-                "end":         end_number,
-                "empty":       f"{empty_count}（{empty_info}）" if empty_count else "0",
-                "sharedBlood": f"{shared_blood_count}（{shared_blood_info}）" if shared_blood_count else "0",
-                "multiBlood":  f"{multi_blood_count}（{multi_blood_info}）" if multi_blood_count else "0",
-            })
-        return result_rows
-
-    # 分项目统计
-    projects_payload = []
-    for proj in qs.values_list("project_name", flat=True).distinct().order_by("project_name"):
-        proj_qs = qs.filter(project_name=proj)
-        prefixes = allowed_prefix_map.get(proj)  # 未配置则为 None → 自动检测
-        stats = process_project(proj_qs, prefixes)
-        projects_payload.append({
-            "project_name": proj,
-            "statistics": stats
-        })
-
     return JsonResponse({
         "today_date": today.strftime("%Y-%m-%d"),
-        "projects": projects_payload
+        "projects": daily_sample_stats(today),
     })
 
 DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
@@ -553,6 +470,9 @@ def _should_hide_in_download_page(fname: str) -> bool:
     # 兼容两种：固定名 payload.json / 以及你们这种 *.payload.json
     if lower == "payload.json" or lower.endswith(".payload.json"):
         return True
+    # 后台正在写入的临时文件（PDF 任务 / payload 原子替换）
+    if lower.endswith(".tmp"):
+        return True
     return False
 
 
@@ -574,8 +494,6 @@ def file_sort_key(fname: str):
     # 3) 最后用文件名兜底，保证稳定排序
     return (ts, kind, fname)
 
-HISTORY_DIRNAME = "历史文件"
-STATION_DIRNAME = "岗位清单"
 
 # 从 OnboardingList 文件名中提取项目名，例如：
 # X6_OnboardingList_FXS-YZ04_S2_25OHD_20260108_060259_X6_GZ.txt -> 25OHD
@@ -589,60 +507,19 @@ def _extract_project_from_onboarding_filename(fname: str) -> str:
 # ========== 新增：自动抓取网络路径岗位清单 ==========
 def _auto_fetch_station_list(today_str: str):
     """
-    自动从局域网共享路径读取当天日期下时间戳最新的岗位清单文件。
-    路径：\\\\10.10.18.70\\00-标本签收与领取\\2026\\共同岗位清单
+    读取当天日期下时间戳最新的共同岗位清单文件。
+    共享目录（STATION_NETWORK_DIR）由后台 watcher 镜像到本地，这里只读本地镜像，见 station_mirror。
     文件名格式：共同岗位清单{YYYYMMDD}_{HHMM}.xlsx
 
     返回：(file_bytes: bytes, filename: str) 成功
           (None, None) 失败（任何原因均静默失败，回退到手动上传）
     """
-    import re as _re
-
-    STATION_NETWORK_DIR = r"\\10.10.18.70\00-标本签收与领取\2026\共同岗位清单"
-    pattern = _re.compile(
-        r"^共同岗位清单" + _re.escape(today_str) + r"_(\d{4})\.(xlsx|xls)$",
-        _re.IGNORECASE,
-    )
-
-    try:
-        entries = os.listdir(STATION_NETWORK_DIR)
-    except Exception as e:
-        logging.getLogger(__name__).warning(
-            "[auto_station] 无法访问网络路径: %s, 原因: %s", STATION_NETWORK_DIR, e
-        )
-        return None, None
-
-    # 筛选当天文件，提取时间戳(HHMM)并取最大值（最新）
-    candidates = []
-    for name in entries:
-        m = pattern.match(name)
-        if m:
-            time_part = m.group(1)   # 如 "0902"
-            candidates.append((time_part, name))
-
-    if not candidates:
-        logging.getLogger(__name__).warning(
-            "[auto_station] 未找到当天(%s)的岗位清单文件", today_str
-        )
-        return None, None
-
-    # 按时间戳字符串排序，取最后一个（最新）
-    candidates.sort(key=lambda x: x[0])
-    latest_time, latest_name = candidates[-1]
-    latest_path = os.path.join(STATION_NETWORK_DIR, latest_name)
-
-    try:
-        with open(latest_path, "rb") as f:
-            file_bytes = f.read()
-        logging.getLogger(__name__).info(
-            "[auto_station] 自动读取成功: %s", latest_path
-        )
-        return file_bytes, latest_name
-    except Exception as e:
+    file_bytes, filename = mirrored_station_file(today_str)
+    if not filename:
         logging.getLogger(__name__).warning(
-            "[auto_station] 读取文件失败: %s, 原因: %s", latest_path, e
+            "[auto_station] 未找到当天(%s)的岗位清单镜像（请确认 watch_station_list 正在运行）", today_str
         )
-        return None, None
+    return file_bytes, filename
 
 
 @require_GET
@@ -659,7 +536,8 @@ def check_station_auto(request):
     else:
         today_str = timezone.localtime().strftime("%Y%m%d")
 
-    _, filename = _auto_fetch_station_list(today_str)
+    # 只看镜像清单，不读文件内容
+    filename = mirrored_station_name(today_str)
     if filename:
         return JsonResponse({"found": True, "filename": filename})
     return JsonResponse({"found": False, "filename": None})
@@ -687,132 +565,144 @@ def _map_to_station_experiment(value: str, station_map: dict) -> tuple[bool, str
     return True, v, False
 
 
-def file_download(request):
-    """
-    展示 downloads 目录结构。
-    - 通用：平台 / 日期 / 项目 / 文件
-    - Starlet：平台 / {工作清单和上机列表 | 取样指令} / 日期 / (项目?) / 文件
-    """
-    root = settings.DOWNLOAD_ROOT
-    os.makedirs(root, exist_ok=True)
+_FORCE_DOWNLOAD_EXTS = (".pdf", ".txt", ".xlsx", ".xls", ".csv")
 
-    groups = []  # 输出给模板
+# 文件下载页首屏展示最近多少天（更早的日期由前端按需分页加载）
+DOWNLOAD_PAGE_RECENT_DAYS = getattr(settings, "DOWNLOAD_PAGE_RECENT_DAYS", 7)
 
-    for platform in sorted(os.listdir(root)):  # 平台层
-        # ✅ 新增：跳过历史文件目录和岗位清单目录（避免在主文件下载页显示）
-        if platform == HISTORY_DIRNAME or platform == STATION_DIRNAME: 
-            continue
+# 按需加载时每页日期数
+DOWNLOAD_TREE_DATES_PER_PAGE = 20
 
-        p_path = os.path.join(root, platform)
-        if not os.path.isdir(p_path):
+
+def _download_day_node(date_name: str, rows: list[dict], hide_internal: bool) -> dict:
+    """由某个日期下的文件记录组装日期节点：有项目层时为 projects，否则为 files（取样指令）"""
+    projects = defaultdict(list)
+    loose_files = []
+    for a in rows:
+        files = projects[a["project"]] if a["project"] else loose_files   # 项目层即使文件全被隐藏也保留
+        fname = a["file_name"]
+        if hide_internal and _should_hide_in_download_page(fname):
             continue
+        files.append({
+            "name": fname,
+            "url": f"{settings.DOWNLOAD_URL}{a['rel_path']}",
+            "force_download": fname.lower().endswith(_FORCE_DOWNLOAD_EXTS),
+        })
 
-        # —— Starlet：多一层“类别”（工作清单和上机列表 / 取样指令）——
-        if platform == "Starlet":
-            category_names = ["工作清单和上机列表", "取样指令"]
-            categories = []
+    if projects:
+        return {"date": date_name, "projects": [
+            {"name": proj, "files": sorted(files, key=lambda f: file_sort_key(f["name"]))}
+            for proj, files in sorted(projects.items())
+        ]}
+    # 无项目层：平台 / 类别 / 日期 / 文件（用于“取样指令”）
+    return {"date": date_name, "files": sorted(loose_files, key=lambda f: f["name"])}
 
-            for cat in category_names:
-                c_path = os.path.join(p_path, cat)
-                if not os.path.isdir(c_path):
-                    continue
 
-                days = []
-                # 日期倒序
-                for date_name in sorted(os.listdir(c_path), reverse=True):
-                    d_path = os.path.join(c_path, date_name)
-                    if not (DATE_RE.match(date_name) and os.path.isdir(d_path)):
-                        continue
-
-                    # 判断“日期目录”下面是否还有项目层
-                    proj_dirs = sorted([
-                        s for s in os.listdir(d_path)
-                        if os.path.isdir(os.path.join(d_path, s))
-                    ])
-
-                    if proj_dirs:
-                        # 有项目层：平台 / 类别 / 日期 / 项目 / 文件
-                        projects = []
-                        for proj in proj_dirs:
-                            proj_path = os.path.join(d_path, proj)
-                            files = []
-                            for fname in sorted(os.listdir(proj_path), key=file_sort_key):
-                                if _should_hide_in_download_page(fname):    # ✅ 新增：隐藏 payload.json
-                                    continue
-
-                                fpath = os.path.join(proj_path, fname)
-                                ext = fname.lower()
-                                if not os.path.isfile(fpath):
-                                    continue
-
-                                files.append({
-                                    "name": fname,
-                                    "url": f"{settings.DOWNLOAD_URL}{platform}/{cat}/{date_name}/{proj}/{fname}",
-                                    "force_download": ext.endswith((".pdf", ".txt", ".xlsx", ".xls", ".csv")),
-                                })
-                            projects.append({"name": proj, "files": files})
-
-                        days.append({"date": date_name, "projects": projects})
+def _build_download_groups(section: str, date_from: str = "") -> list[dict]:
+    """
+    由下载文件索引（DownloadArtifact）组装页面数据，结构与原先逐层扫描目录的结果一致：
+      - 通用：平台 / 日期 / 项目 / 文件
+      - Starlet：平台 / 类别 / 日期 / (项目?) / 文件
+    主下载页（main）隐藏 payload.json 等内部文件；历史文件页全部展示。
+    date_from 给定时只展开该日期（含）之后的日期，更早的由 file_download_tree_api 按需加载。
+    """
+    ensure_artifact_index()
+    hide_internal = section == "main"
 
-                    else:
-                        # 无项目层：平台 / 类别 / 日期 / 文件（用于“取样指令”）
-                        files = []
-                        for fname in sorted(os.listdir(d_path)):
-                            if _should_hide_in_download_page(fname):    # ✅ 新增
-                                continue
-
-                            fpath = os.path.join(d_path, fname)
-                            ext = fname.lower() 
-
-                            if not os.path.isfile(fpath):
-                                continue
-                            files.append({
-                                "name": fname,
-                                "url": f"{settings.DOWNLOAD_URL}{platform}/{cat}/{date_name}/{fname}",
-                                "force_download": ext.endswith((".pdf", ".txt", ".xlsx", ".xls", ".csv")),
-                            })
-                        days.append({"date": date_name, "files": files})
-
-                categories.append({"category": cat, "days": days})
+    # (platform, category) -> date -> [rows]
+    tree = defaultdict(lambda: defaultdict(list))
+    for platform, category in artifact_platforms(section) if date_from else ():
+        tree[(platform, category)]    # 近期没有文件的平台也要显示，便于加载更早日期
+    for a in list_artifacts(section, date_from=date_from):
+        tree[(a["platform"], a["category"])][a["date_name"]].append(a)
 
-            groups.append({"group": platform, "categories": categories})
-            continue  # Starlet 处理完，跳到下一个平台
+    def _days(date_map):
+        return [_download_day_node(d, date_map[d], hide_internal) for d in sorted(date_map, reverse=True)]   # 日期倒序
 
-        # —— 其他平台（沿用旧三层）：平台 / 日期 / 项目 / 文件 ——
-        days = []
-        for date_name in sorted(os.listdir(p_path), reverse=True):
-            d_path = os.path.join(p_path, date_name)
-            if not (DATE_RE.match(date_name) and os.path.isdir(d_path)):
-                continue
+    def _older(platform, category):
+        return {"platform": platform, "category": category, "before": date_from} if date_from else None
 
-            projects = []
-            for proj in sorted(os.listdir(d_path)):
-                proj_path = os.path.join(d_path, proj)
-                if not os.path.isdir(proj_path):
-                    continue
+    groups = []
+    for platform in sorted({p for p, _ in tree}):
+        if platform == "Starlet":
+            categories = [
+                {"category": cat, "days": _days(tree[(platform, cat)]), "older": _older(platform, cat)}
+                for cat in STARLET_CATEGORIES if (platform, cat) in tree
+            ]
+            groups.append({"group": platform, "categories": categories})
+        else:
+            groups.append({"group": platform, "days": _days(tree[(platform, "")]), "older": _older(platform, "")})
+    return groups
 
-                files = []
-                for fname in sorted(os.listdir(proj_path), key=file_sort_key):
-                    if _should_hide_in_download_page(fname):    # ✅ 新增
-                        continue
 
-                    fpath = os.path.join(proj_path, fname)
-                    ext = fname.lower()
-                    if not os.path.isfile(fpath):
-                        continue
-                    files.append({
-                        "name": fname,
-                        "url": f"{settings.DOWNLOAD_URL}{platform}/{date_name}/{proj}/{fname}",
-                        "force_download": ext.endswith((".pdf", ".txt", ".xlsx", ".xls", ".csv")),
-                    })
+def file_download(request):
+    """
+    展示 downloads 目录结构（从下载文件索引渲染，见 artifact_index）。
+    - 通用：平台 / 日期 / 项目 / 文件
+    - Starlet：平台 / {工作清单和上机列表 | 取样指令} / 日期 / (项目?) / 文件
+    首屏只展开最近 DOWNLOAD_PAGE_RECENT_DAYS 天，更早的日期在页面上点击“加载更早日期”时再取。
+    """
+    os.makedirs(settings.DOWNLOAD_ROOT, exist_ok=True)
+    date_from = (timezone.localdate() - timedelta(days=DOWNLOAD_PAGE_RECENT_DAYS - 1)).strftime("%Y-%m-%d")
+    groups = _build_download_groups("main", date_from=date_from)
+    return render(request, "dashboard/file_download.html", {
+        "groups": groups,
+        "recent_days": DOWNLOAD_PAGE_RECENT_DAYS,
+    })
 
-                projects.append({"name": proj, "files": files})
 
-            days.append({"date": date_name, "projects": projects})
+@require_GET
+def file_download_tree_api(request):
+    """
+    文件下载树按需加载：
+      - level=platforms                                  ：平台（及 Starlet 类别）列表
+      - level=dates&platform=&category=&before=&limit=   ：日期（新的在前，before 之前分页）
+      - level=day&platform=&category=&date=              ：展开某个日期时取项目 / 文件
+      - section=main|history（默认 main）
+    """
+    section = request.GET.get("section", "main")
+    if section not in ("main", "history"):
+        return JsonResponse({"ok": False, "message": "section 参数无效"}, status=400)
+    level = request.GET.get("level", "platforms")
+    platform = request.GET.get("platform", "").strip()
+    category = request.GET.get("category", "").strip()
+
+    ensure_artifact_index()
+
+    if level == "platforms":
+        nodes = defaultdict(list)
+        for p, c in artifact_platforms(section):
+            if c:
+                nodes[p].append(c)
+            else:
+                nodes.setdefault(p, [])
+        return JsonResponse({"ok": True, "platforms": [
+            {"platform": p, "categories": [c for c in STARLET_CATEGORIES if c in cats]}
+            for p, cats in sorted(nodes.items())
+        ]})
+
+    if not platform:
+        return JsonResponse({"ok": False, "message": "缺少 platform 参数"}, status=400)
+
+    if level == "dates":
+        before = request.GET.get("before", "").strip()
+        if before and not DATE_RE.match(before):
+            return JsonResponse({"ok": False, "message": "before 参数格式应为 YYYY-MM-DD"}, status=400)
+        try:
+            limit = max(1, min(int(request.GET.get("limit") or DOWNLOAD_TREE_DATES_PER_PAGE), 100))
+        except ValueError:
+            return JsonResponse({"ok": False, "message": "limit 参数无效"}, status=400)
+        dates, next_before = artifact_dates(section, platform, category, before=before, limit=limit)
+        return JsonResponse({"ok": True, "dates": dates, "next_before": next_before, "has_more": bool(next_before)})
 
-        groups.append({"group": platform, "days": days})
+    if level == "day":
+        date_name = request.GET.get("date", "").strip()
+        if not DATE_RE.match(date_name):
+            return JsonResponse({"ok": False, "message": "date 参数格式应为 YYYY-MM-DD"}, status=400)
+        rows = artifact_day(section, platform, category, date_name)
+        return JsonResponse({"ok": True, **_download_day_node(date_name, rows, section == "main")})
 
-    return render(request, "dashboard/file_download.html", {"groups": groups})
+    return JsonResponse({"ok": False, "message": "level 参数无效"}, status=400)
 
 
 def file_download_history(request):
@@ -820,176 +710,35 @@ def file_download_history(request):
     展示历史文件目录结构：DOWNLOAD_ROOT/历史文件/...
     结构与 file_download() 保持一致，便于复用模板渲染。
     """
-    root = settings.DOWNLOAD_ROOT
-    os.makedirs(root, exist_ok=True)
-
-    hist_root = os.path.join(root, HISTORY_DIRNAME)
-    os.makedirs(hist_root, exist_ok=True)
-
-    groups = []
-
-    for platform in sorted(os.listdir(hist_root)):  # 历史平台层
-        p_path = os.path.join(hist_root, platform)
-        if not os.path.isdir(p_path):
-            continue
-
-        # —— Starlet：多一层“类别”（工作清单和上机列表 / 取样指令）——
-        if platform == "Starlet":
-            category_names = ["工作清单和上机列表", "取样指令"]
-            categories = []
-
-            for cat in category_names:
-                c_path = os.path.join(p_path, cat)
-                if not os.path.isdir(c_path):
-                    continue
-
-                days = []
-                for date_name in sorted(os.listdir(c_path), reverse=True):
-                    d_path = os.path.join(c_path, date_name)
-                    if not (DATE_RE.match(date_name) and os.path.isdir(d_path)):
-                        continue
-
-                    proj_dirs = sorted([
-                        s for s in os.listdir(d_path)
-                        if os.path.isdir(os.path.join(d_path, s))
-                    ])
-
-                    if proj_dirs:
-                        projects = []
-                        for proj in proj_dirs:
-                            proj_path = os.path.join(d_path, proj)
-                            files = []
-                            for fname in sorted(os.listdir(proj_path), key=file_sort_key):
-                                fpath = os.path.join(proj_path, fname)
-                                ext = fname.lower()
-                                if not os.path.isfile(fpath):
-                                    continue
-                                files.append({
-                                    "name": fname,
-                                    "url": f"{settings.DOWNLOAD_URL}{HISTORY_DIRNAME}/{platform}/{cat}/{date_name}/{proj}/{fname}",
-                                    "force_download": ext.endswith((".pdf", ".txt", ".xlsx", ".xls", ".csv")),
-                                })
-                            projects.append({"name": proj, "files": files})
-                        days.append({"date": date_name, "projects": projects})
-                    else:
-                        files = []
-                        for fname in sorted(os.listdir(d_path)):
-                            fpath = os.path.join(d_path, fname)
-                            ext = fname.lower()
-                            if not os.path.isfile(fpath):
-                                continue
-                            files.append({
-                                "name": fname,
-                                "url": f"{settings.DOWNLOAD_URL}{HISTORY_DIRNAME}/{platform}/{cat}/{date_name}/{fname}",
-                                "force_download": ext.endswith((".pdf", ".txt", ".xlsx", ".xls", ".csv")),
-                            })
-                        days.append({"date": date_name, "files": files})
-
-                categories.append({"category": cat, "days": days})
-
-            groups.append({"group": platform, "categories": categories})
-            continue
-
-        # —— 其他平台（旧三层）：平台 / 日期 / 项目 / 文件 ——
-        days = []
-        for date_name in sorted(os.listdir(p_path), reverse=True):
-            d_path = os.path.join(p_path, date_name)
-            if not (DATE_RE.match(date_name) and os.path.isdir(d_path)):
-                continue
-
-            projects = []
-            for proj in sorted(os.listdir(d_path)):
-                proj_path = os.path.join(d_path, proj)
-                if not os.path.isdir(proj_path):
-                    continue
-
-                files = []
-                for fname in sorted(os.listdir(proj_path), key=file_sort_key):
-                    fpath = os.path.join(proj_path, fname)
-                    ext = fname.lower()
-                    if not os.path.isfile(fpath):
-                        continue
-                    files.append({
-                        "name": fname,
-                        "url": f"{settings.DOWNLOAD_URL}{HISTORY_DIRNAME}/{platform}/{date_name}/{proj}/{fname}",
-                        "force_download": ext.endswith((".pdf", ".txt", ".xlsx", ".xls", ".csv")),
-                    })
-
-                projects.append({"name": proj, "files": files})
-
-            days.append({"date": date_name, "projects": projects})
-
-        groups.append({"group": platform, "days": days})
-
+    os.makedirs(os.path.join(settings.DOWNLOAD_ROOT, HISTORY_DIRNAME), exist_ok=True)
+    groups = _build_download_groups("history")
     return render(request, "dashboard/file_download_history.html", {"groups": groups})
 
 
 # === 新增：收集当日已取样过的实验号(match_sample)与条码(origin_barcode) ===
 def _collect_today_sampled_codes() -> set[str]:
     """
-    扫描 DOWNLOAD_ROOT 下“当日日期目录”内的所有 *.payload.json，
-    提取 worksheet_table 里的 match_sample / origin_barcode，合并成一个大集合返回（统一大写、去空）。
+    当日日期目录下（不含历史文件、岗位清单）所有 *.payload.json 中
+    worksheet_table 的 match_sample / origin_barcode 集合（统一大写、去空）。
+    每个 payload 在 _dump_payload_json 落盘时即提取好并存入下载文件索引，这里只做合并。
     """
-    root = Path(settings.DOWNLOAD_ROOT)
-    if not root.exists():
-        return set()
-
-    today_str = timezone.localdate().strftime("%Y-%m-%d")
-    sampled: set[str] = set()
+    ensure_artifact_index()
+    return daily_sampled_codes(timezone.localdate().strftime("%Y-%m-%d"))
 
-    # 排除：历史文件、岗位清单
-    excluded_dirs = {HISTORY_DIRNAME, STATION_DIRNAME}
 
-    # 走全量递归：只要路径层级中包含 today_str，就认为是“当日日期子路径”
-    for dirpath, dirnames, filenames in os.walk(root):
-        p = Path(dirpath)
-
-        # 快速跳过排除目录
-        if any(part in excluded_dirs for part in p.parts):
-            continue
-
-        # 必须命中当日日期目录
-        if today_str not in p.parts:
-            continue
-
-        for fn in filenames:
-            lower = (fn or "").lower()
-            if not lower.endswith(".payload.json"):
-                continue
-
-            fpath = p / fn
-            try:
-                payload = json.loads(fpath.read_text(encoding="utf-8"))
-            except Exception:
-                # 单个文件坏了不影响整体
-                continue
-
-            table = payload.get("worksheet_table") or []
-            # worksheet_table: list[list[cell]]
-            for row in table:
-                if not isinstance(row, list):
-                    continue
-                for cell in row:
-                    if not isinstance(cell, dict):
-                        continue
-
-                    ms = (cell.get("match_sample") or "").strip()
-                    ob = (cell.get("origin_barcode") or "").strip()
-
-                    if ms:
-                        sampled.add(ms.upper())
-                    if ob:
-                        sampled.add(ob.upper())
-
-    return sampled
+def _sampled_codes_etag(request):
+    ensure_artifact_index()
+    return sampled_codes_version(timezone.localdate().strftime("%Y-%m-%d"))
 
 
 # 给前端拉取当日集合（用于即时提示）
 @require_GET
+@etag(_sampled_codes_etag)
 def file_replace_sampled_codes(request):
     """
     返回当日所有已取样过的条码/实验号集合（统一大写）。
     前端用于“新条码或实验号”的重复校验提示。
+    带 ETag：集合未变化时前端轮询直接得到 304。
     """
     codes = sorted(_collect_today_sampled_codes())
     return JsonResponse({
@@ -1000,97 +749,24 @@ def file_replace_sampled_codes(request):
 
 # ===== ICP-MS 特殊方法：主条码重复但子条码不同（跨当天历史文件） =====
 
-def _split_main_sub_barcode(barcode: str) -> tuple[str, str]:
-    """
-    仅把含 '-' 的条码拆成 (主条码, 子条码)
-    例如：
-      6859899683-01 -> ("6859899683", "-01")
-      6859899683    -> ("6859899683", "")
-    """
-    s = (barcode or "").strip()
-    if not s:
-        return "", ""
-    parts = s.split("-", 1)
-    if len(parts) == 2 and parts[0].strip() and parts[1].strip():
-        return parts[0].strip(), "-" + parts[1].strip()
-    return s, ""
-
-
-def _collect_today_project_main_barcode_history(platform: str, record_date, project_name: str) -> dict[str, set[str]]:
+def _collect_today_project_main_barcode_history(
+    platform: str, record_date, project_name: str, main_barcodes=None,
+) -> dict[str, set[str]]:
     """
-    扫描当天该平台/项目下已生成的所有 *.payload.json，
-    收集“主条码 -> 已出现过的完整条码集合”。
+    当天该平台/项目下已生成的所有 *.payload.json 中，
+    “主条码 -> 已出现过的完整条码集合”（走 PayloadBarcode 索引，见 barcode_history）。
 
     仅统计：
       - 非历史目录
-      - 非岗位清单目录
       - 当天日期目录
       - 当前项目目录
       - worksheet_table 中真正的样本孔位
       - 且 origin_barcode 同时含主条码和子条码（必须带 '-'）
+    main_barcodes 给定时只查本次出现的主条码。
     """
-    result = defaultdict(set)
-
-    if not platform or not project_name or not record_date:
-        return result
-
-    date_folder = record_date.strftime("%Y-%m-%d")
-    base_dir = os.path.join(settings.DOWNLOAD_ROOT, platform, date_folder, project_name)
-    if not os.path.isdir(base_dir):
-        return result
-
-    for dirpath, _, filenames in os.walk(base_dir):
-        p = Path(dirpath)
-
-        # 跳过历史文件和岗位清单目录
-        if HISTORY_DIRNAME in p.parts or STATION_DIRNAME in p.parts:
-            continue
-
-        for fn in filenames:
-            lower = (fn or "").lower().strip()
-            if not lower.endswith(".payload.json"):
-                continue
-
-            fpath = os.path.join(dirpath, fn)
-            try:
-                with open(fpath, "r", encoding="utf-8") as f:
-                    payload = json.load(f)
-            except Exception:
-                continue
-
-            table = payload.get("worksheet_table") or []
-            for row in table:
-                if not isinstance(row, list):
-                    continue
-                for cell in row:
-                    if not isinstance(cell, dict):
-                        continue
-
-                    if cell.get("locator"):
-                        continue
-
-                    origin = str(cell.get("origin_barcode") or "").strip()
-                    match_sample = str(cell.get("match_sample") or "").strip()
-
-                    if not origin or origin.upper() == "NOTUBE":
-                        continue
-
-                    main_bc, sub_bc = _split_main_sub_barcode(origin)
-                    if not main_bc or not sub_bc:
-                        # 只统计“同时含主条码和子条码”的条码
-                        continue
-
-                    # 尽量排除曲线/质控/Blank
-                    if (
-                        match_sample.startswith("STD")
-                        or match_sample.startswith("QC")
-                        or match_sample.startswith("Blank")
-                    ):
-                        continue
-
-                    result[main_bc].add(origin)
-
-    return result
+    if not record_date:
+        return defaultdict(set)
+    return main_barcode_history(platform, record_date.strftime("%Y-%m-%d"), project_name, main_barcodes)
 
 
 def _detect_icpms_subbarcode_conflicts(
@@ -1171,20 +847,11 @@ def file_replace_get_payload(request):
     base_name = os.path.splitext(payload_filename)[0]
     payload_filename = f"{base_name}.payload.json"
     
-    # 在 DOWNLOAD_ROOT 下递归查找该文件（排除历史文件目录）
-    root = settings.DOWNLOAD_ROOT
-    payload_path = None
-    
-    for dirpath, dirnames, filenames in os.walk(root):
-        # 跳过历史目录
-        if HISTORY_DIRNAME in Path(dirpath).parts:
-            continue
-        
-        if payload_filename in filenames:
-            payload_path = os.path.join(dirpath, payload_filename)
-            break
+    # 按文件名在下载文件索引中查找（不含历史文件目录）
+    ensure_artifact_index()
+    payload_path = find_artifact_path(payload_filename)
     
-    if not payload_path or not os.path.exists(payload_path):
+    if not payload_path:
         return JsonResponse({
             "ok": False, 
             "message": f"payload file not found: {payload_filename}"
@@ -1210,18 +877,17 @@ def file_replace_get_payload(request):
 
 # 收集当前‘文件下载’页面中已有的上机列表文件名，用于后续匹配和替换
 def _index_onboarding_files(root: str) -> dict:
-    idx = {}
-    hist_root = os.path.join(root, HISTORY_DIRNAME)
+    """{上机列表文件名: 绝对路径}（不含历史目录），直接取自下载文件索引，不再遍历整棵目录树"""
+    ensure_artifact_index()
+    return artifact_paths_by_kind("onboarding")
 
-    for dirpath, _, filenames in os.walk(root):
-        # 跳过历史目录
-        if os.path.abspath(dirpath).startswith(os.path.abspath(hist_root) + os.sep):
-            continue
 
-        for fn in filenames:
-            if "OnboardingList" in fn:
-                idx[fn] = os.path.join(dirpath, fn)
-    return idx
+def _find_onboarding_file(file_name: str):
+    """按文件名查找“文件下载”中的上机列表（索引查找），找不到返回 None"""
+    if "OnboardingList" not in (file_name or ""):
+        return None
+    ensure_artifact_index()
+    return find_artifact_path(file_name)
 
 # 历史目录路径：把旧文件移动进去
 def _history_path_for(abs_path: str, download_root: str) -> str:
@@ -1235,6 +901,15 @@ def _history_path_for(abs_path: str, download_root: str) -> str:
     return os.path.join(download_root, HISTORY_DIRNAME, rel)
 
 
+def _move_to_history(abs_path: str, download_root: str) -> str:
+    """把旧文件移动到历史目录（同步更新下载文件索引），返回新路径"""
+    hist_path = _history_path_for(abs_path, download_root)
+    os.makedirs(os.path.dirname(hist_path), exist_ok=True)
+    os.replace(abs_path, hist_path)
+    move_artifact(abs_path, hist_path)
+    return hist_path
+
+
 # 从 OnboardingList 文件名推导 WorkSheet / payload 路径
 def _derive_worksheet_names_from_onboarding(onboarding_name: str) -> tuple[str, str]:
     """
@@ -1301,115 +976,53 @@ def _mark_cell_highlight(cell: dict):
     cell["highlight"] = True
 
 
-# ===== 新增：从当天 station_list.json 中查找条码对应的实验号 =====
+# ===== 新增：从当天岗位清单映射库中查找条码对应的实验号 =====
 def _lookup_experiment_from_station(new_barcode: str, record_date=None) -> str:
     """
-    用新条码在当天 station_list.json 的
-    '主条码->实验号列表' 或 '子条码->实验号列表' 中查找实验号。
+    用新条码在当天岗位清单映射库（station_store）中查找实验号。
     - 找到唯一实验号：返回该实验号
     - 找到多个实验号：返回用 '-' 拼接的字符串（与 ProcessResult 逻辑一致）
     - 找不到：返回空字符串（由调用方决定回退逻辑）
     """
-    from django.utils import timezone as _tz
-    from datetime import date as _date
-
     if not new_barcode or new_barcode.strip().upper() == "NOTUBE":
         return ""
 
     if record_date is None:
-        record_date = _tz.localdate()
-
-    store_path = os.path.join(
-        settings.DOWNLOAD_ROOT,
-        "岗位清单",
-        record_date.strftime("%Y-%m-%d"),
-        "station_list.json",
-    )
-
-    if not os.path.isfile(store_path):
-        return ""
-
-    try:
-        with open(store_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        return ""
-
-    # 兼容主条码/子条码两种字段名
-    barcode_map = (
-        data.get("主条码->实验号列表")
-        or data.get("子条码->实验号列表")
-        or data.get("barcode->实验号列表")
-        or {}
-    )
+        record_date = timezone.localdate()
+    date_name = record_date.strftime("%Y-%m-%d")
 
     # 先用完整条码查，找不到再用主条码（切割 '-' 之前的部分）查
     bc = new_barcode.strip()
-    exp_list = barcode_map.get(bc)
+    exp_list = experiments_for_barcode(date_name, bc)
 
     if not exp_list:
         cut_bc = bc.split("-")[0]
         if cut_bc != bc:
-            exp_list = barcode_map.get(cut_bc)
+            exp_list = experiments_for_barcode(date_name, cut_bc)
 
     if not exp_list:
         return ""
 
-    # 规范化
-    norm = [str(s).strip() for s in exp_list if str(s).strip()]
-    if not norm:
-        return ""
-    if len(norm) == 1:
-        return norm[0]
+    if len(exp_list) == 1:
+        return exp_list[0]
     # 多个实验号：去重后拼接（与 ProcessResult 的共血逻辑保持一致）
-    return "-".join(list(dict.fromkeys(norm)))
+    return "-".join(list(dict.fromkeys(exp_list)))
 
 
 # ===== 新增：通过实验号反查条码 =====
 def _lookup_barcode_from_station(experiment_no: str, record_date=None) -> str:
     """
-    用实验号在当天 station_list.json 的 '实验号->主条码' 或 '实验号->子条码' 中反查条码。
+    用实验号在当天岗位清单映射库中反查条码。
     - 找到：返回对应条码字符串
     - 找不到：返回空字符串
     """
-    from django.utils import timezone as _tz
-
     if not experiment_no or not experiment_no.strip():
         return ""
 
     if record_date is None:
-        record_date = _tz.localdate()
-
-    store_path = os.path.join(
-        settings.DOWNLOAD_ROOT,
-        "岗位清单",
-        record_date.strftime("%Y-%m-%d"),
-        "station_list.json",
-    )
-
-    if not os.path.isfile(store_path):
-        return ""
+        record_date = timezone.localdate()
 
-    try:
-        with open(store_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        return ""
-
-    # 兼容两种字段名
-    exp_to_barcode = (
-        data.get("实验号->主条码")
-        or data.get("实验号->子条码")
-        or data.get("实验号->barcode")
-        or {}
-    )
-
-    exp = experiment_no.strip()
-    barcode = exp_to_barcode.get(exp)
-    if barcode:
-        return str(barcode).strip()
-
-    return ""
+    return barcode_for_experiment(record_date.strftime("%Y-%m-%d"), experiment_no.strip())
 
 
 
@@ -1531,20 +1144,10 @@ def _apply_replace_to_payload(payload: dict, replace_reason: str, entries: list[
 
 
 # 新增核心函数：渲染 export_pdf.html 并写 PDF（复用你现有 export_files 的 CSS/Font 配置）
-def _render_payload_to_pdf(payload: dict, out_pdf_path: str):
-    pdf_html = render_to_string("dashboard/export_pdf.html", payload)
-
-    font_config = FontConfiguration()
-    pdf_css = CSS(string="""
-        @page { size: A4; margin: 10mm; }
-        body { font-family: "Noto Sans CJK SC", "SimSun", sans-serif; font-size: 10px; }
-    """, font_config=font_config)
-
-    HTML(string=pdf_html).write_pdf(
-        out_pdf_path,
-        stylesheets=[pdf_css],
-        font_config=font_config
-    )
+def _render_payload_to_pdf(payload: dict, out_pdf_path: str) -> str:
+    """渲染 HTML 后登记 PDF 任务（后台 worker 生成），返回 job_id"""
+    pdf_html = render_pdf_html("dashboard/export_pdf.html", payload)
+    return enqueue_pdf_job(pdf_html, out_pdf_path, style="replace")
 
 # 新增：WorkSheet 替换总函数（找旧文件 → 生成 Replace_ 新文件 → 旧文件进历史）
 def _replace_worksheet_after_onboarding_replace(root: str, onboarding_uploaded_name: str,
@@ -1581,13 +1184,9 @@ def _replace_worksheet_after_onboarding_replace(root: str, onboarding_uploaded_n
     _dump_payload_json(target_dir, payload, filename=new_payload_name)  # 你 views 里已有此函数
 
     # 5) 旧 PDF + 旧 payload 进历史目录
-    hist_pdf_path = _history_path_for(ws_pdf_path, root)
-    os.makedirs(os.path.dirname(hist_pdf_path), exist_ok=True)
-    os.replace(ws_pdf_path, hist_pdf_path)
+    _move_to_history(ws_pdf_path, root)
 
-    hist_payload_path = _history_path_for(ws_payload_path, root)
-    os.makedirs(os.path.dirname(hist_payload_path), exist_ok=True)
-    os.replace(ws_payload_path, hist_payload_path)
+    _move_to_history(ws_payload_path, root)
 
 
 # 解析分隔符 + 读取表格（只要能稳定分列即可）
@@ -2033,9 +1632,8 @@ def file_replace(request):
         root = settings.DOWNLOAD_ROOT
         os.makedirs(root, exist_ok=True)
 
-        # 建立“已有上机列表文件名索引”
-        exist_map = _index_onboarding_files(root)  # 文件名包含 OnboardingList :contentReference[oaicite:6]{index=6}
-        target_path = exist_map.get(uploaded_name)
+        # 按文件名在下载文件索引中查找已有上机列表
+        target_path = _find_onboarding_file(uploaded_name)
         if not target_path:
             return render(request, "dashboard/error.html", {
                 "message": f"上传文件名【{uploaded_name}】在“文件下载”中未找到同名上机列表文件，请确认文件名必须完全一致。"
@@ -2242,11 +1840,10 @@ def file_replace(request):
             target_encoding = file_enc if file_enc in ["gbk", "gb18030"] else "utf-8"
             with open(new_path, "w", encoding=target_encoding) as f:
                 f.write(out_text)
+            record_artifact(new_path)
 
             # 把旧文件移动到历史目录
-            hist_path = _history_path_for(target_path, root)
-            os.makedirs(os.path.dirname(hist_path), exist_ok=True)
-            os.replace(target_path, hist_path)
+            _move_to_history(target_path, root)
 
             # 同步替换工作清单
             try:
@@ -2888,11 +2485,10 @@ def file_replace(request):
         target_encoding = file_enc if file_enc in ["gbk", "gb18030"] else "utf-8"
         with open(new_path, "w", encoding=target_encoding) as f:
             f.write(out_text)
+        record_artifact(new_path)
             
         # 把旧文件移动到历史目录
-        hist_path = _history_path_for(target_path, root)
-        os.makedirs(os.path.dirname(hist_path), exist_ok=True)
-        os.replace(target_path, hist_path)
+        _move_to_history(target_path, root)
 
         # ===== 新增：同步替换 WorkSheet PDF（工作清单）=====
         try:
@@ -3004,6 +2600,7 @@ def project_config_edit(request, pk):
             # 检查是否上传新文件，如果上传了，删除原文件
             if 'mapping_file' in request.FILES and old_mapping_file and os.path.exists(old_mapping_file):
                 os.remove(old_mapping_file)
+                invalidate_mapping_cache(old_mapping_file)
 
             form.save()
             return redirect('project_config')
@@ -3052,14 +2649,30 @@ def vendor_config_create(request):
                 "message": f"已存在相同的配置：仪器编号 [{instrument_num}] / 厂家 [{instrument_name}] / 系统号 [{systerm_num}]，无需重复创建。"
             })
 
+        # ✅ 2) 上机模板预解析：列头/分隔符/编码只在这里解析一次，生成时直接读 template_meta
+        template_meta = {}
+        if upload_file:
+            raw = upload_file.read()
+            upload_file.seek(0)
+            try:
+                template_meta = build_template_descriptor(raw, upload_file.name)
+            except TemplateParseError as e:
+                return render(request, 'dashboard/error.html', {"message": str(e)})
+
         # 通过校验后再创建
         instance = InstrumentConfiguration(
             instrument_name=instrument_name,
             instrument_num=instrument_num,
             systerm_num=systerm_num,
             upload_file=upload_file,
+            template_meta=template_meta,
         )
         instance.save()
+
+        # 存储层可能对重名文件改名，同步描述里的文件名
+        if template_meta and template_meta.get("source_name") != os.path.basename(instance.upload_file.name):
+            template_meta["source_name"] = os.path.basename(instance.upload_file.name)
+            InstrumentConfiguration.objects.filter(pk=instance.pk).update(template_meta=template_meta)
         return redirect('vendor_config')
     else:
         return render(request, 'dashboard/config/vendor_config_create.html')
@@ -3372,11 +2985,11 @@ def ProcessResult(request):
     if not (station_available and Scanresult and project_id and platform and instrument_num):
         return HttpResponseBadRequest("缺少必要参数或文件。")
 
-    # 读取岗位清单（优先手动上传，其次自动抓取）
+    # 读取岗位清单（优先手动上传，其次自动抓取；按内容 sha256 缓存解析结果）
     if Stationlist:
-        Stationtable = xlrd.open_workbook(filename=None, file_contents=Stationlist.read())
+        station_parsed = parse_station_upload(Stationlist)
     else:
-        Stationtable = xlrd.open_workbook(filename=None, file_contents=station_bytes)
+        station_parsed = parse_station_list(station_bytes)
 
     Scantable = xlrd.open_workbook(filename=None, file_contents=Scanresult.read())
     scan_sheet   = Scantable.sheets()[0]
@@ -3408,8 +3021,8 @@ def ProcessResult(request):
     project_name   = config.project_name
     project_name_full   = config.project_name_full
     mapping_path   = config.mapping_file.path
-    df_mapping_wc  = pd.read_excel(mapping_path, sheet_name="工作清单")   # for worksheet
-    df_worklistmap = pd.read_excel(mapping_path, sheet_name="上机列表")    # worklist mapping 模板
+    mapping_bundle = get_mapping_bundle(mapping_path)                  # 按 (路径, mtime, size) 缓存
+    worklist_map   = mapping_bundle.worklist_map(nimbus_classify)      # “上机列表”每份文件只编译一次，各板共用
 
     # 解析后台设置的上机模板（txt/csv）→ DataFrame（只需列名 / txt_headers）,获取表头
     try:
@@ -3424,224 +3037,34 @@ def ProcessResult(request):
     if not instrument_config.upload_file:
         return HttpResponse("未设置该上机仪器对应的上机模板,请设置后再试", status=404)
 
-    ext = os.path.splitext(instrument_config.upload_file.name)[1].lower()
-    if ext not in (".txt", ".csv"):
-        return HttpResponse(f"仅支持 .txt 或 .csv 模板，当前为：{ext}", status=400)
-
-    with instrument_config.upload_file.open("rb") as f:
-        raw = f.read()
-    text, last_err = None, None
-    for enc in ("utf-8", "utf-8-sig", "gb18030"):
-        try:
-            text = raw.decode(enc)
-            break
-        except UnicodeDecodeError as e:
-            last_err = e
-    if text is None:
-        raise last_err or UnicodeDecodeError("unknown", b"", 0, 1, "unable to decode upload_file")
-    df_template = pd.read_csv(StringIO(text), sep=None, engine="python", dtype=str)
-    txt_headers = df_template.columns.tolist()
-
-    # 岗位清单主条码 ↔ 实验号（获取一一对应关系）
-    st_sheet   = Stationtable.sheets()[0]
-    st_nrows   = st_sheet.nrows
-    st_ncols   = st_sheet.ncols
-    st_header  = [str(st_sheet.row_values(0)[i]).strip() for i in range(st_ncols)]
-    st_index   = {col: idx for idx, col in enumerate(st_header)}
-    SN_IDX     = st_index.get("实验号", 0)
-
-    # 检测岗位清单是否含"子条码"列，决定匹配模式
-    use_sub_barcode = "子条码" in st_index
-    if use_sub_barcode:
-        KEY_IDX = st_index["子条码"]
-        station_json_key1 = "子条码->实验号列表"   # station_list.json 字段名
-        station_json_key2 = "实验号->子条码"
-    else:
-        KEY_IDX = st_index.get("主条码", 0)
-        station_json_key1 = "主条码->实验号列表"
-        station_json_key2 = "实验号->主条码"
-
-    KeyList    = [str(st_sheet.row_values(i)[KEY_IDX]) for i in range(1, st_nrows)]
-    SampleName = [str(st_sheet.row_values(i)[SN_IDX])  for i in range(1, st_nrows)]
-    barcode_to_names = defaultdict(list)
-    for bc, sn in zip(KeyList, SampleName):
-        barcode_to_names[str(bc)].append(str(sn))
-
-
-    # 保存岗位清单中主条码和实验号映射的json数据（每天一份，不能重复）
-    def _station_store_path(day_date: date) -> str:
-        day_dir = os.path.join(settings.DOWNLOAD_ROOT, "岗位清单", day_date.strftime("%Y-%m-%d"))
-        os.makedirs(day_dir, exist_ok=True)
-        return os.path.join(day_dir, "station_list.json")
-
-
-    def _load_station_store(path: str) -> dict:
-        if not os.path.isfile(path):
-            return {"warning": [], "barcode->实验号列表": {}, "实验号->barcode": {}}
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if "warning" not in data:
-                data = {"warning": [], **data}
-            # 兼容历史文件（旧字段名→通用字段名）
-            for old_k1, old_k2 in [
-                ("主条码->实验号列表", "实验号->主条码"),
-                ("子条码->实验号列表", "实验号->子条码"),
-            ]:
-                if old_k1 in data:
-                    data.setdefault("barcode->实验号列表", data.pop(old_k1))
-                    data.setdefault("实验号->barcode",    data.pop(old_k2, {}))
-                    break
-            data.setdefault("barcode->实验号列表", {})
-            data.setdefault("实验号->barcode", {})
-            return data
-        except Exception:
-            return {"warning": [{"type": "load_error", "msg": f"读取失败，已重置：{os.path.basename(path)}"}],
-                    "barcode->实验号列表": {}, "实验号->barcode": {}}
-
-    
-    def _dedup_warning(existing: list, new_items: list) -> list:
-        # 用 (type, exp, old, new) 作为去重 key，避免 warning 越堆越多
-        seen = set()
-        out = []
-        for w in (existing or []) + (new_items or []):
-            if not isinstance(w, dict):
-                continue
-            key = (w.get("type"), w.get("experiment_no"), w.get("old_main_barcode"), w.get("new_main_barcode"), w.get("msg"))
-            if key in seen:
-                continue
-            seen.add(key)
-            out.append(w)
-        return out
-
-
-    def _merge_station_maps(store: dict, new_map: dict, use_sub_barcode: bool = True) -> tuple[dict, dict]:
-
-        mb2sn = store.get("barcode->实验号列表", {}) or {}
-        sn2mb = store.get("实验号->barcode", {}) or {}
-        warnings_new = []
-
-        added_pairs = 0
-        conflict_cnt = 0
-
-        for mb, sns in (new_map or {}).items():
-            mb = (mb or "").strip()
-            if not mb:
-                continue
-
-            # 规范化 sns：去空/去重/保持顺序
-            seen_sn = set()
-            norm_sns = []
-            for sn in (sns or []):
-                sn = (str(sn) or "").strip()
-                if not sn or sn in seen_sn:
-                    continue
-                seen_sn.add(sn)
-                norm_sns.append(sn)
-            if not norm_sns:
-                continue
-
-            exist_list = mb2sn.get(mb, [])
-            if not isinstance(exist_list, list):
-                exist_list = [str(exist_list)]
-            exist_set = set(str(x).strip() for x in exist_list if str(x).strip())
-
-            # 逐实验号合并，并做“实验号->主条码”冲突检测
-            for sn in norm_sns:
-                if sn in sn2mb:
-                    # 已存在映射：若冲突则记录 warning 并跳过
-                    old_mb = str(sn2mb.get(sn) or "").strip()
-   
-                    if old_mb and old_mb != mb:
-                        conflict_cnt += 1
-
-                        if use_sub_barcode:
-                            # 自动读取或者上传的岗位清单中含有‘子条码列’，强制覆盖
-                            msg = f"实验号 {sn} 当天已映射主条码 {old_mb}，本次上传为 {mb}，已强制覆盖"
-                            warnings_new.append({
-                                "type": "conflict",
-                                "experiment_no": sn,
-                                "old_main_barcode": old_mb,
-                                "new_main_barcode": mb,
-                                "msg": msg
-                            })
-                            sn2mb[sn] = mb                    # 反向映射：实验号 → 新条码
-                            # 同步清理 mb2sn：把旧条码里的该实验号移除
-                            if old_mb in mb2sn:
-                                old_list = mb2sn[old_mb]
-                                if isinstance(old_list, list) and sn in old_list:
-                                    old_list.remove(sn)
-                                    if old_list:
-                                        mb2sn[old_mb] = old_list
-                                    else:
-                                        del mb2sn[old_mb]     # 旧条码已无实验号，删除整条
-                        else:
-                            # 上传的岗位清单中不含有‘子条码列’，不覆盖只记录
-                            msg = f"实验号 {sn} 当天已映射子条码 {old_mb}，本次上传为 {mb}，已忽略本次冲突行"
-                            warnings_new.append({
-                                "type": "conflict",
-                                "experiment_no": sn,
-                                "old_main_barcode": old_mb,
-                                "new_main_barcode": mb,
-                                "msg": msg
-                            })
-                            continue                           # 子条码模式：跳过，不覆盖
-
-                    
-                else:
-                    # 新实验号：写入 sn->mb
-                    sn2mb[sn] = mb
-
-                # mb -> sn list：不存在则追加
-                if sn not in exist_set:
-                    exist_list.append(sn)
-                    exist_set.add(sn)
-                    added_pairs += 1
+    # 上机模板描述（保存厂家配置时已预解析；历史配置首次使用时自动补算）
+    try:
+        template_meta = require_strict_encoding(get_template_descriptor(instrument_config))
+    except TemplateParseError as e:
+        return HttpResponse(str(e), status=400)
+    txt_headers = list(template_meta["headers"])
 
-            mb2sn[mb] = exist_list
-                    
-    
-        # warning 合并且去重（warning 必须在 json 最前面）
-        store["warning"] = _dedup_warning(store.get("warning", []), warnings_new)
-        store["barcode->实验号列表"] = mb2sn
-        store["实验号->barcode"] = sn2mb
-
-        summary = {
-            "added_pairs": added_pairs,
-            "conflicts": conflict_cnt,
-            "saved": False,
-        }
-        return store, summary
+    # 岗位清单条码 ↔ 实验号（获取一一对应关系）
+    # 检测岗位清单是否含"子条码"列，决定匹配模式：有则按子条码，否则按主条码
+    # 与原先逐行 str(单元格) 的口径一致：不 strip，空条码 / 空实验号的行也保留（raw=True）
+    use_sub_barcode = station_parsed.use_sub_barcode
+    barcode_to_names = station_parsed.barcode_to_names(raw=True)
 
 
+    # 保存岗位清单中条码和实验号的映射（每天一份，不能重复；见 station_store）
     station_save_summary = None
-    generated_at = timezone.localtime().strftime("%Y-%m-%d %H:%M:%S")
     try:
-        store_path = _station_store_path(record_date)  # record_date 你前面已计算（today/tomorrow）
-        store = _load_station_store(store_path)
-        store2, summary = _merge_station_maps(store, barcode_to_names, use_sub_barcode = use_sub_barcode)
-
-        # 只有真的有新增/新增 warning 才写盘（避免无意义改动）
-        need_write = (summary["added_pairs"] > 0) or (summary["conflicts"] > 0) or (not os.path.isfile(store_path))
-        if need_write:
-            ordered_out = {
-                "生成时间": generated_at,
-                "warning": store2.get("warning", []),
-                station_json_key1: store2.get("barcode->实验号列表", {}),
-                station_json_key2: store2.get("实验号->barcode", {}),
-            }
-            with open(store_path, "w", encoding="utf-8") as f:
-                json.dump(ordered_out, f, ensure_ascii=False, indent=2)
-
-            summary["saved"] = True
-
-        station_save_summary = {
-            **summary,
-            "path": store_path,
-        }
+        # record_date 你前面已计算（today/tomorrow）
+        summary = merge_station_pairs(
+            record_date.strftime("%Y-%m-%d"),
+            ((bc, sn) for bc, sns in barcode_to_names.items() for sn in sns),
+            override=use_sub_barcode,     # 含‘子条码列’的岗位清单强制覆盖，否则只记录冲突
+            barcode_kind="sub" if use_sub_barcode else "main",
+        )
+        station_save_summary = summary
         logging.getLogger(__name__).warning(
-            "[station_list saved] path=%s added_pairs=%s conflicts=%s",
-            store_path, summary["added_pairs"], summary["conflicts"]
+            "[station_list saved] added_pairs=%s conflicts=%s exported=%s",
+            summary["added_pairs"], summary["conflicts"], summary["path"] if summary["saved"] else "-"
         )
     except Exception as e:
         # 任何保存异常：不阻断主流程
@@ -3649,46 +3072,14 @@ def ProcessResult(request):
         station_save_summary = {"saved": False, "added_pairs": 0, "conflicts": 0, "error": str(e)}
 
 
-    # ====【新增】叠加前3天历史 station_list.json，构建 barcode_to_names_for_match ====
+    # ====【新增】叠加前3天历史岗位清单映射，构建 barcode_to_names_for_match ====
     # 说明：
-    # - barcode_to_names：仅含当天岗位清单数据，用于写入当天 station_list.json（已在上方完成写入）
+    # - barcode_to_names：仅含当天岗位清单数据，用于写入当天映射库（已在上方完成写入）
     # - barcode_to_names_for_match：在当天基础上叠加前3天历史，仅用于本次工作清单的条码匹配
     # - 优先级：当天岗位清单 > 前1天 > 前2天 > 前3天（先找到的不会被后来的覆盖）
-    barcode_to_names_for_match = defaultdict(list, barcode_to_names)  # 复制当天数据
-
+    # - 历史叠加结果按日期缓存（station_store.station_history_overlay），前几天有新写入时才重建
     try:
-        for _delta in range(1, 4):   # 前1天、前2天、前3天
-            _past_date = record_date - timedelta(days=_delta)
-            _hist_store_path = _station_store_path(_past_date)
-
-            if not os.path.isfile(_hist_store_path):
-                continue   # 该天的 station_list.json 不存在，跳过
-
-            _hist_store = _load_station_store(_hist_store_path)
-            _hist_map = _hist_store.get("barcode->实验号列表", {})
-
-            # 兼容旧字段名（历史文件可能还用"主条码->实验号列表"或"子条码->实验号列表"）
-            if not _hist_map:
-                _hist_map = (
-                    _hist_store.get("主条码->实验号列表", {}) or
-                    _hist_store.get("子条码->实验号列表", {})
-                )
-
-            for _hist_bc, _hist_sns in _hist_map.items():
-                _hist_bc = (_hist_bc or "").strip()
-                if not _hist_bc:
-                    continue
-                # 当天岗位清单中已有该条码 → 跳过，不覆盖（当天数据优先）
-                if _hist_bc in barcode_to_names_for_match:
-                    continue
-                # 规范化历史实验号列表
-                if isinstance(_hist_sns, list):
-                    _norm_sns = [str(s).strip() for s in _hist_sns if str(s).strip()]
-                else:
-                    _norm_sns = [str(_hist_sns).strip()] if str(_hist_sns).strip() else []
-                if _norm_sns:
-                    barcode_to_names_for_match[_hist_bc] = _norm_sns
-
+        barcode_to_names_for_match = station_map_with_history(record_date, barcode_to_names)
         logging.getLogger(__name__).info(
             "[barcode_to_names_for_match] 叠加前3天历史完成，总条目数: %d（当天: %d）",
             len(barcode_to_names_for_match), len(barcode_to_names)
@@ -3703,21 +3094,16 @@ def ProcessResult(request):
 
 
     # 曲线/质控映射（获取一一对应关系,供后续识别非临床样本,即曲线和质控）
-    barcode_to_name = dict(zip(df_mapping_wc["Barcode"].astype(str), df_mapping_wc["Name"]))
+    barcode_to_name = mapping_bundle.barcode_to_name   # 只读映射，缓存内已按 Barcode(str) -> Name 构建
 
     # 用于构建曲线/QC/Test/DB 序列
     test_count    = config.test_count
     curve_points  = config.curve_points
-    df_std = df_mapping_wc.copy()
-    df_std["Code"] = df_std["Code"].astype(str)
-    df_std = df_std[df_std["Code"].str.match(r"^STD\d+$", na=False)].copy()
-    df_std["__std_idx"] = df_std["Code"].str.replace("STD", "", regex=False).astype(int)
-    df_std = df_std.sort_values("__std_idx")
-    std_names = df_std["Name"].head(curve_points + 1).tolist()
+    std_names = list(mapping_bundle.std_names[: curve_points + 1])     # 缓存内已按 STD 序号排好
     if not std_names or len(std_names) < (curve_points + 1):
         std_names = [f"STD{i}" for i in range(curve_points + 1)]
 
-    qc_names = df_mapping_wc.loc[df_mapping_wc["Code"].astype(str).str.startswith("QC"), "Name"].unique().tolist()
+    qc_names = pd.Series(mapping_bundle.qc_names, dtype=object).unique().tolist()
 
     # 进样体积（非必须设置项）
     try:
@@ -3836,6 +3222,8 @@ def ProcessResult(request):
         worksheet_grid  = [[None for _ in nums] for _ in letters]
         error_rows      = []
 
+        plate_record_rows = []  # 本板待写入 SampleRecord 的孔位记录
+
         def _well_number_rowwise(row_idx: int, col: int) -> int:
             return row_idx * 12 + col
 
@@ -3928,19 +3316,8 @@ def ProcessResult(request):
                 else:
                     error_rows.append(row_data)
 
-            # 落库（以“同日-同项目-同板号-孔位”为粒度）
-            SampleRecord.objects.update_or_create(
-                project_name=project_name,
-                record_date=record_date,
-                batch_id=batch_id,
-                plate_no=plate_no_str,
-                well_str=well_pos_str,
-                defaults={
-                    "sample_name": match_sample,
-                    "barcode": origin_barcode,
-                    "error_info": error_info,
-                }
-            )
+            # 落库（以“同日-同项目-同板号-孔位”为粒度）：先收集，整板构建完后统一批量写入
+            plate_record_rows.append(make_sample_row(well_pos_str, match_sample, origin_barcode, error_info))
             return well
 
         # 清理同日同项目同板号旧记录（避免重复）
@@ -3962,14 +3339,23 @@ def ProcessResult(request):
 
         worksheet_table = [[worksheet_grid[r][c] for c in range(12)] for r in range(8)]
 
+        # 整板一次性落库（单事务 bulk_create / bulk_update）
+        save_plate_records(
+            plate_record_rows,
+            project_name=project_name,
+            record_date=record_date,
+            batch_id=batch_id,
+            plate_no=plate_no_str,
+        )
+
         # —— 生成上机列表 —— #
         # ClinicalSample：OriginBarcode 中不在映射表“Barcode”里的条码（若 Warm 含 X 则以 Xn 记名）
-        mapping_barcodes = set(str(x) for x in df_mapping_wc["Barcode"].tolist())
+        # barcode_to_name 的键即映射表全部 Barcode(str)
         ClinicalSample = []
         for i, ob in enumerate(OriginBarcode):
             ob_str   = str(ob)
             warm_val = str(Warm[i]).strip().upper()
-            if ob_str not in mapping_barcodes:
+            if ob_str not in barcode_to_name:
                 if 'X' in warm_val: ClinicalSample.append(warm_val)  # 定位孔
                 else:               ClinicalSample.append(ob_str)
 
@@ -3981,145 +3367,26 @@ def ProcessResult(request):
         SampleName_list = [name for name in SampleName_list if isinstance(name, str) and name.count('-') <= 3]
 
         # worklist 空表
-        worklist_table = pd.DataFrame(columns=df_template.columns)
+        worklist_table = pd.DataFrame(columns=txt_headers)
         worklist_table[worklist_table.columns[0]] = SampleName_list
 
         # value 队列：Name -> [barcodes...]
-        name_to_barcodes = defaultdict(deque)
-        for barcode, name in barcode_to_name.items():
-            name_to_barcodes[name].append(barcode)
-
-        first_col = worklist_table.columns[0]
+        name_to_barcodes = mapping_bundle.barcode_queues()
 
+        # 按“上机列表”映射规则填充（规则已在板循环外编译；孔位队列为本板的，按行序消费）
+        resolve_vialpos = nimbus_vial_resolver(
+            platform=platform,
+            instrument_name=instrument_name,
+            injection_plate=injection_plate,
+            name_to_barcodes=name_to_barcodes,
+            barcode_to_well=barcode_to_well,
+        )
         # 记录哪些列需要镜像第一列（由映射表的 * 标注）
-        mirror_cols = set()
-
-        for _, row in df_worklistmap.iterrows():
-            sample_key = row.iloc[0]
-            fill_vals  = row.iloc[1:]
-
-            # ===== 新增：标记本行是否为“默认 * 行” =====
-            is_default_star_row = (str(sample_key).strip() == "*")
-
-            def fill_cols(mask):
-                for col, val in zip(worklist_table.columns[1:], fill_vals.values):
-                    # ------- 新增：当“当前行是 * 行 且 该列映射值也为 *” → 镜像第一列 -------
-                    # ★ 标注“需要镜像”的列（映射表该列写了 "*"）
-                    if str(val).strip() == "*":
-                        mirror_cols.add(col)
-                        continue
-                    # -------------------------------------------------------------------
-
-                    if col in ("SmplInjVol", "Injection volume"):
-                        continue
-                    if col in ("VialPos", "Vial position", "样品瓶"):
-                        ROWS = list("ABCDEFGH")
-                        def _resolve_vialpos(sample_name_value):
-                            s = str(sample_name_value).strip().upper()
-                            m = re.fullmatch(r"X(\d+)", s)
-                            if m:
-                                k0 = int(m.group(1)) - 1
-                                if platform == "NIMBUS":
-                                    coln     = 3 + (k0 // 8)
-                                    row_idx  = k0 % 8
-                                else:  # Starlet
-                                    row_idx  = 1 + (k0 // 12)
-                                    coln     = 1 + (k0 % 12)
-                                if not (0 <= row_idx < 8 and 1 <= coln <= 12):
-                                    return None
-                                well_pos = f"{ROWS[row_idx]}{coln}"
-                                well_no  = _well_number_rowwise(row_idx, coln)
-                                if instrument_name == "Thermo" or instrument_name == "Agilent":
-                                    if val == "{{Well_Number}}":
-                                        return f"{injection_plate}:{well_no}" if injection_plate else well_no
-                                    else:
-                                        return f"{injection_plate}-{well_pos}" if injection_plate else well_pos
-                                else:
-                                    if val == "{{Well_Number}}":
-                                        return well_no
-                                    else:
-                                        return well_pos
-
-                            if val in ["{{Well_Number}}", "{{Well_Position}}"]:
-                                # 1) QC/STD：通过 name->barcode 队列取条码，再查位置信息
-                                if sample_name_value in name_to_barcodes and name_to_barcodes[sample_name_value]:
-                                    barcode = name_to_barcodes[sample_name_value].popleft()
-                                    wells_q = barcode_to_well.get(barcode)
-                                    if wells_q:
-                                        # 依次使用该条码对应的各个孔位
-                                        pos, no = wells_q.popleft()
-                                        # 下面保持你原来的仪器判断逻辑不变
-                                        if instrument_name == "Thermo" or instrument_name == "Agilent":
-                                            if val == "{{Well_Number}}":
-                                                return f"{injection_plate}:{no}" if injection_plate else no
-                                            else:
-                                                return f"{injection_plate}-{pos}" if injection_plate else pos
-                                        else:
-                                            if val == "{{Well_Number}}":
-                                                return no
-                                            else:
-                                                return pos
-
-                                # 2) 临床样本：第一列就是条码
-                                elif sample_name_value in barcode_to_well:
-                                    wells_q = barcode_to_well.get(str(sample_name_value))
-                                    if wells_q:
-                                        pos, no = wells_q.popleft()
-                                        if instrument_name == "Thermo" or instrument_name == "Agilent":
-                                            if val == "{{Well_Number}}":
-                                                return f"{injection_plate}:{no}" if injection_plate else no
-                                            else:
-                                                return f"{injection_plate}-{pos}" if injection_plate else pos
-                                        else:
-                                            if val == "{{Well_Number}}":
-                                                return no
-                                            else:
-                                                return pos
-
-                                else:              
-                                    if instrument_name == "Thermo" or instrument_name == "Agilent":
-                                        if val == "{{Well_Number}}":
-                                            return f"{injection_plate}:{'1'}" if injection_plate else "1"
-                                        else:
-                                            return f"{injection_plate}-{'A1'}" if injection_plate else "A1"
-                                    else:
-                                        if val == "{{Well_Number}}":
-                                            return "1"
-                                        else:
-                                            return "A1"
-
-                            return val
-
-                        worklist_table.loc[mask, col] = worklist_table.loc[mask, first_col].apply(_resolve_vialpos)
-
-                    else:
-                        worklist_table.loc[mask, col] = val
-
-            if str(sample_key) == "DB*":
-                mask = worklist_table.iloc[:, 0].str.startswith("DB")
-                fill_cols(mask)
-            elif str(sample_key).startswith("DB"):
-                mask = worklist_table.iloc[:, 0] == str(sample_key)
-                fill_cols(mask)
-
-            elif str(sample_key) == "Test*":
-                mask = worklist_table.iloc[:, 0].str.startswith("Test")
-                fill_cols(mask)
-            elif str(sample_key).startswith("Test"):
-                mask = worklist_table.iloc[:, 0] == str(sample_key)
-                fill_cols(mask)
-
-
-            elif str(sample_key) == "STD*":
-                mask = worklist_table.iloc[:, 0].str.startswith("STD")
-                fill_cols(mask)
-            elif str(sample_key).startswith("STD"):
-                mask = worklist_table.iloc[:, 0] == str(sample_key)
-                fill_cols(mask)
-
-            elif str(sample_key) == "*":
-                mask = worklist_table.iloc[:, 1].isna()
-                fill_cols(mask)
+        mirror_cols = apply_worklist_map(
+            worklist_map, worklist_table,
+            lambda key, fill: standard_rule_mask(key, fill, with_qc=False),
+            resolve_vialpos,
+        )
 
         year       = today_str[:4]
         yearmonth  = today_str[:6]
@@ -4336,7 +3603,8 @@ def ProcessResult(request):
             plates_payload.append(build_one_plate_payload(aligned, layout='horizontal', plate_no_str=aligned["plate_no_str"]))
 
     # ========== 4. 保存 Session 与渲染 ==========
-    request.session["export_payload"] = {
+    # 导出数据落盘（payload_store），session 只保存 token
+    stash_session_payload(request, "export_payload", {
         "project_name": project_name,
         "project_name_full": project_name_full,
         "instrument_num": instrument_num,
@@ -4346,8 +3614,7 @@ def ProcessResult(request):
         "today_str": today_str,
         "testing_day": testing_day,
         "plates": plates_payload,                 # ⭐ 多板/单板统一
-    }
-    request.session.modified = True
+    })
 
     return render(request, "dashboard/ProcessResult.html", {
         "project_name": project_name,
@@ -4363,22 +3630,21 @@ def ProcessResult(request):
 
 # preview_payload
 def preview_export(request):
-    all_payload = request.session.get("export_payload")
+    all_payload = get_session_payload(request, "export_payload")
     if not all_payload:
         return HttpResponseBadRequest("没有可预览的数据，请先生成结果页面。")
 
     # 兼容：多板/单板
-    if "plates" in all_payload:
+    if all_payload.has_plates:
         try:
             idx = int(request.GET.get("plate", "0"))
         except ValueError:
             idx = 0
-        plates = all_payload["plates"]
-        if idx < 0 or idx >= len(plates):
+        if idx < 0 or idx >= all_payload.plate_count:
             return HttpResponseBadRequest("板索引无效。")
-        payload = plates[idx]   # ⭐ 这里面才有 worksheet_table / error_rows / txt_headers / worklist_records
+        payload = all_payload.plate(idx)   # ⭐ 只加载这一块板：worksheet_table / error_rows / txt_headers / worklist_records
     else:
-        payload = all_payload   # 旧结构，仍包含 worksheet_table 等顶层字段
+        payload = all_payload.meta   # 旧结构，仍包含 worksheet_table 等顶层字段
 
     nums = [str(i) for i in range(1, 13)]
     project_name = str(all_payload.get("project_name", "PROJECT"))
@@ -4430,15 +3696,15 @@ def sanitize_payload(obj):
     else:
         return obj
     
-def _dump_payload_json(target_dir: str, payload: dict, filename: str = "payload.json") -> str:
+def _write_payload_json(target_dir: str, payload: dict, filename: str = "payload.json") -> str:
     """
     将 payload 保存为 JSON 文件（UTF-8，保留中文），与 PDF 同目录。
-    为避免写一半中断，使用 .tmp 原子替换。
+    为避免写一半中断，使用 .tmp 原子替换。只写文件、不碰数据库（可在线程池里并行调用）。
     返回写入的绝对路径。
     """
     os.makedirs(target_dir, exist_ok=True)
     out_path = os.path.join(target_dir, filename)
-    tmp_path = out_path + ".tmp"
+    tmp_path = f"{out_path}.{threading.get_ident()}.tmp"   # 批量导出时多线程并行写
 
     # ⭐ 清理 NaN 值
     clean_payload = sanitize_payload(payload)
@@ -4450,38 +3716,62 @@ def _dump_payload_json(target_dir: str, payload: dict, filename: str = "payload.
     return out_path
 
 
+def _record_payload_json(out_path: str, payload: dict) -> None:
+    """payload.json 登记到下载文件索引（含取样条码，供替换页等查询）"""
+    artifact = record_artifact(out_path, sampled_codes=payload_sampled_codes(payload))
+    if artifact is not None:
+        index_payload_barcodes(artifact, payload)
+
+
+def _dump_payload_json(target_dir: str, payload: dict, filename: str = "payload.json") -> str:
+    """写入 payload.json 并登记索引；返回写入的绝对路径"""
+    out_path = _write_payload_json(target_dir, payload, filename)
+    _record_payload_json(out_path, payload)
+    return out_path
+
+
 # 导出pdf和excel
-def export_files(request):
-    """使用WeasyPrint生成PDF（兼容单板/多板）"""
-    all_payload = request.session.get("export_payload")
+# 批量导出时并行写 payload.json / 上机列表的线程数
+_EXPORT_WRITE_WORKERS = getattr(settings, "EXPORT_WRITE_WORKERS", 4)
 
-    if not all_payload:
-        return HttpResponseBadRequest("没有可导出的数据，请先生成结果页面。")
 
-    # === 兼容两种会话结构：单板 vs 多板 ===
-    # 单板（旧结构）：直接就是一份 payload，包含 worksheet_table 等键
-    # 多板（新结构）：export_payload 里有 plates: [ {worksheet_table,..., header{plate_no}}, ... ]
-    if "plates" in all_payload and isinstance(all_payload["plates"], list):
-        # 读取前端传入的板索引（默认 0）
-        try:
-            plate_idx = int(request.GET.get("plate", "0"))
-        except ValueError:
-            plate_idx = 0
-        if plate_idx < 0 or plate_idx >= len(all_payload["plates"]):
-            return HttpResponseBadRequest("板索引无效。")
-        payload = all_payload["plates"][plate_idx]
+def _plate_export_payload(all_payload, plate_idx):
+    """
+    取某块板的导出数据（兼容两种会话结构）：
+      单板（旧结构）：直接就是一份 payload，包含 worksheet_table 等键
+      多板（新结构）：export_payload 里有 plates: [ {worksheet_table,..., header{plate_no}}, ... ]
+    板索引无效时返回 None
+    """
+    if all_payload.has_plates:
+        if plate_idx < 0 or plate_idx >= all_payload.plate_count:
+            return None
+        payload = all_payload.plate(plate_idx)   # 按需加载单块板
         # 这些顶层字段依然从总的 all_payload 里取（沿用旧有逻辑）
         payload["project_name"] = all_payload.get("project_name")
         payload["platform"] = all_payload.get("platform")
 
         if payload["platform"]!="Tecan":
             payload["testing_day"] = all_payload.get("testing_day")
-        else:
-            pass
+        return payload
+
+    return dict(all_payload.meta)  # 旧结构：单板
 
-    else:
-        payload = all_payload  # 旧结构：单板
 
+def _export_instrument_name(instrument_num):
+    # 从会话 payload 里取仪器编号，再查仪器厂家（批量导出时只查一次）
+    if instrument_num:
+        cfg = InstrumentConfiguration.objects.filter(instrument_num=instrument_num).first()
+        if cfg:
+            return (cfg.instrument_name or "").strip()
+    return ""
+
+
+def _prepare_plate_export(all_payload, payload, instrument_name, render_now=False):
+    """
+    导出一块板的第一步（请求线程内）：确定目录 / 文件名、渲染 HTML、登记工作清单 PDF 任务。
+    render_now=True 时 PDF 任务由调用方当场渲染（render_jobs_in_pool），否则交给后台 worker。
+    返回 plan（供 _write_plate_files / _finish_plate_export 使用）；失败时返回 ok=False 的结果 dict。
+    """
     # 1) 目录设置
     if payload["platform"]!="Tecan" and payload["platform"]!="手工取样":
         if payload["testing_day"] == "today":
@@ -4505,18 +3795,11 @@ def export_files(request):
 
     os.makedirs(target_dir, exist_ok=True)
 
-    # 2) 字体路径设置
-    font_path = os.path.join(settings.BASE_DIR, 'dashboard', 'static', 'css', 'fonts', 'NotoSansSC-Regular.ttf')
-
-    # 验证字体文件存在
-    if not os.path.exists(font_path):
-        return JsonResponse({"ok": False, "message": f"字体文件不存在: {font_path}"})
-
     # 3) 准备模板数据
     nums = [str(i) for i in range(1, 13)]
 
     # 4) 渲染HTML
-    pdf_html = render_to_string(
+    pdf_html = render_pdf_html(
         "dashboard/export_pdf.html",
         {
             "worksheet_table": payload["worksheet_table"],
@@ -4529,31 +3812,7 @@ def export_files(request):
         },
     )
 
-    # 5) 创建字体配置 - WeasyPrint需要
-    font_config = FontConfiguration()
-
-    # 6) 定义PDF专用CSS，包含字体配置
-    pdf_css = CSS(string=f"""
-        @font-face {{
-            font-family: "NotoSans";
-            src: url("{font_path}") format("truetype");
-            font-weight: normal;
-            font-style: normal;
-        }}
-        
-        @page {{
-            size: A4 landscape;
-            margin: 6mm 6mm 8mm 6mm;
-        }}
-        
-        body, table, td, th, div, span {{
-            font-family: "NotoSans", "DejaVu Sans", sans-serif;
-            font-size: 9pt;
-            line-height: 1.25;
-        }}
-    """, font_config=font_config)
-
-    # 7) 生成PDF
+    # 5) 生成PDF（字体/CSS 见 pdf_jobs.PDF_STYLES["worksheet"]）
     header = payload.get("header") or {}
     plate_no = header.get("plate_no", "") 
     plate_suffix = f"{plate_no}" if str(plate_no) else ""
@@ -4563,87 +3822,306 @@ def export_files(request):
     pdf_fname = f"{plate_suffix}_WorkSheet_{instrument_num}_{systerm_num}_{project}_{timestamp}_{plate_suffix}_GZ.pdf"
     pdf_path = os.path.join(target_dir, pdf_fname)
 
-    payload_name = f"{Path(pdf_fname).stem}.payload.json"
-    
     try:
-        # 使用WeasyPrint生成PDF
-        HTML(string=pdf_html).write_pdf(
-            pdf_path,
-            stylesheets=[pdf_css],
-            font_config=font_config
-        )
-
-        # ⭐ 新增：首次生成工作清单时，同时落盘保存 payload.json（与PDF同目录）
-        _dump_payload_json(target_dir, payload, filename=payload_name)
-
+        if render_now:
+            pdf_job_id = create_claimed_job(pdf_html, pdf_path, style="worksheet")
+        else:
+            # PDF 排版耗时较长：登记到后台任务队列，请求内立即返回 job_id
+            pdf_job_id = enqueue_pdf_job(pdf_html, pdf_path, style="worksheet")
     except Exception as e:
-        return JsonResponse({"ok": False, "message": f"PDF生成失败: {str(e)}"})
-
-    # 8) 生成Excel
-    xlsx_path = os.path.join(target_dir, f"上机列表_{timestamp}.xlsx")
-    
-    # 组装 DataFrame
-    headers = payload["txt_headers"]
-    records = payload["worklist_records"]  # list[dict]
-    df = pd.DataFrame(records, columns=headers)
+        return {"ok": False, "message": f"PDF生成失败: {str(e)}"}
 
-    # 从会话 payload 里取仪器编号，再查仪器厂家
-    # instrument_num = (payload.get("header") or {}).get("instrument_num")  # 你在 payload['header'] 里放过它
-    # instrument_name = ""
-    if instrument_num:
-        cfg = InstrumentConfiguration.objects.filter(instrument_num=instrument_num).first()
-        if cfg:
-            instrument_name = (cfg.instrument_name or "").strip()
+    # 8) 上机列表文件名：Sciex 导出制表符分隔的 .txt；thermo和agilent 导出逗号分隔的 .csv；其它厂家维持 .xlsx
+    stem = f"{plate_suffix}_OnboardingList_{instrument_num}_{systerm_num}_{project}_{timestamp}_{plate_suffix}_GZ"
+    if instrument_name.lower() == "sciex":
+        worklist_kind, worklist_fname = "txt", f"{stem}.txt"
+    elif instrument_name.lower() == "thermo" or instrument_name.lower() == "agilent":
+        worklist_kind, worklist_fname = "csv", f"{stem}.csv"
+    else:
+        worklist_kind, worklist_fname = "xlsx", f"{stem}.xlsx"
 
-    worklist_url_key = None  # 返回 JSON 用
-    worklist_url_val = None
+    return {
+        "ok": True,
+        "payload": payload,
+        "target_dir": target_dir,
+        "payload_name": f"{Path(pdf_fname).stem}.payload.json",
+        "plate_no": plate_no,
+        "pdf_path": pdf_path,
+        "pdf_job_id": pdf_job_id,
+        "render_now": render_now,
+        "worklist_kind": worklist_kind,
+        "worklist_path": os.path.join(target_dir, worklist_fname),
+        "worklist_url": f"{settings.DOWNLOAD_URL}{today_str}/{project}/{worklist_fname}",
+    }
 
-    if instrument_name.lower() == "sciex":
-        # Sciex：导出制表符分隔的 .txt
-        # txt_fname = f"OnboardingList_{timestamp}{plate_suffix}.txt"
-        txt_fname = f"{plate_suffix}_OnboardingList_{instrument_num}_{systerm_num}_{project}_{timestamp}_{plate_suffix}_GZ.txt"
-        txt_path = os.path.join(target_dir, txt_fname)
-        df.to_csv(txt_path, sep="\t", index=False, encoding="utf-8")
-        worklist_url_key = "txt_url"
-        worklist_url_val = f"{settings.DOWNLOAD_URL}{today_str}/{project}/{txt_fname}"
 
-    elif instrument_name.lower() == "thermo" or instrument_name.lower() == "agilent":
-        # thermo和agilent：导出逗号分隔的 .csv
-        csv_fname = f"{plate_suffix}_OnboardingList_{instrument_num}_{systerm_num}_{project}_{timestamp}_{plate_suffix}_GZ.csv"
-        csv_path = os.path.join(target_dir, csv_fname)
-        df.to_csv(csv_path, sep=",", index=False, encoding="gbk")
-        worklist_url_key = "csv_url"
-        worklist_url_val = f"{settings.DOWNLOAD_URL}{today_str}/{project}/{csv_fname}"
+def _write_plate_files(plan):
+    """
+    导出一块板的第二步：写 payload.json（与PDF同目录）与上机列表。
+    只写文件、不碰数据库，批量导出时各板在线程池里并行执行。
+    """
+    # ⭐ 首次生成工作清单时，同时落盘保存 payload.json，供替换 / 重新生成使用
+    _write_payload_json(plan["target_dir"], plan["payload"], filename=plan["payload_name"])
 
+    # 组装 DataFrame
+    payload = plan["payload"]
+    df = pd.DataFrame(payload["worklist_records"], columns=payload["txt_headers"])
+
+    worklist_path = plan["worklist_path"]
+    if plan["worklist_kind"] == "txt":
+        df.to_csv(worklist_path, sep="\t", index=False, encoding="utf-8")
+    elif plan["worklist_kind"] == "csv":
+        df.to_csv(worklist_path, sep=",", index=False, encoding="gbk")
     else:
-        # 其它厂家：维持原有 .xlsx
-        xlsx_fname = f"{plate_suffix}_OnboardingList_{instrument_num}_{systerm_num}_{project}_{timestamp}_{plate_suffix}_GZ.xlsx"
-        xlsx_path = os.path.join(target_dir, xlsx_fname)
-        with pd.ExcelWriter(xlsx_path, engine="xlsxwriter") as writer:
+        with pd.ExcelWriter(worklist_path, engine="xlsxwriter") as writer:
             df.to_excel(writer, sheet_name="Worklist", index=False)
-        worklist_url_key = "xlsx_url"
-        worklist_url_val = f"{settings.DOWNLOAD_URL}{today_str}/{project}/{xlsx_fname}"
+
+
+def _finish_plate_export(plan):
+    """导出一块板的第三步（请求线程内）：登记文件索引，组装返回结果"""
+    _record_payload_json(os.path.join(plan["target_dir"], plan["payload_name"]), plan["payload"])
+    record_artifact(plan["worklist_path"])
 
     # 返回结果：保留 pdf_url，并根据厂家返回 txt_url 或 xlsx_url
-    resp = {
+    # PDF 交给后台 worker 时此刻文件还不存在：pdf_ready=False，前端须轮询 pdf_job_status 完成后再提示 / 链接
+    pdf_ready = not plan["render_now"] and all_jobs_done([plan["pdf_job_id"]])
+    pdf_rel = os.path.relpath(plan["pdf_path"], settings.DOWNLOAD_ROOT).replace(os.sep, "/")
+    result = {
         "ok": True,
-        "message": "导出完成",
-        "pdf_url": f"{settings.DOWNLOAD_URL}{today_str}/{project}/工作清单_{timestamp}_{plate_suffix}.pdf",
+        "message": "导出完成" if pdf_ready else "上机列表已导出，工作清单 PDF 生成中",
+        "plate_no": plan["plate_no"],
+        "pdf_url": f"{settings.DOWNLOAD_URL}{pdf_rel}",
+        "pdf_ready": pdf_ready,
+        "pdf_job_id": plan["pdf_job_id"],   # 可用 pdf_job_status 轮询 PDF 生成进度
+        "pdf_path": plan["pdf_path"],
+        "worklist_path": plan["worklist_path"],
+    }
+    result[f"{plan['worklist_kind']}_url"] = plan["worklist_url"]
+    return result
+
+
+def _export_plate_files(all_payload, payload, instrument_name, render_now=False):
+    """
+    导出一块板：登记工作清单 PDF 任务、落盘 payload.json、写上机列表。
+    返回结果 dict（ok=False 时带 message）；pdf_path / worklist_path 供打包使用。
+    """
+    plan = _prepare_plate_export(all_payload, payload, instrument_name, render_now=render_now)
+    if not plan["ok"]:
+        return plan
+    try:
+        _write_plate_files(plan)
+    except Exception as e:
+        return {"ok": False, "message": f"导出失败: {str(e)}"}
+    return _finish_plate_export(plan)
+
+
+class _ZipStreamBuffer:
+    """只写、不可 seek 的缓冲区：zipfile 写入后由生成器取走字节流式输出"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_export_zip(members, manifest):
+    """逐个文件写入 ZIP 并流式输出；manifest（各板导出结果）作为 export_result.json 放在最后"""
+    buf = _ZipStreamBuffer()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for path, arcname in members:
+            zf.write(path, arcname)
+            yield buf.drain()
+        zf.writestr("export_result.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    yield buf.drain()
+
+
+def _export_all_plates(request, all_payload, instrument_name):
+    """
+    批量导出 export_payload 里的全部板（?plate=all）：
+      - 各板 HTML 渲染、PDF 任务登记在请求线程内逐板完成（都很快）；
+        payload.json 与上机列表交给线程池并行写盘
+      - PDF：PDF_RENDER_ASYNC 打开（默认）时登记给后台 worker，由其进程池渲染，前端轮询 pdf_job_status；
+        关闭时请求内用共用进程池并行渲染（render_jobs_in_pool），与写上机列表同时进行
+      - &zip=1：总是请求内并行渲染，完成后把 PDF + 上机列表流式打包成一个 ZIP
+    单块板失败不影响其他板，失败原因记录在对应板的结果中。
+    """
+    want_zip = request.GET.get("zip") == "1"
+    render_now = want_zip or not PDF_RENDER_ASYNC
+    plate_count = all_payload.plate_count if all_payload.has_plates else 1
+    log = logging.getLogger(__name__)
+
+    results, plans = [], {}
+    for idx in range(plate_count):
+        try:
+            payload = _plate_export_payload(all_payload, idx)
+            res = _prepare_plate_export(all_payload, payload, instrument_name, render_now=render_now)
+        except Exception as e:
+            log.exception("第 %s 块板导出失败", idx)
+            res = {"ok": False, "message": f"导出失败: {e}"}
+        if res["ok"]:
+            plans[idx] = res
+        results.append(res)
+
+    pdf_errors = {}
+    with ThreadPoolExecutor(max_workers=_EXPORT_WRITE_WORKERS) as pool:
+        writes = {idx: pool.submit(_write_plate_files, plan) for idx, plan in plans.items()}
+        if render_now:
+            pdf_errors = render_jobs_in_pool([plan["pdf_job_id"] for plan in plans.values()])
+
+        for idx, fut in writes.items():
+            try:
+                fut.result()
+                res = _finish_plate_export(plans[idx])
+            except Exception as e:
+                log.exception("第 %s 块板导出失败", idx)
+                res = {"ok": False, "message": f"导出失败: {e}", "pdf_path": plans[idx]["pdf_path"]}
+            if res["ok"] and render_now:
+                res["pdf_ready"] = not pdf_errors.get(res["pdf_job_id"])
+                if res["pdf_ready"]:
+                    res["message"] = "导出完成"
+                else:
+                    res["ok"] = False
+                    res["message"] = f"PDF生成失败: {pdf_errors[res['pdf_job_id']]}"
+            results[idx] = res
+
+    for idx, res in enumerate(results):
+        res["index"] = idx
+
+    ok_count = sum(1 for r in results if r["ok"])
+    pdf_pending = any(r["ok"] and not r.get("pdf_ready", True) for r in results)
+    summary = {
+        "ok": ok_count == len(results),
+        "message": (f"上机列表已导出：成功 {ok_count} / {len(results)} 块板，工作清单 PDF 生成中" if pdf_pending
+                    else f"导出完成：成功 {ok_count} / {len(results)} 块板"),
+        "total": len(results),
+        "succeeded": ok_count,
+        "plates": [{k: v for k, v in r.items() if k not in ("pdf_path", "worklist_path")} for r in results],
+        "pdf_job_ids": [r["pdf_job_id"] for r in results if r.get("pdf_job_id")],
     }
-    resp[worklist_url_key] = worklist_url_val
+
+    if not want_zip:
+        return JsonResponse(summary)
+
+    members = []
+    for r in results:
+        # PDF 失败的板仍打包已生成的上机列表，便于现场先上机
+        for key in ("pdf_path", "worklist_path"):
+            path = r.get(key)
+            if path and os.path.exists(path):
+                members.append((path, os.path.basename(path)))
+
+    project = str(all_payload.get("project_name", ""))
+    zip_name = f"{project}_全部板_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    resp = StreamingHttpResponse(_iter_export_zip(members, summary), content_type="application/zip")
+    resp["Content-Disposition"] = f"attachment; filename*=UTF-8''{escape_uri_path(zip_name)}"
+    return resp
+
+
+def export_files(request):
+    """
+    使用WeasyPrint生成PDF（兼容单板/多板）
+      ?plate=N        ：导出第 N 块板（默认 0）
+      ?plate=all      ：批量导出全部板，返回每块板的结果
+      ?plate=all&zip=1：批量导出并打包为一个 ZIP 下载
+    """
+    all_payload = get_session_payload(request, "export_payload")
+
+    if not all_payload:
+        return HttpResponseBadRequest("没有可导出的数据，请先生成结果页面。")
+
+    # 2) 字体路径设置
+    font_path = os.path.join(settings.BASE_DIR, 'dashboard', 'static', 'css', 'fonts', 'NotoSansSC-Regular.ttf')
+
+    # 验证字体文件存在（PDF 由后台 worker 生成，这里提前校验以便及时报错）
+    if not os.path.exists(font_path):
+        return JsonResponse({"ok": False, "message": f"字体文件不存在: {font_path}"})
+
+    instrument_name = _export_instrument_name(str(all_payload.get("instrument_num", "")))
+
+    if request.GET.get("plate") == "all":
+        return _export_all_plates(request, all_payload, instrument_name)
+
+    # 读取前端传入的板索引（默认 0）
+    try:
+        plate_idx = int(request.GET.get("plate", "0"))
+    except ValueError:
+        plate_idx = 0
+    payload = _plate_export_payload(all_payload, plate_idx)
+    if payload is None:
+        return HttpResponseBadRequest("板索引无效。")
+
+    resp = _export_plate_files(all_payload, payload, instrument_name)
+    resp.pop("pdf_path", None)
+    resp.pop("worklist_path", None)
+    resp.pop("plate_no", None)
     return JsonResponse(resp)
 
 
+# PDF 任务进度查询：?job_id=xxx 或 ?job_ids=a,b,c
+@require_GET
+def pdf_job_status(request):
+    raw_ids = request.GET.get("job_ids") or request.GET.get("job_id") or ""
+    job_ids = [x.strip() for x in raw_ids.split(",") if x.strip()]
+    if not job_ids:
+        return JsonResponse({"ok": False, "message": "缺少 job_id"}, status=400)
+
+    jobs = {j.job_id: j for j in PdfRenderJob.objects.filter(job_id__in=job_ids)}
+    missing = [jid for jid in job_ids if jid not in jobs]
+    if missing:
+        return JsonResponse({"ok": False, "message": f"任务不存在：{', '.join(missing)}"}, status=404)
+
+    items = [job_status_dict(jobs[jid]) for jid in job_ids]
+    finished = sum(1 for it in items if it["status"] in ("done", "failed"))
+    return JsonResponse({
+        "ok": True,
+        "jobs": items,
+        "total": len(items),
+        "finished": finished,
+        "all_done": finished == len(items),
+    })
+
+
 
 # 历史标本查找
 def sample_search_api(request):
+    """
+    GET 参数：
+      - q          : 条码或实验号（必填）
+      - mode       : exact / prefix / contains（默认 contains，与旧接口一致）
+      - date_from / date_to : YYYY-MM-DD（可选）
+      - project    : 项目名称（可选）
+      - cursor     : 上一页返回的 next_cursor（可选）
+      - limit      : 单页条数（默认 50，最多 200）
+    返回：{"results": [...], "next_cursor": "...", "has_more": bool}
+    """
     query = request.GET.get("q", "").strip()
     if not query:
-        return JsonResponse({"results": []})
+        return JsonResponse({"results": [], "next_cursor": "", "has_more": False})
 
-    records = SampleRecord.objects.filter(
-        models.Q(sample_name__icontains=query) | models.Q(barcode__icontains=query)
-    ).order_by("-record_date")
+    try:
+        date_from = request.GET.get("date_from", "").strip()
+        date_to = request.GET.get("date_to", "").strip()
+        records, next_cursor = search_sample_records(
+            query,
+            mode=(request.GET.get("mode") or "contains").strip().lower(),
+            date_from=date.fromisoformat(date_from) if date_from else None,
+            date_to=date.fromisoformat(date_to) if date_to else None,
+            project_name=request.GET.get("project", "").strip(),
+            cursor=request.GET.get("cursor", "").strip(),
+            limit=request.GET.get("limit") or SEARCH_DEFAULT_LIMIT,
+        )
+    except ValueError as e:
+        return JsonResponse({"ok": False, "message": f"查询参数错误：{e}"}, status=400)
 
     results = [
         {
@@ -4657,7 +4135,7 @@ def sample_search_api(request):
         for r in records
     ]
 
-    return JsonResponse({"results": results})
+    return JsonResponse({"results": results, "next_cursor": next_cursor, "has_more": bool(next_cursor)})
 
 
 # 手工取样
@@ -4677,6 +4155,8 @@ def Manual_process_result(request):
 
     if method_type == "icpms":  # ICP-MS特殊方法逻辑
         ctx = _build_icpms_manual_worksheets(request)
+        if isinstance(ctx, HttpResponse):   # 参数 / 配置 / 模板错误时直接返回提示页
+            return ctx
 
         # ★ 新增：把手工 ICP-MS 生成的结果写入 session，结构与 ProcessResult 保持一致
         header_meta = {
@@ -4690,7 +4170,7 @@ def Manual_process_result(request):
         for plate in ctx.get("plates", []):
             plate["header"] = header_meta 
 
-        request.session["export_payload"] = {
+        stash_session_payload(request, "export_payload", {
             "project_name":      ctx.get("project_name"),
             "project_name_full": ctx.get("project_name_full"),
             "plate_no": ctx.get("plate_no"), 
@@ -4706,8 +4186,7 @@ def Manual_process_result(request):
             "plates":            ctx.get("plates", []),
 
             "header": header_meta,
-        }
-        request.session.modified = True
+        })
         # ★ END 新增
 
         return render(request, "dashboard/ProcessResult_Manual.html", ctx)
@@ -4874,11 +4353,11 @@ def _build_icpms_manual_worksheets(request):
     if not (station_available and Scanresult and project_id and platform and instrument_num):
         return HttpResponseBadRequest("缺少必要参数或文件。")
 
-    # 读取岗位清单（优先手动上传，其次自动抓取）
+    # 读取岗位清单（优先手动上传，其次自动抓取；按内容 sha256 缓存解析结果）
     if Stationlist:
-        Stationtable = xlrd.open_workbook(filename=None, file_contents=Stationlist.read())
+        station_parsed = parse_station_upload(Stationlist)
     else:
-        Stationtable = xlrd.open_workbook(filename=None, file_contents=station_bytes)
+        station_parsed = parse_station_list(station_bytes)
 
     Scantable = xlrd.open_workbook(filename=None, file_contents=Scanresult.read())
     scan_sheet   = Scantable.sheets()[0]
@@ -4897,38 +4376,13 @@ def _build_icpms_manual_worksheets(request):
     proj_name_full = cfg.project_name_full
     mapping_path   = cfg.mapping_file.path
 
-    df_mapping_wc = pd.read_excel(mapping_path, sheet_name="工作清单")
-    # Barcode -> Name / Code，用于识别曲线/QC/Blank
-    barcode_to_name = dict(
-        zip(df_mapping_wc["Barcode"].astype(str), df_mapping_wc["Name"].astype(str))
-    )
-    barcode_to_code = dict(
-        zip(df_mapping_wc["Barcode"].astype(str), df_mapping_wc["Code"].astype(str))
-    )
-
-    # ===== 新增：收集“当天该项目已生成工作清单”中的历史完整条码 =====
-    history_main_to_origins = _collect_today_project_main_barcode_history(
-        platform=platform,
-        record_date=record_date,
-        project_name=project_name,
-    )
+    mapping_bundle = get_mapping_bundle(mapping_path)
+    # Barcode -> Name / Code，用于识别曲线/QC/Blank（缓存内只读映射；Name 为原值，取用时再 str）
+    barcode_to_name = mapping_bundle.barcode_to_name
+    barcode_to_code = mapping_bundle.barcode_to_code
 
     # 2) 岗位清单：主条码 -> 实验号 列表（与 NIMBUS 完全同源）
-    st_sheet   = Stationtable.sheets()[0]
-    st_nrows   = st_sheet.nrows
-    st_ncols   = st_sheet.ncols
-    st_header  = [str(st_sheet.row_values(0)[i]).strip() for i in range(st_ncols)]
-    st_index   = {col: idx for idx, col in enumerate(st_header)}
-
-    MB_IDX = st_index.get("主条码", 0)
-    SN_IDX = st_index.get("实验号", 0)
-
-    barcode_to_names = defaultdict(list)
-    for i in range(1, st_nrows):
-        bc = str(st_sheet.row_values(i)[MB_IDX]).strip()
-        sn = str(st_sheet.row_values(i)[SN_IDX]).strip()
-        if bc:
-            barcode_to_names[bc].append(sn)
+    barcode_to_names = station_parsed.barcode_to_names("主条码", require_name=False)
 
     # 3) 扫码结果表：读取 B3:P34 中的条码，按列纵向收集为列表 A
     wb_scan = load_workbook(filename=Scanresult, data_only=True)
@@ -4964,6 +4418,14 @@ def _build_icpms_manual_worksheets(request):
 
     cut_counter = Counter(cut_barcodes)
 
+    # ===== 新增：收集“当天该项目已生成工作清单”中的历史完整条码（只查本次出现的主条码） =====
+    history_main_to_origins = _collect_today_project_main_barcode_history(
+        platform=platform,
+        record_date=record_date,
+        project_name=project_name,
+        main_barcodes={_split_main_sub_barcode(bc)[0] for bc in origin_barcodes},
+    )
+
     # ===== 新增：先判定“同主条码、不同子条码”的后出现冲突（黄色规则） =====
     subbarcode_conflict_flags = _detect_icpms_subbarcode_conflicts(
         origin_barcodes=origin_barcodes,
@@ -5054,7 +4516,7 @@ def _build_icpms_manual_worksheets(request):
                 highlight_types.append("")
 
 
-    # 结合 df_mapping_wc，把 TRUE/ FALSE 的 raw 值转换成最终实验号 / 曲线名
+    # 结合映射表 Barcode -> Name，把 TRUE/ FALSE 的 raw 值转换成最终实验号 / 曲线名
     list_b_items = []  # 每个元素：{"barcode":cut,"origin_barcode":..., "sample_name":..., "is_special":bool}
     for i, cb in enumerate(cut_barcodes):
         raw_value = str(match_sample_raw[i])
@@ -5070,7 +4532,7 @@ def _build_icpms_manual_worksheets(request):
                     sample_name = ""
                 else:
                     # 在 mapping_file 中找曲线 / 质控名称
-                    sample_name = barcode_to_name.get(raw_value, "No match")
+                    sample_name = str(barcode_to_name[raw_value]) if raw_value in barcode_to_name else "No match"
 
         code = barcode_to_code.get(str(cb), "")
         is_special = bool(code) and (
@@ -5251,13 +4713,8 @@ def _build_icpms_manual_worksheets(request):
         })
 
         # ===== 新增：写入 SampleRecord，供“历史标本查找”使用 =====
-        # 与 NIMBUS 保持一致：先清理同日/同项目/同板号旧记录，再逐孔写入
-        SampleRecord.objects.filter(
-            project_name=proj_name,
-            record_date=record_date,
-            plate_no=plate_no_str
-        ).delete()
-
+        # 与 NIMBUS 保持一致：先清理同日/同项目/同板号旧记录，再整板批量写入
+        plate_record_rows = []
         for row in plate:
             for cell in row:
                 match_sample   = str(cell.get("match_sample") or "").strip()
@@ -5273,17 +4730,15 @@ def _build_icpms_manual_worksheets(request):
                 # ICP-MS 目前只有 No match 这一类明显报错信息
                 error_info = "No match" if match_sample == "No match" else ""
 
-                SampleRecord.objects.update_or_create(
-                    project_name=proj_name,
-                    record_date=record_date,
-                    plate_no=plate_no_str,
-                    well_str=well_str,
-                    defaults={
-                        "sample_name": match_sample,
-                        "barcode": origin_barcode,
-                        "error_info": error_info,
-                    }
-                )
+                plate_record_rows.append(make_sample_row(well_str, match_sample, origin_barcode, error_info))
+
+        save_plate_records(
+            plate_record_rows,
+            project_name=proj_name,
+            record_date=record_date,
+            plate_no=plate_no_str,
+            replace_plate=True,
+        )
 
         if clinical_idx >= len(clinical_queue):
             break
@@ -5293,26 +4748,20 @@ def _build_icpms_manual_worksheets(request):
     ############################################
 
     # 对应关系表：上机列表 sheet
-    df_worklistmap = pd.read_excel(mapping_path, sheet_name="上机列表").fillna("")
+    # 每份文件、每个进样体积只编译一次，各板共用
+    worklist_map = mapping_bundle.worklist_map(icpms_classifier(injection_vol), fillna="")
 
     # 仪器上机模板 → 确定列头
     instrument_config = InstrumentConfiguration.objects.get(
         instrument_num=instrument_num,
         systerm_num=systerm_num
     )
-    raw = instrument_config.upload_file.read()
     try:
-        text = raw.decode("utf-8")
-    except Exception:
-        text = raw.decode("gbk", errors="replace")
-
-    df_template = pd.read_csv(
-        StringIO(text),
-        sep=None,
-        engine="python",
-        dtype=str
-    )
-    txt_headers = df_template.columns.tolist()
+        txt_headers = list(get_template_descriptor(instrument_config)["headers"])
+    except (TemplateParseError, OSError) as e:
+        return render(request, "dashboard/error.html", {
+            "message": f"读取上机模板失败：{str(e)}"
+        })
 
     # 仪器名称（Thermo / Agilent 等）
     instrument_name = getattr(instrument_config, "instrument_name", "")
@@ -5321,27 +4770,17 @@ def _build_icpms_manual_worksheets(request):
     test_count   = cfg.test_count or 0
     curve_points = cfg.curve_points or 0
 
-    df_std = df_mapping_wc[
-        df_mapping_wc["Code"].astype(str).str.startswith("STD")
-    ].copy()
-    std_names = df_std["Name"].tolist()
+    std_names = list(mapping_bundle.std_pool)        # Code 以 STD 开头，表中顺序
     std_names_use = std_names[: curve_points + 1]
 
-    qc_names = df_mapping_wc[
-        df_mapping_wc["Code"].astype(str).str.startswith("QC")
-    ]["Name"].astype(str).unique().tolist()
+    qc_names = list(dict.fromkeys(str(n) for n in mapping_bundle.qc_names))
 
     # 对每块板分别生成上机列表
     for p in plates:
         plate_no_str = p["plate_no"]
 
-        # ★ 每块板单独构建一次 name_to_barcodes（从 df_mapping_wc 拷贝）
-        name_to_barcodes = defaultdict(deque)
-        for _, row_m in df_mapping_wc.iterrows():
-            n = str(row_m.get("Name", "")).strip()
-            b = str(row_m.get("Barcode", "")).strip()
-            if n and b and b != "nan":
-                name_to_barcodes[n].append(b)
+        # ★ 每块板单独一份 name_to_barcodes 队列（由缓存的 Name -> 条码复制）
+        name_to_barcodes = mapping_bundle.barcode_queues(stripped=True)
 
         # ---------- 1) 构建 barcode -> [(well_pos, well_no)...] 队列 ----------
         barcode_to_well = defaultdict(deque)
@@ -5396,130 +4835,17 @@ def _build_icpms_manual_worksheets(request):
         first_col_header = txt_headers[0]
         df_worklist[first_col_header] = SampleName_list
 
-        mirror_cols = set()
-
-        # 4) 应用 df_worklistmap 映射规则
-        col0 = df_worklist[first_col_header]
-
-        def resolve_vialpos_for_value(sample_name_value, placeholder):
-            """
-            根据第一列的值 sample_name_value 决定孔位。
-            - 当 placeholder 为 {{Well_Number}} / {{Well_Position}} 时，按条码动态计算；
-            - 否则视为固定字符串（例如 D3B-F8 / D3B-F9），直接返回 placeholder。
-            """
-
-            s = str(sample_name_value).strip()
-            if not s:
-                return ""
-
-            # 1) 非占位符：直接返回配置值（用于 DB* / Test* 的 D3B-F8 / D3B-F9）
-            if placeholder not in ("{{Well_Number}}", "{{Well_Position}}"):
-                return placeholder
-
-            # 2) 定位孔：X1 / X2 / X3 ...
-            # 手工 ICP-MS 的定位孔规则与 worksheet 保持一致：
-            # 板1=A3, 板2=B3, 板3=C3 ... 超过8块后循环
-            m = re.fullmatch(r"X(\d+)", s.upper())
-            if m:
-                k0 = int(m.group(1)) - 1
-                row_idx = k0 % 8
-                coln = 3   # 固定第3列 -> “3”
-                row_letter = letters[row_idx]
-                well_pos = f"{row_letter}{coln}"
-                well_no = row_idx * 12 + coln
-
-                if placeholder == "{{Well_Number}}":
-                    return f"{well_no}"
-                else:
-                    return f"{well_pos}"
-
-            # 1) QC/STD：通过 name_to_barcodes 队列取条码，再查位置信息
-            if s in name_to_barcodes and name_to_barcodes[s]:
-                barcode = name_to_barcodes[s].popleft()
-                wells_q = barcode_to_well.get(barcode)
-                if wells_q:
-                    pos, no = wells_q.popleft()
-                    # ICP-MS 这里不区分 Thermo/Agilent，格式保持与 NIMBUS 一致
-                    if placeholder == "{{Well_Number}}":
-                        return f"{no}"
-                    else:
-                        return f"{pos}"
-
-            # 2) 临床样本：第一列即为条码
-            if s in barcode_to_well:
-                wells_q = barcode_to_well.get(s)
-                if wells_q:
-                    pos, no = wells_q.popleft()
-                    if placeholder == "{{Well_Number}}":
-                        return f"{no}"
-                    else:
-                        return f"{pos}"
-
-            # 3) 找不到就返回空
-            return f"{injection_plate}-{'H1'}"
-
-        def apply_to(mask, fill_values):
-            nonlocal mirror_cols
-            for col, val in zip(txt_headers[1:], fill_values.values):
-                v = str(val).strip()
-
-                # "*"：该列镜像第一列
-                if v == "*":
-                    mirror_cols.add(col)
-                    continue
-
-                # 2) 进样体积列：直接用配置的 injection_volume（如果有），否则写回映射表里的值
-                if col in ("SmplInjVol", "Injection volume"):
-                    df_worklist.loc[mask, col] = injection_vol or v
-                    continue
-
-                # 3) ★ 动态计算孔位列：列名为 VialPos / Vial position / 样品瓶
-                #    触发方式与 NIMBUS 完全一致，不再通过占位符 "{{Well_Number}}" 判断
-                if col in ("VialPos", "Vial position", "样品瓶", "样品瓶号"):
-                    df_worklist.loc[mask, col] = df_worklist.loc[mask, first_col_header].apply(
-                        lambda x: resolve_vialpos_for_value(x, v)
-                    )
-                    continue
-
-                # 4) 其它列：直接按映射表填固定值
-                df_worklist.loc[mask, col] = val
-
-        # 遍历 mapping 表中的每一条规则（完全照 NIMBUS 的 key 语义）
-        for _, rule in df_worklistmap.iterrows():
-            sample_key  = rule.iloc[0]
-            fill_values = rule.iloc[1:]
-
-            if str(sample_key) == "DB*":
-                mask = df_worklist.iloc[:, 0].str.startswith("DB")
-                apply_to(mask, fill_values)
-            elif str(sample_key).startswith("DB"):
-                mask = col0 == str(sample_key)
-                apply_to(mask, fill_values)
-            elif str(sample_key) == "Test*":
-                mask = col0.str.startswith("Test")
-                apply_to(mask, fill_values)
-            elif str(sample_key).startswith("Test"):
-                mask = col0 == str(sample_key)
-                apply_to(mask, fill_values)
-
-            elif str(sample_key) == "STD*":
-                mask = col0.isin(std_names_use)
-                apply_to(mask, fill_values)
-            elif str(sample_key).startswith("STD"):
-                mask = col0 == str(sample_key)
-                apply_to(mask, fill_values)
-
-            elif str(sample_key) == "QC*":
-                mask = col0.isin(qc_names)
-                apply_to(mask, fill_values)
-            elif str(sample_key).startswith("QC"):
-                mask = col0 == str(sample_key)
-                apply_to(mask, fill_values)
-
-            elif str(sample_key) == "*":
-                # 通配：填充剩余所有空行
-                mask = df_worklist.iloc[:, 1].isna() 
-                apply_to(mask, fill_values)
+        # 4) 应用 df_worklistmap 映射规则（完全照 NIMBUS 的 key 语义；STD* / QC* 按本项目的名称列表）
+        resolve_vialpos = icpms_vial_resolver(
+            injection_plate=injection_plate,
+            name_to_barcodes=name_to_barcodes,
+            barcode_to_well=barcode_to_well,
+        )
+        mirror_cols = apply_worklist_map(
+            worklist_map, df_worklist,
+            lambda key, fill: standard_rule_mask(key, fill, std_names=std_names_use, qc_names=qc_names),
+            resolve_vialpos,
+        )
 
         # 5) 镜像列填充
         for col in mirror_cols:
@@ -5876,67 +5202,33 @@ def _build_station_barcode_map_for_daan(Stationlist, station_bytes=None) -> tupl
       }
     """
     if Stationlist:
-        Stationlist.seek(0)
-        station_table = xlrd.open_workbook(filename=None, file_contents=Stationlist.read())
-        try:
-            Stationlist.seek(0)
-        except Exception:
-            pass
+        parsed = parse_station_upload(Stationlist)
     elif station_bytes:
-        station_table = xlrd.open_workbook(filename=None, file_contents=station_bytes)
+        parsed = parse_station_list(station_bytes)
     else:
         raise DaanScanParseError("未检测到岗位清单，无法进行临床样本匹配。")
 
-    st_sheet = station_table.sheets()[0]
-    st_nrows = st_sheet.nrows
-    st_ncols = st_sheet.ncols
-
-    if st_nrows < 2:
+    if not parsed.rows:
         raise DaanScanParseError("岗位清单内容为空或缺少数据行。")
 
-    st_header = [str(st_sheet.row_values(0)[i]).strip() for i in range(st_ncols)]
-    st_index = {col: idx for idx, col in enumerate(st_header)}
-
-    if "实验号" not in st_index:
+    if "实验号" not in parsed.index:
         raise DaanScanParseError("岗位清单缺少必要列：实验号。")
 
-    use_sub_barcode = "子条码" in st_index
-
-    if use_sub_barcode:
-        key_col = "子条码"
-    elif "主条码" in st_index:
-        key_col = "主条码"
-    else:
+    use_sub_barcode = parsed.use_sub_barcode
+    key_col = parsed.key_column
+    if key_col is None:
         raise DaanScanParseError("岗位清单缺少必要列：主条码 或 子条码。")
 
-    KEY_IDX = st_index[key_col]
-    SN_IDX = st_index["实验号"]
-
-    barcode_to_names = defaultdict(list)
-
-    for i in range(1, st_nrows):
-        bc = str(st_sheet.row_values(i)[KEY_IDX]).strip()
-        sn = str(st_sheet.row_values(i)[SN_IDX]).strip()
-
-        if not bc or not sn:
-            continue
-
-        # xlrd 有时会把纯数字读成 1426218671.0，这里转成整数样式字符串
-        if re.fullmatch(r"\d+\.0", bc):
-            bc = bc[:-2]
-
-        if re.fullmatch(r"\d+\.0", sn):
-            sn = sn[:-2]
-
-        barcode_to_names[bc].append(sn)
+    # xlrd 有时会把纯数字读成 1426218671.0，这里转成整数样式字符串
+    barcode_to_names = parsed.barcode_to_names(key_col, int_like=True)
 
     meta = {
         "use_sub_barcode": use_sub_barcode,
         "key_column": key_col,
         "sample_column": "实验号",
-        "row_count": st_nrows - 1,
+        "row_count": len(parsed.rows),
         "map_count": len(barcode_to_names),
-        "headers": st_header,
+        "headers": list(parsed.header),
     }
 
     return barcode_to_names, meta
@@ -5945,7 +5237,7 @@ def _build_station_barcode_map_for_daan(Stationlist, station_bytes=None) -> tupl
 def _match_daan_aligned_samples(
     aligned: dict,
     barcode_to_names: dict,
-    df_mapping_wc: pd.DataFrame,
+    mapping_bundle: MappingBundle,
 ) -> dict:
     """
     对达安 96 孔 aligned 数据做样本匹配。
@@ -5967,20 +5259,15 @@ def _match_daan_aligned_samples(
     Item = aligned["Item"]
     locator_positions = aligned["locator_positions"]
 
-    # mapping_file 工作清单：Barcode -> Name
+    # mapping_file 工作清单：Barcode -> Name（均去空格，缓存内已构建）
     required_cols = {"Barcode", "Name"}
-    missing_cols = required_cols - set(df_mapping_wc.columns)
+    missing_cols = required_cols - set(mapping_bundle.columns("工作清单"))
     if missing_cols:
         raise DaanScanParseError(
             f"mapping_file 的“工作清单”sheet 缺少必要列：{', '.join(sorted(missing_cols))}。"
         )
 
-    barcode_to_name = dict(
-        zip(
-            df_mapping_wc["Barcode"].astype(str).str.strip(),
-            df_mapping_wc["Name"].astype(str).str.strip(),
-        )
-    )
+    barcode_to_name = mapping_bundle.stripped_barcode_to_name
 
     MatchSampleName = []
     MatchResult = []
@@ -6227,7 +5514,7 @@ def _build_daan_worklist_records(
     aligned: dict,
     matched: dict,
     config,
-    df_worklistmap: pd.DataFrame,
+    worklist_map: WorklistMap,
     df_template: pd.DataFrame,
     instrument_name: str,
     injection_plate: str,
@@ -6268,10 +5555,6 @@ def _build_daan_worklist_records(
     if not txt_headers:
         raise DaanScanParseError("上机模板为空，无法生成上机列表。")
 
-    # 清洗映射表列名
-    df_worklistmap = df_worklistmap.copy()
-    df_worklistmap.columns = [str(c).strip() for c in df_worklistmap.columns]
-
     # ========== 1. 基础工具函数 ==========
     def _safe_int(v, default=0):
         try:
@@ -6397,92 +5680,18 @@ def _build_daan_worklist_records(
     first_col = worklist_table.columns[0]
     worklist_table[first_col] = sample_name_list
 
-    # 记录需要镜像第一列的列
-    mirror_cols = set()
-
     # ========== 5. 按 mapping_file 的“上机列表”sheet 填充 ==========
-    for _, map_row in df_worklistmap.iterrows():
-        sample_key = str(map_row.iloc[0]).strip()
-        fill_vals = map_row.iloc[1:]
-
-        def fill_cols(mask):
-            for col, val in zip(worklist_table.columns[1:], fill_vals.values):
-                val = "" if pd.isna(val) else str(val).strip()
-
-                if val == "*":
-                    mirror_cols.add(col)
-                    continue
-
-                if col in ("SmplInjVol", "Injection volume"):
-                    continue
-
-                if col in ("VialPos", "Vial position", "样品瓶"):
-                    def _resolve_vialpos(sample_name_value):
-                        sample_name_value = str(sample_name_value).strip()
-
-                        # 如果该样本在达安 txt 中有孔位，使用 txt Well
-                        wells_q = name_to_wells.get(sample_name_value)
-                        if wells_q:
-                            well = wells_q.popleft()
-                            if val in ("{{Well_Number}}", "{{Well_Position}}"):
-                                return _format_vialpos(well, val)
-                            return val
-
-                        # DB/Test 等没有实际孔位的项：沿用 NIMBUS 兜底 A1/1
-                        if val in ("{{Well_Number}}", "{{Well_Position}}"):
-                            if val == "{{Well_Number}}":
-                                return "1"
-                            return "A1"
-
-                        return val
-
-                    worklist_table.loc[mask, col] = worklist_table.loc[mask, first_col].apply(_resolve_vialpos)
-
-                else:
-                    worklist_table.loc[mask, col] = val
-
-        if sample_key == "DB*":
-            mask = worklist_table[first_col].astype(str).str.startswith("DB", na=False)
-            fill_cols(mask)
-
-        elif sample_key.startswith("DB"):
-            mask = worklist_table[first_col].astype(str) == sample_key
-            fill_cols(mask)
-
-        elif sample_key == "Test*":
-            mask = worklist_table[first_col].astype(str).str.startswith("Test", na=False)
-            fill_cols(mask)
-
-        elif sample_key.startswith("Test"):
-            mask = worklist_table[first_col].astype(str) == sample_key
-            fill_cols(mask)
-
-        elif sample_key == "STD*":
-            mask = worklist_table[first_col].astype(str).str.startswith("STD", na=False)
-            fill_cols(mask)
-
-        elif sample_key.startswith("STD"):
-            mask = worklist_table[first_col].astype(str) == sample_key
-            fill_cols(mask)
-
-        elif sample_key == "QC*":
-            # 兼容 mapping_file 中存在 QC* 行的情况
-            mask = worklist_table[first_col].astype(str).str.startswith("QC", na=False)
-            fill_cols(mask)
-
-        elif sample_key.startswith("QC"):
-            # 兼容具体 QC 名称或 QC 前缀
-            mask = worklist_table[first_col].astype(str) == sample_key
-            fill_cols(mask)
-
-        elif sample_key == "*":
-            # 默认行：填充还未被填过的行
-            # 使用第二列是否为空作为判断，与 NIMBUS 逻辑一致
-            if len(worklist_table.columns) > 1:
-                mask = worklist_table.iloc[:, 1].isna()
-            else:
-                mask = pd.Series([False] * len(worklist_table), index=worklist_table.index)
-            fill_cols(mask)
+    # 孔位列：样本在达安 txt 中有孔位时按队列取用，DB/Test 等没有实际孔位的项沿用 NIMBUS 兜底 A1/1
+    resolve_vialpos = daan_vial_resolver(name_to_wells=name_to_wells, format_well=_format_vialpos)
+
+    # 记录需要镜像第一列的列；QC* 兼容 mapping_file 中存在 QC* 行的情况；
+    # 默认行 * 以第二列是否为空判断（与 NIMBUS 一致），只有一列时不填
+    mirror_cols = apply_worklist_map(
+        worklist_map,
+        worklist_table,
+        lambda key, fill: standard_rule_mask(key, fill, single_column=False),
+        resolve_vialpos,
+    )
 
     # ========== 6. SetName / OutputFile ==========
     year = today_str[:4]
@@ -6598,8 +5807,9 @@ def Daan_process_result(request):
 
     try:
         mapping_path = config.mapping_file.path
-        df_mapping_wc = pd.read_excel(mapping_path, sheet_name="工作清单")
-        df_worklistmap = pd.read_excel(mapping_path, sheet_name="上机列表")
+        mapping_bundle = get_mapping_bundle(mapping_path)
+        mapping_bundle.columns("工作清单")                                          # 缺 sheet 时在此报错
+        worklist_map = mapping_bundle.worklist_map(daan_classify, key=strip_key)   # 每份文件只编译一次
     except Exception as e:
         return render(request, "dashboard/error.html", {
             "message": f"读取 mapping_file 的“工作清单”sheet 失败：{str(e)}"
@@ -6638,33 +5848,13 @@ def Daan_process_result(request):
             "message": "未设置该上机仪器对应的上机模板，请设置后再试。"
         })
 
-    ext = os.path.splitext(instrument_config.upload_file.name)[1].lower()
-    if ext not in (".txt", ".csv"):
-        return render(request, "dashboard/error.html", {
-            "message": f"仅支持 .txt 或 .csv 上机模板，当前为：{ext}"
-        })
-
     try:
-        with instrument_config.upload_file.open("rb") as f:
-            raw = f.read()
-
-        template_text = None
-        for enc in ("utf-8", "utf-8-sig", "gb18030", "gbk"):
-            try:
-                template_text = raw.decode(enc)
-                break
-            except UnicodeDecodeError:
-                continue
-
-        if template_text is None:
-            template_text = raw.decode("utf-8", errors="replace")
-
-        df_template = pd.read_csv(StringIO(template_text), sep=None, engine="python", dtype=str)
-
-    except Exception as e:
+        template_meta = get_template_descriptor(instrument_config)
+    except (TemplateParseError, OSError) as e:
         return render(request, "dashboard/error.html", {
             "message": f"读取上机模板失败：{str(e)}"
         })
+    df_template = pd.DataFrame(columns=template_meta["headers"])
 
     # ========== 5- 读取进样体积 ==========
     try:
@@ -6684,7 +5874,7 @@ def Daan_process_result(request):
         matched = _match_daan_aligned_samples(
             aligned=aligned,
             barcode_to_names=barcode_to_names,
-            df_mapping_wc=df_mapping_wc,
+            mapping_bundle=mapping_bundle,
         )
         worksheet_table = _build_daan_worksheet_table(
             aligned=aligned,
@@ -6719,7 +5909,7 @@ def Daan_process_result(request):
             aligned=aligned,
             matched=matched,
             config=config,
-            df_worklistmap=df_worklistmap,
+            worklist_map=worklist_map,
             df_template=df_template,
             instrument_name=instrument_name,
             injection_plate=injection_plate,
@@ -6760,10 +5950,11 @@ def Daan_process_result(request):
         供“历史标本查找”和“每日标本统计”使用。
 
         说明：
-        - NIMBUS / Starlet 在构建每个 well 时已经 update_or_create；
+        - NIMBUS / Starlet 在构建每个 well 时收集记录，整板统一批量落库；
         - 达安模块目前只构造 worksheet_table / worklist_records，
         因此需要在每块板构造完成后统一落库。
         """
+        plate_record_rows = []
         for row in worksheet_table:
             if not isinstance(row, list):
                 continue
@@ -6811,18 +6002,15 @@ def Daan_process_result(request):
                     or ""
                 ).strip()
 
-                SampleRecord.objects.update_or_create(
-                    project_name=project_name,
-                    record_date=record_date,
-                    batch_id=batch_id,
-                    plate_no=plate_no_str,
-                    well_str=well_str,
-                    defaults={
-                        "sample_name": sample_name,
-                        "barcode": origin_barcode,
-                        "error_info": error_info,
-                    }
-                )
+                plate_record_rows.append(make_sample_row(well_str, sample_name, origin_barcode, error_info))
+
+        save_plate_records(
+            plate_record_rows,
+            project_name=project_name,
+            record_date=record_date,
+            batch_id=batch_id,
+            plate_no=plate_no_str,
+        )
 
     plate_payload = {
         "project_name": project_name,
@@ -6865,7 +6053,7 @@ def Daan_process_result(request):
     match_counter = Counter(matched["MatchResult"])
 
     # ========== 达安：保存 Session，供 preview_export / export_files 使用 ==========
-    request.session["export_payload"] = {
+    stash_session_payload(request, "export_payload", {
         "project_name": project_name,
         "project_name_full": project_name_full,
         "instrument_num": instrument_num,
@@ -6875,8 +6063,7 @@ def Daan_process_result(request):
         "today_str": today_str,
         "testing_day": testing_day,
         "plates": plates_payload,
-    }
-    request.session.modified = True
+    })
 
 
     # ========== 10. 渲染现有结果页 ==========
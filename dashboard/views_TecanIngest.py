@@ -13,6 +13,17 @@ from django.utils.html import escape
 from django.utils import timezone
 from django.shortcuts import render
 from .models import *
+from .mapping_cache import get_mapping_bundle
+from .payload_store import stash_session_payload
+from .sample_records import make_sample_row, save_plate_records
+from .station_store import merge_station_pairs, station_barcode_map
+from .station_map_store import get_session_station_map, stash_session_station_map
+from .station_parser import parse_station_list, parse_station_upload, read_upload_bytes
+from .tecan_history import forget_processed_file, history_first_tubes, history_main_barcodes, index_processed_file
+from .tecan_scan import load_tecan_scan, remember_tecan_scan, write_tecan_scan
+from .worklist_engine import (
+    WorklistMap, apply_worklist_map, strip_key, tecan_classify, tecan_rule_mask, tecan_vial_resolver,
+)
 
 import math
 import os
@@ -60,6 +71,14 @@ def _safe_dirname(name: str) -> str:
     s = s.strip("._-")
     return s or "project"
 
+def _station_pairs(parsed) -> list[tuple[str, str]]:
+    """已解析岗位清单中的 (条码, 实验号)：优先子条码列，其次主条码列；缺列时返回空列表"""
+    if parsed.key_column is None or not parsed.has_columns("实验号"):
+        return []
+    # pandas dtype=str 读数字单元格不带 .0，这里保持同一口径
+    return parsed.pairs(int_like=True)
+
+
 def _extract_station_pairs_from_upload(f) -> list[tuple[str, str]]:
     """
     从岗位清单表中提取 (主条码, 实验号)。
@@ -70,18 +89,22 @@ def _extract_station_pairs_from_upload(f) -> list[tuple[str, str]]:
     """
     name = (getattr(f, "name", "") or "").lower()
 
+    # Excel 走共享解析缓存（与 _load_station_map_from_upload 解析同一份上传时直接命中）
+    if not name.endswith(".csv"):
+        try:
+            return _station_pairs(parse_station_upload(f))
+        except Exception:
+            pass
+
     # 读取成 DataFrame
     try:
-        if name.endswith((".xls", ".xlsx")):
-            df = pd.read_excel(f, dtype=str)
-        elif name.endswith(".csv"):
+        if name.endswith(".csv"):
             df = pd.read_csv(f, dtype=str, encoding="utf-8", engine="python")
         else:
-            # 尝试按 excel 读一次
             df = pd.read_excel(f, dtype=str)
     except Exception:
         # 最后兜底：读 bytes 再让 pandas 猜
-        bio = io.BytesIO(f.read())
+        bio = io.BytesIO(read_upload_bytes(f))
         df = pd.read_excel(bio, dtype=str)
 
     # 列名清洗
@@ -104,268 +127,44 @@ def _extract_station_pairs_from_upload(f) -> list[tuple[str, str]]:
 
 def _save_station_store_daily(pairs: list[tuple[str, str]]) -> dict:
     """
-    将 pairs 合并保存到：DOWNLOAD_ROOT/岗位清单/YYYY-MM-DD/station_list.json
-    冲突不阻断：记录到 warning（json 最前面）
+    将 pairs 合并进当天岗位清单映射库（station_store；station_list.json 只在需要时用 export_station_list 导出）
+    冲突不阻断：同一实验号已映射其他主条码时忽略本次冲突行，记录到 warning
     返回 summary：{saved, added_pairs, conflicts, path}
     """
-    day_date = timezone.localdate()
-    day_dir = os.path.join(settings.DOWNLOAD_ROOT, "岗位清单", day_date.strftime("%Y-%m-%d"))
-    os.makedirs(day_dir, exist_ok=True)
-    path = os.path.join(day_dir, "station_list.json")
-
-    def load_store():
-        if not os.path.isfile(path):
-            return {"warning": [], "主条码->实验号列表": {}, "实验号->主条码": {}}
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                d = json.load(f)
-            if "warning" not in d:
-                d = {"warning": [], **d}
-            d.setdefault("主条码->实验号列表", {})
-            d.setdefault("实验号->主条码", {})
-            return d
-        except Exception:
-            return {"warning": [{"type": "load_error", "msg": f"读取失败，已重置：{os.path.basename(path)}"}],
-                    "主条码->实验号列表": {}, "实验号->主条码": {}}
+    return merge_station_pairs(timezone.localdate().strftime("%Y-%m-%d"), pairs, override=False, barcode_kind="main")
 
-    def dedup_warning(existing, new_items):
-        seen = set()
-        out = []
-        for w in (existing or []) + (new_items or []):
-            if not isinstance(w, dict):
-                continue
-            key = (w.get("type"), w.get("experiment_no"), w.get("old_main_barcode"), w.get("new_main_barcode"), w.get("msg"))
-            if key in seen:
-                continue
-            seen.add(key)
-            out.append(w)
-        return out
-
-    store = load_store()
-    mb2sn = store.get("主条码->实验号列表", {}) or {}
-    sn2mb = store.get("实验号->主条码", {}) or {}
-
-    added_pairs = 0
-    conflict_cnt = 0
-    warnings_new = []
-
-    # 合并
-    for mb, sn in pairs:
-        mb = (mb or "").strip()
-        sn = (sn or "").strip()
-        if not mb or not sn:
-            continue
 
-        if sn in sn2mb:
-            old_mb = str(sn2mb.get(sn) or "").strip()
-            if old_mb and old_mb != mb:
-                conflict_cnt += 1
-                warnings_new.append({
-                    "type": "conflict",
-                    "experiment_no": sn,
-                    "old_main_barcode": old_mb,
-                    "new_main_barcode": mb,
-                    "msg": f"实验号 {sn} 当天已映射主条码 {old_mb}，本次上传为 {mb}，已忽略本次冲突行"
-                })
-                continue
-        else:
-            sn2mb[sn] = mb
-
-        exist_list = mb2sn.get(mb, [])
-        if not isinstance(exist_list, list):
-            exist_list = [str(exist_list)]
-        exist_set = set(str(x).strip() for x in exist_list if str(x).strip())
-
-        if sn not in exist_set:
-            exist_list.append(sn)
-            added_pairs += 1
-        mb2sn[mb] = exist_list
-
-    store["warning"] = dedup_warning(store.get("warning", []), warnings_new)
-    store["主条码->实验号列表"] = mb2sn
-    store["实验号->主条码"] = sn2mb
-
-    generated_at = timezone.localtime().strftime("%Y-%m-%d %H:%M:%S")
-    need_write = (added_pairs > 0) or (conflict_cnt > 0) or (not os.path.isfile(path))
-    if need_write:
-        ordered_out = {
-            "生成时间": generated_at,
-            "warning": store.get("warning", []),
-            "主条码->实验号列表": store.get("主条码->实验号列表", {}),
-            "实验号->主条码": store.get("实验号->主条码", {}),
-        }
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(ordered_out, f, ensure_ascii=False, indent=2)
-
-    return {"saved": need_write, "added_pairs": added_pairs, "conflicts": conflict_cnt, "path": path}
-
-
-def _read_raw_csv_lines(path: str) -> tuple[str, list[str], list[list[str]]]:
-    """
-    返回 (header_line, data_lines, parsed_rows)
-    - header_line: 第一行（原样字符串）
-    - data_lines: 第二行开始的每一行原文本
-    - parsed_rows: data_lines 按 ';' 分割后的二维列表
-    """
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        lines = [ln.strip() for ln in f.read().splitlines() if ln.strip() != ""]
-    if not lines:
-        raise ValueError("CSV为空")
-    header_line = lines[0]
-    data_lines = lines[1:]
-    parsed_rows = [[p.strip() for p in ln.split(";")] for ln in data_lines]
-    return header_line, data_lines, parsed_rows
-
-
-def _parse_tecan_csv_abs(path: str) -> pd.DataFrame:
+def _collect_history_mainbarcodes(processed_dir: str, main_barcodes=None) -> Set[str]:
     """
-    解析无表头的 Tecan 扫码 CSV 文件。
-    逻辑与 R 版一致：
-      - 首行忽略（视为批次/板号信息）
-      - 每行以 ';' 分隔
-      - 第1列 -> GridPos
-      - 第3列 -> TipNumber（若不足3列则 NA）
-      - 最后一列 -> SRCTubeID
-      - MainBarcode = SRCTubeID.split('-')[0]
+    “当天”processed 目录下 *.csv 中出现过的历史 MainBarcode 集合（走 tecan_history 索引，不再逐个读文件）。
+    main_barcodes 给定时只查这些候选主码。
     """
+    return history_main_barcodes(processed_dir, main_barcodes)
 
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        lines = [ln.strip() for ln in f.read().splitlines() if ln.strip() != ""]
-
-    if not lines:
-        raise ValueError("CSV为空")
-
-    # 跳过首行（批次号）
-    data_lines = lines[1:]
-    if not data_lines:
-        raise ValueError("CSV无数据行")
-
-    parsed_rows = []
-    for i, line in enumerate(data_lines, start=1):
-        parts = [p.strip() for p in line.split(";")]
-        if not parts:
-            continue
-
-        # 按 R 逻辑取列
-        gridpos_raw = parts[0] if len(parts) >= 1 else ""
-        tip_raw = parts[2] if len(parts) >= 3 else ""
-        src_raw = parts[-1] if len(parts) >= 1 else ""
-
-        # 从文本中提取数字
-        def extract_int(s):
-            m = re.search(r"(\d+)", str(s))
-            return int(m.group(1)) if m else None
-
-        parsed_rows.append({
-            "RowID": i,
-            "SRCTubeID": str(src_raw),
-            "MainBarcode": str(src_raw).split("-", 1)[0],
-            "GridPos": extract_int(gridpos_raw),
-            "TipNumber": extract_int(tip_raw),
-        })
-
-    if not parsed_rows:
-        raise ValueError("CSV无有效数据行")
-
-    return pd.DataFrame(parsed_rows)
 
 
-def _collect_history_mainbarcodes(processed_dir: str) -> Set[str]:
+def _collect_history_mainbarcode_prefixes(processed_dir: str, main_barcodes=None) -> dict[str, str]:
     """
-    遍历“当天”的 processed 目录下 *.csv，按 “首行跳过 + ';' 分割 + 最后一列为 SRCTubeID” 解析，
-    汇总历史 MainBarcode 集合。
-    """
-    s: Set[str] = set()
-    if not os.path.isdir(processed_dir):
-        return s
-
-    for name in os.listdir(processed_dir):
-        if not name.lower().endswith(".csv"):
-            continue
-        p = os.path.join(processed_dir, name)
-        try:
-            with open(p, "r", encoding="utf-8", errors="ignore") as f:
-                lines = [ln.strip() for ln in f.read().splitlines() if ln.strip() != ""]
-            if len(lines) <= 1:
-                continue
-            for line in lines[1:]:  # 跳过首行
-                parts = [x.strip() for x in line.split(";")]
-                if not parts:
-                    continue
-                src = parts[-1] if len(parts) >= 1 else ""
-                main = str(src).split("-", 1)[0]
-                if main:
-                    s.add(main)
-        except Exception:
-            # 忽略坏文件
-            continue
-    return s
-
-
-
-def _collect_history_mainbarcode_prefixes(processed_dir: str) -> dict[str, str]:
-    """
-    遍历当天 processed 目录下所有 *.csv，
-    返回 Dict[MainBarcode, 代表实验号前缀]。
+    当天 processed 目录下所有 *.csv 的 Dict[MainBarcode, 代表实验号前缀]。
+    main_barcodes 给定时只查这些主条码（跨文件检查只关心本次出现的主条码）。
 
     前缀查找方式：
-      读取同级 station_list.json（由 _save_station_store_daily 写入），
-      用完整 SRCTubeID 查找实验号列表，提取代表前缀。
-    若找不到 station_list.json，则前缀为空字符串（退化为旧逻辑）。
+      主码在历史中首次出现的完整 SRCTubeID（tecan_history 索引），
+      到当天岗位清单映射库（由 _save_station_store_daily 写入）中查实验号列表，提取代表前缀。
+      查询时才取映射，之后合并进来的岗位清单同样生效。
+    若当天没有映射，则前缀为空字符串（退化为旧逻辑）。
     """
-    result: dict[str, str] = {}
-    if not os.path.isdir(processed_dir):
-        return result
+    first_tubes = history_first_tubes(processed_dir, main_barcodes)
+    if not first_tubes:
+        return {}
 
-    # 尝试加载当天岗位清单映射库
-    # processed_dir 结构: media/tecan/YYYYMMDD/<project>/processed
-    # station_list.json 在: downloads/岗位清单/YYYY-MM-DD/station_list.json
-    from django.conf import settings as _settings
-    from django.utils import timezone as _tz
-    day_str = _tz.localdate().strftime("%Y-%m-%d")
-    station_json_path = os.path.join(
-        _settings.DOWNLOAD_ROOT, "岗位清单", day_str, "station_list.json"
-    )
-    sn2mb_inv: dict[str, list[str]] = {}  # SRCTubeID → 实验号列表
+    # 当天岗位清单映射库（主条码 -> 实验号列表，此处 key 即完整 SRCTubeID）
     try:
-        with open(station_json_path, "r", encoding="utf-8") as f:
-            sdata = json.load(f)
-        # 结构：{"主条码->实验号列表": {"12345": ["CA001","CA002"]}, ...}
-        mb2sn = sdata.get("主条码->实验号列表", {})
-        # 反转为：完整 SRCTubeID（主码）→ 实验号列表（此处 key 为主码，同 MainBarcode）
-        sn2mb_inv = mb2sn
+        sn2mb_inv = station_barcode_map(timezone.localdate().strftime("%Y-%m-%d"), first_tubes.values())
     except Exception:
-        pass
+        sn2mb_inv = {}
 
-    for name in os.listdir(processed_dir):
-        if not name.lower().endswith(".csv"):
-            continue
-        p = os.path.join(processed_dir, name)
-        try:
-            with open(p, "r", encoding="utf-8", errors="ignore") as f:
-                lines = [ln.strip() for ln in f.read().splitlines() if ln.strip()]
-            if len(lines) <= 1:
-                continue
-            for line in lines[1:]:
-                parts = [x.strip() for x in line.split(";")]
-                if not parts:
-                    continue
-                src = parts[-1]
-                main = str(src).split("-", 1)[0]
-                if not main or main in result:
-                    continue
-                # 查找该主码对应的实验号列表
-                exp_list = sn2mb_inv.get(src, [])
-                prefix = ""
-                if exp_list:
-                    from collections import Counter
-                    prefixes = [_get_exp_prefix(e) for e in exp_list if e]
-                    if prefixes:
-                        prefix = Counter(prefixes).most_common(1)[0][0]
-                result[main] = prefix
-        except Exception:
-            continue
-    return result
+    return {main: _get_main_exp_prefix(src, sn2mb_inv) for main, src in first_tubes.items()}
 
 
 
@@ -384,46 +183,80 @@ def _detect_project_experiment_conflicts(
     2. CA 项目：完整条码对应实验号列表中同时含有 CA 和 ZMN 开头的实验号
     3. ZMNs 项目：完整条码对应实验号列表中含有 PCA 开头的实验号
     4. ZMNs 项目：完整条码对应实验号列表中同时含有 CA 和 ZMN 开头的实验号
+    （实际判定：CA 项目含 PCA / ZMN 实验号即冲突，ZMNs 项目含 PCA / CA 实验号即冲突，规则 2 / 4 被其覆盖）
     """
+    if project_name == "CA":
+        bad_prefixes = ("PCA", "ZMN")
+    elif project_name == "ZMNs":
+        bad_prefixes = ("PCA", "CA")
+    else:
+        return set()
+
+    # 每个唯一条码只判断一次
     conflict_barcodes = set()
-    
-    # 遍历每个条码
-    for _, row in df.iterrows():
-        src_tube_id = str(row.get("SRCTubeID", "")).strip()
+    for src_tube_id in df["SRCTubeID"].astype(str).str.strip().unique():
         if not src_tube_id or "$" in src_tube_id:
             continue
-        
         # 从 station_map 获取对应的实验号列表（列表 A）
-        exp_list = station_map.get(src_tube_id, [])
-        if not exp_list:
-            continue
-        
-        # 统计各前缀出现情况
-        has_pca = any(exp.startswith("PCA") for exp in exp_list)
-        has_ca = any(exp.startswith("CA") for exp in exp_list)
-        has_zmn = any(exp.startswith("ZMN") for exp in exp_list)
-        
-        # 判断冲突
-        if project_name == "CA":
-            # 规则 1: CA 项目含 PCA 实验号
-            if has_pca or has_zmn:
-                conflict_barcodes.add(src_tube_id)
-                continue
-            # 规则 2: CA 项目同时含 CA 和 ZMN 实验号
-            if has_ca and has_zmn:
-                conflict_barcodes.add(src_tube_id)
-                
-        elif project_name == "ZMNs":
-            # 规则 3: ZMNs 项目含 PCA 实验号
-            if has_pca or has_ca:
-                conflict_barcodes.add(src_tube_id)
-                continue
-            # 规则 4: ZMNs 项目同时含 CA 和 ZMN 实验号
-            if has_ca and has_zmn:
-                conflict_barcodes.add(src_tube_id)
-    
+        if any(exp.startswith(bad_prefixes) for exp in station_map.get(src_tube_id, [])):
+            conflict_barcodes.add(src_tube_id)
     return conflict_barcodes
 
+
+def _detect_tecan_conflicts(
+    df: pd.DataFrame,
+    station_map: dict[str, list[str]],
+    history_prefix_map: dict[str, str],
+    project_name: str,
+) -> dict[str, pd.Series]:
+    """
+    扫码结果的冲突检测（按列整体计算）。在 df 上写入 conflict_type 列，返回各掩码：
+      infile   文件内重复：
+               A. 同一 MainBarcode 内子码不同，且实验号代表前缀与该主码首次出现行相同（双方均无前缀也算）
+               B. SRCTubeID 完全相同的所有行
+      cross    跨文件重复：主码在当天历史中出现，且双方代表前缀非空并相同
+      project  项目-实验号冲突（见 _detect_project_experiment_conflicts）
+      dollar   主码含 '$'（不参与人工修正）
+      need_fix （infile ∪ cross ∪ project）且不含 '$'
+    conflict_type 后判定的覆盖先判定的：项目实验号冲突 > 跨文件重复 > 文件内重复
+    """
+    sid = df["SRCTubeID"]
+    main = df["MainBarcode"].astype(str)
+
+    # 实验号代表前缀：每个唯一条码只算一次，再按列映射
+    prefix_of = {s: _get_main_exp_prefix(s, station_map) for s in sid.unique()}
+    prefix = sid.map(prefix_of)
+
+    # A. 与所在主码组首行比较（首行自身 SRCTubeID 相同，不会被标记）
+    by_main = df.groupby("MainBarcode", sort=False)
+    first_sid = by_main["SRCTubeID"].transform("first")
+    first_prefix = prefix.groupby(df["MainBarcode"], sort=False).transform("first")
+    diff_sub_same_prefix = (sid != first_sid) & (prefix == first_prefix)
+
+    # B. 主码和子码均相同
+    exact_dup_all = sid.duplicated(keep=False)
+    mask_infile = diff_sub_same_prefix | exact_dup_all
+
+    hist_prefix = main.map(history_prefix_map)
+    mask_cross = hist_prefix.notna() & (prefix != "") & (hist_prefix == prefix)
+
+    mask_project = sid.isin(_detect_project_experiment_conflicts(df, project_name, station_map))
+
+    mask_dollar = main.str.contains("$", regex=False)
+
+    df["conflict_type"] = ""
+    df.loc[mask_infile, "conflict_type"] = "文件内重复"
+    df.loc[mask_cross, "conflict_type"] = "跨文件重复"
+    df.loc[mask_project, "conflict_type"] = "项目实验号冲突"
+
+    return {
+        "infile": mask_infile,
+        "cross": mask_cross,
+        "project": mask_project,
+        "dollar": mask_dollar,
+        "need_fix": (mask_infile | mask_cross | mask_project) & (~mask_dollar),
+    }
+
 # ======== 新增：提取实验号前缀的辅助函数 ========
 def _get_exp_prefix(exp: str) -> str:
     """
@@ -460,19 +293,23 @@ def _get_main_exp_prefix(srctube_id: str, station_map: dict) -> str:
 
 
 # 将扫码结果表写入processed文件夹（无重复条码时）
-def _write_processed_copy_from_original(saved_scan_abs: str, processed_dir: str) -> str:
+def _write_processed_copy_from_original(saved_scan_abs: str, processed_dir: str, scan=None) -> str:
     """
     无冲突：把原始 CSV 原样复制到当天 processed 目录，文件名保持不变。
+    传入 scan（原始文件的解析结果）时顺带登记到解析缓存，渲染时不再回读。
+    写出后登记到当日历史条码索引。
     """
     _ensure_dir(processed_dir)
     out_path = os.path.join(processed_dir, os.path.basename(saved_scan_abs))
     with open(saved_scan_abs, "rb") as src, open(out_path, "wb") as dst:
         dst.write(src.read())
+    if scan is not None:
+        scan = remember_tecan_scan(out_path, scan)
+    index_processed_file(out_path, scan)
     return out_path
 
 def _write_processed_with_row_replacements(
-    header_line: str,
-    parsed_rows: list[list[str]],
+    scan,
     processed_dir: str,
     original_filename: str,
     fix_map_by_rowid: dict[int, tuple[str, str]],  # {RowID -> (old_srctubeid, new_srctubeid)}
@@ -483,21 +320,11 @@ def _write_processed_with_row_replacements(
     """
     os.makedirs(processed_dir, exist_ok=True)
 
-    # 应用替换（RowID 从 1 开始；parsed_rows 从 0 开始）
-    for rowid, (old_v, new_v) in fix_map_by_rowid.items():
-        idx = rowid - 1
-        if 0 <= idx < len(parsed_rows) and parsed_rows[idx]:
-            if parsed_rows[idx][-1] == old_v:
-                parsed_rows[idx][-1] = new_v  # 只改“最后一列 SRCTubeID”
-
     out_name = original_filename[:-4] + "_processed.csv" if original_filename.lower().endswith(".csv") else original_filename + "_processed.csv"
     out_path = os.path.join(processed_dir, out_name)
 
-    with open(out_path, "w", encoding="utf-8", errors="ignore") as f:
-        f.write(header_line.strip() + "\n")
-        for fields in parsed_rows:
-            f.write(";".join(fields) + "\n")
-
+    # 只改“最后一列 SRCTubeID”；写出的同时登记解析缓存和当日历史条码索引
+    index_processed_file(out_path, write_tecan_scan(out_path, scan.with_replacements(fix_map_by_rowid)))
     return out_path
 
 
@@ -537,8 +364,6 @@ def _validate_new_srctubeids(
 
 def _load_station_map_auto(testing_day: str) -> tuple[dict, dict | None]:
     from .views import _auto_fetch_station_list
-    from collections import defaultdict
-    import io
 
     # _auto_fetch_station_list 返回 (file_bytes, filename) 或 (None, None)
     file_bytes, filename = _auto_fetch_station_list(testing_day)
@@ -546,28 +371,14 @@ def _load_station_map_auto(testing_day: str) -> tuple[dict, dict | None]:
         return {}, None
 
     try:
-        bio = io.BytesIO(file_bytes)
-        df_s = pd.read_excel(bio, dtype=str)
-        cols = {c.strip(): c for c in df_s.columns if isinstance(c, str)}
-        if "子条码" not in cols or "实验号" not in cols:
+        parsed = parse_station_list(file_bytes)
+        if not parsed.has_columns("子条码", "实验号"):
             return {}, None
+        station_map = _station_sub_map(parsed)
 
-        sub = df_s[[cols["子条码"], cols["实验号"]]].dropna()
-        sub.columns = ["barcode", "exp"]
-        mp = defaultdict(list)
-        for _, r in sub.iterrows():
-            b = str(r["barcode"]).strip()
-            e = str(r["exp"]).strip()
-            if b and e:
-                mp[b].append(e)
-        station_map = dict(mp)
-
-        # 顺带保存到每日 JSON 映射库
+        # 顺带保存到每日映射库（同一份解析结果，不再重复读取）
         try:
-            bio2 = io.BytesIO(file_bytes)  # 重新创建 BytesIO（第一个已读完）
-            bio2.name = filename
-            pairs = _extract_station_pairs_from_upload(bio2)
-            summary = _save_station_store_daily(pairs)
+            summary = _save_station_store_daily(_station_pairs(parsed))
         except Exception:
             summary = None
 
@@ -612,7 +423,7 @@ def tecaningest(request: HttpRequest) -> HttpResponse:
     station_save_summary = None
     if station_file:
         station_map = _load_station_map_from_upload(station_file)  # ← 新函数
-        request.session["tecan_station_map"] = station_map
+        stash_session_station_map(request, station_map)   # 映射存服务端，session 只记 key
 
          # 【新增】保存每日岗位清单映射库（downloads/岗位清单/..）
         try:
@@ -624,7 +435,7 @@ def tecaningest(request: HttpRequest) -> HttpResponse:
     else:
         testing_day = request.POST.get("testing_day", "today")
         station_map, station_save_summary = _load_station_map_auto(today_str)
-        request.session["tecan_station_map"] = station_map
+        stash_session_station_map(request, station_map)
 
     # 把项目信息写入 session，给 Step2 使用
     request.session["tecan_project_dir"] = project_dir
@@ -637,106 +448,16 @@ def tecaningest(request: HttpRequest) -> HttpResponse:
 
     # 1) 解析 CSV
     try:
-        df = _parse_tecan_csv_abs(saved_scan_abs)
+        scan = load_tecan_scan(saved_scan_abs)
+        df = scan.frame()
     except Exception as e:
         return HttpResponseBadRequest(f"CSV解析失败：{e}")
 
-    # 冲突检测 + 渲染 
-    history = _collect_history_mainbarcodes(processed_dir)
-
-    # === 新：文件内重复的细分规则（含实验号前缀校验）===
-
-    # 先为每行计算实验号代表前缀（从 station_map 中查找）
-    df["__exp_prefix"] = df["SRCTubeID"].apply(
-        lambda sid: _get_main_exp_prefix(sid, station_map)
-    )
-
-    # A. 主码相同且子码不同：
-    #    在同一 MainBarcode 组内，只有与"首次出现行"的实验号前缀相同的后续行才算重复
-    def _mark_diff_sub_same_prefix(group):
-        """
-        对同一 MainBarcode 的分组：
-        - 若组内只有一个唯一 SRCTubeID，不标记
-        - 若组内有多个唯一 SRCTubeID（子码不同），
-        以首次出现行的实验号前缀为基准，
-        只将"子码不同且前缀与首行相同"的后续行标记为重复
-        """
-        result = pd.Series(False, index=group.index)
-        if group["SRCTubeID"].nunique() <= 1:
-            return result
-        first_idx = group.index[0]
-        base_prefix = group.loc[first_idx, "__exp_prefix"]
-        for idx in group.index[1:]:  # 跳过首行
-            row_prefix = group.loc[idx, "__exp_prefix"]
-            row_sid = group.loc[idx, "SRCTubeID"]
-            first_sid = group.loc[first_idx, "SRCTubeID"]
-            if row_sid != first_sid:  # 子码不同
-                # 仅当前缀相同（或两者均无前缀）时才标记为重复
-                if base_prefix and row_prefix and base_prefix == row_prefix:
-                    result[idx] = True
-                elif not base_prefix and not row_prefix:
-                    # 双方均无实验号匹配，保持原有逻辑（主码重复即标记）
-                    result[idx] = True
-        return result
-
-    diff_sub_later_mask = df.groupby("MainBarcode", group_keys=False).apply(
-        _mark_diff_sub_same_prefix
-    ).reindex(df.index, fill_value=False)
-
-    # B. 主码和子码均相同：标记所有重复（完全相同的条码，无需比较前缀）
-    exact_dup_all = df["SRCTubeID"].duplicated(keep=False)
-
-    # 合并两种"文件内重复"的掩码
-    mask_infile_new = diff_sub_later_mask | exact_dup_all
-
-    # 清理临时列
-    df.drop(columns=["__exp_prefix"], inplace=True)
-
-
-    # 跨文件重复（新逻辑：主码在历史中存在，且实验号前缀与历史中该主码的前缀相同）
-    #
-    # 为此需要升级 history：从 Set[str] 改为 Dict[str, str]（主码 → 代表前缀）
-    # 注意：_collect_history_mainbarcodes 只返回主码集合，
-    # 需要同步升级为能返回前缀信息的新函数（见改动四）
-    history_prefix_map = _collect_history_mainbarcode_prefixes(processed_dir)
-
-    def _is_cross_dup(row):
-        main = str(row["MainBarcode"])
-        if main not in history_prefix_map:
-            return False
-        hist_prefix = history_prefix_map[main]
-        cur_prefix = _get_main_exp_prefix(str(row["SRCTubeID"]), station_map)
-        # 若历史或当前均无前缀信息，保持原有逻辑（主码重复即标记）
-        if not hist_prefix or not cur_prefix:
-            return False
-        return hist_prefix == cur_prefix
-
-    mask_cross = df.apply(_is_cross_dup, axis=1)
-
-    # 同时保持 history（Set）供后续使用（如 cross_mains 提示）
-    history = set(history_prefix_map.keys())
-
-
-    # ========== 新增：项目-实验号交叉冲突检测 ==========
-    project_exp_conflicts = _detect_project_experiment_conflicts(
-        df=df,
-        project_name=project_name,
-        station_map=station_map  # 从 session 获取
-    )
-    mask_project_exp = df["SRCTubeID"].isin(project_exp_conflicts)
-    # ====================================================
-
-    # 去除含有 '$' 的主码
-    mask_dollar = df["MainBarcode"].astype(str).str.contains(r"\$")
-
-    # 最终需要人工修正的集合 = （文件内重复 ∪ 跨文件重复 ∪ 项目-实验号冲突） 且 不含 '$'
-    intra_or_cross_mask = (mask_infile_new | mask_cross | mask_project_exp) & (~mask_dollar)
-
-    # 为前端区分冲突类型
-    df["conflict_type"] = ""
-    df.loc[mask_infile_new, "conflict_type"] = "文件内重复"
-    df.loc[mask_cross, "conflict_type"] = "跨文件重复"
-    df.loc[mask_project_exp, "conflict_type"] = "项目实验号冲突"
+    # 冲突检测（文件内重复 / 跨文件重复 / 项目-实验号冲突）
+    history_prefix_map = _collect_history_mainbarcode_prefixes(processed_dir, df["MainBarcode"].unique())
+    masks = _detect_tecan_conflicts(df, station_map, history_prefix_map, project_name)
+    mask_cross, mask_dollar = masks["cross"], masks["dollar"]
+    intra_or_cross_mask = masks["need_fix"]
 
     need_fix_df = (
         df[intra_or_cross_mask]
@@ -778,7 +499,7 @@ def tecaningest(request: HttpRequest) -> HttpResponse:
         })
 
     # === 修改：无冲突 → 原样复制到“当天/processed/”，保持原 CSV 格式 ===  
-    out_path = _write_processed_copy_from_original(saved_scan_abs, processed_dir)
+    out_path = _write_processed_copy_from_original(saved_scan_abs, processed_dir, scan=scan)
 
     return _render_tecan_process_result(
         request,
@@ -821,15 +542,11 @@ def tecan_resolve_duplicates(request: HttpRequest) -> HttpResponse:
 
     # 1) 解析当前文件，准备校验
     try:
-        df = _parse_tecan_csv_abs(saved_scan_abs)
-        header_line, data_lines, parsed_rows = _read_raw_csv_lines(saved_scan_abs)
+        scan = load_tecan_scan(saved_scan_abs)
+        df = scan.frame()
     except Exception as e:
         return HttpResponseBadRequest(f"CSV解析失败：{e}")
 
-    # 2) 收集当天历史主码，并构造 all_main_barcodes（当前 + 历史）
-    history = _collect_history_mainbarcodes(processed_dir)
-    all_main_barcodes = set(df["MainBarcode"].astype(str).tolist()) | set(history)
-
     # 3) 从表单收集修正映射：字段名 new_<index>，携带 hidden old_<index>
     #    或者你也可以按 SRCTubeID 为键：new_for_<srctubeid>
     #    下面按“new_<i> + old_<i>”示例：
@@ -850,14 +567,19 @@ def tecan_resolve_duplicates(request: HttpRequest) -> HttpResponse:
     if not fix_map_by_rowid:
         return HttpResponseBadRequest("没有收到任何修正项")
 
+    # 2) 当天历史主码：只按索引点查本次文件的主码和提交的新主码（候选），并构造 all_main_barcodes（当前 + 历史）
+    current_mains = set(df["MainBarcode"].astype(str).tolist())
+    new_mains = {new_v.split("-", 1)[0].strip() for _, _, new_v in fix_map_by_rowid.values()}
+    history = _collect_history_mainbarcodes(processed_dir, current_mains | new_mains)
+    all_main_barcodes = current_mains | history
+
 
     # === B) 校验（逐行构造错误并返回原页高亮） ===
     rows_for_fix = df[df["RowID"].isin(fix_map_by_rowid.keys())].copy()
     if rows_for_fix.empty:
         return HttpResponseBadRequest("修正的 RowID 不存在于当前文件")
 
-    history = _collect_history_mainbarcodes(processed_dir)
-    all_main = set(df["MainBarcode"].astype(str)) | set(history)
+    all_main = all_main_barcodes
 
     error_rows = set()      # 需要高亮的行(RowID)
     error_msgs = {}         # RowID -> 错误消息（用于“确认原值”不一致）
@@ -942,14 +664,11 @@ def tecan_resolve_duplicates(request: HttpRequest) -> HttpResponse:
 
 
     # === C) 写 processed：保留首行，仅改这些 RowID 的“最后一列 SRCTubeID” ===
-    header_line, data_lines, parsed_rows = _read_raw_csv_lines(saved_scan_abs)
-
     # 将三元组 (old, confirm_old, new) 瘦身为二元组 (old, new)，以适配写文件函数
     fix_pairs = {rid: (old, new) for rid, (old, _confirm_old, new) in fix_map_by_rowid.items()}
 
     out_path = _write_processed_with_row_replacements(
-        header_line=header_line,
-        parsed_rows=parsed_rows,
+        scan=scan,
         processed_dir=processed_dir,
         original_filename=os.path.basename(saved_scan_abs),
         fix_map_by_rowid=fix_pairs,  # ← 只传 (old, new)
@@ -1014,6 +733,8 @@ def tecan_manage_processed_file(request: HttpRequest) -> HttpResponse:
     except Exception as e:
         return HttpResponseBadRequest(f"操作失败：{e}")
 
+    forget_processed_file(processed_dir, os.path.basename(src_path))
+
     return JsonResponse({"ok": True})
 
 
@@ -1141,27 +862,18 @@ def _load_station_map_from_upload(f) -> dict[str, list[str]]:  # ← ★ 改为
     直接从用户本次上传的岗位清单文件对象读取"子条码 -> 实验号列表"映射。
     """
     try:
-        import pandas as pd
-        df = pd.read_excel(f)
-        cols = {c.strip(): c for c in df.columns if isinstance(c, str)}
-        if "子条码" not in cols or "实验号" not in cols:
-            return {}
-        sub = df[[cols["子条码"], cols["实验号"]]].dropna()
-        sub.columns = ["barcode", "exp"]
-        
-        # ★ 改为 defaultdict(list)
-        mp = defaultdict(list)
-        for _, r in sub.iterrows():
-            b = str(r["barcode"]).strip()
-            e = str(r["exp"]).strip()
-            if b and e:
-                mp[b].append(e)  # ← 追加到列表
-        
-        return dict(mp)  # 返回普通字典
+        return _station_sub_map(parse_station_upload(f))
     except Exception:
         return {}
 
 
+def _station_sub_map(parsed) -> dict[str, list[str]]:
+    """已解析岗位清单的“子条码 -> 实验号列表”；缺少子条码 / 实验号列时返回空 dict"""
+    if not parsed.has_columns("子条码", "实验号"):
+        return {}
+    return dict(parsed.barcode_to_names("子条码", int_like=True))
+
+
 # 根据文件名解析 plate_number 与 start_offset  
 def _parse_plate_meta_by_filename(filename: str) -> tuple[int, int]:
     """
@@ -1324,10 +1036,7 @@ def _get_qc_names_from_mapping(mapping_path: str) -> list[str]:
     - 返回 Name 列，保持原表顺序
     """
     try:
-        df = pd.read_excel(mapping_path, sheet_name="工作清单")
-        df = df.copy()
-        df["Code"] = df["Code"].astype(str)
-        qc_names = df.loc[df["Code"].str.startswith("QC", na=False), "Name"].astype(str).tolist()
+        qc_names = [str(n) for n in get_mapping_bundle(mapping_path).qc_names]
         # 兜底：保证至少返回一个占位
         return qc_names or ["QC"]
     except Exception:
@@ -1386,7 +1095,7 @@ def format_vialpos_column(df: pd.DataFrame, colname: str = "VialPos"):
 
 
 def _apply_mapping_to_table(
-    mapping_df: pd.DataFrame,
+    worklist_map: WorklistMap,
     worklist_table: pd.DataFrame,
     *,
     name_to_barcodes: dict[str, deque],
@@ -1399,7 +1108,7 @@ def _apply_mapping_to_table(
     output_file: str | None = None      
 ):
     """
-    按 '上机列表' 映射模板，把占位符填入 worklist_table（第一列已是完整 SampleName_list）。
+    按 '上机列表' 映射模板（已编译的 worklist_map），把占位符填入 worklist_table（第一列已是完整 SampleName_list）。
     兼容规则：
       - sample_key = 'DB*'/'Test*'/'STD3'/'*' 等
       - 列值 = 常量 / '*'(镜像第一列) / {{Well_Number}} / {{Well_Position}}
@@ -1419,147 +1128,51 @@ def _apply_mapping_to_table(
     col_wellnum = next((c for c in headers if c in WELLNUM_COLS), None)
     col_wellpos = next((c for c in headers if c in WELLPOS_COLS), None)
 
-    # 记录需要镜像第一列的列（模板值 = '*'）
-    mirror_cols = set()
-
     # 第一次使用定位孔的标记 & 待删除行
     locator_first_used = False
     rows_to_drop = []
 
-    # 按模板逐行套规则（与 NIMBUS 同构）
-    for _, map_row in mapping_df.iterrows():
-        sample_key = str(map_row.iloc[0]).strip()
-        fill_vals  = list(map_row.iloc[1:].values)
-
-        # 针对 sample_key 生成 mask
-        col0 = df[first_col].astype(str)
-
-        if sample_key.upper().startswith("DB"):
-            mask = col0.str.upper().str.startswith("DB")
-        elif sample_key.lower().startswith("test"):
-            mask = col0.str.lower().str.startswith("test")
-        elif sample_key.upper().startswith("STD"):
-            mask = col0 == sample_key  # STD3 等精确匹配
-        elif loc_display and sample_key.strip() == loc_display:
-            mask = (col0 == loc_display)
-        elif sample_key.strip() == "*":
-            # 兜底规则：留到最后填尚未填充的行
-            mask = df.iloc[:, 1].isna() if df.shape[1] > 1 else pd.Series([True] * len(df), index=df.index)
-        else:
-            # 临床样本（一般不在模板中定义具体 key），跳过；让 '*' 兜底去管
-            continue
-
-        idxs = df.index[mask].tolist()
-        if not idxs:
-            continue
-
-        # 处理每个目标列
-        for col, val in zip(headers[1:], fill_vals):
-            sval = str(val).strip()
-
-            # '*'：整列镜像第一列
-            if sval == "*":
-                mirror_cols.add(col)
-                continue
-
-            # 定位孔行：只替第一个命中的行
-            if loc_display and sample_key.strip() == loc_display:
-                if not locator_info:
-                    # 没有定位孔信息 → 保留原样
-                    continue
-                # 第一个
-                first_idx = None
-                for i in idxs:
-                    if not locator_first_used:
-                        first_idx = i
-                        locator_first_used = True
-                        break
-                # 其他同名行删除
-                for j in idxs:
-                    if j != first_idx:
-                        rows_to_drop.append(j)
-                if first_idx is None:
-                    continue
-                # 写显示名 + 坐标（仅当占位符时）
-                if col == first_col:
-                    df.at[first_idx, col] = loc_display
-                if col_wellnum and col == col_wellnum:
-                    df.at[first_idx, col_wellnum] = locator_info.get("well_num")
-                if col_wellpos and col == col_wellpos:
-                    df.at[first_idx, col_wellpos] = locator_info.get("well_pos")
+    def _fill_locator(rule, hits, fill):
+        # 定位孔行：只替第一个命中的行（写孔号 / 孔位），其他同名行删除
+        nonlocal locator_first_used
+        if not (loc_display and rule.key == loc_display):
+            return False
+        if not locator_info:
+            # 没有定位孔信息 → 保留原样
+            return True
+        idxs = hits.nonzero()[0].tolist()
+        for _, col, _ in rule.steps:
+            first_idx = None
+            if not locator_first_used:
+                first_idx = idxs[0]
+                locator_first_used = True
+            rows_to_drop.extend(df.index[j] for j in idxs if j != first_idx)
+            if first_idx is None:
                 continue
-
-            # 孔号/孔位占位符：根据“样本名 → 条码 → 孔位”求值  f"{injection_plate}:{well_no}"
-            if sval in ("{{Well_Number}}", "{{Well_Position}}"):
-                def _resolve(sample_name_value: str):
-                    name = str(sample_name_value).strip()
-
-                    # 1) DB*: 固定 A1/1（与 Tecan 现有规则一致）
-                    if name.upper().startswith("DB"):
-                        return 1 if sval == "{{Well_Number}}" else "A1"
-                    
-                    # 2) 定位孔：name 等于 X{plate} 时，直接用 locator_info
-                    if loc_display and locator_info and name == loc_display:
-                        well_pos = locator_info.get("well_pos")
-                        well_num = locator_info.get("well_num")
-                        if instrument_name == "Thermo" or instrument_name == "Agilent":
-                            if sval == "{{Well_Number}}":
-                                return f"{injection_plate}:{well_num}" if injection_plate else well_num
-                            else:
-                                if project_name == "PCA":
-                                    return f"{injection_plate}:{well_pos}" if injection_plate else well_pos
-                                else:
-                                    return f"{injection_plate}-{well_pos}" if injection_plate else well_pos
-                        else:
-                            if sval == "{{Well_Number}}":
-                                return well_num
-                            else:
-                                return well_pos
-
-                    # 3) QC/STD：Name→Barcode（队列），条码→(well_pos, well_num)
-                    if name in name_to_barcodes and name_to_barcodes[name]:
-                        barcode = name_to_barcodes[name].popleft()
-                        wells = barcode_to_well.get(barcode)
-                        if wells:
-                            well_pos, well_num = wells.popleft()   # ← 关键：消费本条码的下一个孔位
-                            if instrument_name == "Thermo" or instrument_name == "Agilent":
-                                if sval == "{{Well_Number}}":
-                                    return f"{injection_plate}:{well_num}" if injection_plate else well_num
-                                else:
-                                    if project_name == "PCA":
-                                        return f"{injection_plate}:{well_pos}" if injection_plate else well_pos
-                                    else:
-                                        return f"{injection_plate}-{well_pos}" if injection_plate else well_pos
-                            else:
-                                if sval == "{{Well_Number}}":
-                                    return well_num
-                                else:
-                                    return well_pos
-                        return None
-
-                    # 3) 临床：第一列值即条码
-                    wells = barcode_to_well.get(name)
-                    
-                    if wells:
-                        well_pos, well_num = wells.popleft()       # ← 关键：消费一次
-                        if instrument_name == "Thermo" or instrument_name == "Agilent":
-                            if sval == "{{Well_Number}}":
-                                return f"{injection_plate}:{well_num}" if injection_plate else well_num
-                            else:
-                                if project_name == "PCA":
-                                    return f"{injection_plate}:{well_pos}" if injection_plate else well_pos
-                                else:
-                                    return f"{injection_plate}-{well_pos}" if injection_plate else well_pos
-                        else:
-                            if sval == "{{Well_Number}}":
-                                return well_num
-                            else:
-                                return well_pos
-
-                df.loc[mask, col] = df.loc[mask, first_col].apply(_resolve)
-            else:
-                # 其他列：写常量
-                df.loc[mask, col] = val
+            if col_wellnum and col == col_wellnum:
+                fill.set(col_wellnum, [first_idx], locator_info.get("well_num"))
+            if col_wellpos and col == col_wellpos:
+                fill.set(col_wellpos, [first_idx], locator_info.get("well_pos"))
+        return True
+
+    # 按模板逐行套规则（与 NIMBUS 同构）；孔号/孔位占位符根据“样本名 → 条码 → 孔位”求值
+    resolve_vialpos = tecan_vial_resolver(
+        project_name=project_name,
+        instrument_name=instrument_name,
+        injection_plate=injection_plate,
+        name_to_barcodes=name_to_barcodes,
+        barcode_to_well=barcode_to_well,
+        locator_info=locator_info,
+    )
+    # 记录需要镜像第一列的列（模板值 = '*'）
+    mirror_cols = apply_worklist_map(
+        worklist_map,
+        df,
+        lambda key, fill: tecan_rule_mask(key, fill, locator_display=loc_display),
+        resolve_vialpos,
+        skip_empty=True,
+        on_rule=_fill_locator,
+    )
 
     # 统一执行“镜像列”
     for col in mirror_cols:
@@ -1606,8 +1219,8 @@ def _linear_fill_vertical_from_A1(n: int) -> list[tuple[str, int]]:
     return coords
 
 
-# 根据 CSV（processed 文件）+ station 映射，生成“临床样品”落位
-def _build_clinical_cells_from_csv(csv_abs_path: str, start_offset: int, station_map: dict[str, str]) -> list[tuple[str,int,str,str]]:
+# 根据扫码解析结果（processed 文件）+ station 映射，生成“临床样品”落位
+def _build_clinical_cells(scan, start_offset: int, station_map: dict[str, str]) -> list[tuple[str,int,str,str]]:
     """
     返回 [(row_letter, col_num, sample_name, barcode), ...]  ← ★ 修改返回类型
     - area 映射：20->(4,5), 21->(6,7), 22->(7,8), 23->(9,10), 24->(11,12)
@@ -1617,17 +1230,8 @@ def _build_clinical_cells_from_csv(csv_abs_path: str, start_offset: int, station
     base_area_map = {"20": (3,4), "21": (5,6), "22": (7,8), "23": (9,10), "24": (11,12)}
 
     rows = []
-    with open(csv_abs_path, "r", encoding="utf-8", errors="ignore") as f:
-        lines = [ln.strip() for ln in f.read().splitlines() if ln.strip() != ""]
-    if len(lines) <= 1:
-        return rows
-    for ln in lines[1:]:
-        parts = [p.strip() for p in ln.split(";")]
-        if not parts:
-            continue
-        area = parts[0] if len(parts) >= 1 else ""
-        pos  = int(re.search(r"(\d+)", parts[2]).group(1)) if len(parts) >= 3 and re.search(r"(\d+)", parts[2]) else None
-        srctube = parts[-1] if len(parts) >= 1 else ""  # ← 原始条码（如 01000795927-01）
+    # area：第1列原文；pos：第3列中的数字；srctube：原始条码（如 01000795927-01）
+    for area, pos, srctube in zip(scan.areas, scan.tip_numbers, scan.src_tube_ids):
         if not area or pos is None: 
             continue
         if "$" in srctube:  # 含 $ 忽略
@@ -1733,9 +1337,10 @@ def _render_tecan_process_result(
     # 读取上机列表模板
     mapping_file_path = config.mapping_file.path
 
-    # 读取“项目配置”与“上机映射模板”sheet
-    df_mapping_wc  = pd.read_excel(mapping_file_path, sheet_name="工作清单")
-    df_worklistmap = pd.read_excel(mapping_file_path, sheet_name="上机列表")
+    # 读取“项目配置”与“上机映射模板”sheet（按文件缓存；上机列表每份文件只编译一次）
+    mapping_bundle = get_mapping_bundle(mapping_file_path)
+    worklist_headers = mapping_bundle.columns("上机列表")
+    worklist_map = mapping_bundle.worklist_map(tecan_classify, key=strip_key)
 
     # 解析后台设置的上机模板（txt/csv）→ DataFrame（只需列名 / txt_headers）,获取表头
     try:
@@ -1761,13 +1366,8 @@ def _render_tecan_process_result(
     # std_qc_items = _build_curve_and_qc_cells(curve_points, qc_groups, qc_levels, file_basename)
 
     # 从『工作清单』表取 STD 和QC 名称池 —— 
-    std_names_pool = df_mapping_wc.loc[
-        df_mapping_wc["Code"].astype(str).str.startswith("STD", na=False), "Name"
-    ].astype(str).tolist()
-
-    qc_names_pool = df_mapping_wc.loc[
-        df_mapping_wc["Code"].astype(str).str.startswith("QC", na=False), "Name"
-    ].astype(str).tolist()
+    std_names_pool = [str(n) for n in mapping_bundle.std_pool]
+    qc_names_pool = [str(n) for n in mapping_bundle.qc_names]
 
     # —— 传给新版 _build_curve_and_qc_cells —— 
     std_qc_items = _build_curve_and_qc_cells(
@@ -1800,10 +1400,11 @@ def _render_tecan_process_result(
         request.POST.get("project_name", "") or request.POST.get("project_id", "")
     )
 
-    station_map = request.session.get("tecan_station_map")
+    station_map = get_session_station_map(request)
     clinical_cells = []
     try:
-        clinical_cells = _build_clinical_cells_from_csv(csv_abs_path, start_offset, station_map)
+        # ingest / 修正时写 processed 文件已登记解析缓存，这里不再回读磁盘
+        clinical_cells = _build_clinical_cells(load_tecan_scan(csv_abs_path), start_offset, station_map)
         # ★ 修改：解包4个元素（row, col, sample_name, barcode）
         clinical_cells = [
             {"row": r, "col": c, "text": s or "", "barcode": bc or ""} 
@@ -2043,23 +1644,13 @@ def _render_tecan_process_result(
             break
 
     # 用于构建曲线/QC/Test/DB 序列
-    df_std = df_mapping_wc.copy() 
-    df_std["Code"] = df_std["Code"].astype(str)
-    df_std = df_std[df_std["Code"].str.match(r"^STD\d+$", na=False)].copy()
-    df_std["__std_idx"] = df_std["Code"].str.replace("STD", "", regex=False).astype(int)
-    df_std = df_std.sort_values("__std_idx")
-    std_names = df_std["Name"].head(curve_points + 1).tolist()
+    std_names = list(mapping_bundle.std_names[: curve_points + 1])     # 缓存内已按 STD 序号排好
     if not std_names or len(std_names) < (curve_points + 1):
         std_names = [f"STD{i}" for i in range(curve_points + 1)]
     
     # 按组别分别提取 QC1 和 QC2 的名称
-    qc1_names = df_mapping_wc.loc[
-        df_mapping_wc["Code"].astype(str).str.startswith("QC1"), "Name"
-    ].tolist()
-
-    qc2_names = df_mapping_wc.loc[
-        df_mapping_wc["Code"].astype(str).str.startswith("QC2"), "Name"
-    ].tolist()
+    qc1_names = mapping_bundle.names_with_code_prefix("QC1")
+    qc2_names = mapping_bundle.names_with_code_prefix("QC2")
 
     # 临床样本
     # === 用“列优先 A1→H1→A2…”提取临床样本顺序（跳过定位孔）+ 插入定位孔显示名 === 
@@ -2097,7 +1688,7 @@ def _render_tecan_process_result(
     SampleName_list = ['' if isinstance(x, float) and math.isnan(x) else x for x in SampleName_list]
 
     # ④ 以模板列头构造空表，第一列写入 SampleName_list  _write_processed_copy_from_original
-    txt_headers = list(df_worklistmap.columns)
+    txt_headers = worklist_headers
     worklist_table = pd.DataFrame(columns=txt_headers)
     worklist_table[txt_headers[0]] = SampleName_list
 
@@ -2110,7 +1701,7 @@ def _render_tecan_process_result(
 
     # ⑥ 应用“上机映射模板”把占位符填入表
     worklist_table = _apply_mapping_to_table(
-        df_worklistmap,
+        worklist_map,
         worklist_table,
         name_to_barcodes=name_to_barcodes,
         barcode_to_well=barcode_to_well,
@@ -2187,15 +1778,10 @@ def _render_tecan_process_result(
     # 确定记录日期（当天）
     record_date = date.today()
     
-    # 清理同日同项目同板号的旧记录（避免重复提交时累积）
     plate_no_str = f"X{plate_number}"
-    SampleRecord.objects.filter(
-        project_name=project_name,
-        record_date=record_date,
-        plate_no=plate_no_str
-    ).delete()
 
-    # 遍历 worksheet_table（96孔板数据），逐孔写入
+    # 遍历 worksheet_table（96孔板数据），逐孔收集后整板批量写入
+    plate_record_rows = []
     for row in worksheet_table:
         for cell in row:
             if not cell:
@@ -2225,21 +1811,19 @@ def _render_tecan_process_result(
             if cell.get("locator"):
                 error_info = "locator"  # 标记为定位孔
             
-            # 写入数据库
-            SampleRecord.objects.update_or_create(
-                project_name=project_name,
-                record_date=record_date,
-                plate_no=plate_no_str,
-                well_str=well_str,
-                defaults={
-                    "sample_name": sample_name,
-                    "barcode": barcode,
-                    "error_info": error_info,
-                }
-            )
+            plate_record_rows.append(make_sample_row(well_str, sample_name, barcode, error_info))
+
+    # 写入数据库（清理同日同项目同板号的旧记录，避免重复提交时累积）
+    save_plate_records(
+        plate_record_rows,
+        project_name=project_name,
+        record_date=record_date,
+        plate_no=plate_no_str,
+        replace_plate=True,
+    )
 
     # 兼容 NIMBUS 旧逻辑（有些视图会兜底取 export_payload）
-    request.session["export_payload"] = {
+    stash_session_payload(request, "export_payload", {
         "project_name": project_name,
         "project_name_full": project_name_full,
         "instrument_num": instrument_num,
@@ -2254,7 +1838,7 @@ def _render_tecan_process_result(
         "txt_headers": txt_headers,
         "worklist_records": worklist_records, 
         "header": header_meta,
-    }
+    })
 
     return render(request, "dashboard/ProcessResult_TECAN.html",locals())
 
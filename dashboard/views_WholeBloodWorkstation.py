@@ -18,6 +18,11 @@ import re
 import json
 
 from .models import *
+from .mapping_cache import get_mapping_bundle
+from .pdf_jobs import all_jobs_done, enqueue_pdf_job, render_pdf_html
+from .payload_store import stash_session_payload, get_session_payload
+from .artifact_index import record_artifact
+from .station_parser import parse_station_list, parse_station_upload
 
 
 # ========== ★ 新增：报错关键词列表 ==========
@@ -191,48 +196,24 @@ def WholeBloodWorkstationResult(request):
         record_date = date.today() + timedelta(days=1)
     
     # ========== 2. 读取岗位清单表（获取条码→实验号映射）==========
-    # 未手动上传时，尝试从共享路径自动读取当天岗位清单
+    # 未手动上传时，尝试从共享路径自动读取当天岗位清单（按内容 sha256 缓存解析结果）
     if not station_list:
         from .views import _auto_fetch_station_list
-        auto_result = _auto_fetch_station_list(testing_day)
-        if auto_result["found"]:
-            import io
-            with open(auto_result["path"], "rb") as _f:
-                _bio = io.BytesIO(_f.read())
-            station_wb = xlrd.open_workbook(file_contents=_bio.read())
-        else:
+        auto_bytes, _ = _auto_fetch_station_list(today_str)
+        if not auto_bytes:
             return render(request, "dashboard/error.html", {
                 "message": "未上传岗位清单，且未找到当天自动读取文件，请手动上传后重试。"
             })
+        station_parsed = parse_station_list(auto_bytes)
     else:
-        station_wb = xlrd.open_workbook(filename=None, file_contents=station_list.read())
+        station_parsed = parse_station_upload(station_list)
 
-
-    station_sheet = station_wb.sheets()[0]
-    station_nrows = station_sheet.nrows
-    station_ncols = station_sheet.ncols
-
-    # 解析表头
-    station_header = [str(station_sheet.row_values(0)[i]).strip() for i in range(station_ncols)]
-    station_index = {col: idx for idx, col in enumerate(station_header)}
-
-    
     # ★ 与NIMBUS对齐：优先检测是否含"子条码"列，动态决定匹配键类型
-    use_sub_barcode = "子条码" in station_index
-    if use_sub_barcode:
-        KEY_IDX = station_index["子条码"]   # 用完整子条码（如 2437871821-01）作为键
-    else:
-        KEY_IDX = station_index.get("主条码", 0)  # 退而用主条码（如 2437871821）作为键
+    #   有则用完整子条码（如 2437871821-01）作为键，否则退而用主条码（如 2437871821）
+    use_sub_barcode = station_parsed.use_sub_barcode
 
-    sn_idx = station_index.get("实验号", 0)
-    
     # ========== 构建条码→实验号列表的映射 ==========
-    barcode_to_names = defaultdict(list)
-    for i in range(1, station_nrows):
-        barcode = str(station_sheet.row_values(i)[KEY_IDX]).strip()
-        sample_name = str(station_sheet.row_values(i)[sn_idx]).strip()
-        if barcode and sample_name:
-            barcode_to_names[barcode].append(sample_name)
+    barcode_to_names = station_parsed.barcode_to_names()
     
     
     # ========== 3. 读取取样总表（从"产品信息"工作表）==========
@@ -475,8 +456,8 @@ def WholeBloodWorkstationResult(request):
                     try:
                         mapping_path = config.mapping_file.path
                         if os.path.exists(mapping_path):
-                            # 读取Excel映射文件
-                            mapping_df = pd.read_excel(mapping_path, sheet_name='上机列表')
+                            # 读取Excel映射文件（按文件缓存，只读遍历，不复制 sheet）
+                            mapping_df = get_mapping_bundle(mapping_path).sheet_view('上机列表')
                             
                             # 映射文件格式为：第一列是样品名称关键词，其他列是对应的值
                             # 根据实际映射文件格式调整
@@ -550,8 +531,8 @@ def WholeBloodWorkstationResult(request):
         }],
     }
     
-    request.session['wholeblood_payload'] = payload
-    request.session.modified = True
+    # 导出数据落盘（payload_store），session 只保存 token
+    stash_session_payload(request, 'wholeblood_payload', payload)
     
     # ========== 8. 返回中间展示页面 ==========
     return render(request, "dashboard/ProcessResult_WholeBloodWorkstation.html", {
@@ -572,7 +553,7 @@ def export_wholeblood_files(request):
     导出全血工作站工作清单和报错信息表（第二步）
     """
     # 从 session 中读取之前保存的数据
-    payload = request.session.get('wholeblood_payload')
+    payload = get_session_payload(request, 'wholeblood_payload')
     if not payload:
         return JsonResponse({"ok": False, "message": "数据已过期，请重新上传文件"}, status=400)
     
@@ -582,14 +563,13 @@ def export_wholeblood_files(request):
     systerm_num = payload['systerm_num']
     platform = payload['platform']
     today_str = payload['today_str']
-    plates = payload['plates']
     
     # 获取要导出的板号（支持多板，但全血工作站目前只有一块板）
     plate_index = int(request.GET.get('plate', 0))
-    if plate_index >= len(plates):
+    if plate_index < 0 or plate_index >= payload.plate_count:
         return JsonResponse({"ok": False, "message": "板号不存在"}, status=400)
     
-    plate_data = plates[plate_index]
+    plate_data = payload.plate(plate_index)   # 只加载这一块板
     plate_no = plate_data['plate_no']
     worksheet_table = plate_data['worksheet_table']
     error_rows = plate_data['error_rows']
@@ -632,25 +612,12 @@ def export_wholeblood_files(request):
     }
     
     # 渲染 HTML 模板
-    placement_html = render_to_string("dashboard/export_pdf.html", placement_pdf_payload)
+    placement_html = render_pdf_html("dashboard/export_pdf.html", placement_pdf_payload)
     
-    # 配置字体和样式
-    font_config = FontConfiguration()
-    pdf_css = CSS(string="""
-        @page { size: A4; margin: 10mm; }
-        body { font-family: "Noto Sans CJK SC", "SimSun", sans-serif; font-size: 10px; }
-        .highlight { background-color: #ffcccc; }
-    """, font_config=font_config)
-    
-    # 生成样品放置图 PDF 文件
+    # 生成样品放置图 PDF 文件（登记到后台任务队列，样式见 pdf_jobs.PDF_STYLES["wholeblood"]）
     placement_pdf_filename = f"{placement_map_filename_stem}.pdf"
     placement_pdf_path = os.path.join(save_dir, placement_pdf_filename)
-    
-    HTML(string=placement_html).write_pdf(
-        placement_pdf_path,
-        stylesheets=[pdf_css],
-        font_config=font_config
-    )
+    pdf_job_ids = [enqueue_pdf_job(placement_html, placement_pdf_path, style="wholeblood")]
 
 
     # ========== 4. 生成前处理样品工作单 PDF (worksheet_table_2) ==========
@@ -678,17 +645,13 @@ def export_wholeblood_files(request):
         }
         
         # 渲染HTML
-        worksheet2_html = render_to_string("dashboard/export_pdf_worksheet2.html", worksheet2_pdf_payload)
+        worksheet2_html = render_pdf_html("dashboard/export_pdf_worksheet2.html", worksheet2_pdf_payload)
         
         # 生成前处理样品工作单PDF
         worksheet2_pdf_filename = f"{worksheet_filename_stem}.pdf"
         worksheet2_pdf_path = os.path.join(save_dir, worksheet2_pdf_filename)
         
-        HTML(string=worksheet2_html).write_pdf(
-            worksheet2_pdf_path,
-            stylesheets=[pdf_css],
-            font_config=font_config
-        )
+        pdf_job_ids.append(enqueue_pdf_job(worksheet2_html, worksheet2_pdf_path, style="wholeblood"))
 
     
     # ========== 5. 保存 payload.json（用于后续重新生成）==========
@@ -697,6 +660,7 @@ def export_wholeblood_files(request):
     
     with open(payload_path, "w", encoding="utf-8") as f:
         json.dump(worksheet2_pdf_payload, f, ensure_ascii=False, indent=2)
+    record_artifact(payload_path)
     
 
     # ========== 6. 生成上机列表 Excel 文件（如果有数据）==========
@@ -721,6 +685,14 @@ def export_wholeblood_files(request):
         worklist_filename = f"{plate_no}_OnboardingList_{instrument_num}_{systerm_num}_{project_name}_{timestamp}_{plate_no}_GZ.xls"
         worklist_path = os.path.join(save_dir, worklist_filename)
         worklist_wb.save(worklist_path)
+        record_artifact(worklist_path)
 
     # ========== 6. 返回成功响应 ==========
-    return JsonResponse({"ok": True, "message": "导出成功"})
+    # PDF 由后台 worker 生成：前端用 pdf_job_ids 轮询 pdf_job_status，全部完成后再提示导出成功
+    pdf_ready = all_jobs_done(pdf_job_ids)
+    return JsonResponse({
+        "ok": True,
+        "message": "导出成功" if pdf_ready else "上机列表已导出，PDF 生成中",
+        "pdf_ready": pdf_ready,
+        "pdf_job_ids": pdf_job_ids,
+    })
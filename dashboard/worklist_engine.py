@@ -0,0 +1,425 @@
+# dashboard/worklist_engine.py
+# 上机列表映射引擎（对应关系表“上机列表”sheet -> worklist 表）
+#
+# 以前 NIMBUS / Starlet（ProcessResult）、ICP-MS、达安、Tecan 各自 df_worklistmap.iterrows() 逐条套规则：
+# 每块板、每条规则都重新判断列类型、重新定义 _resolve_vialpos 闭包，每个 (规则, 列) 一次 df.loc 赋值。
+# 这里统一为：
+#   - 映射表按模板列头编译一次为 WorklistRule（sample_key + 各列动作：常量 / 镜像 / 孔位 / 跳过），多块板共用
+#   - 套用时把 worklist 各列取成 object 数组：规则命中行在数组上计算（同一前缀只算一次），
+#     常量按命中行整列写入，全部规则套完后一次写回 DataFrame
+#   - 孔位列仍按行序逐个求值：name -> barcode -> well 队列有状态（popleft），必须按原顺序消费；
+#     求值结果经 Series.apply 得到，数值类型推断（如 1 / None -> 1.0 / NaN）与原先一致
+#   - 各平台 sample_key 语义不同：standard_rule_mask（NIMBUS / Starlet / ICP-MS / 达安）、tecan_rule_mask；
+#     孔位求值见各 *_vial_resolver
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+WELL_NUMBER = "{{Well_Number}}"
+WELL_POSITION = "{{Well_Position}}"
+WELL_PLACEHOLDERS = (WELL_NUMBER, WELL_POSITION)
+
+INJECTION_COLUMNS = ("SmplInjVol", "Injection volume")
+VIAL_COLUMNS = ("VialPos", "Vial position", "样品瓶")
+
+# 列动作
+MIRROR = "mirror"     # 该列镜像第一列（映射值为 *）
+SKIP = "skip"         # 不填
+CONST = "const"       # 写固定值
+VIAL = "vial"         # 按第一列逐行求孔位
+
+_LOCATOR_RE = re.compile(r"X(\d+)")
+_ROWS = "ABCDEFGH"
+
+
+class WorklistRule:
+    """映射表的一行：sample_key + 镜像列 + 按列顺序的 (动作, 列名, 值)"""
+
+    __slots__ = ("key", "mirror_cols", "steps")
+
+    def __init__(self, key, mirror_cols, steps):
+        self.key = key
+        self.mirror_cols = mirror_cols
+        self.steps = steps
+
+    def __repr__(self):
+        return f"WorklistRule({self.key!r}, mirror={self.mirror_cols!r}, steps={self.steps!r})"
+
+
+class WorklistMap:
+    """
+    编译后的“上机列表”映射表。
+      classify(col, val) -> (动作, 值)：决定每个单元格的动作，各平台口径不同
+      key(sample_key)：sample_key 的归一化（默认 str）
+    按模板列头（位置对应）编译，同一列头只编译一次。
+    """
+
+    def __init__(self, mapping_df, classify, key=str):
+        self._classify = classify
+        # 与 iterrows() 取到的值一致（同样来自 DataFrame.values）
+        self._rows = [(key(row[0]), tuple(row[1:])) for row in mapping_df.values]
+        self._rules = {}
+
+    def rules(self, headers):
+        headers = tuple(headers)
+        rules = self._rules.get(headers)
+        if rules is None:
+            rules = tuple(self._compile(key, vals, headers[1:]) for key, vals in self._rows)
+            self._rules[headers] = rules
+        return rules
+
+    def _compile(self, key, vals, cols):
+        mirror_cols, steps = [], []
+        for col, val in zip(cols, vals):
+            kind, value = self._classify(col, val)
+            if kind == MIRROR:
+                mirror_cols.append(col)
+            elif kind != SKIP:
+                steps.append((kind, col, value))
+        return WorklistRule(key, tuple(mirror_cols), tuple(steps))
+
+
+# ============ 各平台的列动作口径 ============
+def nimbus_classify(col, val):
+    """NIMBUS / Starlet：* 镜像；进样体积列不填；孔位列按原值求值；其他列写原值"""
+    if str(val).strip() == "*":
+        return MIRROR, None
+    if col in INJECTION_COLUMNS:
+        return SKIP, None
+    if col in VIAL_COLUMNS:
+        return VIAL, val
+    return CONST, val
+
+
+def strip_key(key):
+    """sample_key 去空格（达安 / Tecan）；模块级函数，便于按 (classify, key) 缓存编译结果"""
+    return str(key).strip()
+
+
+# 同一进样体积返回同一函数对象，编译结果可按 classify 缓存（见 mapping_cache.MappingBundle.worklist_map）
+@lru_cache(maxsize=32)
+def icpms_classifier(injection_vol):
+    """手工 ICP-MS：进样体积列写配置值（没有时写映射值）；孔位列多一个“样品瓶号”"""
+    def classify(col, val):
+        v = str(val).strip()
+        if v == "*":
+            return MIRROR, None
+        if col in INJECTION_COLUMNS:
+            return CONST, injection_vol or v
+        if col in VIAL_COLUMNS or col == "样品瓶号":
+            return VIAL, v
+        return CONST, val
+    return classify
+
+
+def daan_classify(col, val):
+    """达安：映射值先去空格（空值为 ""），其余同 NIMBUS"""
+    val = "" if pd.isna(val) else str(val).strip()
+    if val == "*":
+        return MIRROR, None
+    if col in INJECTION_COLUMNS:
+        return SKIP, None
+    if col in VIAL_COLUMNS:
+        return VIAL, val
+    return CONST, val
+
+
+def tecan_classify(col, val):
+    """Tecan：按映射值判断——* 镜像；孔号 / 孔位占位符逐行求值；其他写原值"""
+    sval = str(val).strip()
+    if sval == "*":
+        return MIRROR, None
+    if sval in WELL_PLACEHOLDERS:
+        return VIAL, sval
+    return CONST, val
+
+
+class WorklistFill:
+    """套用过程中的 worklist：各列为 object 数组（按列位置），第一列的匹配结果按需缓存"""
+
+    def __init__(self, table):
+        self.table = table
+        self.index = table.index
+        self.headers = list(table.columns)
+        self.values = [table.iloc[:, i].to_numpy(dtype=object, copy=True) for i in range(len(self.headers))]
+        self.dirty = set()
+        self._positions = {}
+        for i, col in enumerate(self.headers):
+            self._positions.setdefault(col, []).append(i)
+        self._masks = {}
+        self._names = None
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def names(self):
+        """第一列的字符串形式（astype(str) 口径）"""
+        if self._names is None:
+            self._names = [str(v) for v in self.values[0]]
+        return self._names
+
+    def _cached(self, key, build):
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._masks[key] = np.fromiter(build(), dtype=bool, count=len(self))
+        return mask
+
+    def prefix_mask(self, prefix, fold=None):
+        """第一列以 prefix 开头（fold 为 "upper" / "lower" 时先转换大小写）"""
+        if fold == "upper":
+            return self._cached(("prefix", prefix, fold), lambda: (s.upper().startswith(prefix) for s in self.names))
+        if fold == "lower":
+            return self._cached(("prefix", prefix, fold), lambda: (s.lower().startswith(prefix) for s in self.names))
+        return self._cached(("prefix", prefix, fold), lambda: (s.startswith(prefix) for s in self.names))
+
+    def equals_mask(self, value):
+        return self._cached(("eq", value), lambda: (s == value for s in self.names))
+
+    def isin_mask(self, names):
+        names = set(names)
+        return np.fromiter((s in names for s in self.names), dtype=bool, count=len(self))
+
+    def isna_mask(self, pos, single_column=None):
+        """第 pos 列仍为空的行；表只有一列时：single_column 为 None 则与 iloc 一样抛 IndexError，否则全为该值"""
+        if pos >= len(self.values) and single_column is not None:
+            return np.full(len(self), single_column, dtype=bool)
+        return pd.isna(self.values[pos])
+
+    def set(self, col, hits, value):
+        """命中行（bool 数组或行位置列表）的 col 列写入 value（标量或与命中行等长的数组）"""
+        for pos in self._positions[col]:
+            self.values[pos][hits] = value
+            self.dirty.add(pos)
+            if pos == 0:
+                self._names = None
+                self._masks.clear()
+
+    def first_column(self, hits):
+        return pd.Series(self.values[0][hits], dtype=object)
+
+    def flush(self):
+        """把改动过的列写回 table"""
+        for pos in sorted(self.dirty):
+            self.table.isetitem(pos, self.values[pos])
+        self.dirty.clear()
+
+
+def apply_worklist_map(worklist_map, table, match, resolve=None, *, skip_empty=False, on_rule=None):
+    """
+    把映射规则原地套到 table（第一列已是 SampleName 列表），返回需要镜像第一列的列名集合。
+      match(key, fill)：该规则命中的行（bool 数组），不适用的 key 返回 None
+      resolve(sample_name, value)：孔位列逐行求值
+      skip_empty：命中 0 行的规则整条跳过（不登记镜像列）
+      on_rule(rule, hits, fill)：返回 True 表示该规则已由调用方处理（Tecan 定位孔行）
+    """
+    fill = WorklistFill(table)
+    mirror_cols = set()
+
+    for rule in worklist_map.rules(fill.headers):
+        hits = match(rule.key, fill)
+        if hits is None:
+            continue
+        if skip_empty and not hits.any():
+            continue
+        mirror_cols.update(rule.mirror_cols)
+        if on_rule is not None and on_rule(rule, hits, fill):
+            continue
+
+        for kind, col, value in rule.steps:
+            if kind == CONST:
+                fill.set(col, hits, value)
+            elif hits.any():
+                resolved = fill.first_column(hits).apply(lambda s, v=value: resolve(s, v))
+                fill.set(col, hits, resolved.to_numpy())
+
+    fill.flush()
+    return mirror_cols
+
+
+# ============ sample_key 语义 ============
+def standard_rule_mask(key, fill, *, with_qc=True, std_names=None, qc_names=None, single_column=None):
+    """
+    NIMBUS / Starlet / ICP-MS / 达安 的 sample_key 语义（按顺序判断）：
+      DB* / Test* / STD* / QC*：第一列以该前缀开头（给定 std_names / qc_names 时改为在名单内）
+      DB… / Test… / STD… / QC…：第一列等于 sample_key
+      *：第二列仍为空的行
+    with_qc=False 时不识别 QC 规则（NIMBUS / Starlet）。
+    """
+    groups = (("DB", None), ("Test", None), ("STD", std_names), ("QC", qc_names))
+    for prefix, names in groups if with_qc else groups[:3]:
+        if key == prefix + "*":
+            return fill.prefix_mask(prefix) if names is None else fill.isin_mask(names)
+        if key.startswith(prefix):
+            return fill.equals_mask(key)
+    if key == "*":
+        return fill.isna_mask(1, single_column)
+    return None
+
+
+def tecan_rule_mask(key, fill, *, locator_display=None):
+    """
+    Tecan 的 sample_key 语义：
+      DB…（不分大小写）：全部 DB 行；test…（不分大小写）：全部 Test 行
+      STD…：第一列等于 sample_key；定位孔显示名（Xn）：第一列等于它
+      *：第二列仍为空的行（只有一列时为全部行）
+    其他 key（临床样本）不处理。
+    """
+    if key.upper().startswith("DB"):
+        return fill.prefix_mask("DB", fold="upper")
+    if key.lower().startswith("test"):
+        return fill.prefix_mask("test", fold="lower")
+    if key.upper().startswith("STD"):
+        return fill.equals_mask(key)
+    if locator_display and key == locator_display:
+        return fill.equals_mask(locator_display)
+    if key == "*":
+        return fill.isna_mask(1, True)
+    return None
+
+
+# ============ 孔位求值 ============
+def _plate_formatter(instrument_name, injection_plate, pos_sep="-"):
+    # Thermo / Agilent 带进样盘前缀：孔号 plate:no，孔位 plate-pos（pos_sep 可改）
+    if instrument_name == "Thermo" or instrument_name == "Agilent":
+        def fmt(placeholder, pos, no):
+            if placeholder == WELL_NUMBER:
+                return f"{injection_plate}:{no}" if injection_plate else no
+            return f"{injection_plate}{pos_sep}{pos}" if injection_plate else pos
+    else:
+        def fmt(placeholder, pos, no):
+            return no if placeholder == WELL_NUMBER else pos
+    return fmt
+
+
+def nimbus_vial_resolver(*, platform, instrument_name, injection_plate, name_to_barcodes, barcode_to_well):
+    """
+    NIMBUS / Starlet 孔位列求值（value 为映射表原值）：
+      Xn 定位孔：NIMBUS 从第3列纵向排，Starlet 从 B 行横向排；超出板面为 None
+      占位符：QC/STD 经 Name -> 条码队列取孔位；临床样本第一列即条码；都没有时为 A1 / 1
+      其他值原样返回
+    """
+    fmt = _plate_formatter(instrument_name, injection_plate)
+
+    def resolve(sample_name, value):
+        m = _LOCATOR_RE.fullmatch(str(sample_name).strip().upper())
+        if m:
+            k0 = int(m.group(1)) - 1
+            if platform == "NIMBUS":
+                coln, row_idx = 3 + (k0 // 8), k0 % 8
+            else:  # Starlet
+                row_idx, coln = 1 + (k0 // 12), 1 + (k0 % 12)
+            if not (0 <= row_idx < 8 and 1 <= coln <= 12):
+                return None
+            return fmt(value, f"{_ROWS[row_idx]}{coln}", row_idx * 12 + coln)
+
+        if value in WELL_PLACEHOLDERS:
+            if sample_name in name_to_barcodes and name_to_barcodes[sample_name]:
+                wells_q = barcode_to_well.get(name_to_barcodes[sample_name].popleft())
+                if wells_q:
+                    pos, no = wells_q.popleft()
+                    return fmt(value, pos, no)
+            elif sample_name in barcode_to_well:
+                wells_q = barcode_to_well.get(str(sample_name))
+                if wells_q:
+                    pos, no = wells_q.popleft()
+                    return fmt(value, pos, no)
+            else:
+                return fmt(value, "A1", "1")
+        return value
+
+    return resolve
+
+
+def icpms_vial_resolver(*, injection_plate, name_to_barcodes, barcode_to_well):
+    """
+    手工 ICP-MS 孔位列求值（value 为去空格后的映射值）：
+      非占位符原样返回；Xn 定位孔固定第3列（A3 / B3 / …，超过8块循环）
+      QC/STD 经 Name -> 条码队列取孔位，临床样本第一列即条码，都没有时为 {进样盘}-H1
+    """
+    def resolve(sample_name, value):
+        s = str(sample_name).strip()
+        if not s:
+            return ""
+        if value not in WELL_PLACEHOLDERS:
+            return value
+
+        m = _LOCATOR_RE.fullmatch(s.upper())
+        if m:
+            row_idx = (int(m.group(1)) - 1) % 8
+            if value == WELL_NUMBER:
+                return f"{row_idx * 12 + 3}"
+            return f"{_ROWS[row_idx]}3"
+
+        if s in name_to_barcodes and name_to_barcodes[s]:
+            wells_q = barcode_to_well.get(name_to_barcodes[s].popleft())
+            if wells_q:
+                pos, no = wells_q.popleft()
+                return f"{no}" if value == WELL_NUMBER else f"{pos}"
+
+        if s in barcode_to_well:
+            wells_q = barcode_to_well.get(s)
+            if wells_q:
+                pos, no = wells_q.popleft()
+                return f"{no}" if value == WELL_NUMBER else f"{pos}"
+
+        return f"{injection_plate}-H1"
+
+    return resolve
+
+
+def daan_vial_resolver(*, name_to_wells, format_well):
+    """
+    达安孔位列求值（value 为去空格后的映射值）：
+      样本在达安 txt 中有孔位时按队列取用，占位符经 format_well(well, value) 格式化；
+      没有孔位的 DB / Test 等项占位符兜底为 A1 / 1；其他值原样返回
+    """
+    def resolve(sample_name, value):
+        wells_q = name_to_wells.get(str(sample_name).strip())
+        if wells_q:
+            well = wells_q.popleft()
+            if value in WELL_PLACEHOLDERS:
+                return format_well(well, value)
+            return value
+        if value in WELL_PLACEHOLDERS:
+            return "1" if value == WELL_NUMBER else "A1"
+        return value
+
+    return resolve
+
+
+def tecan_vial_resolver(*, project_name, instrument_name, injection_plate,
+                        name_to_barcodes, barcode_to_well, locator_info=None):
+    """
+    Tecan 孔位占位符求值（value 为占位符）：
+      DB 行固定 A1 / 1；定位孔用 locator_info；QC/STD 经 Name -> 条码队列取孔位；临床样本第一列即条码
+      PCA 项目孔位前缀用 plate:pos；取不到时为 None
+    """
+    fmt = _plate_formatter(instrument_name, injection_plate, ":" if project_name == "PCA" else "-")
+    loc_display = (locator_info or {}).get("display_name")
+
+    def resolve(sample_name, value):
+        name = str(sample_name).strip()
+        if name.upper().startswith("DB"):
+            return 1 if value == WELL_NUMBER else "A1"
+
+        if loc_display and locator_info and name == loc_display:
+            return fmt(value, locator_info.get("well_pos"), locator_info.get("well_num"))
+
+        if name in name_to_barcodes and name_to_barcodes[name]:
+            wells = barcode_to_well.get(name_to_barcodes[name].popleft())
+            if wells:
+                well_pos, well_num = wells.popleft()
+                return fmt(value, well_pos, well_num)
+            return None
+
+        wells = barcode_to_well.get(name)
+        if wells:
+            well_pos, well_num = wells.popleft()
+            return fmt(value, well_pos, well_num)
+        return None
+
+    return resolve